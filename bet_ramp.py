@@ -0,0 +1,209 @@
+""" Kelly bet ramps from simulated EV per shoe signal bucket.
+
+A single pass over simulated rounds bets one unit in a probe wallet and
+records the result against the bucket of the shoe signal (true count or
+blackjack percent) seen when the bet was placed. Per bucket only the number
+of rounds, the sum and the sum of squares of the results are kept, so
+histograms from separate workers merge by addition.
+
+The Kelly bet for a bucket with mean result m and variance v is
+bankroll * m / v. A fraction of it, capped to the table limits, gives the
+bet for each bucket of a strategy.StrategyRamp.
+"""
+import argparse
+
+import simulation
+import strategy
+import wallet
+
+
+class BetRampException(Exception):
+  """Base exception."""
+
+
+class RoundHistogram(object):
+  """Result moments per bucket."""
+
+  def __init__(self):
+    self.num_rounds = {}
+    self.total = {}
+    self.total_squared = {}
+
+  def Add(self, bucket, result):
+    """Record the result of a round.
+
+    Args:
+      bucket: int or float, bucket the bet was placed in.
+      result: float, money units won per unit bet.
+    """
+    if bucket in self.num_rounds:
+      self.num_rounds[bucket] += 1
+      self.total[bucket] += result
+      self.total_squared[bucket] += result * result
+    else:
+      self.num_rounds[bucket] = 1
+      self.total[bucket] = result
+      self.total_squared[bucket] = result * result
+
+  def Merge(self, other):
+    """Add the rounds of another histogram to this one.
+
+    Args:
+      other: RoundHistogram, histogram to merge in.
+    """
+    for bucket, num_rounds in other.num_rounds.iteritems():
+      self.num_rounds[bucket] = self.num_rounds.get(bucket, 0) + num_rounds
+      self.total[bucket] = self.total.get(bucket, 0.0) + other.total[bucket]
+      self.total_squared[bucket] = (self.total_squared.get(bucket, 0.0) +
+                                    other.total_squared[bucket])
+
+  def Mean(self, bucket):
+    """Returns the mean result of the bucket."""
+    return float(self.total[bucket]) / self.num_rounds[bucket]
+
+  def Variance(self, bucket):
+    """Returns the sample variance of the results of the bucket."""
+    num_rounds = self.num_rounds[bucket]
+    if num_rounds < 2:
+      return 0.0
+    mean = self.Mean(bucket)
+    return max((self.total_squared[bucket] - num_rounds * mean * mean) /
+               (num_rounds - 1), 0.0)
+
+
+class _ProbeStrategy(strategy.BettingStrategy):
+  """Bets one unit and remembers the bucket of the shoe at bet time."""
+
+  def __init__(self, bucket_name):
+    super(_ProbeStrategy, self).__init__()
+    self.bucket_function = strategy.BUCKET_FUNCTIONS[bucket_name]
+    self.bucket = None
+
+  def GetBetAmount(self, **kwargs):
+    self.bucket = self.bucket_function(kwargs['shoe'])
+    return 1
+
+
+def HistogramTask(task):
+  """Worker entry point. Simulate rounds into a histogram.
+
+  Args:
+    task: (GameConfig, int, int, str), game config, seed, number of rounds
+        and bucket name.
+
+  Returns:
+    RoundHistogram, results of the rounds.
+  """
+  config, seed, num_rounds, bucket_name = task
+  probe = _ProbeStrategy(bucket_name)
+  probe_wallet = wallet.Wallet('Probe', probe)
+  blackjack_game = simulation.NewGame(config, seed, wallets=[probe_wallet])
+
+  histogram = RoundHistogram()
+  for _ in xrange(num_rounds):
+    start = probe_wallet.money_units
+    simulation.PlayRound(blackjack_game)
+    histogram.Add(probe.bucket, probe_wallet.money_units - start)
+  return histogram
+
+
+def BuildHistogram(num_rounds, bucket_name='true_count',
+                   config=simulation.DEFAULT_GAME_CONFIG, num_workers=None,
+                   num_batches=None, seed=0):
+  """Simulate rounds across workers and merge the histograms.
+
+  Args:
+    num_rounds: int, total number of rounds.
+    bucket_name: str, key of strategy.BUCKET_FUNCTIONS.
+    config: simulation.GameConfig, game to simulate.
+    num_workers: int, worker processes. None uses one per cpu.
+    num_batches: int, independent games the rounds are split over. None
+        uses one per worker. Results only depend on this and the seed.
+    seed: int, seed of the first batch; batch i uses seed + i.
+
+  Returns:
+    RoundHistogram, results of all rounds.
+
+  Raises:
+    BetRampException: Unknown bucket.
+  """
+  if bucket_name not in strategy.BUCKET_FUNCTIONS:
+    raise BetRampException('Unknown bucket: %s' % bucket_name)
+  if num_batches is None:
+    num_batches = num_workers or simulation.multiprocessing.cpu_count()
+
+  tasks = [(config, seed + index, batch_rounds, bucket_name)
+           for index, batch_rounds in enumerate(
+               simulation.SplitRounds(num_rounds, num_batches))]
+  histogram = RoundHistogram()
+  for batch_histogram in simulation.RunTasks(HistogramTask, tasks,
+                                             num_workers):
+    histogram.Merge(batch_histogram)
+  return histogram
+
+
+def KellyRamp(histogram, bankroll, table_minimum, table_maximum,
+              kelly_fraction=0.5, min_rounds=1000):
+  """Returns the fractional Kelly bet of each bucket.
+
+  Args:
+    histogram: RoundHistogram, simulated results.
+    bankroll: float, money units backing the bets.
+    table_minimum: int, smallest bet allowed.
+    table_maximum: int, largest bet allowed.
+    kelly_fraction: float, fraction of the full Kelly bet to make.
+    min_rounds: int, buckets with fewer rounds bet the table minimum.
+
+  Returns:
+    {int or float: int}, bet amount per bucket.
+  """
+  ramp = {}
+  for bucket, num_rounds in histogram.num_rounds.iteritems():
+    bet = table_minimum
+    variance = histogram.Variance(bucket)
+    if num_rounds >= min_rounds and variance > 0:
+      optimal = kelly_fraction * bankroll * histogram.Mean(bucket) / variance
+      bet = min(max(int(optimal), table_minimum), table_maximum)
+    ramp[bucket] = bet
+  return ramp
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--num-rounds', type=int, default=1000000,
+                      help='Number of rounds to simulate.')
+  parser.add_argument('--bucket', type=str, default='true_count',
+                      choices=sorted(strategy.BUCKET_FUNCTIONS),
+                      help='Shoe signal the ramp is keyed by.')
+  parser.add_argument('--bankroll', type=float, default=1000,
+                      help='Bankroll in money units.')
+  parser.add_argument('--kelly-fraction', type=float, default=0.5,
+                      help='Fraction of the full Kelly bet.')
+  parser.add_argument('--min-rounds', type=int, default=1000,
+                      help='Rounds needed in a bucket to bet above minimum.')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the first batch.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  config = simulation.DEFAULT_GAME_CONFIG
+  histogram = BuildHistogram(args.num_rounds, args.bucket, config,
+                             num_workers=args.workers, seed=args.seed)
+  ramp = KellyRamp(histogram, args.bankroll, config.rules.min_money_units,
+                   config.rules.max_money_units, args.kelly_fraction,
+                   args.min_rounds)
+
+  print '%10s %10s %10s %10s %6s' % ('Bucket', 'Rounds', 'EV', 'Variance',
+                                     'Bet')
+  for bucket in sorted(ramp):
+    print '%10s %10d %10.4f %10.4f %6d' % (
+        bucket, histogram.num_rounds[bucket], histogram.Mean(bucket),
+        histogram.Variance(bucket), ramp[bucket])
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,57 @@
+import bet_ramp
+import card
+import shoe
+import strategy
+import unittest
+
+
+class BetRampTest(unittest.TestCase):
+  def test_merge_matches_single_pass(self):
+    results = [(0, 1.0), (1, -1.0), (0, 1.5), (1, 2.0), (2, 0.0), (0, -1.0)]
+    single = bet_ramp.RoundHistogram()
+    for bucket, result in results:
+      single.Add(bucket, result)
+
+    merged = bet_ramp.RoundHistogram()
+    for part in (results[:2], results[2:]):
+      histogram = bet_ramp.RoundHistogram()
+      for bucket, result in part:
+        histogram.Add(bucket, result)
+      merged.Merge(histogram)
+
+    self.assertEqual(merged.num_rounds, single.num_rounds)
+    for bucket in single.num_rounds:
+      self.assertAlmostEqual(merged.Mean(bucket), single.Mean(bucket))
+      self.assertAlmostEqual(merged.Variance(bucket), single.Variance(bucket))
+
+  def test_kelly_ramp(self):
+    histogram = bet_ramp.RoundHistogram()
+    for bucket, results in ((-1, (-1.0, 0.5)), (1, (1.0, -0.9)),
+                            (2, (1.0, 1.2)), (3, (1.0,))):
+      for result in results:
+        histogram.Add(bucket, result)
+    ramp = bet_ramp.KellyRamp(histogram, bankroll=100, table_minimum=1,
+                              table_maximum=20, kelly_fraction=1.0,
+                              min_rounds=2)
+    # Negative EV at the minimum, small edge scaled, large edge capped and
+    # too few rounds at the minimum.
+    self.assertEqual(ramp, {-1: 1, 1: 2, 2: 20, 3: 1})
+
+  def test_workers_do_not_change_results(self):
+    serial = bet_ramp.BuildHistogram(200, num_workers=1, num_batches=2)
+    parallel = bet_ramp.BuildHistogram(200, num_workers=2, num_batches=2)
+    self.assertEqual(sum(serial.num_rounds.values()), 200)
+    self.assertEqual(serial.num_rounds, parallel.num_rounds)
+    self.assertEqual(serial.total, parallel.total)
+
+  def test_ramp_strategy_clamps_buckets(self):
+    ramp_strategy = strategy.StrategyRamp({-1: 1, 2: 8})
+    test_shoe = shoe.Shoe(4)
+    test_shoe.cards_played = {}
+    self.assertEqual(ramp_strategy.GetBetAmount(shoe=test_shoe), 1)
+    test_shoe.cards_played = {card.TWO: 40}
+    self.assertEqual(ramp_strategy.GetBetAmount(shoe=test_shoe), 8)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -18,3 +18,37 @@ SEVEN = Card('Seven', 7, 7)
 EIGHT = Card('Eight', 8, 8)
 NINE = Card('Nine', 9, 9)
 FACE = Card('Face', 10, 10)
+
+# All ranks, in the order used by composition vectors.
+RANKS = (ACE, TWO, THREE, FOUR, FIVE, SIX, SEVEN, EIGHT, NINE, FACE)
+
+# Suits, ordered so a suit and the other suit of its colour differ in the
+# lowest bit.
+SPADES, CLUBS, HEARTS, DIAMONDS = range(4)
+SUITS = ('Spades', 'Clubs', 'Hearts', 'Diamonds')
+
+# Ranks when faces are told apart, Ace first and King last.
+SUITED_RANKS = ('Ace', 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven',
+                'Eight', 'Nine', 'Ten', 'Jack', 'Queen', 'King')
+TEN, JACK, QUEEN, KING = range(9, 13)
+
+# A suited card is an int identity, suited rank * 4 + suit, so a deck is
+# range(52). SUITED_CARDS maps an identity to the Card the game plays with.
+NUM_IDENTITIES = len(SUITED_RANKS) * len(SUITS)
+SUITED_CARDS = tuple(RANKS[min(identity // 4, TEN)]
+                     for identity in xrange(NUM_IDENTITIES))
+
+
+def Identity(suited_rank, suit):
+  """Returns the identity of a suited card.
+
+  Args:
+    suited_rank: int, index in SUITED_RANKS.
+    suit: int, index in SUITS.
+  """
+  return suited_rank * 4 + suit
+
+
+def IdentityName(identity):
+  """Returns a readable name such as 'Queen of Hearts'."""
+  return '%s of %s' % (SUITED_RANKS[identity // 4], SUITS[identity % 4])
@@ -0,0 +1,340 @@
+""" A casino floor of many tables and card counting agents.
+
+A counter who wongs stands behind a table counting (back-counting), sits
+down when the count is good and leaves when it turns, then walks to another
+table. The floor holds the tables as rows of a table_array.TableArray, each
+with its own shoe and stop card, and moves agents between them.
+
+Time is simulated. A round takes seconds_per_seat for every player at the
+table and a shuffle shuffle_seconds. The scheduler keeps a heap of the
+tables agents are at, ordered by when their next round ends, and plays them
+in that order. A table nobody is at is not played while left alone; when an
+agent walks up, it is caught up by playing the rounds it would have played
+since, in one batch. Nobody saw those cards, so a table left alone for more
+than a shoe is instead reshuffled at a random point of the last shoe
+length and only played from there. Hundreds of tables then cost little
+more than the few being watched.
+
+The seat at the table is played as the game plays its player: every round,
+with the table's play strategy. When an agent sits in it the agent bets
+on it, from a ramp keyed by the true count; otherwise it is someone else's
+hand. One agent sits at a table at a time; any number may watch. An agent
+only knows the cards dealt since it walked up, or since the shuffle but
+the ones burned face down.
+
+Run directly for a report per agent:
+
+  python casino_floor.py --tables 200 --agents 10 --hours 100
+"""
+import argparse
+import array
+import collections
+import heapq
+import math
+import random
+
+import count
+import simulation
+import strategy
+import table_array
+
+# One unit bet on the seat every round, so its balance moves by the result
+# per unit bet.
+_SEAT_WALLET = 'seat'
+_SEAT_SPECS = [{'name': _SEAT_WALLET, 'strategy': 'table_minimum',
+                'params': {'table_minimum': 1}}]
+
+# Betting ramp by Hi-Lo true count of the default agents: sit at +1 and
+# spread 1 to 8 units.
+DEFAULT_RAMP = {1: 1, 2: 2, 3: 4, 4: 6, 5: 8}
+
+_NO_AGENT = -1
+
+
+class CasinoFloorException(Exception):
+  """Base exception."""
+
+
+class Agent(object):
+  """A back-counter moving between tables.
+
+  Attributes:
+    table: int, table the agent is at.
+    seated: bool, the agent is playing the seat rather than watching.
+    hands: int, hands played.
+    units: float, money units won.
+    units_squared: float, sum of squared money units won per hand.
+  """
+
+  def __init__(self, name, ramp=None, entry_count=1, exit_count=0,
+               max_watch_rounds=10, leave_at_shuffle=True):
+    """Constructor.
+
+    Args:
+      name: str, name of the agent in reports.
+      ramp: {int: int}, bet per rounded true count, see
+          strategy.StrategyRamp. Defaults to DEFAULT_RAMP.
+      entry_count: float, sit down at this true count or above.
+      exit_count: float, leave once the true count falls below this.
+      max_watch_rounds: int, rounds watched without sitting before walking
+          to another table.
+      leave_at_shuffle: bool, leave the seat when the shoe ends.
+    """
+    if exit_count > entry_count:
+      raise CasinoFloorException('Exit count %s above entry count %s' % (
+          exit_count, entry_count))
+    self.name = name
+    self.ramp = strategy.StrategyRamp(ramp or DEFAULT_RAMP)
+    self.entry_count = entry_count
+    self.exit_count = exit_count
+    self.max_watch_rounds = max_watch_rounds
+    self.leave_at_shuffle = leave_at_shuffle
+
+    # Index of the agent on its floor.
+    self.index = None
+    self.table = None
+    self.seated = False
+    # Running count of the table when the agent started counting it, and
+    # the shoe it was then.
+    self.baseline = 0
+    self.shoe_number = 0
+    self.watched_rounds = 0
+
+    self.hands = 0
+    self.units = 0.0
+    self.units_squared = 0.0
+    self.bet = 0
+
+  def TrueCount(self, tables):
+    """Returns the true count of the cards the agent saw at its table."""
+    table = self.table
+    if tables.ShoeNumber(table) != self.shoe_number:
+      # The agent watched the shuffle, so it knows every card since but the
+      # ones burned face down.
+      self.shoe_number = tables.ShoeNumber(table)
+      self.baseline = tables.BurnCount(table)
+    return (float(tables.RunningCount(table) - self.baseline) /
+            tables.DecksRemaining(table))
+
+
+def RoundsPerShoe(config, seed=0, num_rounds=2000):
+  """Returns the mean number of rounds dealt from a shoe of the game."""
+  tables = table_array.TableArray(config, 1, seed=seed,
+                                  wallet_specs=_SEAT_SPECS)
+  tables.Play(num_rounds)
+  return float(num_rounds) / max(tables.ShoeNumber(0), 1)
+
+
+AgentReport = collections.namedtuple(
+    'AgentReport', ['name', 'hands', 'hours', 'units', 'ev_per_hour',
+                    'ev_per_hand', 'error_per_hand'])
+
+
+class Floor(object):
+  """Tables and agents, advanced in simulated time."""
+
+  def __init__(self, agents, num_tables=100,
+               config=simulation.DEFAULT_GAME_CONFIG, seed=0,
+               seconds_per_seat=10.0, shuffle_seconds=60.0):
+    """Constructor. Every agent starts watching a random table.
+
+    Args:
+      agents: [Agent], agents on the floor.
+      num_tables: int, number of tables.
+      config: simulation.GameConfig, game played at every table. Its
+          num_players includes the seat agents sit in.
+      seed: int, seed of the shoes and of the agents walks.
+      seconds_per_seat: float, round time per player at the table.
+      shuffle_seconds: float, time taken by a shuffle.
+
+    Raises:
+      CasinoFloorException: Fewer tables than agents.
+    """
+    if num_tables < len(agents):
+      raise CasinoFloorException('%d agents need at least as many tables' %
+                                 len(agents))
+    self.agents = agents
+    self.tables = table_array.TableArray(
+        config, num_tables, seed=seed, wallet_specs=_SEAT_SPECS,
+        count_tags=count.HI_LO)
+    self.rng = random.Random(seed)
+    self.round_seconds = seconds_per_seat * config.num_players
+    self.shuffle_seconds = shuffle_seconds
+    self.shoe_seconds = (RoundsPerShoe(config, seed) * self.round_seconds +
+                         shuffle_seconds)
+    self.time = 0.0
+
+    # Per table: when its next round ends and the agent seated, if any.
+    # Every table starts at a random point of its first round.
+    self.clocks = array.array('d', [
+        self.rng.random() * self.round_seconds for _ in xrange(num_tables)])
+    self.seats = array.array('l', [_NO_AGENT]) * num_tables
+    # {table: [Agent]} of the tables agents are at, and the heap of
+    # (next round end, table) of the tables in scheduled. A table stays in
+    # the heap until its next round, even once everyone left.
+    self.present = {}
+    self.heap = []
+    self.scheduled = set()
+
+    for index, agent in enumerate(agents):
+      agent.index = index
+      self._Walk(agent)
+
+  def _Walk(self, agent):
+    """Move an agent to watch another table, chosen at random."""
+    old_table = agent.table
+    if old_table is not None:
+      if agent.seated:
+        self.seats[old_table] = _NO_AGENT
+      self.present[old_table].remove(agent)
+      if not self.present[old_table]:
+        del self.present[old_table]
+
+    num_tables = self.tables.num_tables
+    if old_table is None:
+      table = self.rng.randrange(num_tables)
+    elif num_tables == 1:
+      table = old_table
+    else:
+      table = self.rng.randrange(num_tables - 1)
+      if table >= old_table:
+        table += 1
+    if table not in self.scheduled:
+      self._CatchUp(table)
+      self.scheduled.add(table)
+      heapq.heappush(self.heap, (self.clocks[table], table))
+    self.present.setdefault(table, [])
+    self.present[table].append(agent)
+
+    agent.table = table
+    agent.seated = False
+    agent.watched_rounds = 0
+    agent.shoe_number = self.tables.ShoeNumber(table)
+    agent.baseline = self.tables.RunningCount(table)
+
+  def _CatchUp(self, table):
+    """Play the rounds a table played while nobody was there."""
+    tables = self.tables
+    clock = self.clocks[table]
+    if self.time - clock > self.shoe_seconds:
+      tables.Shuffle(table)
+      clock = self.time - self.rng.random() * self.shoe_seconds
+    while clock < self.time:
+      tables.PlayRound(table)
+      clock += self.round_seconds
+      if tables.ShoeFinished(table):
+        clock += self.shuffle_seconds
+    self.clocks[table] = clock
+
+  def Run(self, hours):
+    """Advance the floor.
+
+    Args:
+      hours: float, simulated hours to run for.
+    """
+    tables = self.tables
+    balances = tables.balances
+    end = self.time + hours * 3600
+    while self.heap and self.heap[0][0] <= end:
+      self.time, table = heapq.heappop(self.heap)
+      agents = self.present.get(table)
+      if not agents:
+        # Everyone walked away; the table is caught up when visited again.
+        self.scheduled.discard(table)
+        continue
+
+      seated = self.seats[table]
+      player = None
+      if seated != _NO_AGENT:
+        player = self.agents[seated]
+        true_count = 0.0
+        if not tables.ShoeFinished(table):
+          true_count = player.TrueCount(tables)
+        player.bet = player.ramp.BetForSignal(int(round(true_count)))[0]
+      before = balances[table]
+      tables.PlayRound(table)
+      if player is not None:
+        won = player.bet * (balances[table] - before)
+        player.hands += 1
+        player.units += won
+        player.units_squared += won * won
+
+      for agent in list(agents):
+        self._Decide(agent)
+
+      clock = self.time + self.round_seconds
+      if tables.ShoeFinished(table):
+        clock += self.shuffle_seconds
+      self.clocks[table] = clock
+      heapq.heappush(self.heap, (clock, table))
+    self.time = end
+
+  def _Decide(self, agent):
+    """After a round at its table, an agent sits, stays or walks."""
+    true_count = agent.TrueCount(self.tables)
+    if agent.seated:
+      if (true_count < agent.exit_count or
+          (agent.leave_at_shuffle and self.tables.ShoeFinished(agent.table))):
+        self._Walk(agent)
+      return
+
+    seat = self.seats[agent.table]
+    if true_count >= agent.entry_count and seat == _NO_AGENT:
+      self.seats[agent.table] = agent.index
+      agent.seated = True
+      return
+    agent.watched_rounds += 1
+    if agent.watched_rounds >= agent.max_watch_rounds:
+      self._Walk(agent)
+
+  def Report(self):
+    """Returns an AgentReport per agent, for the time run so far."""
+    hours = self.time / 3600
+    reports = []
+    for agent in self.agents:
+      ev_per_hand = agent.units / max(agent.hands, 1)
+      variance = agent.units_squared / max(agent.hands, 1) - ev_per_hand ** 2
+      reports.append(AgentReport(
+          name=agent.name, hands=agent.hands, hours=hours, units=agent.units,
+          ev_per_hour=agent.units / hours if hours else 0.0,
+          ev_per_hand=ev_per_hand,
+          error_per_hand=math.sqrt(max(variance, 0.0) /
+                                   max(agent.hands - 1, 1))))
+    return reports
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--tables', type=int, default=200,
+                      help='Tables on the floor.')
+  parser.add_argument('--agents', type=int, default=10,
+                      help='Back-counting agents.')
+  parser.add_argument('--hours', type=float, default=100,
+                      help='Simulated hours.')
+  parser.add_argument('--entry-count', type=float, default=1,
+                      help='True count agents sit down at.')
+  parser.add_argument('--exit-count', type=float, default=0,
+                      help='True count agents leave below.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the shoes and walks.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  agents = [Agent('agent_%d' % index, entry_count=args.entry_count,
+                  exit_count=args.exit_count)
+            for index in xrange(args.agents)]
+  floor = Floor(agents, num_tables=args.tables, seed=args.seed)
+  floor.Run(args.hours)
+
+  print '%-10s %8s %10s %10s %12s' % ('Agent', 'Hands', 'Units',
+                                      'Units/hour', 'Units/hand')
+  for report in floor.Report():
+    print '%-10s %8d %10.1f %10.2f %6.4f+-%.4f' % (
+        report.name, report.hands, report.units, report.ev_per_hour,
+        report.ev_per_hand, report.error_per_hand)
+
+
+if __name__ == '__main__':
+  main()
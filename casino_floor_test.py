@@ -0,0 +1,81 @@
+import casino_floor
+import count
+import simulation
+import table_array
+import unittest
+
+
+def NewAgents(num_agents, **kwargs):
+  return [casino_floor.Agent('agent_%d' % index, **kwargs)
+          for index in xrange(num_agents)]
+
+
+class FloorTest(unittest.TestCase):
+  def test_agents_play_and_report(self):
+    floor = casino_floor.Floor(NewAgents(3), num_tables=20, seed=1)
+    floor.Run(5)
+    reports = floor.Report()
+    self.assertEqual(['agent_0', 'agent_1', 'agent_2'],
+                     [report.name for report in reports])
+    for report in reports:
+      self.assertGreater(report.hands, 0)
+      self.assertAlmostEqual(5.0, report.hours)
+      self.assertAlmostEqual(report.units / 5.0, report.ev_per_hour)
+    # Hands are capped by the rounds of the simulated time.
+    self.assertLess(max(report.hands for report in reports),
+                    5 * 3600 / floor.round_seconds)
+
+  def test_same_seed_same_floor(self):
+    first = casino_floor.Floor(NewAgents(2), num_tables=10, seed=4)
+    second = casino_floor.Floor(NewAgents(2), num_tables=10, seed=4)
+    first.Run(2)
+    second.Run(1)
+    second.Run(1)
+    self.assertEqual(first.Report(), second.Report())
+
+  def test_agents_wait_for_the_count(self):
+    floor = casino_floor.Floor(NewAgents(2, entry_count=50, exit_count=50),
+                               num_tables=10, seed=2)
+    floor.Run(3)
+    self.assertEqual([0, 0], [report.hands for report in floor.Report()])
+
+  def test_one_agent_per_seat(self):
+    agents = NewAgents(6, entry_count=-10, exit_count=-10)
+    floor = casino_floor.Floor(agents, num_tables=6, seed=3)
+    floor.Run(2)
+    seated = [agent.table for agent in agents if agent.seated]
+    self.assertEqual(len(seated), len(set(seated)))
+    for agent in agents:
+      self.assertEqual(agent.seated,
+                       floor.seats[agent.table] == agent.index)
+
+  def test_idle_tables_are_not_played(self):
+    floor = casino_floor.Floor(NewAgents(1), num_tables=200, seed=5)
+    floor.Run(10)
+    rounds = floor.tables.Totals().num_hands
+    self.assertLess(rounds, 10 * 3600 / floor.round_seconds * 5)
+
+  def test_burned_cards_are_not_counted(self):
+    tables = table_array.TableArray(
+        simulation.DEFAULT_GAME_CONFIG, 1, seed=4,
+        wallet_specs=casino_floor._SEAT_SPECS, count_tags=count.HI_LO)
+    agent = casino_floor.Agent('agent')
+    agent.table = 0
+    tables.Shuffle(0)
+    self.assertNotEqual(0, tables.BurnCount(0))
+    tables.PlayRound(0)
+    num_decks = simulation.DEFAULT_GAME_CONFIG.rules.num_decks
+    tags = dict((rank.value, tag) for rank, tag in count.HI_LO.iteritems())
+    running_count = sum(tags[code]
+                        for code in tables.cards[num_decks:tables.positions[0]])
+    self.assertAlmostEqual(
+        float(running_count) / tables.DecksRemaining(0),
+        agent.TrueCount(tables))
+
+  def test_exit_above_entry(self):
+    self.assertRaises(casino_floor.CasinoFloorException, casino_floor.Agent,
+                      'agent', entry_count=1, exit_count=2)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,311 @@
+""" Distributing round batches over several machines.
+
+A coordinator owns a job spec (see job_server.NormalizeSpec) and its seed
+plan: batch i plays a fresh game seeded with seed + i. Workers connect over
+plain TCP and pull one batch at a time, so fast workers naturally take more
+batches. Each result comes back as compact JSON counters.
+
+A batch handed to a worker is leased to it. If the worker's connection
+drops, or the lease runs out, the batch goes back to the front of the
+queue for the next worker. Results are merged in batch order and
+duplicate results for a batch are ignored, so the totals only depend on the
+spec.
+
+The protocol is one JSON object per line. A worker sends
+{"type": "request"} and gets {"type": "batch", "index": i, "spec": ...},
+{"type": "wait", "seconds": s} or {"type": "done"}; it answers a batch
+with {"type": "result", "index": i, "counters": ...}.
+"""
+import argparse
+import collections
+import json
+import socket
+import SocketServer
+import threading
+import time
+
+import counters
+import job_server
+
+MESSAGE_REQUEST = 'request'
+MESSAGE_RESULT = 'result'
+MESSAGE_BATCH = 'batch'
+MESSAGE_WAIT = 'wait'
+MESSAGE_DONE = 'done'
+
+
+class ClusterException(Exception):
+  """Base exception."""
+
+
+class Coordinator(object):
+  """Hands out the batches of a spec and collects their counters."""
+
+  def __init__(self, spec, host='127.0.0.1', port=0, lease_seconds=600.0,
+               wait_seconds=1.0):
+    """Constructor.
+
+    Args:
+      spec: dict, job spec, see job_server.NormalizeSpec.
+      host: str, address to listen on.
+      port: int, port to listen on. 0 picks a free port.
+      lease_seconds: float, time a worker has to return a batch.
+      wait_seconds: float, time idle workers wait before asking again.
+    """
+    self.spec = job_server.NormalizeSpec(spec)
+    self.batches = job_server.SpecBatches(self.spec)
+    self.lease_seconds = lease_seconds
+    self.wait_seconds = wait_seconds
+
+    self.condition = threading.Condition()
+    self.pending = collections.deque(xrange(len(self.batches)))
+    # {batch index: (connection id, lease deadline)}
+    self.leases = {}
+    # {batch index: GameCounters}
+    self.results = {}
+    self.num_reassigned = 0
+
+    self.server = _CoordinatorServer((host, port), _CoordinatorHandler)
+    self.server.coordinator = self
+    self.address = self.server.server_address
+    self.thread = None
+
+  def Start(self):
+    """Serve workers in a background thread."""
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.daemon = True
+    self.thread.start()
+
+  def Stop(self):
+    """Stop serving."""
+    self.server.shutdown()
+    self.server.server_close()
+    if self.thread is not None:
+      self.thread.join()
+
+  def IsDone(self):
+    """Returns True once every batch has a result."""
+    with self.condition:
+      return len(self.results) == len(self.batches)
+
+  def Wait(self, timeout=None):
+    """Block until every batch has a result or the timeout passes.
+
+    Returns:
+      bool, True if every batch has a result.
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    with self.condition:
+      while len(self.results) < len(self.batches):
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+          return False
+        # Wake up periodically to reclaim expired leases.
+        self.condition.wait(min(remaining or self.wait_seconds,
+                                self.wait_seconds))
+        self._ReclaimExpired()
+      return True
+
+  def Totals(self):
+    """Returns the counters of the finished batches, merged in batch order."""
+    with self.condition:
+      totals = counters.GameCounters()
+      for index in sorted(self.results):
+        totals.Merge(self.results[index])
+      return totals
+
+  def NextBatch(self, connection_id):
+    """Lease the next batch to a connection.
+
+    Returns:
+      int, batch index, None if there is nothing to hand out right now.
+    """
+    with self.condition:
+      self._ReclaimExpired()
+      while self.pending:
+        index = self.pending.popleft()
+        if index in self.results:
+          continue
+        self.leases[index] = (connection_id,
+                              time.time() + self.lease_seconds)
+        return index
+      return None
+
+  def Complete(self, connection_id, index, game_counters):
+    """Record the result of a batch. Later duplicates are ignored."""
+    with self.condition:
+      if not 0 <= index < len(self.batches):
+        raise ClusterException('Unknown batch %d' % index)
+      self.leases.pop(index, None)
+      if index not in self.results:
+        self.results[index] = game_counters
+      self.condition.notify_all()
+
+  def Release(self, connection_id):
+    """Put the batches leased to a connection back in the queue."""
+    with self.condition:
+      for index, (holder, _) in self.leases.items():
+        if holder == connection_id:
+          self._Requeue(index)
+      self.condition.notify_all()
+
+  def _ReclaimExpired(self):
+    now = time.time()
+    for index, (_, deadline) in self.leases.items():
+      if deadline < now:
+        self._Requeue(index)
+
+  def _Requeue(self, index):
+    del self.leases[index]
+    if index not in self.results:
+      self.pending.appendleft(index)
+      self.num_reassigned += 1
+
+
+class _CoordinatorServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+  daemon_threads = True
+  allow_reuse_address = True
+
+
+class _CoordinatorHandler(SocketServer.StreamRequestHandler):
+  """One worker connection."""
+
+  def handle(self):
+    coordinator = self.server.coordinator
+    connection_id = id(self)
+    try:
+      for line in iter(self.rfile.readline, ''):
+        message = json.loads(line)
+        if message['type'] == MESSAGE_RESULT:
+          coordinator.Complete(connection_id, message['index'],
+                               counters.FromDict(message['counters']))
+          continue
+
+        if message['type'] != MESSAGE_REQUEST:
+          raise ClusterException('Unknown message: %s' % message['type'])
+        index = coordinator.NextBatch(connection_id)
+        if index is not None:
+          reply = {'type': MESSAGE_BATCH, 'index': index,
+                   'spec': coordinator.spec}
+        elif coordinator.IsDone():
+          reply = {'type': MESSAGE_DONE}
+        else:
+          reply = {'type': MESSAGE_WAIT, 'seconds': coordinator.wait_seconds}
+        self.wfile.write(json.dumps(reply) + '\n')
+        self.wfile.flush()
+    except (socket.error, ValueError, KeyError, ClusterException):
+      pass
+    finally:
+      coordinator.Release(connection_id)
+
+
+def RunBatch(spec, index):
+  """Play one batch of a normalized spec.
+
+  Returns:
+    counters.GameCounters, counters of the batch.
+  """
+  batches = job_server.SpecBatches(spec)
+  return counters.CountersTask((job_server.SpecGameConfig(spec),
+                                spec['seed'] + index, batches[index],
+                                spec['wallets']))
+
+
+def RunWorker(host, port, max_batches=None, connect_retries=10):
+  """Pull and play batches until the coordinator is done.
+
+  Args:
+    host: str, coordinator address.
+    port: int, coordinator port.
+    max_batches: int, stop after this many batches. None plays until done.
+    connect_retries: int, connection attempts, one second apart.
+
+  Returns:
+    int, number of batches played.
+  """
+  for attempt in xrange(connect_retries):
+    try:
+      connection = socket.create_connection((host, port))
+      break
+    except socket.error:
+      if attempt == connect_retries - 1:
+        raise
+      time.sleep(1)
+
+  reader = connection.makefile('rb')
+  writer = connection.makefile('wb')
+  num_batches = 0
+  try:
+    while max_batches is None or num_batches < max_batches:
+      writer.write(json.dumps({'type': MESSAGE_REQUEST}) + '\n')
+      writer.flush()
+      line = reader.readline()
+      if not line:
+        break
+      message = json.loads(line)
+      if message['type'] == MESSAGE_DONE:
+        break
+      elif message['type'] == MESSAGE_WAIT:
+        time.sleep(message['seconds'])
+        continue
+
+      game_counters = RunBatch(message['spec'], message['index'])
+      writer.write(json.dumps({'type': MESSAGE_RESULT,
+                               'index': message['index'],
+                               'counters': game_counters.ToDict()}) + '\n')
+      writer.flush()
+      num_batches += 1
+  finally:
+    reader.close()
+    writer.close()
+    connection.close()
+  return num_batches
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  subparsers = parser.add_subparsers(dest='mode')
+  coordinator_parser = subparsers.add_parser(
+      'coordinator', help='Hand out the batches of a job spec.')
+  coordinator_parser.add_argument('spec', type=str,
+                                  help='Job spec JSON file.')
+  coordinator_parser.add_argument('--host', type=str, default='127.0.0.1',
+                                  help='Address to listen on.')
+  coordinator_parser.add_argument('--port', type=int, default=8081,
+                                  help='Port to listen on.')
+  coordinator_parser.add_argument('--lease', type=float, default=600,
+                                  help='Seconds a worker has per batch.')
+  worker_parser = subparsers.add_parser(
+      'worker', help='Play batches from a coordinator.')
+  worker_parser.add_argument('--host', type=str, default='127.0.0.1',
+                             help='Coordinator address.')
+  worker_parser.add_argument('--port', type=int, default=8081,
+                             help='Coordinator port.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  if args.mode == 'worker':
+    print 'Played %d batches' % RunWorker(args.host, args.port)
+    return
+
+  with open(args.spec) as spec_file:
+    coordinator = Coordinator(json.load(spec_file), args.host, args.port,
+                              args.lease)
+  coordinator.Start()
+  print 'Coordinating %d batches on %s:%d' % (
+      (len(coordinator.batches),) + coordinator.address)
+  try:
+    while not coordinator.Wait(timeout=10):
+      print '%d/%d batches done' % (len(coordinator.results),
+                                    len(coordinator.batches))
+    # Let connected workers hear that the job is done.
+    time.sleep(coordinator.wait_seconds)
+  finally:
+    coordinator.Stop()
+  print json.dumps(coordinator.Totals().ToDict(), indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+  main()
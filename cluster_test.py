@@ -0,0 +1,58 @@
+import cluster
+import counters
+import json
+import multiprocessing
+import os
+import socket
+import unittest
+
+SPEC = {'num_rounds': 500, 'batch_rounds': 100, 'seed': 2}
+
+
+def DyingWorker(port):
+  """Take a batch and exit without returning it."""
+  connection = socket.create_connection(('127.0.0.1', port))
+  connection.sendall(json.dumps({'type': cluster.MESSAGE_REQUEST}) + '\n')
+  connection.makefile('rb').readline()
+  os._exit(0)
+
+
+class ClusterTest(unittest.TestCase):
+  def setUp(self):
+    self.coordinator = cluster.Coordinator(SPEC, wait_seconds=0.05)
+    self.coordinator.Start()
+    self.port = self.coordinator.address[1]
+
+  def tearDown(self):
+    self.coordinator.Stop()
+
+  def test_local_workers_match_seed_plan(self):
+    dying = multiprocessing.Process(target=DyingWorker, args=(self.port,))
+    dying.start()
+    dying.join()
+
+    workers = [multiprocessing.Process(target=cluster.RunWorker,
+                                       args=('127.0.0.1', self.port))
+               for _ in xrange(2)]
+    for worker in workers:
+      worker.start()
+    self.assertTrue(self.coordinator.Wait(timeout=60))
+    for worker in workers:
+      worker.join()
+
+    expected = counters.GameCounters()
+    for index in xrange(5):
+      expected.Merge(cluster.RunBatch(self.coordinator.spec, index))
+    self.assertEqual(self.coordinator.Totals(),
+                     counters.FromDict(json.loads(json.dumps(
+                         expected.ToDict()))))
+    self.assertEqual(self.coordinator.num_reassigned, 1)
+
+  def test_expired_lease_is_reassigned(self):
+    self.coordinator.lease_seconds = -1
+    first = self.coordinator.NextBatch('slow')
+    self.assertEqual(self.coordinator.NextBatch('fast'), first)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,380 @@
+""" Control variates for wallet EV estimates.
+
+Some per round quantities have expectations known exactly from the shoe
+when the bets are placed:
+
+  player two card hand: the first two cards dealt are a blackjack, a 20, a
+      19, a hard 10 or 11 or a hard 12 to 16. The blackjack probability is
+      Shoe.GetBlackjackPercent, the others are sums of
+      n_i * (n_j - [i == j]) / (N * (N - 1)) over the rank pairs i, j making
+      the hand.
+  dealer up card: the third card dealt is an Ace, a ten or a two to six,
+      each with probability (cards of the kind left) / (cards left).
+
+Each control is the indicator minus its expectation, so it has mean zero.
+A wallet's result y is regressed on the controls c, and
+
+  mean(y) - b . mean(c),  b = Cov(c, c)^-1 Cov(c, y)
+
+estimates the same EV as mean(y) with the noise explained by the controls
+removed. Controls are scaled by the wallets bet on the round, which is
+fixed before the cards are dealt, so wallets with bet ramps benefit as
+much as flat bettors. Only sums are kept, so estimates from separate games merge by
+addition.
+"""
+import collections
+import math
+
+import card
+import events
+
+# Names of the controls, in the order of the control vectors.
+PLAYER_CONTROLS = ('player_blackjack', 'player_twenty', 'player_nineteen',
+                   'player_ten_or_eleven', 'player_twelve_to_sixteen')
+UP_CARD_CONTROLS = ('up_ace', 'up_ten', 'up_two_to_six')
+CONTROLS = PLAYER_CONTROLS + UP_CARD_CONTROLS
+
+
+def _PlayerControl(first, second):
+  """Returns the index in PLAYER_CONTROLS of two cards, None if none."""
+  aces = (first == card.ACE) + (second == card.ACE)
+  total = first.alt_value + second.alt_value
+  if aces == 1:
+    total += card.ACE.value - card.ACE.alt_value
+    if total == 21:
+      return 0
+  if total == 20:
+    return 1
+  if total == 19:
+    return 2
+  if aces:
+    return None
+  if 10 <= total <= 11:
+    return 3
+  if 12 <= total <= 16:
+    return 4
+  return None
+
+
+def _UpCardControl(up):
+  """Returns the index in UP_CARD_CONTROLS of the up card, None if none."""
+  if up == card.ACE:
+    return 0
+  if up == card.FACE:
+    return 1
+  if 2 <= up.value <= 6:
+    return 2
+  return None
+
+
+# Per player control, the composition index pairs dealing it.
+_PLAYER_PAIRS = [[] for _ in PLAYER_CONTROLS]
+for _first, _first_rank in enumerate(card.RANKS):
+  for _second, _second_rank in enumerate(card.RANKS):
+    _control = _PlayerControl(_first_rank, _second_rank)
+    if _control is not None:
+      _PLAYER_PAIRS[_control].append((_first, _second))
+
+# Per up card control, the composition indices dealing it.
+_UP_CARD_RANKS = [[index for index, rank in enumerate(card.RANKS)
+                   if _UpCardControl(rank) == control]
+                  for control in xrange(len(UP_CARD_CONTROLS))]
+
+# z of a two sided 95% confidence interval.
+Z_95 = 1.96
+
+
+class ControlVariateException(Exception):
+  """Base exception."""
+
+
+class Estimate(collections.namedtuple(
+    'Estimate', ['num_rounds', 'raw_mean', 'raw_error', 'mean', 'error'])):
+  """Per round EV of a wallet, raw and with control variates.
+
+  Errors are standard errors of the means.
+  """
+
+  def VarianceReduction(self):
+    """Returns the fraction of the raw variance removed by the controls."""
+    if not self.raw_error:
+      return 0.0
+    return 1 - (self.error / self.raw_error) ** 2
+
+
+def _Solve(matrix, vector):
+  """Returns x with matrix x = vector, by Gaussian elimination.
+
+  Directions with no variance get a zero coefficient instead of failing.
+
+  Args:
+    matrix: [[float]], square symmetric matrix.
+    vector: [float], right hand side.
+  """
+  size = len(vector)
+  rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+  # {column: row holding its pivot}
+  pivots = {}
+  for column in xrange(size):
+    free = [index for index in xrange(size) if index not in pivots.values()]
+    best = max(free, key=lambda index: abs(rows[index][column]))
+    if abs(rows[best][column]) < 1e-12:
+      continue
+    pivots[column] = best
+    pivot_row = rows[best]
+    for index in xrange(size):
+      if index != best and rows[index][column]:
+        factor = rows[index][column] / pivot_row[column]
+        rows[index] = [value - factor * pivot_value
+                       for value, pivot_value in zip(rows[index], pivot_row)]
+  return [rows[pivots[column]][size] / rows[pivots[column]][column]
+          if column in pivots else 0.0 for column in xrange(size)]
+
+
+class ControlSums(object):
+  """Sums of each wallet's results and bet scaled controls.
+
+  Sums over the controls are kept once for all wallets, as running totals.
+  A wallet only adds bet times (running total now - running total when the
+  bet was last changed) when its bet changes, so wallets betting the same
+  amount for many rounds cost a few additions per round.
+  """
+
+  def __init__(self):
+    size = len(CONTROLS)
+    # Running totals of c and of c * c row major, over every round.
+    self.control_totals = [0.0] * size
+    self.product_totals = [0.0] * (size * size)
+    # {wallet name: [rounds, sum y, sum y ** 2, [sum b * c], [sum b * b * c *
+    #                c], [sum b * y * c], bet, control_totals and
+    #                product_totals when the bet was set]}
+    self.wallets = {}
+
+  def AddRound(self, controls, bets, results):
+    """Record a round.
+
+    Args:
+      controls: [float], control values in CONTROLS order, per unit bet.
+      bets: {str: float}, money units each wallet bet before the deal.
+      results: {str: float}, money units each wallet won.
+    """
+    size = len(controls)
+    for name, result in results.iteritems():
+      bet = bets[name]
+      sums = self.wallets.get(name)
+      if sums is None:
+        sums = self.wallets[name] = [0, 0.0, 0.0, [0.0] * size,
+                                     [0.0] * (size * size), [0.0] * size,
+                                     bet, list(self.control_totals),
+                                     list(self.product_totals)]
+      elif sums[6] != bet:
+        self._CloseBet(sums)
+        sums[6] = bet
+      sums[0] += 1
+      sums[1] += result
+      sums[2] += result * result
+      if result:
+        scale = bet * result
+        sums[5] = [total + scale * value
+                   for total, value in zip(sums[5], controls)]
+
+    self.control_totals = [total + value for total, value in
+                           zip(self.control_totals, controls)]
+    outer = [value * other for value in controls for other in controls]
+    self.product_totals = [total + value for total, value in
+                           zip(self.product_totals, outer)]
+
+  def _CloseBet(self, sums):
+    """Add the rounds since the wallets bet was set to its sums."""
+    bet = sums[6]
+    if bet is None:
+      # Wallet only known from merged sums, no rounds of its own yet.
+      sums[7] = list(self.control_totals)
+      sums[8] = list(self.product_totals)
+      return
+    squared_bet = bet * bet
+    sums[3] = [total + bet * (now - then) for total, now, then in
+               zip(sums[3], self.control_totals, sums[7])]
+    sums[4] = [total + squared_bet * (now - then) for total, now, then in
+               zip(sums[4], self.product_totals, sums[8])]
+    sums[7] = list(self.control_totals)
+    sums[8] = list(self.product_totals)
+
+  def _Closed(self, name):
+    """Returns the first six sums of a wallet, its open bet included."""
+    sums = self.wallets[name]
+    self._CloseBet(sums)
+    return sums[:6]
+
+  def Merge(self, other):
+    """Add the rounds of other sums to these.
+
+    Args:
+      other: ControlSums, sums to add.
+    """
+    for name in other.wallets:
+      theirs = other._Closed(name)
+      mine = self.wallets.get(name)
+      if mine is None:
+        mine = self.wallets[name] = [0, 0.0, 0.0, [0.0] * len(theirs[3]),
+                                     [0.0] * len(theirs[4]),
+                                     [0.0] * len(theirs[5]), None,
+                                     list(self.control_totals),
+                                     list(self.product_totals)]
+      for index in xrange(3):
+        mine[index] += theirs[index]
+      for index in xrange(3, 6):
+        mine[index] = [a + b for a, b in zip(mine[index], theirs[index])]
+
+  def Estimate(self, name):
+    """Returns the Estimate of a wallet.
+
+    Raises:
+      ControlVariateException: Unknown wallet or fewer than two rounds.
+    """
+    if name not in self.wallets:
+      raise ControlVariateException('No results for wallet %s' % name)
+    num_rounds, total, squared, totals, products, cross = self._Closed(name)
+    if num_rounds < 2:
+      raise ControlVariateException('Need two rounds, have %d' % num_rounds)
+    size = len(totals)
+
+    raw_mean = total / num_rounds
+    raw_variance = max(squared / num_rounds - raw_mean * raw_mean, 0.0)
+    means = [value / num_rounds for value in totals]
+    covariance = [[products[index * size + column] / num_rounds -
+                   means[index] * means[column] for column in xrange(size)]
+                  for index in xrange(size)]
+    cross_covariance = [value / num_rounds - mean * raw_mean
+                        for value, mean in zip(cross, means)]
+    coefficients = _Solve(covariance, cross_covariance)
+
+    mean = raw_mean - sum(coefficient * control_mean for coefficient,
+                          control_mean in zip(coefficients, means))
+    variance = max(raw_variance - sum(
+        coefficient * value for coefficient, value in
+        zip(coefficients, cross_covariance)), 0.0)
+    return Estimate(num_rounds, raw_mean,
+                    math.sqrt(raw_variance / (num_rounds - 1)), mean,
+                    math.sqrt(variance / max(num_rounds - 1 - size, 1)))
+
+
+class ControlVariates(object):
+  """Collects the controls and wallet results of a game's rounds.
+
+  A round starts with its first bet, when the controls' expectations are
+  read from the shoe. The first settled hand of the round tells the players
+  two cards and the dealers up card. Settled hands add to the wallet
+  results, which are recorded when the next round starts or on Sums.
+  """
+
+  def __init__(self, blackjack_game):
+    """Constructor.
+
+    Args:
+      blackjack_game: game.Game, game to observe.
+    """
+    self.game = blackjack_game
+    self.sums = ControlSums()
+    self._ResetRound()
+    self.listeners = ((events.BET_PLACED, self._BetPlaced),
+                      (events.SETTLEMENT, self._Settlement))
+    for event, listener in self.listeners:
+      blackjack_game.events.Register(event, listener)
+
+  def Close(self):
+    """Stop observing the game."""
+    for event, listener in self.listeners:
+      self.game.events.Unregister(event, listener)
+
+  def _ResetRound(self):
+    self.in_round = False
+    self.settled = False
+    self.expected = None
+    self.cards = []
+    self.bets = {}
+    self.results = {}
+
+  def _Record(self):
+    """Add the finished round to the sums."""
+    if self.settled:
+      first, second, up = self.cards
+      controls = [-expected for expected in self.expected]
+      player = _PlayerControl(first, second)
+      if player is not None:
+        controls[player] += 1
+      up = _UpCardControl(up)
+      if up is not None:
+        controls[len(PLAYER_CONTROLS) + up] += 1
+      self.sums.AddRound(controls, self.bets, self.results)
+    self._ResetRound()
+
+  def _BetPlaced(self, wallet_name, bet):
+    if self.in_round and not self.settled:
+      # Another wallet betting on the same round.
+      self.bets[wallet_name] = bet.money_units
+      return
+    self._Record()
+    self.bets[wallet_name] = bet.money_units
+    self.in_round = True
+    composition = self.game.shoe.GetComposition()
+    num_cards = float(sum(composition))
+    pairs = num_cards * (num_cards - 1)
+    expected = []
+    for control_pairs in _PLAYER_PAIRS:
+      ways = 0
+      for first, second in control_pairs:
+        ways += composition[first] * (composition[second] - (first == second))
+      expected.append(ways / pairs)
+    for ranks in _UP_CARD_RANKS:
+      expected.append(sum(composition[index] for index in ranks) / num_cards)
+    self.expected = expected
+    self.results = dict.fromkeys(self.game.player.wallets, 0.0)
+
+  def _Settlement(self, player_hand, dealer_hand, outcome):
+    if not self.settled:
+      self.settled = True
+      self.cards = player_hand.cards[:2] + dealer_hand.cards[:1]
+    if outcome == events.TIE:
+      return
+    if outcome == events.LOSS:
+      multiplier = -1
+    elif outcome == events.SURRENDER:
+      multiplier = -0.5
+    elif player_hand.IsBlackjack():
+      multiplier = self.game.table_rules.blackjack_win_multiplier
+    else:
+      multiplier = 1
+    for bet in player_hand.bets:
+      self.results[bet.wallet_name] += multiplier * bet.money_units
+
+  def Sums(self):
+    """Returns the ControlSums, including the last finished round."""
+    if self.settled:
+      self._Record()
+    return self.sums
+
+  def PrintStats(self):
+    """Print the raw and controlled EV of every wallet."""
+    PrintSums(self.Sums())
+
+
+def PrintSums(sums):
+  """Print the raw and controlled EV of every wallet, with 95% intervals.
+
+  Args:
+    sums: ControlSums, sums to print.
+  """
+  names = [name for name in sorted(sums.wallets)
+           if sums.wallets[name][0] >= 2]
+  if not names:
+    return
+  print '== Control Variates ====='
+  print '%-25s %22s %22s %6s' % ('Wallet', 'Raw [units/hand]',
+                                 'Controlled [units/hand]', 'Var-')
+  for name in names:
+    estimate = sums.Estimate(name)
+    print '%-25s %10.4f +/- %7.4f %10.4f +/- %7.4f %5.1f%%' % (
+        name, estimate.raw_mean, Z_95 * estimate.raw_error, estimate.mean,
+        Z_95 * estimate.error, 100 * estimate.VarianceReduction())
+  print '=========================='
@@ -0,0 +1,97 @@
+import card
+import control_variate
+import counters
+import hand
+import simulation
+import unittest
+
+
+def _Game(seed):
+  blackjack_game = simulation.NewGame(simulation.DEFAULT_GAME_CONFIG, seed)
+  blackjack_game.EnableControlVariates()
+  return blackjack_game
+
+
+def _Play(blackjack_game, num_rounds):
+  for _ in xrange(num_rounds):
+    simulation.PlayRound(blackjack_game)
+
+
+class ControlsTest(unittest.TestCase):
+  def test_player_controls(self):
+    self.assertEqual(0, control_variate._PlayerControl(card.ACE, card.FACE))
+    self.assertEqual(1, control_variate._PlayerControl(card.ACE, card.NINE))
+    self.assertEqual(1, control_variate._PlayerControl(card.FACE, card.FACE))
+    self.assertEqual(2, control_variate._PlayerControl(card.FACE, card.NINE))
+    self.assertEqual(3, control_variate._PlayerControl(card.FIVE, card.SIX))
+    self.assertEqual(4, control_variate._PlayerControl(card.FACE, card.SIX))
+    self.assertEqual(None, control_variate._PlayerControl(card.ACE, card.SIX))
+    self.assertEqual(None, control_variate._PlayerControl(card.TWO, card.THREE))
+
+  def test_blackjack_expectation_matches_shoe(self):
+    blackjack_game = _Game(1)
+    _Play(blackjack_game, 30)
+    # Expectations are read from the shoe as the next round's bets go in.
+    blackjack_game.player.PlaceBets(hand.Hand(), blackjack_game.bet_kwargs)
+    expected = blackjack_game.control_variates.expected
+    self.assertAlmostEqual(blackjack_game.shoe.GetBlackjackPercent() / 100,
+                           expected[0])
+    composition = blackjack_game.shoe.GetComposition()
+    self.assertAlmostEqual(
+        float(composition[0]) / sum(composition),
+        expected[len(control_variate.PLAYER_CONTROLS)])
+
+
+class ControlSumsTest(unittest.TestCase):
+  def test_controlled_estimate_is_tighter(self):
+    blackjack_game = _Game(2)
+    _Play(blackjack_game, 20000)
+    sums = blackjack_game.control_variates.Sums()
+    for name, player_wallet in blackjack_game.player.wallets.iteritems():
+      estimate = sums.Estimate(name)
+      self.assertEqual(20000, estimate.num_rounds)
+      self.assertAlmostEqual(player_wallet.money_units / 20000.0,
+                             estimate.raw_mean)
+      self.assertLess(estimate.error, estimate.raw_error)
+      self.assertLess(abs(estimate.mean - estimate.raw_mean),
+                      3 * estimate.raw_error)
+
+  def test_merge_adds_games(self):
+    blackjack_game = _Game(3)
+    _Play(blackjack_game, 400)
+    other = _Game(4)
+    _Play(other, 600)
+    total = counters.GameCounters()
+    total.Merge(counters.FromGame(blackjack_game))
+    total.Merge(counters.FromGame(other))
+    for name in blackjack_game.player.wallets:
+      merged = total.control_sums.Estimate(name)
+      self.assertEqual(1000, merged.num_rounds)
+      self.assertAlmostEqual(
+          (blackjack_game.player.wallets[name].money_units +
+           other.player.wallets[name].money_units) / 1000.0, merged.raw_mean)
+
+  def test_merged_wallet_keeps_counting(self):
+    blackjack_game = _Game(5)
+    _Play(blackjack_game, 100)
+    merged = control_variate.ControlSums()
+    merged.Merge(blackjack_game.control_variates.Sums())
+    size = len(control_variate.CONTROLS)
+    name = sorted(merged.wallets)[0]
+    merged.AddRound([0.0] * size, {name: 1}, {name: 1.0})
+    self.assertEqual(101, merged.Estimate(name).num_rounds)
+
+  def test_unknown_wallet(self):
+    self.assertRaises(control_variate.ControlVariateException,
+                      control_variate.ControlSums().Estimate, 'missing')
+
+
+class SolveTest(unittest.TestCase):
+  def test_singular_direction_gets_zero(self):
+    self.assertEqual([2.0, 0.0],
+                     control_variate._Solve([[1.0, 0.0], [0.0, 0.0]],
+                                            [2.0, 5.0]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,75 @@
+""" Card counting systems.
+
+A counting system tags each card with a weight. The running count is the sum
+of the tags of the cards played; the true count normalizes it by the number
+of decks remaining. Tags follow the player convention: a positive count means
+the remaining cards favor the player.
+"""
+import card
+import shoe
+
+HI_LO = {
+    card.TWO: 1,
+    card.THREE: 1,
+    card.FOUR: 1,
+    card.FIVE: 1,
+    card.SIX: 1,
+    card.SEVEN: 0,
+    card.EIGHT: 0,
+    card.NINE: 0,
+    card.FACE: -1,
+    card.ACE: -1,
+}
+
+
+def RankTags(tags=HI_LO):
+  """Returns the tags in card.RANKS order, matching composition vectors.
+
+  Args:
+    tags: {Card: int}, counting system.
+
+  Returns:
+    (int), tag per rank.
+  """
+  return tuple([tags[rank] for rank in card.RANKS])
+
+
+def RunningCount(cards_played, tags=HI_LO):
+  """Returns the running count of the cards played.
+
+  Args:
+    cards_played: {Card: int}, number of each card played.
+    tags: {Card: int}, counting system.
+
+  Returns:
+    int, running count.
+  """
+  return sum([tags[played_card] * num_played
+              for played_card, num_played in cards_played.iteritems()])
+
+
+def DecksRemaining(current_shoe):
+  """Returns the number of decks left in the shoe, to the nearest half deck.
+
+  Args:
+    current_shoe: Shoe, shoe being played.
+
+  Returns:
+    float, decks remaining, at least half a deck.
+  """
+  num_decks = float(len(current_shoe.cards)) / shoe.Shoe.NUM_CARDS_PER_DECK
+  return max(round(num_decks * 2) / 2, 0.5)
+
+
+def TrueCount(current_shoe, tags=HI_LO):
+  """Returns the true count of the shoe.
+
+  Args:
+    current_shoe: Shoe, shoe being played.
+    tags: {Card: int}, counting system.
+
+  Returns:
+    float, running count per deck remaining.
+  """
+  return (float(RunningCount(current_shoe.cards_played, tags)) /
+          DecksRemaining(current_shoe))
@@ -0,0 +1,310 @@
+""" Exact true count frequencies by depth in the shoe.
+
+How often each true count comes up, and how deep in the shoe, decides what
+a bet spread earns. Rather than simulating shoes, the atlas computes it
+exactly. After d cards of a shuffled shoe are dealt, the numbers of cards
+dealt from each group of ranks sharing a tag are multivariate
+hypergeometric, so
+
+  P(running count r at depth d) = sum of prod C(G_g, k_g) / C(N, d)
+
+over the numbers k_g dealt from each group g with sum k_g = d and
+sum k_g * tag_g = r. A dynamic program over the groups, with state (cards
+dealt, running count), gives every depth at once.
+
+Running counts become true counts as count.TrueCount does, dividing by the
+decks remaining to the nearest half deck, and are bucketed as
+strategy.TrueCountBucket buckets them. Buckets beyond +-max_true_count are
+merged into the outermost ones. Depths count every card dealt, burned cards
+included, as the shoe's cards_played does.
+
+The atlas keeps the bucket probabilities per depth and their running sums
+over depths in flat arrays, so the probability at a depth, or the frequency
+of a true count over the depths a cut card leaves in play, is read in
+constant time. Atlases are cached in memory and on disk per counting system
+and number of decks.
+"""
+import argparse
+import array
+import collections
+import cPickle
+import os
+
+import count
+import shoe
+import strategy_catalog
+
+# Disk cache of the atlases, next to the play strategies.
+DEFAULT_CACHE_FILE = os.path.join(strategy_catalog.DEFAULT_DIRECTORY,
+                                  'count_atlas.pickle')
+
+# In memory cache of atlases, by cache key.
+_ATLAS_CACHE = {}
+
+
+class CountAtlasException(Exception):
+  """Base exception."""
+
+
+def _Binomials(num):
+  """Returns [C(num, k) for k in 0..num] as floats."""
+  binomials = [1]
+  for k in xrange(1, num + 1):
+    binomials.append(binomials[-1] * (num - k + 1) // k)
+  return [float(binomial) for binomial in binomials]
+
+
+def RunningCountWeights(num_decks, tags=count.HI_LO):
+  """Returns the hypergeometric weight of every running count per depth.
+
+  Args:
+    num_decks: int, number of decks in the shoe.
+    tags: {Card: int}, counting system.
+
+  Returns:
+    [{int: float}], per depth d the sum of prod C(G_g, k_g) per running
+        count. Divided by C(N, d) they are probabilities.
+  """
+  groups = collections.defaultdict(int)
+  for tag, per_deck in zip(count.RankTags(tags),
+                           shoe.Shoe.RANK_COUNTS_PER_DECK):
+    groups[tag] += per_deck * num_decks
+
+  num_cards = sum(groups.itervalues())
+  weights = [{} for _ in xrange(num_cards + 1)]
+  weights[0][0] = 1.0
+  dealt = 0
+  for tag, group_size in sorted(groups.iteritems()):
+    binomials = _Binomials(group_size)
+    new_weights = [{} for _ in xrange(num_cards + 1)]
+    for num_dealt in xrange(dealt, -1, -1):
+      for running, weight in weights[num_dealt].iteritems():
+        for taken, binomial in enumerate(binomials):
+          row = new_weights[num_dealt + taken]
+          key = running + taken * tag
+          row[key] = row.get(key, 0.0) + weight * binomial
+    weights = new_weights
+    dealt += group_size
+  return weights
+
+
+def DecksRemaining(num_cards):
+  """Returns decks left for num_cards cards, as count.DecksRemaining."""
+  num_decks = float(num_cards) / shoe.Shoe.NUM_CARDS_PER_DECK
+  return max(round(num_decks * 2) / 2, 0.5)
+
+
+class Atlas(object):
+  """True count bucket probabilities per depth of a shoe.
+
+  Attributes:
+    num_decks: int, number of decks in the shoe.
+    num_cards: int, cards in the shoe.
+    max_true_count: int, largest bucket, in absolute value.
+    probabilities: array.array, P(bucket at depth) at
+        depth * num_buckets + bucket + max_true_count.
+    cumulative: array.array, sums of probabilities over the depths before
+        each depth, laid out as probabilities with one more depth.
+  """
+
+  def __init__(self, num_decks, tags=count.HI_LO, max_true_count=20):
+    """Constructor. Computes the atlas.
+
+    Args:
+      num_decks: int, number of decks in the shoe.
+      tags: {Card: int}, counting system.
+      max_true_count: int, buckets beyond +-max_true_count are merged into
+          the outermost ones.
+    """
+    self.num_decks = num_decks
+    self.max_true_count = max_true_count
+    self.num_buckets = 2 * max_true_count + 1
+
+    weights = RunningCountWeights(num_decks, tags)
+    self.num_cards = len(weights) - 1
+    self.probabilities = array.array('d', [0.0]) * (
+        (self.num_cards + 1) * self.num_buckets)
+    self.cumulative = array.array('d', [0.0]) * (
+        (self.num_cards + 2) * self.num_buckets)
+
+    deals = _Binomials(self.num_cards)
+    for depth, row in enumerate(weights):
+      decks_remaining = DecksRemaining(self.num_cards - depth)
+      offset = depth * self.num_buckets + max_true_count
+      for running, weight in row.iteritems():
+        bucket = int(round(float(running) / decks_remaining))
+        bucket = min(max(bucket, -max_true_count), max_true_count)
+        self.probabilities[offset + bucket] += weight / deals[depth]
+
+    for depth in xrange(self.num_cards + 1):
+      for index in xrange(self.num_buckets):
+        at = depth * self.num_buckets + index
+        self.cumulative[at + self.num_buckets] = (self.cumulative[at] +
+                                                  self.probabilities[at])
+
+  def _Bucket(self, true_count):
+    """Returns the index of a true count bucket, clamped."""
+    return min(max(int(true_count), -self.max_true_count),
+               self.max_true_count) + self.max_true_count
+
+  def _CheckDepths(self, first_depth, last_depth):
+    if not 0 <= first_depth <= last_depth <= self.num_cards:
+      raise CountAtlasException('Depths %d to %d outside a %d card shoe' % (
+          first_depth, last_depth, self.num_cards))
+
+  def Probability(self, depth, true_count):
+    """Returns the probability of a true count bucket at a depth.
+
+    Args:
+      depth: int, cards dealt from the shoe.
+      true_count: int, true count bucket.
+    """
+    self._CheckDepths(depth, depth)
+    return self.probabilities[depth * self.num_buckets +
+                              self._Bucket(true_count)]
+
+  def Frequency(self, true_count, cut_card, first_depth=0):
+    """Returns how often a true count bucket comes up over the shoe.
+
+    Every depth from first_depth to cut_card, the depths a round can start
+    at, weighs the same: rounds start about every cards per round cards.
+
+    Args:
+      true_count: int, true count bucket.
+      cut_card: int, stop card location; no round starts past it.
+      first_depth: int, depth of the first round, such as the burn cards.
+    """
+    self._CheckDepths(first_depth, cut_card)
+    bucket = self._Bucket(true_count)
+    total = (self.cumulative[(cut_card + 1) * self.num_buckets + bucket] -
+             self.cumulative[first_depth * self.num_buckets + bucket])
+    return total / (cut_card + 1 - first_depth)
+
+  def Frequencies(self, cut_card, first_depth=0):
+    """Returns Frequency of every true count bucket.
+
+    Returns:
+      {int: float}, frequency per true count bucket.
+    """
+    return dict((true_count, self.Frequency(true_count, cut_card,
+                                            first_depth))
+                for true_count in xrange(-self.max_true_count,
+                                         self.max_true_count + 1))
+
+
+def CutCard(num_decks, penetration):
+  """Returns the stop card location of a penetration, as Shoe.SetStop.
+
+  Args:
+    num_decks: int, number of decks in the shoe.
+    penetration: float, percent of the shoe dealt before the shuffle.
+  """
+  return int((float(penetration) / 100.0) *
+             (shoe.Shoe.NUM_CARDS_PER_DECK * num_decks))
+
+
+def GetAtlas(num_decks, tags=count.HI_LO, max_true_count=20,
+             cache_file=DEFAULT_CACHE_FILE):
+  """Returns the atlas of a shoe and counting system, computed at most once.
+
+  Args:
+    num_decks: int, number of decks in the shoe.
+    tags: {Card: int}, counting system.
+    max_true_count: int, see Atlas.
+    cache_file: str, pickle file atlases are loaded from and saved to. None
+        only caches in memory.
+
+  Returns:
+    Atlas, the atlas.
+  """
+  key = repr((num_decks, sorted((rank.name, tag)
+                                for rank, tag in tags.iteritems()),
+              max_true_count))
+  if key in _ATLAS_CACHE:
+    return _ATLAS_CACHE[key]
+
+  disk_cache = {}
+  if cache_file is not None and os.path.exists(cache_file):
+    try:
+      with open(cache_file, 'rb') as cache:
+        disk_cache = cPickle.load(cache)
+    except (IOError, EOFError, cPickle.UnpicklingError):
+      disk_cache = {}
+
+  if key not in disk_cache:
+    disk_cache[key] = Atlas(num_decks, tags, max_true_count)
+    if cache_file is not None:
+      try:
+        with open(cache_file, 'wb') as cache:
+          cPickle.dump(disk_cache, cache, cPickle.HIGHEST_PROTOCOL)
+      except IOError:
+        # A read only directory still works, it just computes every time.
+        pass
+
+  _ATLAS_CACHE[key] = disk_cache[key]
+  return disk_cache[key]
+
+
+SpreadPlan = collections.namedtuple(
+    'SpreadPlan', ['ev_per_round', 'average_bet', 'ev_per_unit_bet'])
+
+
+def PlanSpread(atlas, cut_card, ramp, base_ev, ev_per_true_count=0.005,
+               first_depth=0):
+  """Returns what a bet spread earns per round, without simulating.
+
+  The EV of a round is modelled as linear in the true count.
+
+  Args:
+    atlas: Atlas, atlas of the shoe.
+    cut_card: int, stop card location.
+    ramp: {int: float}, bet per true count bucket, as strategy.StrategyRamp
+        takes it. Buckets outside use the nearest one in the ramp.
+    base_ev: float, EV per unit bet at a true count of 0.
+    ev_per_true_count: float, EV gained per unit bet per true count.
+    first_depth: int, see Atlas.Frequency.
+
+  Returns:
+    SpreadPlan, EV per round, average bet and EV per unit bet.
+
+  Raises:
+    CountAtlasException: Empty ramp.
+  """
+  if not ramp:
+    raise CountAtlasException('Ramp has no buckets')
+  ev = 0.0
+  total_bet = 0.0
+  for true_count, frequency in atlas.Frequencies(cut_card,
+                                                 first_depth).iteritems():
+    bet = ramp[min(ramp, key=lambda bucket: abs(bucket - true_count))]
+    ev += frequency * bet * (base_ev + ev_per_true_count * true_count)
+    total_bet += frequency * bet
+  return SpreadPlan(ev, total_bet, ev / total_bet if total_bet else 0.0)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--decks', type=int, default=4,
+                      help='Decks in the shoe.')
+  parser.add_argument('--penetration', type=float, default=75,
+                      help='Percent of the shoe dealt before the shuffle.')
+  parser.add_argument('--cache-file', type=str, default=DEFAULT_CACHE_FILE,
+                      help='Pickle file atlases are cached in.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  atlas = GetAtlas(args.decks, cache_file=args.cache_file)
+  cut_card = CutCard(args.decks, args.penetration)
+  frequencies = atlas.Frequencies(cut_card, first_depth=args.decks)
+
+  print 'Hi-Lo, %d decks, cut card after %d cards' % (args.decks, cut_card)
+  print '%10s %10s' % ('True count', 'Frequency')
+  for true_count in sorted(frequencies):
+    if frequencies[true_count] >= 1e-6:
+      print '%10d %9.4f%%' % (true_count, frequencies[true_count] * 100)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,72 @@
+import collections
+import count
+import count_atlas
+import os
+import random
+import shoe
+import shutil
+import tempfile
+import unittest
+
+
+class CountAtlasTest(unittest.TestCase):
+  def setUp(self):
+    self.atlas = count_atlas.GetAtlas(1, cache_file=None)
+
+  def test_probabilities_sum_to_one(self):
+    for depth in (0, 10, 26, 51, 52):
+      total = sum(self.atlas.Probability(depth, true_count)
+                  for true_count in xrange(-20, 21))
+      self.assertAlmostEqual(total, 1.0)
+    self.assertEqual(self.atlas.Probability(0, 0), 1.0)
+    # Hi-Lo is balanced: the whole deck counts to 0.
+    self.assertAlmostEqual(self.atlas.Probability(52, 0), 1.0)
+
+  def test_matches_dealt_shoes(self):
+    depth = 20
+    num_shoes = 4000
+    rng = random.Random(3)
+    seen = collections.defaultdict(int)
+    for _ in xrange(num_shoes):
+      current_shoe = shoe.Shoe(1, rng=rng)
+      current_shoe.GetCards(depth)
+      seen[int(round(count.TrueCount(current_shoe)))] += 1
+    for true_count in xrange(-6, 7):
+      self.assertAlmostEqual(float(seen[true_count]) / num_shoes,
+                             self.atlas.Probability(depth, true_count),
+                             delta=0.025)
+
+  def test_frequency_averages_depths(self):
+    expected = sum(self.atlas.Probability(depth, 2)
+                   for depth in xrange(5, 40)) / 35
+    self.assertAlmostEqual(self.atlas.Frequency(2, 39, first_depth=5),
+                           expected)
+    self.assertAlmostEqual(sum(self.atlas.Frequencies(39, 5).values()), 1.0)
+    self.assertRaises(count_atlas.CountAtlasException,
+                      self.atlas.Frequency, 0, 53)
+
+  def test_disk_cache(self):
+    directory = tempfile.mkdtemp()
+    try:
+      cache_file = os.path.join(directory, 'atlas.pickle')
+      atlas = count_atlas.GetAtlas(1, max_true_count=8, cache_file=cache_file)
+      self.assertTrue(os.path.exists(cache_file))
+      count_atlas._ATLAS_CACHE.clear()
+      loaded = count_atlas.GetAtlas(1, max_true_count=8,
+                                    cache_file=cache_file)
+      self.assertIsNot(atlas, loaded)
+      self.assertEqual(atlas.probabilities, loaded.probabilities)
+    finally:
+      shutil.rmtree(directory)
+
+  def test_plan_spread(self):
+    cut_card = count_atlas.CutCard(1, 75)
+    flat = count_atlas.PlanSpread(self.atlas, cut_card, {0: 1}, -0.005)
+    self.assertAlmostEqual(flat.average_bet, 1.0)
+    spread = count_atlas.PlanSpread(self.atlas, cut_card,
+                                    {0: 1, 2: 4, 4: 8}, -0.005)
+    self.assertGreater(spread.ev_per_unit_bet, flat.ev_per_unit_bet)
+
+
+if __name__ == '__main__':
+  unittest.main()
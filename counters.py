@@ -0,0 +1,170 @@
+""" Plain counters of a game.
+
+A GameCounters holds the numbers StatsForNerds reports (game, dealer,
+player and action stats, money units and multiplier records per wallet) as
+ints, floats and dicts. It is cheap to pickle, merges by addition and
+converts to JSON, so worker processes return it instead of the Person and
+Wallet object graphs.
+
+Games with control variates enabled also carry their
+control_variate.ControlSums. These merge by addition too, but are left out
+of the JSON form.
+"""
+import control_variate
+import simulation
+
+# Counters kept per person: WinLossTie, blackjack ties and ActionStats.
+PERSON_FIELDS = ('win', 'win_blackjack', 'loss', 'tie', 'blackjack_tie',
+                 'stand', 'hit', 'double', 'split', 'bust')
+
+# Counters kept per multiplier of a wallet, as WinLossTie names them.
+RECORD_FIELDS = ('win', 'win_blackjack', 'loss', 'tie')
+
+
+def _PersonCounters(person):
+  """Returns {field: int} for a person, in PERSON_FIELDS."""
+  return {
+      'win': person.stats.win,
+      'win_blackjack': person.stats.win_blackjack,
+      'loss': person.stats.loss,
+      'tie': person.stats.tie,
+      'blackjack_tie': person.blackjack_tie,
+      'stand': person.action_stats.stand,
+      'hit': person.action_stats.hit,
+      'double': person.action_stats.double,
+      'split': person.action_stats.split,
+      'bust': person.action_stats.bust,
+  }
+
+
+class GameCounters(object):
+  """Counters of one or more games."""
+
+  def __init__(self):
+    self.num_hands = 0
+    self.num_shoes = 0
+    self.dealer = dict.fromkeys(PERSON_FIELDS, 0)
+    self.player = dict.fromkeys(PERSON_FIELDS, 0)
+    # {wallet name: money units}
+    self.wallets = {}
+    # {wallet name: {multiplier: [int]}}, counts in RECORD_FIELDS order.
+    self.multiplier_records = {}
+    # control_variate.ControlSums, None unless control variates were on.
+    self.control_sums = None
+
+  def __eq__(self, other):
+    return isinstance(other, GameCounters) and vars(self) == vars(other)
+
+  def __ne__(self, other):
+    return not self == other
+
+  def Merge(self, other):
+    """Add the counters of another game to these.
+
+    Args:
+      other: GameCounters, counters to add.
+    """
+    self.num_hands += other.num_hands
+    self.num_shoes += other.num_shoes
+    for field in PERSON_FIELDS:
+      self.dealer[field] += other.dealer[field]
+      self.player[field] += other.player[field]
+    for name, money_units in other.wallets.iteritems():
+      self.wallets[name] = self.wallets.get(name, 0) + money_units
+    for name, records in other.multiplier_records.iteritems():
+      merged = self.multiplier_records.setdefault(name, {})
+      for multiplier, counts in records.iteritems():
+        if multiplier in merged:
+          merged[multiplier] = [mine + theirs for mine, theirs in
+                                zip(merged[multiplier], counts)]
+        else:
+          merged[multiplier] = list(counts)
+    if other.control_sums is not None:
+      if self.control_sums is None:
+        self.control_sums = control_variate.ControlSums()
+      self.control_sums.Merge(other.control_sums)
+
+  def ToDict(self):
+    """Returns the counters as JSON serializable dicts."""
+    return {
+        'num_hands': self.num_hands,
+        'num_shoes': self.num_shoes,
+        'dealer': dict(self.dealer),
+        'player': dict(self.player),
+        'wallets': dict(self.wallets),
+        'multiplier_records': dict(
+            (name, dict((repr(multiplier), dict(zip(RECORD_FIELDS, counts)))
+                        for multiplier, counts in records.iteritems()))
+            for name, records in self.multiplier_records.iteritems()),
+    }
+
+
+def FromDict(counters_dict):
+  """Returns the counters of a GameCounters.ToDict dict.
+
+  Args:
+    counters_dict: dict, as returned by ToDict, possibly through JSON.
+
+  Returns:
+    GameCounters, counters. Multipliers come back as floats.
+  """
+  game_counters = GameCounters()
+  game_counters.num_hands = counters_dict['num_hands']
+  game_counters.num_shoes = counters_dict['num_shoes']
+  game_counters.dealer = dict(counters_dict['dealer'])
+  game_counters.player = dict(counters_dict['player'])
+  game_counters.wallets = dict(counters_dict['wallets'])
+  for name, records in counters_dict['multiplier_records'].iteritems():
+    game_counters.multiplier_records[name] = dict(
+        (float(multiplier), [record[field] for field in RECORD_FIELDS])
+        for multiplier, record in records.iteritems())
+  return game_counters
+
+
+def FromGame(blackjack_game):
+  """Returns the counters of a game.
+
+  Args:
+    blackjack_game: game.Game, game to read.
+
+  Returns:
+    GameCounters, copy of the games counters.
+  """
+  game_counters = GameCounters()
+  game_counters.num_hands = blackjack_game.game_stats.num_hands
+  game_counters.num_shoes = blackjack_game.game_stats.num_shoes
+  game_counters.dealer = _PersonCounters(blackjack_game.dealer)
+  game_counters.player = _PersonCounters(blackjack_game.player)
+  for name, player_wallet in blackjack_game.player.wallets.iteritems():
+    game_counters.wallets[name] = player_wallet.money_units
+    game_counters.multiplier_records[name] = dict(
+        (multiplier, [getattr(record, field) for field in RECORD_FIELDS])
+        for multiplier, record in
+        player_wallet.betting_strategy.multiplier_record.iteritems())
+  if blackjack_game.control_variates is not None:
+    game_counters.control_sums = blackjack_game.control_variates.Sums()
+  return game_counters
+
+
+def CountersTask(task):
+  """Worker entry point. Play rounds of a fresh game.
+
+  Args:
+    task: (GameConfig, int, int, [dict][, bool]), game config, seed, number
+        of rounds, wallet specs (see simulation.NewWallets) and optionally
+        whether to collect control variates. None wallet specs keep the
+        players default wallets.
+
+  Returns:
+    GameCounters, counters of the game.
+  """
+  config, seed, num_rounds, wallet_specs = task[:4]
+  wallets = None
+  if wallet_specs is not None:
+    wallets = simulation.NewWallets(wallet_specs)
+  blackjack_game = simulation.NewGame(config, seed, wallets=wallets)
+  if len(task) > 4 and task[4]:
+    blackjack_game.EnableControlVariates()
+  for _ in xrange(num_rounds):
+    simulation.PlayRound(blackjack_game)
+  return FromGame(blackjack_game)
@@ -0,0 +1,105 @@
+""" The dealer drawing rule as a state transition table.
+
+A dealer hand is summarized by its hard value (aces counted as 1) and
+whether it holds an ace. While the dealer draws, that pair is a state; once
+the dealer stands or busts the hand is a final outcome: a total of 17 to 21
+or a bust. The table holds, per drawing state and card value, the next state
+or the final outcome, so playing the dealer is a loop of integer table
+reads:
+
+  state = automaton.StateOf(dealer_hand.cards)
+  while state >= 0:
+    state = automaton.steps[state + shoe.GetCard().value]
+
+Drawing states are offsets of their row in steps, rows being indexed by
+card.Card.value (2-11, an ace is 11). Final outcomes are negative:
+-1 - outcome, with outcome indexing OUTCOME_TOTALS then BUST.
+
+Only TableRules.hit_on_soft_17 changes the rule, so tables are built once
+per value of it and cached.
+"""
+import card
+
+# Final outcome indices: totals 17-21 then bust.
+OUTCOME_TOTALS = (17, 18, 19, 20, 21)
+BUST = len(OUTCOME_TOTALS)
+NUM_OUTCOMES = BUST + 1
+
+# Row length, indexed by card value.
+NUM_CARD_VALUES = card.ACE.value + 1
+# Largest hard value of a drawing state (a hard 16) plus one card.
+MAX_HARD_VALUE = 16 + card.FACE.value
+
+_ACE_BONUS = card.ACE.value - card.ACE.alt_value
+
+
+def FinalCode(outcome):
+  """Returns the table code of a final outcome index."""
+  return -1 - outcome
+
+
+def Outcome(code):
+  """Returns the outcome index of a final table code."""
+  return -1 - code
+
+
+class DealerAutomaton(object):
+  """Transition table of the dealer drawing rule."""
+
+  def __init__(self, hit_on_soft_17):
+    """Constructor.
+
+    Args:
+      hit_on_soft_17: bool, the dealer hits a soft 17.
+    """
+    self.hit_on_soft_17 = hit_on_soft_17
+    self.steps = [0] * (self.State(MAX_HARD_VALUE, True) + NUM_CARD_VALUES)
+    for hard_value in xrange(MAX_HARD_VALUE + 1):
+      for has_ace in (False, True):
+        row = self.State(hard_value, has_ace)
+        for rank in card.RANKS:
+          self.steps[row + rank.value] = self.Classify(
+              hard_value + rank.alt_value, has_ace or rank == card.ACE)
+
+  @staticmethod
+  def State(hard_value, has_ace):
+    """Returns the drawing state of a hand, whatever the rule says of it."""
+    return (hard_value * 2 + int(has_ace)) * NUM_CARD_VALUES
+
+  def Classify(self, hard_value, has_ace):
+    """Returns the table code of a hand: its state or final outcome.
+
+    Args:
+      hard_value: int, value of the hand counting aces as 1.
+      has_ace: bool, the hand holds an ace.
+    """
+    value = hard_value
+    is_soft = has_ace and hard_value + _ACE_BONUS <= 21
+    if is_soft:
+      value += _ACE_BONUS
+    if value > 21:
+      return FinalCode(BUST)
+    if value < 17 or (value == 17 and is_soft and self.hit_on_soft_17):
+      return self.State(hard_value, has_ace)
+    return FinalCode(value - OUTCOME_TOTALS[0])
+
+  def StateOf(self, cards):
+    """Returns the table code of a hand of cards."""
+    return self.Classify(sum([hand_card.alt_value for hand_card in cards]),
+                         card.ACE in cards)
+
+
+# Automatons by hit_on_soft_17.
+_AUTOMATONS = {}
+
+
+def GetAutomaton(rules):
+  """Returns the automaton of a rule set, building it at most once.
+
+  Args:
+    rules: table_rules.TableRules, rules at the table.
+  """
+  key = bool(rules.hit_on_soft_17)
+  if key not in _AUTOMATONS:
+    _AUTOMATONS[key] = DealerAutomaton(key)
+  return _AUTOMATONS[key]
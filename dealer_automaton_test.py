@@ -0,0 +1,91 @@
+import card
+import dealer_automaton
+import hand
+import itertools
+import person
+import table_rules
+import unittest
+
+
+def _Draws(hit_on_soft_17, current_hand):
+  """The dealer rule as written against Hand."""
+  return current_hand.IsActive() and (
+      current_hand.GetValue() < 17 or
+      (hit_on_soft_17 and current_hand.IsSoft(17)))
+
+
+class _StackedShoe(object):
+  """Deals the given cards in order."""
+
+  def __init__(self, cards):
+    self.cards = list(cards)
+
+  def GetCard(self):
+    return self.cards.pop(0)
+
+
+class DealerAutomatonTest(unittest.TestCase):
+  def test_matches_hand_rule(self):
+    for hit_on_soft_17 in (True, False):
+      automaton = dealer_automaton.DealerAutomaton(hit_on_soft_17)
+      for num_cards in (2, 3, 4):
+        for cards in itertools.product(card.RANKS, repeat=num_cards):
+          current_hand = hand.Hand(list(cards))
+          code = automaton.StateOf(current_hand.cards)
+          if _Draws(hit_on_soft_17, current_hand):
+            self.assertTrue(code >= 0, cards)
+            continue
+          self.assertTrue(code < 0, cards)
+          outcome = dealer_automaton.Outcome(code)
+          if current_hand.IsActive():
+            self.assertEqual(current_hand.GetValue(),
+                             dealer_automaton.OUTCOME_TOTALS[outcome])
+          else:
+            self.assertEqual(dealer_automaton.BUST, outcome)
+
+  def test_steps_follow_state_of(self):
+    automaton = dealer_automaton.DealerAutomaton(True)
+    for first, second, third in itertools.product(card.RANKS, repeat=3):
+      state = automaton.StateOf([first, second])
+      if state >= 0:
+        self.assertEqual(automaton.StateOf([first, second, third]),
+                         automaton.steps[state + third.value])
+
+  def test_cached_per_rule(self):
+    rules = table_rules.DEFAULT_TABLE_RULES
+    automaton = dealer_automaton.GetAutomaton(rules)
+    self.assertIs(automaton, dealer_automaton.GetAutomaton(
+        rules._replace(num_decks=8)))
+    self.assertIsNot(automaton, dealer_automaton.GetAutomaton(
+        rules._replace(hit_on_soft_17=not rules.hit_on_soft_17)))
+
+
+class DealerPlayTest(unittest.TestCase):
+  def Play(self, hit_on_soft_17, cards, draws):
+    rules = table_rules.DEFAULT_TABLE_RULES._replace(
+        hit_on_soft_17=hit_on_soft_17)
+    dealer = person.Dealer(rules)
+    dealer_hand = hand.Hand(list(cards))
+    dealer.Play(_StackedShoe(draws), dealer_hand)
+    return dealer_hand, dealer.action_stats
+
+  def test_soft_seventeen(self):
+    dealer_hand, action_stats = self.Play(True, [card.ACE, card.SIX],
+                                          [card.TWO])
+    self.assertEqual(19, dealer_hand.GetValue())
+    self.assertEqual((1, 1, 0), (action_stats.hit, action_stats.stand,
+                                 action_stats.bust))
+    dealer_hand, action_stats = self.Play(False, [card.ACE, card.SIX], [])
+    self.assertEqual(17, dealer_hand.GetValue())
+    self.assertEqual((0, 1), (action_stats.hit, action_stats.stand))
+
+  def test_bust(self):
+    dealer_hand, action_stats = self.Play(True, [card.FACE, card.SIX],
+                                          [card.FACE])
+    self.assertFalse(dealer_hand.IsActive())
+    self.assertEqual((1, 0, 1), (action_stats.hit, action_stats.stand,
+                                 action_stats.bust))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,477 @@
+""" Differential checks of the fast engines against the reference Game.
+
+The reference is game.Game itself: one fresh game per batch, seeded as
+counters.CountersTask seeds it, played round by round in this process.
+Engines which deal the same cards (the parallel runner, the session, the
+shared memory runner, the compact table array, the population) must
+reproduce it exactly:
+
+  counters: every GameCounters field of the merged batches is equal.
+  rounds: per round, the cards dealt, the actions taken, the settlements
+      and the money units each wallet won are equal.
+
+Engines dealing different cards on purpose, such as the tilted shoes of
+importance sampling, are checked statistically: per bucket of a shoe
+signal their mean result must lie within a few standard errors of the
+reference.
+
+Run directly for a report of every engine:
+
+  python differential.py --num-rounds 20000
+"""
+import argparse
+import collections
+import math
+
+import counters
+import events
+import importance
+import population
+import session
+import shared_counters
+import simulation
+import strategy
+import table_array
+import wallet
+
+
+class DifferentialException(Exception):
+  """Base exception."""
+
+
+class Plan(collections.namedtuple(
+    'Plan', ['config', 'seed', 'num_batches', 'batch_rounds',
+             'wallet_specs'])):
+  """Batch i plays batch_rounds rounds of a fresh game seeded seed + i."""
+
+  def Tasks(self):
+    """Returns the counters.CountersTask tasks of the plan."""
+    return [(self.config, self.seed + index, self.batch_rounds,
+             self.wallet_specs) for index in xrange(self.num_batches)]
+
+DEFAULT_PLAN = Plan(config=simulation.DEFAULT_GAME_CONFIG, seed=0,
+                    num_batches=3, batch_rounds=500, wallet_specs=None)
+
+
+class RoundRecord(collections.namedtuple(
+    'RoundRecord', ['cards', 'actions', 'settlements', 'results'])):
+  """What happened in a round.
+
+  cards: (str), names of the cards dealt, burned cards included.
+  actions: (str), names of the actions the player took.
+  settlements: ((str, str, str)), per settled hand the player and dealer
+      cards and the outcome.
+  results: ((str, float)), money units won per wallet, sorted by name.
+  """
+
+
+class _RoundLog(object):
+  """Listens to a game and keeps a RoundRecord per round."""
+
+  def __init__(self, blackjack_game):
+    self.game = blackjack_game
+    self.cards = []
+    self.actions = []
+    self.settlements = []
+    self.listeners = (
+        (events.CARD_DEALT, lambda dealt: self.cards.append(dealt.name)),
+        (events.ACTION_TAKEN,
+         lambda _, action: self.actions.append(action.name)),
+        (events.SETTLEMENT, self._Settlement))
+    for event, listener in self.listeners:
+      blackjack_game.events.Register(event, listener)
+
+  def _Settlement(self, player_hand, dealer_hand, outcome):
+    self.settlements.append((repr(player_hand.cards),
+                             repr(dealer_hand.cards), outcome))
+
+  def Close(self):
+    for event, listener in self.listeners:
+      self.game.events.Unregister(event, listener)
+
+  def PlayRound(self):
+    """Play a round and returns its RoundRecord."""
+    wallets = self.game.player.wallets
+    start = dict((name, player_wallet.money_units)
+                 for name, player_wallet in wallets.iteritems())
+    self.cards, self.actions, self.settlements = [], [], []
+    simulation.PlayRound(self.game)
+    return RoundRecord(
+        tuple(self.cards), tuple(self.actions), tuple(self.settlements),
+        tuple((name, wallets[name].money_units - start[name])
+              for name in sorted(wallets)))
+
+
+def RecordRounds(blackjack_game, num_rounds):
+  """Play rounds of a game and record them.
+
+  Args:
+    blackjack_game: game.Game, game to play.
+    num_rounds: int, number of rounds.
+
+  Returns:
+    [RoundRecord], record per round.
+  """
+  log = _RoundLog(blackjack_game)
+  try:
+    return [log.PlayRound() for _ in xrange(num_rounds)]
+  finally:
+    log.Close()
+
+
+def ReferenceGame(plan, index):
+  """Returns the reference game of a batch of the plan."""
+  wallets = None
+  if plan.wallet_specs is not None:
+    wallets = simulation.NewWallets(plan.wallet_specs)
+  return simulation.NewGame(plan.config, plan.seed + index, wallets=wallets)
+
+
+def ReferenceCounters(plan):
+  """Returns the merged counters of the plan's reference games."""
+  totals = counters.GameCounters()
+  for index in xrange(plan.num_batches):
+    blackjack_game = ReferenceGame(plan, index)
+    for _ in xrange(plan.batch_rounds):
+      simulation.PlayRound(blackjack_game)
+    totals.Merge(counters.FromGame(blackjack_game))
+  return totals
+
+
+def CounterDifferences(expected, actual):
+  """Returns the counters which differ, exactly.
+
+  Args:
+    expected: counters.GameCounters, reference counters.
+    actual: counters.GameCounters, engine counters.
+
+  Returns:
+    [str], one 'field: expected != actual' line per difference.
+  """
+  # Multipliers compare as the floats JSON and shared memory hand back.
+  expected_dict = counters.FromDict(expected.ToDict()).ToDict()
+  actual_dict = counters.FromDict(actual.ToDict()).ToDict()
+  differences = []
+  for field in sorted(set(expected_dict) | set(actual_dict)):
+    mine = expected_dict.get(field)
+    theirs = actual_dict.get(field)
+    if isinstance(mine, dict) and isinstance(theirs, dict):
+      for key in sorted(set(mine) | set(theirs)):
+        if mine.get(key) != theirs.get(key):
+          differences.append('%s.%s: %r != %r' % (field, key, mine.get(key),
+                                                  theirs.get(key)))
+    elif mine != theirs:
+      differences.append('%s: %r != %r' % (field, mine, theirs))
+  return differences
+
+
+def FirstRoundDifference(expected, actual, fields=RoundRecord._fields):
+  """Returns the first round at which two recordings differ.
+
+  Args:
+    expected: [RoundRecord], reference rounds.
+    actual: [RoundRecord], engine rounds.
+    fields: (str), RoundRecord fields to compare.
+
+  Returns:
+    (int, str) index of the round and the differing RoundRecord field, or
+        None if the recordings are equal.
+  """
+  for index, (mine, theirs) in enumerate(zip(expected, actual)):
+    for field in fields:
+      if getattr(mine, field) != getattr(theirs, field):
+        return index, field
+  if len(expected) != len(actual):
+    return min(len(expected), len(actual)), 'length'
+  return None
+
+
+# Engines checked exactly on counters. Each takes a Plan and returns the
+# merged counters.GameCounters of its batches.
+
+def RunTasksCounters(plan, num_workers=2):
+  """The parallel runner, simulation.RunTasks over counters.CountersTask."""
+  totals = counters.GameCounters()
+  for game_counters in simulation.RunTasks(counters.CountersTask,
+                                           plan.Tasks(), num_workers):
+    totals.Merge(game_counters)
+  return totals
+
+
+def SessionCounters(plan, num_workers=2):
+  """The warm session of session.Session."""
+  blackjack_session = session.Session(
+      plan.config, wallet_specs=plan.wallet_specs, num_workers=num_workers,
+      batch_rounds=plan.batch_rounds, seed=plan.seed)
+  try:
+    if not blackjack_session.Play(plan.num_batches * plan.batch_rounds):
+      raise DifferentialException('Session interrupted')
+    return blackjack_session.Totals()
+  finally:
+    blackjack_session.Close()
+
+
+def SharedCounters(plan, num_workers=2):
+  """The shared memory runner."""
+  return shared_counters.RunShared(
+      plan.num_batches * plan.batch_rounds, config=plan.config,
+      wallet_specs=plan.wallet_specs, num_workers=num_workers,
+      num_batches=plan.num_batches, seed=plan.seed)
+
+
+def TableArrayCounters(plan, num_workers=2):
+  """The compact tables of table_array, one single table array per batch."""
+  totals = counters.GameCounters()
+  for index in xrange(plan.num_batches):
+    tables = table_array.TableArray(plan.config, 1, plan.seed + index,
+                                    plan.wallet_specs)
+    tables.Play(plan.batch_rounds)
+    totals.Merge(tables.Totals())
+  return totals
+
+COUNTER_ENGINES = collections.OrderedDict([
+    ('run_tasks', RunTasksCounters),
+    ('session', SessionCounters),
+    ('shared_counters', SharedCounters),
+    ('table_array', TableArrayCounters),
+])
+
+
+def CompareEngines(plan=DEFAULT_PLAN, engines=None, num_workers=2):
+  """Run counter engines on a plan and compare them to the reference.
+
+  Args:
+    plan: Plan, batches to play.
+    engines: [str], names in COUNTER_ENGINES. None runs them all.
+    num_workers: int, worker processes of the engines.
+
+  Returns:
+    {str: [str]}, CounterDifferences per engine, empty when exact.
+  """
+  reference = ReferenceCounters(plan)
+  differences = {}
+  for name in engines or COUNTER_ENGINES:
+    actual = COUNTER_ENGINES[name](plan, num_workers)
+    differences[name] = CounterDifferences(reference, actual)
+  return differences
+
+
+# Engines checked exactly round by round. Each takes a Plan and a batch index
+# and returns the FirstRoundDifference of the batch against the reference.
+
+def ObservedRounds(plan, index):
+  """The reference game with control variates and extra listeners on.
+
+  Observers must not change the cards, the play or the payouts.
+  """
+  expected = RecordRounds(ReferenceGame(plan, index), plan.batch_rounds)
+  observed = ReferenceGame(plan, index)
+  observed.EnableControlVariates()
+  for event in events.EVENTS:
+    observed.events.Register(event, lambda *args: None)
+  return FirstRoundDifference(expected,
+                              RecordRounds(observed, plan.batch_rounds))
+
+
+def PopulationRounds(plan, index):
+  """The per round results population.RecordRounds prices variants from.
+
+  They must equal what a one unit flat bet wins in the reference game.
+  """
+  blackjack_game = simulation.NewGame(
+      plan.config, plan.seed + index,
+      wallets=[wallet.Wallet('Probe', strategy.StrategyTableMinimum(1))])
+  expected = RecordRounds(blackjack_game, plan.batch_rounds)
+  _, results = population.RecordRounds(plan.config, plan.seed + index,
+                                       plan.batch_rounds, ['constant'])
+  actual = [RoundRecord(None, None, None, (('Probe', result),))
+            for result in results]
+  return FirstRoundDifference(expected, actual, fields=('results',))
+
+ROUND_ENGINES = collections.OrderedDict([
+    ('observed', ObservedRounds),
+    ('population', PopulationRounds),
+])
+
+
+def CompareRounds(plan=DEFAULT_PLAN, engines=None):
+  """Run round engines on every batch of a plan.
+
+  Args:
+    plan: Plan, batches to play.
+    engines: [str], names in ROUND_ENGINES. None runs them all.
+
+  Returns:
+    {str: (int, int, str)}, per engine the batch, round and RoundRecord
+        field of its first difference, None when exact.
+  """
+  differences = {}
+  for name in engines or ROUND_ENGINES:
+    differences[name] = None
+    for index in xrange(plan.num_batches):
+      difference = ROUND_ENGINES[name](plan, index)
+      if difference is not None:
+        differences[name] = (index,) + difference
+        break
+  return differences
+
+
+def PopulationDifferences(plan, strategies):
+  """Compare population pricing with real wallets in the reference games.
+
+  Args:
+    plan: Plan, batches to play. Its wallet specs are ignored.
+    strategies: callable, returns fresh BettingStrategy variants which bet
+        from a signal. Called once for the population and once per batch.
+
+  Returns:
+    [str], one line per variant whose money units or rounds differ.
+  """
+  variants = population.Population(strategies())
+  variants.Play(plan.num_batches * plan.batch_rounds, config=plan.config,
+                num_workers=1, num_batches=plan.num_batches, seed=plan.seed)
+
+  money_units = None
+  for index in xrange(plan.num_batches):
+    wallets = [wallet.Wallet(str(position), betting_strategy)
+               for position, betting_strategy in enumerate(strategies())]
+    blackjack_game = simulation.NewGame(plan.config, plan.seed + index,
+                                        wallets=wallets)
+    for _ in xrange(plan.batch_rounds):
+      simulation.PlayRound(blackjack_game)
+    batch_units = [blackjack_game.player.wallets[str(position)].money_units
+                   for position in xrange(len(wallets))]
+    money_units = batch_units if money_units is None else [
+        total + units for total, units in zip(money_units, batch_units)]
+
+  differences = []
+  expected_rounds = plan.num_batches * plan.batch_rounds
+  for position, result in enumerate(variants.Results()):
+    if result.num_rounds != expected_rounds:
+      differences.append('%d: rounds %d != %d' % (
+          position, expected_rounds, result.num_rounds))
+    # Sums are added in another order, so allow for rounding.
+    if abs(result.money_units - money_units[position]) > 1e-6:
+      differences.append('%d: money units %r != %r' % (
+          position, money_units[position], result.money_units))
+  return differences
+
+
+def ReferenceHistogram(plan, bucket_name):
+  """Returns the unweighted importance.WeightedHistogram of the reference.
+
+  Args:
+    plan: Plan, batches to play. Its wallet specs are ignored.
+    bucket_name: str, key of strategy.BUCKET_FUNCTIONS.
+  """
+  histogram = importance.WeightedHistogram()
+  for index in xrange(plan.num_batches):
+    keys, results = population.RecordRounds(
+        plan.config, plan.seed + index, plan.batch_rounds, [bucket_name])
+    for bucket, result in zip(keys[bucket_name], results):
+      histogram.Add(bucket, result)
+  return histogram
+
+
+def ZScore(mean, error, other_mean, other_error):
+  """Returns the z score of the difference of two independent means."""
+  spread = math.sqrt(error * error + other_error * other_error)
+  if not spread:
+    return 0.0 if mean == other_mean else float('inf')
+  return (other_mean - mean) / spread
+
+
+def HistogramDifferences(expected, actual, max_z=4.0, min_ess=100):
+  """Compare two histograms bucket by bucket.
+
+  Args:
+    expected: importance.WeightedHistogram, reference histogram.
+    actual: importance.WeightedHistogram, engine histogram.
+    max_z: float, largest absolute z score accepted.
+    min_ess: float, buckets with a smaller effective sample size on either
+        side are not compared.
+
+  Returns:
+    [(object, float)], bucket and z score of every rejected bucket.
+  """
+  rejected = []
+  for bucket in sorted(set(expected.num_rounds) & set(actual.num_rounds)):
+    if (expected.EffectiveSampleSize(bucket) < min_ess or
+        actual.EffectiveSampleSize(bucket) < min_ess):
+      continue
+    z_score = ZScore(expected.Mean(bucket), expected.StandardError(bucket),
+                     actual.Mean(bucket), actual.StandardError(bucket))
+    if abs(z_score) > max_z:
+      rejected.append((bucket, z_score))
+  return rejected
+
+
+def TiltedDifferences(plan, tilt, bucket_name='true_count', **kwargs):
+  """Check importance sampling against the reference statistically.
+
+  Args:
+    plan: Plan, batches to play. The tilted run uses seeds after the
+        reference's, so both are independent.
+    tilt: float, see importance.TiltedShoe.
+    bucket_name: str, key of strategy.BUCKET_FUNCTIONS.
+    kwargs: dict, see HistogramDifferences.
+
+  Returns:
+    [(object, float)], see HistogramDifferences.
+  """
+  if bucket_name not in strategy.BUCKET_FUNCTIONS:
+    raise DifferentialException('Unknown bucket: %s' % bucket_name)
+  tilted = importance.BuildHistogram(
+      plan.num_batches * plan.batch_rounds, tilt, bucket_name,
+      config=plan.config, num_workers=1, num_batches=plan.num_batches,
+      seed=plan.seed + plan.num_batches)
+  return HistogramDifferences(ReferenceHistogram(plan, bucket_name), tilted,
+                              **kwargs)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--num-rounds', type=int, default=20000,
+                      help='Rounds per engine, split over the batches.')
+  parser.add_argument('--batches', type=int, default=4,
+                      help='Batches, each a freshly seeded game.')
+  parser.add_argument('--workers', type=int, default=2,
+                      help='Worker processes of the parallel engines.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the first batch.')
+  parser.add_argument('--tilt', type=float, default=0.1,
+                      help='Tilt of the importance sampling check.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  plan = DEFAULT_PLAN._replace(seed=args.seed, num_batches=args.batches,
+                               batch_rounds=args.num_rounds // args.batches)
+
+  failed = False
+  for name, differences in sorted(CompareEngines(
+      plan, num_workers=args.workers).iteritems()):
+    print '%-20s %s' % (name, 'exact' if not differences else
+                        '%d differences' % len(differences))
+    for difference in differences:
+      print '    %s' % difference
+    failed = failed or bool(differences)
+
+  for name, difference in sorted(CompareRounds(plan).iteritems()):
+    if difference is None:
+      print '%-20s exact' % name
+    else:
+      print '%-20s batch %d round %d differs in %s' % ((name,) + difference)
+      failed = True
+
+  rejected = TiltedDifferences(plan, args.tilt)
+  print '%-20s %s' % ('importance', 'consistent' if not rejected else
+                      '%d buckets rejected' % len(rejected))
+  for bucket, z_score in rejected:
+    print '    bucket %s: z = %.2f' % (bucket, z_score)
+  return 1 if failed or rejected else 0
+
+
+if __name__ == '__main__':
+  raise SystemExit(main())
@@ -0,0 +1,59 @@
+import counters
+import differential
+import strategy
+import unittest
+
+
+# Small enough to run on every change.
+PLAN = differential.DEFAULT_PLAN._replace(seed=11, num_batches=2,
+                                          batch_rounds=300)
+
+
+class CounterEnginesTest(unittest.TestCase):
+  def test_counter_engines_match_reference(self):
+    for name, differences in differential.CompareEngines(PLAN).iteritems():
+      self.assertEqual([], differences, '%s: %s' % (name, differences))
+
+  def test_detects_drift(self):
+    reference = differential.ReferenceCounters(PLAN)
+    drifted = counters.GameCounters()
+    drifted.Merge(reference)
+    drifted.player['hit'] += 1
+    self.assertEqual(['player.hit: %d != %d' % (reference.player['hit'],
+                                                reference.player['hit'] + 1)],
+                     differential.CounterDifferences(reference, drifted))
+
+  def test_population_matches_wallets(self):
+    def Strategies():
+      return [strategy.StrategyTableMinimum(1),
+              strategy.StrategyProgressive(1, 20),
+              strategy.StrategyRamp({-1: 1, 0: 2, 3: 10})]
+    self.assertEqual([], differential.PopulationDifferences(PLAN, Strategies))
+
+
+class RoundEnginesTest(unittest.TestCase):
+  def test_round_engines_match_reference(self):
+    for name, difference in differential.CompareRounds(PLAN).iteritems():
+      self.assertEqual(None, difference, '%s: %s' % (name, difference))
+
+  def test_same_seed_same_rounds(self):
+    first = differential.RecordRounds(differential.ReferenceGame(PLAN, 0), 50)
+    second = differential.RecordRounds(differential.ReferenceGame(PLAN, 0), 50)
+    self.assertEqual(None, differential.FirstRoundDifference(first, second))
+    other = differential.RecordRounds(differential.ReferenceGame(PLAN, 1), 50)
+    self.assertEqual((0, 'cards'),
+                     differential.FirstRoundDifference(first, other))
+
+
+class StatisticalTest(unittest.TestCase):
+  def test_z_score(self):
+    self.assertAlmostEqual(2.0, differential.ZScore(0.0, 0.3, 1.0, 0.4))
+    self.assertEqual(0.0, differential.ZScore(1.0, 0.0, 1.0, 0.0))
+
+  def test_tilted_shoe_consistent(self):
+    plan = PLAN._replace(num_batches=2, batch_rounds=2000)
+    self.assertEqual([], differential.TiltedDifferences(plan, 0.1))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,95 @@
+""" Observer hooks into the game.
+
+Listeners register per event on an EventBus shared by the game, its shoe
+and its people. For every event the bus keeps one compiled handler
+attribute: None without listeners, the listener itself with one, and a
+fan out function with several. Emitters do
+
+  handler = events.card_dealt
+  if handler is not None:
+    handler(new_card)
+
+so an event nobody listens to costs one attribute lookup.
+
+Events and their arguments:
+  card_dealt(card): a card left the shoe, burned cards and the dealers hole
+      card included.
+  bet_placed(wallet_name, bet): a wallet placed a wallet.Bet on a new hand.
+  action_taken(hand, action): the player chose a play_strategy.Action.
+  dealer_draw(card): the dealer drew a card while playing their hand.
+  settlement(player_hand, dealer_hand, outcome): a player hand was settled,
+      outcome is WIN, LOSS, TIE or SURRENDER.
+  shoe_reset(shoe): the shoe was reshuffled, before its first burn.
+"""
+
+CARD_DEALT = 'card_dealt'
+BET_PLACED = 'bet_placed'
+ACTION_TAKEN = 'action_taken'
+DEALER_DRAW = 'dealer_draw'
+SETTLEMENT = 'settlement'
+SHOE_RESET = 'shoe_reset'
+EVENTS = (CARD_DEALT, BET_PLACED, ACTION_TAKEN, DEALER_DRAW, SETTLEMENT,
+          SHOE_RESET)
+
+# Settlement outcomes.
+WIN = 'win'
+LOSS = 'loss'
+TIE = 'tie'
+SURRENDER = 'surrender'
+
+
+class EventsException(Exception):
+  """Base exception."""
+
+
+def _FanOut(listeners):
+  """Returns a handler calling every listener in order."""
+  def Handler(*args):
+    for listener in listeners:
+      listener(*args)
+  return Handler
+
+
+class EventBus(object):
+  """Per event listeners, compiled into one handler attribute per event."""
+
+  def __init__(self):
+    self._listeners = dict((event, []) for event in EVENTS)
+    for event in EVENTS:
+      setattr(self, event, None)
+
+  def Register(self, event, listener):
+    """Call listener on every event of the type.
+
+    Args:
+      event: str, one of EVENTS.
+      listener: callable, called with the event arguments.
+
+    Raises:
+      EventsException: Unknown event.
+    """
+    if event not in self._listeners:
+      raise EventsException('Unknown event: %s' % event)
+    self._listeners[event].append(listener)
+    self._Compile(event)
+
+  def Unregister(self, event, listener):
+    """Stop calling a registered listener.
+
+    Raises:
+      EventsException: Unknown event or listener.
+    """
+    if listener not in self._listeners.get(event, []):
+      raise EventsException('%s is not listening to %s' % (listener, event))
+    self._listeners[event].remove(listener)
+    self._Compile(event)
+
+  def _Compile(self, event):
+    listeners = tuple(self._listeners[event])
+    if not listeners:
+      handler = None
+    elif len(listeners) == 1:
+      handler = listeners[0]
+    else:
+      handler = _FanOut(listeners)
+    setattr(self, event, handler)
@@ -0,0 +1,65 @@
+import events
+import simulation
+import strategy
+import unittest
+import wallet
+
+
+class EventsTest(unittest.TestCase):
+  def test_compiled_handlers(self):
+    bus = events.EventBus()
+    calls = []
+    first = lambda new_card: calls.append(('first', new_card))
+    second = lambda new_card: calls.append(('second', new_card))
+
+    self.assertIsNone(bus.card_dealt)
+    bus.Register(events.CARD_DEALT, first)
+    self.assertIs(bus.card_dealt, first)
+    bus.Register(events.CARD_DEALT, second)
+    bus.card_dealt('A')
+    self.assertEqual(calls, [('first', 'A'), ('second', 'A')])
+
+    bus.Unregister(events.CARD_DEALT, first)
+    bus.Unregister(events.CARD_DEALT, second)
+    self.assertIsNone(bus.card_dealt)
+    self.assertRaises(events.EventsException, bus.Register, 'split', first)
+
+  def test_game_events(self):
+    blackjack_game = simulation.NewGame(simulation.DEFAULT_GAME_CONFIG, 3)
+    seen = dict((event, 0) for event in events.EVENTS)
+
+    def Counter(event):
+      def Listener(*args):
+        seen[event] += 1
+      return Listener
+
+    for event in events.EVENTS:
+      blackjack_game.events.Register(event, Counter(event))
+
+    num_rounds = 500
+    for _ in xrange(num_rounds):
+      simulation.PlayRound(blackjack_game)
+
+    self.assertEqual(seen[events.SETTLEMENT], num_rounds)
+    self.assertEqual(seen[events.BET_PLACED],
+                     num_rounds * len(blackjack_game.player.wallets))
+    self.assertEqual(seen[events.SHOE_RESET],
+                     blackjack_game.game_stats.num_shoes)
+    self.assertGreater(seen[events.ACTION_TAKEN], 0)
+    self.assertGreater(seen[events.DEALER_DRAW], 0)
+    self.assertGreater(seen[events.CARD_DEALT], 4 * num_rounds)
+
+  def test_count_listener_matches_scan(self):
+    listening = strategy.StrategyCount(1, 20)
+    blackjack_game = simulation.NewGame(simulation.DEFAULT_GAME_CONFIG, 6)
+    blackjack_game.AddPlayerWallet(wallet.Wallet('Listening', listening))
+    scanning = strategy.StrategyCount(1, 20)
+    for _ in xrange(500):
+      self.assertEqual(
+          listening.GetBetAmount(**blackjack_game.bet_kwargs),
+          scanning.GetBetAmount(**blackjack_game.bet_kwargs))
+      simulation.PlayRound(blackjack_game)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,404 @@
+""" Evolutionary search over parameterized betting strategies.
+
+Candidates come from the families strategy.py implements: progressive
+betting (growth factor, cap, reset rule) and bet ramps keyed by true count
+or blackjack percent. Each generation every candidate is priced on the same
+simulated rounds (common random numbers), so selection reflects the
+strategy rather than the luck of the shuffle. Rounds are simulated once per
+batch in a worker and every candidate is replayed over the recorded trace,
+which also gives path dependent measures such as the risk of ruin.
+
+The search state is pickled after every generation and picked up again
+when the search is restarted with the same checkpoint file.
+"""
+import argparse
+import collections
+import cPickle
+import os
+import random
+
+import population
+import simulation
+import strategy
+
+
+class EvolveException(Exception):
+  """Base exception."""
+
+
+class Candidate(collections.namedtuple('Candidate', ['family', 'params'])):
+  """A point in the search space: family name and its parameters tuple."""
+
+
+class ProgressiveFamily(object):
+  """strategy.StrategyProgressive, params (factor, cap, reset_after_max)."""
+
+  FACTORS = (1.5, 2, 2.5, 3)
+
+  def __init__(self, table_minimum, table_maximum):
+    self.table_minimum = table_minimum
+    self.table_maximum = table_maximum
+
+  def Random(self, rng):
+    return (rng.choice(self.FACTORS),
+            rng.randint(self.table_minimum, self.table_maximum),
+            rng.random() < 0.5)
+
+  def Mutate(self, params, rng):
+    factor, cap, reset = params
+    gene = rng.randrange(3)
+    if gene == 0:
+      factor = rng.choice(self.FACTORS)
+    elif gene == 1:
+      cap = min(max(cap + rng.choice((-2, -1, 1, 2)), self.table_minimum),
+                self.table_maximum)
+    else:
+      reset = not reset
+    return factor, cap, reset
+
+  def Crossover(self, first, second, rng):
+    return tuple([rng.choice(genes) for genes in zip(first, second)])
+
+  def Build(self, params):
+    factor, cap, reset = params
+    return strategy.StrategyProgressive(self.table_minimum, cap,
+                                        reset_after_max=reset, factor=factor)
+
+
+class RampFamily(object):
+  """strategy.StrategyRamp over fixed buckets, params are the bets."""
+
+  def __init__(self, table_minimum, table_maximum, bucket_name, buckets):
+    self.table_minimum = table_minimum
+    self.table_maximum = table_maximum
+    self.bucket_name = bucket_name
+    self.buckets = tuple(buckets)
+
+  def Random(self, rng):
+    # Random non decreasing ramp.
+    return tuple(sorted([rng.randint(self.table_minimum, self.table_maximum)
+                         for _ in self.buckets]))
+
+  def Mutate(self, params, rng):
+    bets = list(params)
+    index = rng.randrange(len(bets))
+    bets[index] = min(max(bets[index] + rng.choice((-3, -1, 1, 3)),
+                          self.table_minimum), self.table_maximum)
+    return tuple(bets)
+
+  def Crossover(self, first, second, rng):
+    # One point crossover keeps runs of neighbouring buckets together.
+    point = rng.randrange(1, len(self.buckets))
+    return first[:point] + second[point:]
+
+  def Build(self, params):
+    return strategy.StrategyRamp(dict(zip(self.buckets, params)),
+                                 self.bucket_name)
+
+
+def NewFamilies(rules):
+  """Returns the searchable families for the table rules, by name."""
+  return {
+      'progressive': ProgressiveFamily(rules.min_money_units,
+                                       rules.max_money_units),
+      'true_count_ramp': RampFamily(rules.min_money_units,
+                                    rules.max_money_units, 'true_count',
+                                    range(-2, 7)),
+      'blackjack_percent_ramp': RampFamily(
+          rules.min_money_units, rules.max_money_units, 'blackjack_percent',
+          [percent / 2.0 for percent in xrange(8, 15)]),
+  }
+
+
+class CandidateStats(collections.namedtuple(
+    'CandidateStats', ['num_rounds', 'total', 'total_squared', 'total_bet',
+                       'num_sessions', 'num_ruined'])):
+  """Money units won over the rounds and sessions ruined."""
+
+  def Merge(self, other):
+    return CandidateStats(*[mine + theirs
+                            for mine, theirs in zip(self, other)])
+
+  def Rate(self):
+    """Returns the mean money units won per round."""
+    return float(self.total) / max(self.num_rounds, 1)
+
+  def Stdev(self):
+    """Returns the standard deviation of the money units won per round."""
+    rate = self.Rate()
+    return max(float(self.total_squared) / max(self.num_rounds, 1) -
+               rate * rate, 0.0) ** 0.5
+
+  def RiskOfRuin(self):
+    """Returns the fraction of sessions which lost the bankroll."""
+    return float(self.num_ruined) / max(self.num_sessions, 1)
+
+
+def Fitness(candidate_stats, objective):
+  """Returns a sortable fitness, higher is better.
+
+  Args:
+    candidate_stats: CandidateStats, stats of a candidate.
+    objective: str, 'ev_per_risk' for mean over standard deviation per
+        round, 'risk_of_ruin' for the fewest ruined sessions, ties broken by
+        the mean.
+
+  Raises:
+    EvolveException: Unknown objective.
+  """
+  if objective == 'ev_per_risk':
+    stdev = candidate_stats.Stdev()
+    return (candidate_stats.Rate() / stdev if stdev else 0.0,)
+  elif objective == 'risk_of_ruin':
+    return (-candidate_stats.RiskOfRuin(), candidate_stats.Rate())
+  raise EvolveException('Unknown objective: %s' % objective)
+
+
+def FitnessTask(task):
+  """Worker entry point. Price every candidate on one batch of rounds.
+
+  Args:
+    task: (GameConfig, int, int, int, float, [Candidate]), game config,
+        seed, number of rounds, rounds per session, bankroll and candidates.
+
+  Returns:
+    [CandidateStats], stats per candidate.
+  """
+  config, seed, num_rounds, session_rounds, bankroll, candidates = task
+  families = NewFamilies(config.rules)
+  strategies = [families[candidate.family].Build(candidate.params)
+                for candidate in candidates]
+  keys, results = population.RecordRounds(
+      config, seed, num_rounds,
+      sorted(set([variant.signal for variant in strategies])))
+
+  all_stats = []
+  for variant in strategies:
+    signal_keys = keys[variant.signal]
+    bets = dict((key, variant.BetForSignal(key)[0])
+                for key in set(signal_keys))
+    total = total_squared = total_bet = 0.0
+    num_sessions = num_ruined = 0
+    balance = 0.0
+    ruined = False
+    for index, (key, result) in enumerate(zip(signal_keys, results)):
+      if index % session_rounds == 0:
+        num_sessions += 1
+        balance = 0.0
+        ruined = False
+      bet = bets[key]
+      won = bet * result
+      total += won
+      total_squared += won * won
+      total_bet += bet
+      balance += won
+      if not ruined and balance <= -bankroll:
+        ruined = True
+        num_ruined += 1
+    all_stats.append(CandidateStats(len(results), total, total_squared,
+                                    total_bet, num_sessions, num_ruined))
+  return all_stats
+
+
+class EvolutionarySearch(object):
+  """Generational search with elitism and tournament selection."""
+
+  def __init__(self, config=simulation.DEFAULT_GAME_CONFIG,
+               objective='ev_per_risk', population_size=40, num_elites=4,
+               num_rounds=20000, session_rounds=1000, bankroll=100,
+               mutation_rate=0.8, families=None, num_workers=None,
+               num_batches=None, checkpoint_file=None, seed=0):
+    """Constructor.
+
+    Args:
+      config: simulation.GameConfig, game to simulate.
+      objective: str, see Fitness.
+      population_size: int, candidates per generation.
+      num_elites: int, best candidates carried over unchanged.
+      num_rounds: int, rounds every candidate is priced on per generation.
+      session_rounds: int, rounds per session for the risk of ruin.
+      bankroll: float, money units a session may lose before it is ruined.
+      mutation_rate: float, probability a child is mutated.
+      families: [str], names of the families to search. None searches all.
+      num_workers: int, worker processes. None uses one per cpu.
+      num_batches: int, batches the rounds are split over. None uses one
+          per worker.
+      checkpoint_file: str, pickle file the search state is saved to and
+          resumed from.
+      seed: int, seed of the search and of the simulated shoes.
+    """
+    self.config = config
+    self.objective = objective
+    self.population_size = population_size
+    self.num_elites = num_elites
+    self.num_rounds = num_rounds
+    self.session_rounds = session_rounds
+    self.bankroll = bankroll
+    self.mutation_rate = mutation_rate
+    self.num_workers = num_workers
+    if num_batches is None:
+      num_batches = num_workers or simulation.multiprocessing.cpu_count()
+    self.num_batches = num_batches
+    self.checkpoint_file = checkpoint_file
+    self.seed = seed
+
+    self.families = NewFamilies(config.rules)
+    if families is not None:
+      unknown = set(families) - set(self.families)
+      if unknown:
+        raise EvolveException('Unknown families: %s' % sorted(unknown))
+      self.families = dict((name, self.families[name]) for name in families)
+
+    self.rng = random.Random(seed)
+    self.generation = 0
+    self.candidates = [self._RandomCandidate()
+                       for _ in xrange(population_size)]
+    # (generation, Candidate, CandidateStats) of the best candidate.
+    self.history = []
+
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+      self._LoadCheckpoint()
+
+  def _RandomCandidate(self):
+    family = self.rng.choice(sorted(self.families))
+    return Candidate(family, self.families[family].Random(self.rng))
+
+  def Evaluate(self, candidates, generation):
+    """Price candidates on the rounds of a generation.
+
+    Args:
+      candidates: [Candidate], candidates to price.
+      generation: int, generation whose shoes are used.
+
+    Returns:
+      [CandidateStats], stats per candidate.
+    """
+    # Every candidate of a generation sees the same shoes.
+    first_seed = self.seed + generation * self.num_batches
+    tasks = [(self.config, first_seed + index, batch_rounds,
+              self.session_rounds, self.bankroll, candidates)
+             for index, batch_rounds in enumerate(
+                 simulation.SplitRounds(self.num_rounds, self.num_batches))]
+    merged = None
+    for batch_stats in simulation.RunTasks(FitnessTask, tasks,
+                                           self.num_workers):
+      if merged is None:
+        merged = batch_stats
+      else:
+        merged = [mine.Merge(theirs)
+                  for mine, theirs in zip(merged, batch_stats)]
+    return merged
+
+  def Step(self):
+    """Evaluate the current generation and breed the next one.
+
+    Returns:
+      (Candidate, CandidateStats), best candidate of the generation.
+    """
+    candidate_stats = self.Evaluate(self.candidates, self.generation)
+    fitness = [Fitness(stat, self.objective) for stat in candidate_stats]
+    ranked = sorted(xrange(len(self.candidates)),
+                    key=lambda index: fitness[index], reverse=True)
+    best = ranked[0]
+    self.history.append((self.generation, self.candidates[best],
+                         candidate_stats[best]))
+
+    next_candidates = [self.candidates[index]
+                       for index in ranked[:self.num_elites]]
+    while len(next_candidates) < self.population_size:
+      first = self._Tournament(fitness)
+      second = self._Tournament(fitness)
+      if first.family == second.family and first.params != second.params:
+        params = self.families[first.family].Crossover(
+            first.params, second.params, self.rng)
+      else:
+        params = first.params
+      if self.rng.random() < self.mutation_rate:
+        params = self.families[first.family].Mutate(params, self.rng)
+      next_candidates.append(Candidate(first.family, params))
+
+    self.candidates = next_candidates
+    self.generation += 1
+    if self.checkpoint_file is not None:
+      self._SaveCheckpoint()
+    return self.history[-1][1:]
+
+  def Run(self, num_generations):
+    """Run generations until num_generations have been evaluated in total.
+
+    Returns:
+      [(int, Candidate, CandidateStats)], best candidate per generation.
+    """
+    while self.generation < num_generations:
+      self.Step()
+    return self.history
+
+  def _Tournament(self, fitness, size=3):
+    """Returns the fittest of a few randomly drawn candidates."""
+    entrants = [self.rng.randrange(len(self.candidates))
+                for _ in xrange(size)]
+    return self.candidates[max(entrants, key=lambda index: fitness[index])]
+
+  def _SaveCheckpoint(self):
+    state = {
+        'generation': self.generation,
+        'candidates': self.candidates,
+        'history': self.history,
+        'rng': self.rng.getstate(),
+    }
+    # Write then rename so an interrupted save keeps the last checkpoint.
+    temp_file = self.checkpoint_file + '.tmp'
+    with open(temp_file, 'wb') as checkpoint:
+      cPickle.dump(state, checkpoint, cPickle.HIGHEST_PROTOCOL)
+    os.rename(temp_file, self.checkpoint_file)
+
+  def _LoadCheckpoint(self):
+    with open(self.checkpoint_file, 'rb') as checkpoint:
+      state = cPickle.load(checkpoint)
+    self.generation = state['generation']
+    self.candidates = state['candidates']
+    self.history = state['history']
+    self.rng.setstate(state['rng'])
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--generations', type=int, default=20,
+                      help='Number of generations.')
+  parser.add_argument('--population', type=int, default=40,
+                      help='Candidates per generation.')
+  parser.add_argument('--num-rounds', type=int, default=20000,
+                      help='Rounds each candidate is priced on per generation.')
+  parser.add_argument('--objective', type=str, default='ev_per_risk',
+                      choices=['ev_per_risk', 'risk_of_ruin'],
+                      help='What to maximize.')
+  parser.add_argument('--bankroll', type=float, default=100,
+                      help='Money units per session for the risk of ruin.')
+  parser.add_argument('--session-rounds', type=int, default=1000,
+                      help='Rounds per session for the risk of ruin.')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--checkpoint', type=str, default=None,
+                      help='Checkpoint file to save to and resume from.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the search.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  search = EvolutionarySearch(
+      objective=args.objective, population_size=args.population,
+      num_rounds=args.num_rounds, session_rounds=args.session_rounds,
+      bankroll=args.bankroll, num_workers=args.workers,
+      checkpoint_file=args.checkpoint, seed=args.seed)
+  while search.generation < args.generations:
+    candidate, candidate_stats = search.Step()
+    print 'Generation %d: %s %s rate %.4f stdev %.3f ruin %.3f' % (
+        search.generation - 1, candidate.family, candidate.params,
+        candidate_stats.Rate(), candidate_stats.Stdev(),
+        candidate_stats.RiskOfRuin())
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,46 @@
+import evolve
+import os
+import population
+import shutil
+import tempfile
+import unittest
+
+
+class EvolveTest(unittest.TestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def NewSearch(self, checkpoint_file=None):
+    return evolve.EvolutionarySearch(
+        population_size=6, num_elites=2, num_rounds=300, session_rounds=100,
+        num_workers=1, num_batches=2, checkpoint_file=checkpoint_file, seed=3)
+
+  def test_candidates_share_rounds(self):
+    search = self.NewSearch()
+    candidates = search.candidates + search.candidates[:1]
+    candidate_stats = search.Evaluate(candidates, 0)
+    self.assertEqual(candidate_stats[0], candidate_stats[-1])
+
+    # Same money as the single pass population over the same rounds.
+    variants = population.Population(
+        [search.families[candidate.family].Build(candidate.params)
+         for candidate in candidates])
+    variants.Play(300, num_workers=1, num_batches=2, seed=3)
+    for stat, result in zip(candidate_stats, variants.Results()):
+      self.assertAlmostEqual(stat.total, result.money_units)
+
+  def test_resume_from_checkpoint(self):
+    checkpoint_file = os.path.join(self.temp_dir, 'search.pkl')
+    uninterrupted = self.NewSearch().Run(3)
+
+    self.NewSearch(checkpoint_file).Run(2)
+    resumed = self.NewSearch(checkpoint_file)
+    self.assertEqual(resumed.generation, 2)
+    self.assertEqual(resumed.Run(3), uninterrupted)
+
+
+if __name__ == '__main__':
+  unittest.main()
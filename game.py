@@ -2,9 +2,14 @@
 
 Select number of players and number of decks then PlayRounds or PlayShoes.
 """
+import random
 
+import card
+import control_variate
+import events
 import hand
 import shoe
+import side_bet
 import strategy
 import table_rules
 import stats
@@ -61,12 +66,21 @@ class Game(object):
   """Blackjack."""
 
   def __init__(self, num_players=5,
-               rules=table_rules.DEFAULT_TABLE_RULES):
+               rules=table_rules.DEFAULT_TABLE_RULES,
+               player_strategy=None, shuffle_model=None, rng=random,
+               suited=False):
     """Constructor.
 
     Args:
       num_players: int, total number of players at the table. Excludes Dealer.
       rules: table_rules.TableRules, table rules.
+      player_strategy: play_strategy.PlayStrategy, how the player plays hands.
+          Defaults to the strategy matching the table rules.
+      shuffle_model: shuffle.ShuffleModel, how the dealer shuffles between
+          shoes. None shuffles perfectly at random.
+      rng: random.Random, source of randomness for the shoe.
+      suited: bool, deal from a side_bet.SuitedShoe so wallets can place
+          suit dependent side bets.
     """
     # Rules and strategy
     self.table_rules = rules
@@ -78,15 +92,40 @@ class Game(object):
     self.num_players = num_players
 
     # TODO(self): Support multiple play strategies.
-    self.play_strategy = play_strategy.PlayStrategy(self.table_rules)
+    if player_strategy is None:
+      player_strategy = play_strategy.PlayStrategy(self.table_rules)
+    self.play_strategy = player_strategy
+
+    # Observers of the cards and actions, shared by the shoe and people.
+    self.events = events.EventBus()
 
     # Initialize people.
-    self.dealer = person.Dealer(self.table_rules)
-    self.player = person.Player(self.table_rules, self.play_strategy)
+    self.dealer = person.Dealer(self.table_rules, event_bus=self.events)
+    self.player = person.Player(self.table_rules, self.play_strategy,
+                                event_bus=self.events)
 
     # Initializing game parameters.
     self.game_stats = stats.GameStats()
-    self.shoe = shoe.Shoe(self.table_rules.num_decks)
+    self.suited = suited
+    shoe_class = side_bet.SuitedShoe if suited else shoe.Shoe
+    self.shoe = shoe_class(self.table_rules.num_decks,
+                           shuffle_model=shuffle_model, rng=rng,
+                           event_bus=self.events)
+
+    # Control variates for the wallet EVs, see EnableControlVariates.
+    self.control_variates = None
+
+    # Parameters for betting strategies, updated in place every round.
+    self.bet_kwargs = {'shoe': self.shoe, 'num_hands': 0}
+
+    # Identities of the players two cards and the dealers up card, kept for
+    # the side bets settled once a table without a hole card deals the
+    # dealers second card.
+    self.up_card_identities = None
+
+    # The rules resolved once into the steps of a round.
+    self.surrender_hands = play_strategy.SurrenderHands(self.table_rules)
+    self.round_steps = self._BuildRoundSteps()
 
   def AddPlayerWallet(self, new_wallet):
     """Add wallet to player.
@@ -99,6 +138,16 @@ class Game(object):
     """
     self.player.AddWallet(new_wallet)
 
+  def EnableControlVariates(self):
+    """Estimate the wallet EVs with control variates from now on.
+
+    Returns:
+      control_variate.ControlVariates, the collected estimates.
+    """
+    if self.control_variates is None:
+      self.control_variates = control_variate.ControlVariates(self)
+    return self.control_variates
+
   def Reset(self):
     """Reset everything."""
     self.player.Reset()
@@ -175,6 +224,10 @@ class Game(object):
       self.player.wallets[wallet_name].PrintStats(self.game_stats)
     print '=========================='
 
+    if self.control_variates is not None:
+      print ''
+      self.control_variates.PrintStats()
+
   def PlayRounds(self, num_hands, reset=False):
     """Play some rounds.
 
@@ -215,6 +268,53 @@ class Game(object):
     self.game_stats.num_shoes += 1
     self.shoe.Reset()
 
+  def _BuildRoundSteps(self):
+    """Resolve the table rules into the steps of a round, per up card.
+
+    A round deals the player two cards and the dealer an up card, then runs
+    the steps of the up card in order until one ends the round. Rules which
+    are off add no step, so they cost nothing per round.
+
+    Returns:
+      {int: (callable)}, steps per up card value. Each step takes the player
+          and dealer hands and returns True if it ended the round.
+
+    Raises:
+      GameException: Unknown peek or surrender rule.
+    """
+    rules = self.table_rules
+    if rules.dealer_peek not in table_rules.PEEK_UP_CARD_VALUES:
+      raise GameException('Unknown dealer peek rule: %s' % rules.dealer_peek)
+    if rules.surrender not in table_rules.SURRENDERS:
+      raise GameException('Unknown surrender rule: %s' % rules.surrender)
+    peeked_values = table_rules.PEEK_UP_CARD_VALUES[rules.dealer_peek]
+
+    round_steps = {}
+    for up_card in card.RANKS:
+      steps = []
+      if up_card == card.ACE:
+        steps.append(self._OfferInsurance)
+      if rules.dealer_peek == table_rules.NO_HOLE_CARD:
+        steps.append(self._SettleSideBetsWithoutHoleCard)
+      else:
+        steps.extend([self._DealHoleCard, self._SettleSideBets])
+      # Side bets are settled first; the hole card stays face down.
+      if rules.surrender == table_rules.EARLY_SURRENDER:
+        steps.append(self._Surrender)
+      if up_card.value in peeked_values:
+        steps.append(self._Peek)
+      steps.append(self._BurnOthers)
+      if rules.surrender == table_rules.LATE_SURRENDER:
+        steps.append(self._Surrender)
+      if up_card.value in peeked_values or up_card not in (card.ACE,
+                                                           card.FACE):
+        steps.extend([self._PayBlackjack, self._PlayHands])
+      else:
+        # The dealer may still turn out to have blackjack.
+        steps.extend([self._PayBlackjackUnchecked, self._PlayHandsUnchecked])
+      round_steps[up_card.value] = tuple(steps)
+    return round_steps
+
   def PlayRound(self):
     """Play a round."""
     # Shoe is finished. Round over.
@@ -230,49 +330,157 @@ class Game(object):
     player_hand = hand.Hand()
 
     # Pack parameters for betting strategies.
-    kwargs = {}
-    kwargs['shoe'] = self.shoe
-    kwargs['num_hands'] = self.game_stats.num_hands
-    self.player.PlaceBets(player_hand, **kwargs)
+    self.bet_kwargs['num_hands'] = self.game_stats.num_hands
+    self.player.PlaceBets(player_hand, self.bet_kwargs)
 
     # Get player hand
     player_hand.AddCards(self.shoe.GetCards(2))
 
     # Get dealer top card. This dictates how the player will play their hand.
     dealer_top_card = self.shoe.GetCard()
-    dealer_hand = hand.Hand([dealer_top_card, self.shoe.GetCard()])
+    dealer_hand = hand.Hand([dealer_top_card])
 
     # Increase stats.
     self.game_stats.num_hands += 1
 
-    # Check for auto-loss dealer blackjack. Insurance is for suckers.
+    for step in self.round_steps[dealer_top_card.value]:
+      if step(player_hand, dealer_hand):
+        return
+
+  def _OfferInsurance(self, player_hand, dealer_hand):
+    self.player.OfferInsurance(player_hand, self.shoe)
+
+  def _DealHoleCard(self, player_hand, dealer_hand):
+    dealer_hand.AddCard(self.shoe.GetCard())
+
+  def _SettleSideBets(self, player_hand, dealer_hand):
+    """Side bets are settled on the first four cards."""
+    if player_hand.side_bets:
+      identities = None
+      if self.suited:
+        identities = self.shoe.GetLastIdentities(4)
+      self.player.SettleSideBets(player_hand, dealer_hand, identities)
+      player_hand.side_bets = []
+
+  def _SettleSideBetsWithoutHoleCard(self, player_hand, dealer_hand):
+    """Settle the side bets on the first three cards.
+
+    The side bets reading the dealers second card stay on the hand until it
+    is dealt, see _SettleHoleCardSideBets.
+    """
+    if player_hand.side_bets:
+      identities = None
+      if self.suited:
+        identities = self.shoe.GetLastIdentities(3)
+      self.up_card_identities = identities
+      pending = [placed for placed in player_hand.side_bets
+                 if placed[0].hole_card]
+      player_hand.side_bets = [placed for placed in player_hand.side_bets
+                               if not placed[0].hole_card]
+      self.player.SettleSideBets(player_hand, dealer_hand, identities)
+      player_hand.side_bets = pending
+
+  def _SettleHoleCardSideBets(self, player_hand, dealer_hand):
+    """Settle the side bets left on the hand on the dealers first two cards.
+
+    Only tables without a hole card leave side bets until the dealer has
+    drawn. A dealer who did not draw has no second card for them.
+    """
+    if player_hand.side_bets:
+      identities = None
+      if self.suited:
+        identities = self.up_card_identities
+        num_drawn = len(dealer_hand.cards) - 1
+        if num_drawn:
+          # Every card the dealer drew after the up card is still last out.
+          identities += self.shoe.GetLastIdentities(num_drawn)[:1]
+      self.player.SettleSideBets(
+          player_hand, hand.Hand(dealer_hand.cards[:2]), identities)
+      player_hand.side_bets = []
+
+  def _Peek(self, player_hand, dealer_hand):
+    """Check for auto-loss dealer blackjack. Insurance is a side bet."""
     if dealer_hand.IsBlackjack():
       if player_hand.IsBlackjack():
         self.player.Tie(player_hand)
         self.dealer.Tie(dealer_hand)
+        self._Settle(player_hand, dealer_hand, events.TIE)
       else:
         self.player.Loss()
         self.dealer.Win(dealer_hand)
-      return
+        self._Settle(player_hand, dealer_hand, events.LOSS)
+      return True
 
+  def _BurnOthers(self, player_hand, dealer_hand):
     # Burn cards representing average num cards in blackjack hand.
     # TODO(self): Could keep track of everyone.
     self.shoe.BurnCards(1 * (self.num_players - 1))
 
+  def _Surrender(self, player_hand, dealer_hand):
+    """Give up half the bet on the hands basic strategy surrenders."""
+    if ((player_hand.GetValue(), dealer_hand.cards[0].value) in
+        self.surrender_hands and not player_hand.IsSoft()):
+      handler = self.events.action_taken
+      if handler is not None:
+        handler(player_hand, play_strategy.Action.SURRENDER)
+      if player_hand.side_bets:
+        # Without a hole card the dealer still draws for the side bets.
+        dealer_hand.AddCard(self.shoe.GetCard())
+        self._SettleHoleCardSideBets(player_hand, dealer_hand)
+      self.player.Surrender(player_hand)
+      self.dealer.Win(dealer_hand)
+      self._Settle(player_hand, dealer_hand, events.SURRENDER)
+      return True
+
+  def _PayBlackjack(self, player_hand, dealer_hand):
     # Player blackjack. Pay me.
     if player_hand.IsBlackjack():
+      self._SettleHoleCardSideBets(player_hand, dealer_hand)
       self.player.Win(player_hand)
-      return
+      self._Settle(player_hand, dealer_hand, events.WIN)
+      return True
+
+  def _PayBlackjackUnchecked(self, player_hand, dealer_hand):
+    """Player blackjack against a dealer who has not looked for one."""
+    if player_hand.IsBlackjack():
+      if len(dealer_hand.cards) == 1:
+        dealer_hand.AddCard(self.shoe.GetCard())
+      self._SettleHoleCardSideBets(player_hand, dealer_hand)
+      if dealer_hand.IsBlackjack():
+        self.player.Tie(player_hand)
+        self.dealer.Tie(dealer_hand)
+        self._Settle(player_hand, dealer_hand, events.TIE)
+      else:
+        self.player.Win(player_hand)
+        self._Settle(player_hand, dealer_hand, events.WIN)
+      return True
 
+  def _PlayHands(self, player_hand, dealer_hand):
     # Play player hand(s). Player may end up having multiple hands as a result
     # of split(s).
-    player_hands = self.player.Play(self.shoe, player_hand, dealer_top_card)
+    player_hands = self.player.Play(self.shoe, player_hand, dealer_hand.cards[0])
     # TODO(self): Dealer may not need to depending on what players have.
     self.dealer.Play(self.shoe, dealer_hand)
+    self._SettleHoleCardSideBets(player_hand, dealer_hand)
 
     for player_hand in player_hands:
       self._ProcessOutcome(player_hand, dealer_hand)
 
+  def _PlayHandsUnchecked(self, player_hand, dealer_hand):
+    """Play the hands, then a dealer blackjack takes every bet."""
+    player_hands = self.player.Play(self.shoe, player_hand, dealer_hand.cards[0])
+    self.dealer.Play(self.shoe, dealer_hand)
+    self._SettleHoleCardSideBets(player_hand, dealer_hand)
+
+    if not dealer_hand.IsBlackjack():
+      for player_hand in player_hands:
+        self._ProcessOutcome(player_hand, dealer_hand)
+      return
+    for player_hand in player_hands:
+      self.player.Loss()
+      self.dealer.Win(dealer_hand)
+      self._Settle(player_hand, dealer_hand, events.LOSS)
+
   def _ProcessOutcome(self, player_hand, dealer_hand):
     """Process outcome of hand and update players.
     
@@ -283,24 +491,44 @@ class Game(object):
     # If this is one of your split hands and you got blackjack.
     if player_hand.IsBlackjack():
       self.player.Win(player_hand)
+      outcome = events.WIN
 
     # If you bust you lose.
     elif not player_hand.IsActive():
       self.player.Loss()
       self.dealer.Win(dealer_hand)
+      outcome = events.LOSS
 
     # If we good and dealer busts.
     elif not dealer_hand.IsActive():
       self.player.Win(player_hand)
       self.dealer.Loss()
+      outcome = events.WIN
 
     # We are both active, let's compare cards.
     elif player_hand.GetValue() == dealer_hand.GetValue():
       self.player.Tie(player_hand)
       self.dealer.Tie(dealer_hand)
+      outcome = events.TIE
     elif player_hand.GetValue() > dealer_hand.GetValue():
       self.player.Win(player_hand)
       self.dealer.Loss()
+      outcome = events.WIN
     else:
       self.player.Loss()
       self.dealer.Win(dealer_hand)
+      outcome = events.LOSS
+
+    self._Settle(player_hand, dealer_hand, outcome)
+
+  def _Settle(self, player_hand, dealer_hand, outcome):
+    """Tell settlement listeners how a player hand ended.
+
+    Args:
+      player_hand: Hand, players hand.
+      dealer_hand: Hand, dealer hand.
+      outcome: str, events.WIN, events.LOSS or events.TIE.
+    """
+    handler = self.events.settlement
+    if handler is not None:
+      handler(player_hand, dealer_hand, outcome)
@@ -0,0 +1,120 @@
+import card
+import game
+import random
+import shoe
+import side_bet
+import simulation
+import strategy
+import table_array
+import table_rules
+import unittest
+import wallet
+
+
+def StackedGame(rules, cards, **kwargs):
+  """Returns a one player game about to deal cards in order."""
+  blackjack_game = game.Game(num_players=1, rules=rules, rng=random.Random(0),
+                             **kwargs)
+  blackjack_game.player.ClearWallets()
+  blackjack_game.AddPlayerWallet(
+      wallet.Wallet('flat', strategy.StrategyTableMinimum(1)))
+  blackjack_game.shoe.cards.extend(reversed(cards))
+  return blackjack_game
+
+
+class GameRulesTest(unittest.TestCase):
+  def setUp(self):
+    self.rules = table_rules.DEFAULT_TABLE_RULES
+
+  def Play(self, rules, cards):
+    """Returns the units won by a round and the cards it dealt."""
+    blackjack_game = StackedGame(rules, cards)
+    num_cards = len(blackjack_game.shoe.cards)
+    blackjack_game.PlayRound()
+    return (blackjack_game.player.wallets['flat'].money_units,
+            num_cards - len(blackjack_game.shoe.cards))
+
+  def test_default_rules_skip_peek_off_ace_and_ten(self):
+    steps = game.Game(rules=self.rules).round_steps
+    self.assertIn(game.Game._Peek.__func__,
+                  [step.__func__ for step in steps[card.ACE.value]])
+    self.assertNotIn(game.Game._Peek.__func__,
+                     [step.__func__ for step in steps[card.SIX.value]])
+    self.assertEqual(len(steps), len(card.RANKS))
+
+  def test_late_surrender(self):
+    cards = [card.FACE, card.SIX, card.FACE, card.NINE, card.FACE]
+    self.assertEqual(self.Play(self.rules, cards), (-1, 5))
+    rules = self.rules._replace(surrender=table_rules.LATE_SURRENDER)
+    self.assertEqual(self.Play(rules, cards), (-0.5, 4))
+
+  def test_early_surrender(self):
+    # The dealer has blackjack under the ace; early surrender still saves
+    # half the bet.
+    cards = [card.FACE, card.SIX, card.ACE, card.FACE]
+    rules = self.rules._replace(surrender=table_rules.LATE_SURRENDER)
+    self.assertEqual(self.Play(rules, cards), (-1, 4))
+    rules = self.rules._replace(surrender=table_rules.EARLY_SURRENDER)
+    self.assertEqual(self.Play(rules, cards), (-0.5, 4))
+
+  def test_unpeeked_blackjack_takes_doubles(self):
+    # 11 doubles against a ten; the dealer has an ace underneath.
+    cards = [card.FIVE, card.SIX, card.FACE, card.ACE, card.NINE]
+    self.assertEqual(self.Play(self.rules, cards), (-1, 4))
+    rules = self.rules._replace(dealer_peek=table_rules.PEEK_ACE)
+    self.assertEqual(self.Play(rules, cards), (-2, 5))
+
+  def test_no_hole_card(self):
+    rules = self.rules._replace(dealer_peek=table_rules.NO_HOLE_CARD)
+    cards = [card.FIVE, card.SIX, card.FACE, card.NINE, card.ACE]
+    self.assertEqual(self.Play(rules, cards), (-2, 5))
+    cards = [card.ACE, card.FACE, card.FACE, card.ACE]
+    self.assertEqual(self.Play(rules, cards), (0, 4))
+    cards = [card.ACE, card.FACE, card.FACE, card.NINE]
+    self.assertEqual(self.Play(rules, cards), (1.5, 4))
+
+  def test_no_hole_card_side_bets(self):
+    rules = self.rules._replace(dealer_peek=table_rules.NO_HOLE_CARD)
+    pairs = side_bet.PerfectPairs()
+    insurance = side_bet.Insurance()
+    for side in (pairs, insurance):
+      side.Ev = lambda current_shoe: 1.0
+    blackjack_game = StackedGame(rules, [], suited=True)
+    flat = blackjack_game.player.wallets['flat']
+    flat.side_bets = [pairs, insurance]
+    # Eights of spades and hearts against an ace; the player hits to 21 and
+    # the dealer draws a blackjack.
+    identities = [card.Identity(7, card.SPADES), card.Identity(7, card.HEARTS),
+                  card.Identity(0, card.SPADES), card.Identity(4, card.CLUBS),
+                  card.Identity(12, card.CLUBS)]
+    suited_shoe = blackjack_game.shoe
+    suited_shoe.identities.extend(reversed(identities))
+    suited_shoe.cards.extend(card.SUITED_CARDS[identity]
+                             for identity in reversed(identities))
+    blackjack_game.PlayRound()
+    # Main bet -1, insurance on half the bet +1, a mixed pair +6.
+    self.assertEqual(flat.money_units, 6)
+    self.assertEqual(flat.side_bet_record,
+                     {pairs.name: [1, pairs.MIXED],
+                      insurance.name: [1, 1.0]})
+
+  def test_six_to_five(self):
+    rules = self.rules._replace(
+        blackjack_win_multiplier=table_rules.BLACKJACK_PAYS_6_TO_5)
+    cards = [card.ACE, card.FACE, card.NINE, card.SEVEN]
+    won, _ = self.Play(rules, cards)
+    self.assertAlmostEqual(won, 1.2)
+
+  def test_unknown_rules(self):
+    self.assertRaises(game.GameException, game.Game,
+                      rules=self.rules._replace(surrender='sometimes'))
+    self.assertRaises(game.GameException, game.Game,
+                      rules=self.rules._replace(dealer_peek='never'))
+    config = simulation.DEFAULT_GAME_CONFIG._replace(
+        rules=self.rules._replace(surrender=table_rules.EARLY_SURRENDER))
+    self.assertRaises(table_array.TableArrayException,
+                      table_array.TableArray, config)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -29,6 +29,8 @@ class Hand(object):
     else:
       self.cards = cards
     self.bets = []
+    # [(side_bet.SideBet, wallet.Bet)] placed on the hand.
+    self.side_bets = []
 
   def AddBet(self, bet):
     """Add bet to hand.
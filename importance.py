@@ -0,0 +1,314 @@
+""" Importance sampling of rich shoes.
+
+Uniformly shuffled shoes rarely reach high true counts, so the EV of a bet
+at +5 and above converges slowly. A TiltedShoe deals its cards one rank at
+a time with every remaining card weighted by exp(tilt * tag): a positive
+tilt brings low cards out early and leaves the rest of the shoe rich.
+
+Each drawn card multiplies the likelihood ratio of the deal by
+
+  P(rank under a uniform shuffle) / P(rank under the tilted draw)
+    = (sum of remaining card weights) / (remaining cards * exp(tilt * tag)).
+
+The ratio of the cards dealt up to the end of a round is that round's
+weight. Its expectation is one, so weighted results stay unbiased for
+uniform shuffles. Per bucket of the shoe signal at bet time the EV is the
+self normalized estimate sum(w * x) / sum(w), and the effective sample size
+(sum w) ** 2 / sum(w ** 2) tells how many uniform rounds it is worth.
+"""
+import argparse
+import math
+import random
+
+import card
+import count
+import shoe
+import simulation
+import strategy
+import wallet
+
+
+class ImportanceException(Exception):
+  """Base exception."""
+
+
+class TiltedShoe(shoe.Shoe):
+  """A shoe shuffled towards a running count, remembering the odds it took.
+
+  self.log_weights[k] is the log likelihood ratio of the first k cards dealt
+  since the last shuffle.
+  """
+
+  def __init__(self, num_decks, tilt, tags=count.HI_LO, rng=random,
+               event_bus=None):
+    """Constructor.
+
+    Args:
+      num_decks: int, number of decks in the shoe.
+      tilt: float, 0 shuffles uniformly, positive values deal the cards with
+          positive tags early.
+      tags: {Card: int}, counting system the tilt follows.
+      rng: random.Random, source of randomness.
+      event_bus: events.EventBus, see shoe.Shoe.
+    """
+    self.tilt = tilt
+    self.tags = tags
+    self.log_weights = [0.0]
+    super(TiltedShoe, self).__init__(num_decks, rng=rng, event_bus=event_bus)
+
+  def _Shuffle(self):
+    """Deal the shoe rank by rank from the tilted distribution."""
+    ranks = card.RANKS
+    remaining = [self.cards.count(rank) for rank in ranks]
+    factors = [math.exp(self.tilt * self.tags[rank]) for rank in ranks]
+    # Log of the tilt part of each ranks likelihood ratio term.
+    log_factors = [-self.tilt * self.tags[rank] for rank in ranks]
+    total_weight = sum(num * factor
+                       for num, factor in zip(remaining, factors))
+    last = len(ranks) - 1
+    random_value = self.rng.random
+
+    dealt = []
+    log_weight = 0.0
+    log_weights = [log_weight]
+    for num_left in xrange(len(self.cards), 0, -1):
+      target = random_value() * total_weight
+      index = 0
+      while index < last and target >= remaining[index] * factors[index]:
+        target -= remaining[index] * factors[index]
+        index += 1
+      # Rounding may run past the last rank still in the shoe.
+      while not remaining[index]:
+        index -= 1
+
+      log_weight += math.log(total_weight / num_left) + log_factors[index]
+      log_weights.append(log_weight)
+      dealt.append(ranks[index])
+      remaining[index] -= 1
+      total_weight -= factors[index]
+
+    # The shoe deals from the end of the list.
+    dealt.reverse()
+    self.cards = dealt
+    self.log_weights = log_weights
+
+  def Weight(self):
+    """Returns the likelihood ratio of the cards dealt since the shuffle."""
+    return math.exp(self.log_weights[self.GetNumCardsPlayed()])
+
+
+class WeightedHistogram(object):
+  """Weighted result sums per bucket, merged by addition."""
+
+  def __init__(self):
+    self.num_rounds = {}
+    # Per bucket sums of w, w ** 2, w * x, w * x ** 2, w ** 2 * x and
+    # w ** 2 * x ** 2.
+    self.sums = {}
+
+  def Add(self, bucket, result, weight=1.0):
+    """Record the result of a round.
+
+    Args:
+      bucket: int or float, bucket the bet was placed in.
+      result: float, money units won per unit bet.
+      weight: float, likelihood ratio of the round.
+    """
+    weight_squared = weight * weight
+    terms = (weight, weight_squared, weight * result,
+             weight * result * result, weight_squared * result,
+             weight_squared * result * result)
+    if bucket in self.num_rounds:
+      self.num_rounds[bucket] += 1
+      self.sums[bucket] = [total + term for total, term in
+                           zip(self.sums[bucket], terms)]
+    else:
+      self.num_rounds[bucket] = 1
+      self.sums[bucket] = list(terms)
+
+  def Merge(self, other):
+    """Add the rounds of another histogram to this one.
+
+    Args:
+      other: WeightedHistogram, histogram to merge in.
+    """
+    for bucket, num_rounds in other.num_rounds.iteritems():
+      if bucket in self.num_rounds:
+        self.num_rounds[bucket] += num_rounds
+        self.sums[bucket] = [mine + theirs for mine, theirs in
+                             zip(self.sums[bucket], other.sums[bucket])]
+      else:
+        self.num_rounds[bucket] = num_rounds
+        self.sums[bucket] = list(other.sums[bucket])
+
+  def Frequency(self, bucket):
+    """Returns the estimated fraction of uniform rounds in the bucket."""
+    return self.sums[bucket][0] / sum(self.num_rounds.itervalues())
+
+  def Mean(self, bucket):
+    """Returns the self normalized mean result of the bucket."""
+    weight, _, weighted, _, _, _ = self.sums[bucket]
+    return weighted / weight
+
+  def Variance(self, bucket):
+    """Returns the weighted variance of the results of the bucket."""
+    weight, _, _, weighted_squared, _, _ = self.sums[bucket]
+    mean = self.Mean(bucket)
+    return max(weighted_squared / weight - mean * mean, 0.0)
+
+  def StandardError(self, bucket):
+    """Returns the standard error of Mean, by the delta method."""
+    weight, weight_squared, _, _, squared_weighted, squared_weighted_squared = (
+        self.sums[bucket])
+    mean = self.Mean(bucket)
+    spread = (squared_weighted_squared - 2 * mean * squared_weighted +
+              mean * mean * weight_squared)
+    return math.sqrt(max(spread, 0.0)) / weight
+
+  def EffectiveSampleSize(self, bucket):
+    """Returns the number of uniform rounds the bucket is worth."""
+    weight, weight_squared = self.sums[bucket][:2]
+    return weight * weight / weight_squared
+
+
+class _ProbeStrategy(strategy.BettingStrategy):
+  """Bets one unit and remembers the bucket of the shoe at bet time."""
+
+  def __init__(self, bucket_name):
+    super(_ProbeStrategy, self).__init__()
+    self.bucket_function = strategy.BUCKET_FUNCTIONS[bucket_name]
+    self.bucket = None
+
+  def GetBetAmount(self, **kwargs):
+    self.bucket = self.bucket_function(kwargs['shoe'])
+    return 1
+
+
+def NewTiltedGame(config, seed, tilt, wallets=None):
+  """Build a game dealing from a TiltedShoe.
+
+  Args:
+    config: simulation.GameConfig, game to build.
+    seed: int, seed of the shoe.
+    tilt: float, see TiltedShoe.
+    wallets: [Wallet], see simulation.NewGame.
+
+  Returns:
+    game.Game, new game.
+  """
+  blackjack_game = simulation.NewGame(config, seed, wallets=wallets)
+  # Swap the shoe for a tilted one sharing the game's events.
+  blackjack_game.shoe = TiltedShoe(config.rules.num_decks, tilt,
+                                   rng=random.Random(seed),
+                                   event_bus=blackjack_game.events)
+  blackjack_game.bet_kwargs['shoe'] = blackjack_game.shoe
+  return blackjack_game
+
+
+def ImportanceTask(task):
+  """Worker entry point. Simulate weighted rounds into a histogram.
+
+  Args:
+    task: (GameConfig, int, int, str, float), game config, seed, number of
+        rounds, bucket name and tilt.
+
+  Returns:
+    WeightedHistogram, weighted results of the rounds.
+  """
+  config, seed, num_rounds, bucket_name, tilt = task
+  probe = _ProbeStrategy(bucket_name)
+  probe_wallet = wallet.Wallet('Probe', probe)
+  blackjack_game = NewTiltedGame(config, seed, tilt, wallets=[probe_wallet])
+  current_shoe = blackjack_game.shoe
+
+  histogram = WeightedHistogram()
+  for _ in xrange(num_rounds):
+    start = probe_wallet.money_units
+    simulation.PlayRound(blackjack_game)
+    histogram.Add(probe.bucket, probe_wallet.money_units - start,
+                  current_shoe.Weight())
+  return histogram
+
+
+def BuildHistogram(num_rounds, tilt, bucket_name='true_count',
+                   config=simulation.DEFAULT_GAME_CONFIG, num_workers=None,
+                   num_batches=None, seed=0):
+  """Simulate tilted rounds across workers and merge the histograms.
+
+  Args:
+    num_rounds: int, total number of rounds.
+    tilt: float, see TiltedShoe. 0 is plain Monte Carlo.
+    bucket_name: str, key of strategy.BUCKET_FUNCTIONS.
+    config: simulation.GameConfig, game to simulate.
+    num_workers: int, worker processes. None uses one per cpu.
+    num_batches: int, independent games the rounds are split over. None
+        uses one per worker. Results only depend on this and the seed.
+    seed: int, seed of the first batch; batch i uses seed + i.
+
+  Returns:
+    WeightedHistogram, weighted results of all rounds.
+
+  Raises:
+    ImportanceException: Unknown bucket.
+  """
+  if bucket_name not in strategy.BUCKET_FUNCTIONS:
+    raise ImportanceException('Unknown bucket: %s' % bucket_name)
+  if num_batches is None:
+    num_batches = num_workers or simulation.multiprocessing.cpu_count()
+
+  tasks = [(config, seed + index, batch_rounds, bucket_name, tilt)
+           for index, batch_rounds in enumerate(
+               simulation.SplitRounds(num_rounds, num_batches))]
+  histogram = WeightedHistogram()
+  for batch_histogram in simulation.RunTasks(ImportanceTask, tasks,
+                                             num_workers):
+    histogram.Merge(batch_histogram)
+  return histogram
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--num-rounds', type=int, default=200000,
+                      help='Number of rounds to simulate per run.')
+  parser.add_argument('--tilt', type=float, default=0.1,
+                      help='Tilt of the shuffle towards high counts.')
+  parser.add_argument('--bucket', type=str, default='true_count',
+                      choices=sorted(strategy.BUCKET_FUNCTIONS),
+                      help='Shoe signal the results are bucketed by.')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the first batch.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  runs = [('Uniform', BuildHistogram(args.num_rounds, 0.0, args.bucket,
+                                     num_workers=args.workers,
+                                     seed=args.seed)),
+          ('Tilted', BuildHistogram(args.num_rounds, args.tilt, args.bucket,
+                                    num_workers=args.workers,
+                                    seed=args.seed))]
+  buckets = sorted(set(bucket for _, histogram in runs
+                       for bucket in histogram.num_rounds))
+
+  print '%8s' % 'Bucket',
+  for name, _ in runs:
+    print '| %-8s %8s %8s %8s %8s' % (name, 'Rounds', 'ESS', 'EV', 'SE'),
+  print ''
+  for bucket in buckets:
+    print '%8s' % bucket,
+    for _, histogram in runs:
+      if bucket not in histogram.num_rounds:
+        print '| %-8s %8s %8s %8s %8s' % ('', '-', '-', '-', '-'),
+        continue
+      print '| %-8s %8d %8.0f %8.4f %8.4f' % (
+          '', histogram.num_rounds[bucket],
+          histogram.EffectiveSampleSize(bucket), histogram.Mean(bucket),
+          histogram.StandardError(bucket)),
+    print ''
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,67 @@
+import card
+import count
+import importance
+import math
+import random
+import unittest
+
+
+class TiltedShoeTest(unittest.TestCase):
+  def test_no_tilt_is_uniform(self):
+    tilted_shoe = importance.TiltedShoe(2, 0.0, rng=random.Random(1))
+    self.assertEqual([0.0] * len(tilted_shoe.log_weights),
+                     [round(w, 12) for w in tilted_shoe.log_weights])
+    self.assertEqual(1.0, round(tilted_shoe.Weight(), 12))
+
+  def test_first_card_ratio(self):
+    tilt = 0.5
+    tilted_shoe = importance.TiltedShoe(1, tilt, rng=random.Random(2))
+    first = tilted_shoe.discards[0]
+    total_weight = sum(4 * math.exp(tilt * count.HI_LO[rank])
+                       for rank in card.RANKS[:-1]) + 16 * math.exp(-tilt)
+    expected = math.log(total_weight / 52) - tilt * count.HI_LO[first]
+    self.assertAlmostEqual(expected, tilted_shoe.log_weights[1])
+
+  def test_weighted_deals_are_unbiased(self):
+    tilted_shoe = importance.TiltedShoe(1, 0.1, rng=random.Random(3))
+    num_shoes = 3000
+    total_weight = 0.0
+    low_cards = 0.0
+    for _ in xrange(num_shoes):
+      tilted_shoe.Reset()
+      weight = math.exp(tilted_shoe.log_weights[20])
+      total_weight += weight
+      # Burned cards first, then the rest of the shoe from the top.
+      dealt = tilted_shoe.discards + tilted_shoe.cards[::-1]
+      low_cards += weight * sum(1 for played in dealt[:20]
+                                if count.HI_LO[played] > 0)
+    self.assertAlmostEqual(1.0, total_weight / num_shoes, delta=0.05)
+    self.assertAlmostEqual(20 * 20.0 / 52, low_cards / num_shoes, delta=0.3)
+
+
+class WeightedHistogramTest(unittest.TestCase):
+  def test_unit_weights(self):
+    histogram = importance.WeightedHistogram()
+    other = importance.WeightedHistogram()
+    for result in (1, -1, 1.5, 0):
+      histogram.Add(3, result)
+    other.Add(3, -1)
+    other.Add(4, 2)
+    histogram.Merge(other)
+    self.assertEqual(5, histogram.num_rounds[3])
+    self.assertAlmostEqual(0.1, histogram.Mean(3))
+    self.assertAlmostEqual(5, histogram.EffectiveSampleSize(3))
+    self.assertAlmostEqual(math.sqrt(histogram.Variance(3) / 5),
+                           histogram.StandardError(3))
+    self.assertAlmostEqual(5.0 / 6, histogram.Frequency(3))
+
+  def test_weights_reweight(self):
+    histogram = importance.WeightedHistogram()
+    histogram.Add(0, 1.0, weight=3.0)
+    histogram.Add(0, -1.0, weight=1.0)
+    self.assertAlmostEqual(0.5, histogram.Mean(0))
+    self.assertAlmostEqual(16.0 / 10, histogram.EffectiveSampleSize(0))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,311 @@
+""" Index plays: true count dependent deviations from a play strategy.
+
+The engine prices each (hand, dealer up card) cell with the exact round EV
+calculator over shoe compositions at a range of true counts, and records the
+true count at which the best action stops being the strategy's action. At the
+table IndexPlayStrategy plays the base strategy, except for cells with an
+index, where a single comparison against the true count picks the deviation.
+
+Indices are expensive to compute and only depend on the rules, the counting
+system and the sampling parameters, so they are cached per rule set in memory
+and optionally on disk.
+"""
+import cPickle
+import os
+import random
+
+import card
+import count
+import play_strategy
+import round_ev
+import shoe
+
+
+class IndexPlayException(Exception):
+  """Base exception."""
+
+
+def _RepresentativeHands():
+  """Returns the two card hand, as rank indices, used to price each cell.
+
+  Returns:
+    {(bool, int): (int, int)}, hand per (is_soft, value).
+  """
+  hands = {}
+  for value in xrange(5, 21):
+    if value >= 12:
+      first, second = value - 10, 10
+    else:
+      first = max(2, value // 2 - 1)
+      second = value - first
+    hands[(False, value)] = (first - 1, second - 1)
+  for value in xrange(12, 21):
+    hands[(True, value)] = (round_ev.ACE_INDEX, value - 12)
+  return hands
+
+REPRESENTATIVE_HANDS = _RepresentativeHands()
+
+# Cards of each rank a composition keeps, enough to deal the hand and up card
+# of any cell.
+MIN_CARDS_PER_RANK = 3
+
+# Deviations only choose between these actions.
+CANDIDATE_ACTIONS = (play_strategy.Action.STAND, play_strategy.Action.HIT,
+                     play_strategy.Action.DOUBLE)
+
+# In memory cache of computed indices, by cache key.
+_INDEX_CACHE = {}
+
+
+class IndexPlayEngine(object):
+  """Computes the true count index of every decision cell."""
+
+  def __init__(self, rules, base_strategy, tags=count.HI_LO,
+               true_counts=range(-6, 7), samples_per_count=2,
+               depth_fraction=0.5, cells=None, rng=random):
+    """Constructor.
+
+    Args:
+      rules: table_rules.TableRules, rules at the table.
+      base_strategy: play_strategy.PlayStrategy, strategy being deviated from.
+      tags: {Card: int}, counting system.
+      true_counts: [int], true counts at which cells are priced.
+      samples_per_count: int, shoe compositions averaged per true count.
+      depth_fraction: float, fraction of the shoe dealt in each composition.
+      cells: [(bool, int, int)], (is_soft, value, dealer up value) cells to
+          price. None prices every cell.
+      rng: random.Random, source of randomness for the compositions.
+
+    Raises:
+      IndexPlayException: The shoe cannot be dealt to depth_fraction and keep
+          MIN_CARDS_PER_RANK cards of every rank.
+    """
+    self.table_rules = rules
+    self.base_strategy = base_strategy
+    self.tags = tags
+    self.true_counts = sorted(true_counts)
+    self.samples_per_count = samples_per_count
+    self.depth_fraction = depth_fraction
+    self.rng = rng
+    self.calculator = round_ev.RoundEvCalculator(rules, base_strategy)
+
+    num_cards = rules.num_decks * shoe.Shoe.NUM_CARDS_PER_DECK
+    max_depth = num_cards - MIN_CARDS_PER_RANK * len(card.RANKS)
+    if int(num_cards * depth_fraction) > max_depth:
+      raise IndexPlayException(
+          'Cannot deal %s of %d cards and keep %d of every rank' %
+          (depth_fraction, num_cards, MIN_CARDS_PER_RANK))
+
+    if cells is None:
+      cells = [(is_soft, value, up.value)
+               for is_soft, value in sorted(REPRESENTATIVE_HANDS)
+               for up in card.RANKS]
+    self.cells = cells
+
+  def CacheKey(self):
+    """Returns a key identifying the indices this engine computes."""
+    return repr((self.table_rules, sorted(self.tags.items()),
+                 self.true_counts, self.samples_per_count,
+                 self.depth_fraction, sorted(self.cells)))
+
+  def SampleComposition(self, true_count):
+    """Returns a random shoe composition at the true count.
+
+    Deals depth_fraction of the shoe at random, then swaps dealt and undealt
+    cards until the running count matches the true count. At least
+    MIN_CARDS_PER_RANK cards of every rank stay undealt, so every cell can be
+    dealt from the composition.
+
+    Args:
+      true_count: int, target true count.
+
+    Returns:
+      (int), remaining count per rank in card.RANKS order.
+    """
+    rank_tags = count.RankTags(self.tags)
+    full = [per_deck * self.table_rules.num_decks
+            for per_deck in shoe.Shoe.RANK_COUNTS_PER_DECK]
+    num_cards = sum(full)
+    depth = int(num_cards * self.depth_fraction)
+    decks_remaining = float(num_cards - depth) / shoe.Shoe.NUM_CARDS_PER_DECK
+    target = int(round(true_count * decks_remaining))
+
+    # Deal at random.
+    deck = [index for index, num in enumerate(full)
+            for _ in xrange(num - MIN_CARDS_PER_RANK)]
+    dealt = [0] * len(full)
+    for index in self.rng.sample(deck, depth):
+      dealt[index] += 1
+
+    # Swap one dealt card for one undealt card to move the count.
+    running = sum([tag * num for tag, num in zip(rank_tags, dealt)])
+    while running != target:
+      needed = target - running
+      swaps = [(out, back) for out in xrange(len(full))
+               for back in xrange(len(full))
+               if full[out] - dealt[out] > MIN_CARDS_PER_RANK and
+               dealt[back] and
+               0 < (rank_tags[out] - rank_tags[back]) * cmp(needed, 0) <=
+               abs(needed)]
+      if not swaps:
+        break
+      out, back = self.rng.choice(swaps)
+      dealt[out] += 1
+      dealt[back] -= 1
+      running += rank_tags[out] - rank_tags[back]
+
+    return tuple([num - num_dealt for num, num_dealt in zip(full, dealt)])
+
+  def Compute(self):
+    """Price every cell at every true count and find the indices.
+
+    Returns:
+      {(bool, int, int): (int, int, Action)}, per (is_soft, value, dealer up
+          value) cell with a deviation: the direction (1 deviates at or above
+          the index, -1 at or below), the index times the direction, and the
+          action to deviate to.
+    """
+    # Average EV of each candidate action, per true count and cell.
+    evs = {}
+    for true_count in self.true_counts:
+      totals = dict((cell, dict.fromkeys(CANDIDATE_ACTIONS, 0.0))
+                    for cell in self.cells)
+      for _ in xrange(self.samples_per_count):
+        composition = self.SampleComposition(true_count)
+        for cell in self.cells:
+          for action, ev in self._CellEvs(cell, composition).iteritems():
+            totals[cell][action] += ev
+        # States rarely repeat across compositions; keep memory bounded.
+        self.calculator.ClearCache()
+      evs[true_count] = totals
+
+    indices = {}
+    for cell in self.cells:
+      is_soft, value, dealer_value = cell
+      base = self.base_strategy.LookupAction(value, is_soft, dealer_value)
+      best = dict((true_count, max(evs[true_count][cell].iteritems(),
+                                   key=lambda item: item[1])[0])
+                  for true_count in self.true_counts)
+      above = [tc for tc in self.true_counts if tc > 0 and best[tc] != base]
+      below = [tc for tc in self.true_counts if tc < 0 and best[tc] != base]
+      if above and (not below or above[0] <= -below[-1]):
+        indices[cell] = (1, above[0], best[above[0]])
+      elif below:
+        indices[cell] = (-1, -below[-1], best[below[-1]])
+    return indices
+
+  def _CellEvs(self, cell, composition):
+    """EV of each candidate action for a cell.
+
+    Args:
+      cell: (bool, int, int), is_soft, value and dealer up value.
+      composition: (int), shoe composition before the deal.
+
+    Returns:
+      {Action: float}, EV per candidate action.
+    """
+    is_soft, value, dealer_value = cell
+    first, second = REPRESENTATIVE_HANDS[(is_soft, value)]
+    up = [rank.value for rank in card.RANKS].index(dealer_value)
+    remaining = composition
+    for index in (first, second, up):
+      if not remaining[index]:
+        raise IndexPlayException('Composition has no %s to deal' %
+                                 card.RANKS[index].name)
+      remaining = round_ev.RemoveCard(remaining, index)
+    return self.calculator.ActionEvs(first, second, up, remaining,
+                                     CANDIDATE_ACTIONS)
+
+
+def GetIndices(rules, base_strategy, cache_file=None, **kwargs):
+  """Returns the indices for a rule set, computing them at most once.
+
+  Args:
+    rules: table_rules.TableRules, rules at the table.
+    base_strategy: play_strategy.PlayStrategy, strategy being deviated from.
+    cache_file: str, pickle file the indices are loaded from and saved to.
+    kwargs: dict, IndexPlayEngine parameters.
+
+  Returns:
+    {(bool, int, int): (int, int, Action)}, see IndexPlayEngine.Compute.
+  """
+  engine = IndexPlayEngine(rules, base_strategy, **kwargs)
+  key = engine.CacheKey()
+  if key in _INDEX_CACHE:
+    return _INDEX_CACHE[key]
+
+  disk_cache = {}
+  if cache_file is not None and os.path.exists(cache_file):
+    with open(cache_file, 'rb') as cache:
+      disk_cache = cPickle.load(cache)
+
+  if key not in disk_cache:
+    disk_cache[key] = engine.Compute()
+    if cache_file is not None:
+      with open(cache_file, 'wb') as cache:
+        cPickle.dump(disk_cache, cache, cPickle.HIGHEST_PROTOCOL)
+
+  _INDEX_CACHE[key] = disk_cache[key]
+  return disk_cache[key]
+
+
+class IndexPlayStrategy(object):
+  """A play strategy which deviates from a base strategy by true count."""
+
+  def __init__(self, base_strategy, indices, tags=count.HI_LO):
+    """Constructor.
+
+    Args:
+      base_strategy: play_strategy.PlayStrategy, strategy being deviated from.
+      indices: {(bool, int, int): (int, int, Action)}, see GetIndices.
+      tags: {Card: int}, counting system the indices were computed with.
+    """
+    self.base_strategy = base_strategy
+    self.table_rules = base_strategy.table_rules
+    self.indices = indices
+    self.tags = tags
+    # The running count is the count of a full shoe less the count of the
+    # cards left, read off Shoe.rank_counts.
+    self._rank_tags = count.RankTags(tags)
+    self._deck_count = sum([tag * num for tag, num in zip(
+        self._rank_tags, shoe.Shoe.RANK_COUNTS_PER_DECK)])
+
+  def GetAction(self, current_hand, dealer_top_card, num_split_hands=1,
+                current_shoe=None):
+    """Get player action, deviating from the base strategy by true count.
+
+    Args:
+      current_hand: Hand, Players hand.
+      dealer_top_card: Card, Dealers face up card.
+      num_split_hands: int, Number of currently active split hands.
+      current_shoe: Shoe, shoe being played. Without it no deviations are made.
+
+    Returns:
+      Action, action to take.
+    """
+    if (not current_hand.IsActive() or
+        (current_hand.IsSplitable() and
+         num_split_hands <= self.table_rules.max_num_split_hands)):
+      return self.base_strategy.GetAction(current_hand, dealer_top_card,
+                                          num_split_hands)
+
+    value = current_hand.GetValue()
+    is_soft = current_hand.IsSoft()
+    deviation = self.indices.get((is_soft, value, dealer_top_card.value))
+    if deviation is not None and current_shoe is not None:
+      direction, index, action = deviation
+      if direction * self._TrueCount(current_shoe) >= index:
+        return action
+    return self.base_strategy.LookupAction(value, is_soft,
+                                           dealer_top_card.value)
+
+  def _TrueCount(self, current_shoe):
+    """Returns count.TrueCount of the shoe from its cards left per rank."""
+    remaining = sum([tag * num for tag, num in zip(self._rank_tags,
+                                                   current_shoe.rank_counts)])
+    return (float(self._deck_count * current_shoe.num_decks - remaining) /
+            count.DecksRemaining(current_shoe))
+
+  def LookupAction(self, value, is_soft, dealer_value):
+    """Base strategy action for a hand that is not being split."""
+    return self.base_strategy.LookupAction(value, is_soft, dealer_value)
@@ -0,0 +1,75 @@
+import card
+import count
+import hand
+import index_play
+import os
+import play_strategy
+import random
+import shoe
+import table_rules
+import unittest
+
+STRATEGY_YAML = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'play_strat_four_deck_hit_soft_17.yaml')
+
+
+class IndexPlayTest(unittest.TestCase):
+  def setUp(self):
+    self.rules = table_rules.DEFAULT_TABLE_RULES
+    self.play_strategy = play_strategy.PlayStrategy(self.rules, STRATEGY_YAML)
+
+  def test_sampled_composition_matches_true_count(self):
+    engine = index_play.IndexPlayEngine(self.rules, self.play_strategy,
+                                        rng=random.Random(3))
+    full = [per_deck * self.rules.num_decks
+            for per_deck in shoe.Shoe.RANK_COUNTS_PER_DECK]
+    for true_count in (-4, 0, 4):
+      composition = engine.SampleComposition(true_count)
+      running = sum([tag * (num - left) for tag, num, left in
+                     zip(count.RankTags(), full, composition)])
+      self.assertEqual(sum(composition), sum(full) / 2)
+      self.assertEqual(running, true_count * 2)
+      self.assertGreaterEqual(min(composition),
+                              index_play.MIN_CARDS_PER_RANK)
+
+  def test_indices_over_every_cell(self):
+    # This seed used to sample a composition without aces.
+    indices = index_play.GetIndices(self.rules, self.play_strategy,
+                                    true_counts=(-6, 6), samples_per_count=1,
+                                    rng=random.Random(4))
+    cells = set((is_soft, value, up.value)
+                for is_soft, value in index_play.REPRESENTATIVE_HANDS
+                for up in card.RANKS)
+    for cell, (direction, index, action) in indices.iteritems():
+      self.assertIn(cell, cells)
+      self.assertIn(direction * index, (-6, 6))
+      self.assertIn(action, index_play.CANDIDATE_ACTIONS)
+
+  def test_depth_keeps_every_rank(self):
+    self.assertRaises(index_play.IndexPlayException,
+                      index_play.IndexPlayEngine, self.rules,
+                      self.play_strategy, depth_fraction=0.9)
+
+  def test_deviates_at_index(self):
+    # Stand on hard 16 against a face at true count 0 and above.
+    indices = {(False, 16, 10): (1, 0, play_strategy.Action.STAND)}
+    strategy = index_play.IndexPlayStrategy(self.play_strategy, indices)
+    test_hand = hand.Hand([card.FACE, card.SIX])
+    test_shoe = shoe.Shoe(self.rules.num_decks)
+
+    for _ in xrange(4):
+      test_shoe.RemoveCard(card.FACE)
+    self.assertEqual(strategy.GetAction(test_hand, card.FACE, 1, test_shoe),
+                     play_strategy.Action.HIT)
+    for _ in xrange(8):
+      test_shoe.RemoveCard(card.FIVE)
+    self.assertEqual(strategy._TrueCount(test_shoe),
+                     count.TrueCount(test_shoe))
+    self.assertEqual(strategy.GetAction(test_hand, card.FACE, 1, test_shoe),
+                     play_strategy.Action.STAND)
+    self.assertEqual(strategy.GetAction(test_hand, card.FACE),
+                     play_strategy.Action.HIT)
+
+
+if __name__ == '__main__':
+  unittest.main()
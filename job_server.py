@@ -0,0 +1,477 @@
+""" Local HTTP/JSON service running simulation jobs on a process pool.
+
+A job names the table rules, the wallets to compare, a round budget and a
+seed. Its rounds are split into batches which run on a shared
+multiprocessing pool; each batch plays a fresh game seeded with the job
+seed plus the batch index, so a job spec fully determines its result.
+Finished results are cached by the canonical spec, and identical specs are
+answered from the cache (or attached to the job already running them).
+
+Endpoints, all JSON:
+  POST   /jobs              submit a job spec, returns the job.
+  GET    /jobs              every job.
+  GET    /jobs/<id>         status, progress and counters so far.
+  GET    /jobs/<id>/stream  one JSON line per update until the job ends.
+  DELETE /jobs/<id>         cancel the job.
+
+Python 2 has no asyncio, so requests are served by a threaded
+BaseHTTPServer and batch completions arrive through pool callbacks. The
+server only binds to localhost.
+"""
+import argparse
+import BaseHTTPServer
+import json
+import multiprocessing
+import SocketServer
+import threading
+import traceback
+
+import counters
+import play_strategy
+import simulation
+import table_rules
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+FINISHED_STATES = (JOB_DONE, JOB_CANCELLED, JOB_FAILED)
+
+DEFAULT_BATCH_ROUNDS = 10000
+
+# Types of the TableRules fields a spec may set as plain JSON values.
+_NUMBER = (int, long, float)
+_INTEGER = (int, long)
+_RULE_TYPES = {
+    'min_money_units': _NUMBER,
+    'max_money_units': _NUMBER,
+    'blackjack_win_multiplier': _NUMBER,
+    'hit_on_soft_17': bool,
+    'num_decks': _INTEGER,
+    'max_num_split_hands': _INTEGER,
+    'max_num_seats': _INTEGER,
+}
+
+
+class JobServerException(Exception):
+  """Base exception."""
+
+
+def NormalizeSpec(spec):
+  """Fill in defaults and check a job spec.
+
+  Args:
+    spec: dict, 'rules' (TableRules fields overriding the defaults),
+        'num_players', 'wallets' (see simulation.NewWallets, omitted keeps
+        the players default wallets), 'num_rounds', 'seed' and
+        'batch_rounds'.
+
+  Returns:
+    dict, spec with every field set.
+
+  Raises:
+    JobServerException: Invalid spec.
+  """
+  if not isinstance(spec, dict):
+    raise JobServerException('Job spec must be a JSON object')
+  unknown = set(spec) - set(['rules', 'num_players', 'wallets', 'num_rounds',
+                             'seed', 'batch_rounds'])
+  if unknown:
+    raise JobServerException('Unknown job fields: %s' % sorted(unknown))
+
+  rules = table_rules.DEFAULT_TABLE_RULES._asdict()
+  if not isinstance(spec.get('rules', {}), dict):
+    raise JobServerException('rules must be a JSON object')
+  unknown = set(spec.get('rules', {})) - set(rules)
+  if unknown:
+    raise JobServerException('Unknown rules: %s' % sorted(unknown))
+  rules.update(spec.get('rules', {}))
+  _CheckRules(rules)
+
+  normalized = {
+      'rules': rules,
+      'num_players': spec.get('num_players',
+                              simulation.DEFAULT_GAME_CONFIG.num_players),
+      'wallets': spec.get('wallets'),
+      'num_rounds': spec.get('num_rounds'),
+      'seed': spec.get('seed', 0),
+      'batch_rounds': spec.get('batch_rounds', DEFAULT_BATCH_ROUNDS),
+  }
+  for field in ('num_players', 'num_rounds', 'seed', 'batch_rounds'):
+    if not isinstance(normalized[field], (int, long)):
+      raise JobServerException('%s must be an integer' % field)
+  if normalized['num_rounds'] < 1 or normalized['batch_rounds'] < 1:
+    raise JobServerException('num_rounds and batch_rounds must be positive')
+  if not 1 <= normalized['num_players'] <= rules['max_num_seats']:
+    raise JobServerException('num_players must be between 1 and %d' %
+                             rules['max_num_seats'])
+
+  # Build everything once here so bad specs fail on submit, not in a worker.
+  try:
+    config = SpecGameConfig(normalized)
+    play_strategy.PlayStrategy(config.rules, config.strategy_file)
+    if normalized['wallets'] is not None:
+      simulation.NewWallets(normalized['wallets'])
+  except (play_strategy.PlayStrategyException,
+          simulation.SimulationException, AttributeError, TypeError,
+          ValueError) as e:
+    raise JobServerException(str(e))
+  return normalized
+
+
+def _CheckRules(rules):
+  """Check the types and values of the rules of a spec.
+
+  Args:
+    rules: dict, TableRules fields.
+
+  Raises:
+    JobServerException: A rule of the wrong type or an unknown value.
+  """
+  for field, types in _RULE_TYPES.iteritems():
+    # bool is an int; only bool fields take true or false.
+    if (not isinstance(rules[field], types) or
+        (types is not bool and isinstance(rules[field], bool))):
+      raise JobServerException('Rule %s has the wrong type' % field)
+  if rules['num_decks'] < 1 or rules['max_num_seats'] < 1:
+    raise JobServerException('num_decks and max_num_seats must be positive')
+  if (not isinstance(rules['double_limited_to'], list) or
+      not all(isinstance(value, _INTEGER) and not isinstance(value, bool)
+              for value in rules['double_limited_to'])):
+    raise JobServerException('double_limited_to must be a list of integers')
+  if rules['dealer_peek'] not in table_rules.PEEK_UP_CARD_VALUES:
+    raise JobServerException('dealer_peek must be one of %s' %
+                             sorted(table_rules.PEEK_UP_CARD_VALUES))
+  if rules['surrender'] not in table_rules.SURRENDERS:
+    raise JobServerException('surrender must be one of %s' %
+                             list(table_rules.SURRENDERS))
+
+
+def SpecGameConfig(spec):
+  """Returns the simulation.GameConfig of a normalized spec."""
+  rules = dict(spec['rules'])
+  rules['double_limited_to'] = list(rules['double_limited_to'])
+  return simulation.GameConfig(
+      num_players=spec['num_players'],
+      rules=table_rules.TableRules(**rules),
+      strategy_file=simulation.DEFAULT_STRATEGY_FILE)
+
+
+def SpecBatches(spec):
+  """Returns the number of rounds of each batch of a normalized spec."""
+  return simulation.SplitRounds(
+      spec['num_rounds'], -(-spec['num_rounds'] // spec['batch_rounds']))
+
+
+def _RunBatch(task):
+  """Pool entry point. Returns ('ok', GameCounters) or ('error', str)."""
+  try:
+    return 'ok', counters.CountersTask(task)
+  except Exception:
+    return 'error', traceback.format_exc()
+
+
+class Job(object):
+  """A submitted job and its progress."""
+
+  def __init__(self, job_id, spec, key):
+    self.job_id = job_id
+    self.spec = spec
+    self.key = key
+    self.config = SpecGameConfig(spec)
+    self.batches = SpecBatches(spec)
+    self.status = JOB_QUEUED
+    self.cached = False
+    self.error = None
+    # {batch index: GameCounters}
+    self.results = {}
+    self.next_batch = 0
+    self.in_flight = 0
+    # Final counters, set once the job is done.
+    self.counters = None
+    # Bumped on every change, for streaming.
+    self.version = 0
+
+  def Task(self, index):
+    """Returns the pool task of a batch."""
+    return (self.config, self.spec['seed'] + index, self.batches[index],
+            self.spec['wallets'])
+
+  def MergedCounters(self):
+    """Returns the counters of the finished batches, merged in batch order."""
+    if self.counters is not None:
+      return self.counters
+    merged = counters.GameCounters()
+    for index in sorted(self.results):
+      merged.Merge(self.results[index])
+    return merged
+
+  def Snapshot(self):
+    """Returns the job as a JSON serializable dict."""
+    rounds_done = sum([self.batches[index] for index in self.results])
+    if self.counters is not None:
+      rounds_done = self.spec['num_rounds']
+    return {
+        'id': self.job_id,
+        'status': self.status,
+        'cached': self.cached,
+        'error': self.error,
+        'spec': self.spec,
+        'rounds_done': rounds_done,
+        'num_rounds': self.spec['num_rounds'],
+        'counters': self.MergedCounters().ToDict(),
+    }
+
+
+class JobManager(object):
+  """Runs jobs on a process pool and caches their results."""
+
+  def __init__(self, num_workers=None):
+    """Constructor.
+
+    Args:
+      num_workers: int, worker processes. None uses one per cpu.
+    """
+    if num_workers is None:
+      num_workers = multiprocessing.cpu_count()
+    self.num_workers = num_workers
+    self.pool = multiprocessing.Pool(num_workers)
+    self.condition = threading.Condition()
+    self.jobs = {}
+    # {spec key: job id} of jobs running or done.
+    self.jobs_by_key = {}
+    # {spec key: GameCounters}
+    self.result_cache = {}
+    self.num_jobs = 0
+
+  def Close(self):
+    """Stop the workers."""
+    self.pool.terminate()
+    self.pool.join()
+
+  def Submit(self, spec):
+    """Submit a job.
+
+    Args:
+      spec: dict, see NormalizeSpec.
+
+    Returns:
+      Job, new job, or the job already running the same spec.
+
+    Raises:
+      JobServerException: Invalid spec.
+    """
+    spec = NormalizeSpec(spec)
+    key = json.dumps(spec, sort_keys=True)
+    with self.condition:
+      running_id = self.jobs_by_key.get(key)
+      if (running_id is not None and
+          self.jobs[running_id].status not in FINISHED_STATES):
+        return self.jobs[running_id]
+
+      self.num_jobs += 1
+      job = Job(str(self.num_jobs), spec, key)
+      self.jobs[job.job_id] = job
+      self.jobs_by_key[key] = job.job_id
+      if key in self.result_cache:
+        job.counters = self.result_cache[key]
+        job.cached = True
+        job.status = JOB_DONE
+      else:
+        job.status = JOB_RUNNING
+        self._Schedule(job)
+      self.condition.notify_all()
+    return job
+
+  def Get(self, job_id):
+    """Returns the job, or None."""
+    return self.jobs.get(job_id)
+
+  def Cancel(self, job_id):
+    """Cancel a job. Batches already running finish but are discarded.
+
+    Returns:
+      Job, the job, or None if unknown.
+    """
+    with self.condition:
+      job = self.jobs.get(job_id)
+      if job is not None and job.status not in FINISHED_STATES:
+        job.status = JOB_CANCELLED
+        job.version += 1
+        self.condition.notify_all()
+    return job
+
+  def Wait(self, job, version, timeout=None):
+    """Block until the job changes from version or finishes.
+
+    Returns:
+      dict, snapshot of the job.
+    """
+    with self.condition:
+      if job.version == version and job.status not in FINISHED_STATES:
+        self.condition.wait(timeout)
+      snapshot = job.Snapshot()
+      snapshot['version'] = job.version
+      return snapshot
+
+  def _Schedule(self, job):
+    """Keep up to one batch per worker of the job in the pool.
+
+    Batches are handed out as others finish, so cancelled jobs stop quickly
+    and concurrent jobs share the workers.
+    """
+    while (job.status == JOB_RUNNING and job.in_flight < self.num_workers and
+           job.next_batch < len(job.batches)):
+      index = job.next_batch
+      job.next_batch += 1
+      job.in_flight += 1
+      self.pool.apply_async(
+          _RunBatch, (job.Task(index),),
+          callback=lambda outcome, index=index: self._BatchDone(
+              job, index, outcome))
+
+  def _BatchDone(self, job, index, outcome):
+    """Pool callback of a finished batch."""
+    status, result = outcome
+    with self.condition:
+      job.in_flight -= 1
+      if job.status != JOB_RUNNING:
+        return
+      if status != 'ok':
+        job.status = JOB_FAILED
+        job.error = result
+      else:
+        job.results[index] = result
+        if len(job.results) == len(job.batches):
+          job.counters = job.MergedCounters()
+          job.results = {}
+          job.status = JOB_DONE
+          self.result_cache[job.key] = job.counters
+        else:
+          self._Schedule(job)
+      job.version += 1
+      self.condition.notify_all()
+
+
+class JobRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Routes requests to the servers JobManager."""
+
+  def do_POST(self):
+    if self.path.rstrip('/') != '/jobs':
+      return self._SendJson(404, {'error': 'Not found'})
+    try:
+      length = int(self.headers.getheader('content-length', 0))
+      spec = json.loads(self.rfile.read(length) or 'null')
+      job = self.server.manager.Submit(spec)
+    except (ValueError, JobServerException) as e:
+      return self._SendJson(400, {'error': str(e)})
+    self._SendJson(200, job.Snapshot())
+
+  def do_GET(self):
+    parts = self.path.strip('/').split('/')
+    if parts == ['jobs']:
+      manager = self.server.manager
+      return self._SendJson(200, [manager.jobs[job_id].Snapshot()
+                                  for job_id in sorted(manager.jobs, key=int)])
+    job = self._GetJob(parts)
+    if job is None:
+      return self._SendJson(404, {'error': 'Not found'})
+    if len(parts) == 3 and parts[2] == 'stream':
+      return self._Stream(job)
+    self._SendJson(200, job.Snapshot())
+
+  def do_DELETE(self):
+    parts = self.path.strip('/').split('/')
+    if len(parts) != 2:
+      return self._SendJson(404, {'error': 'Not found'})
+    job = self._GetJob(parts)
+    if job is None:
+      return self._SendJson(404, {'error': 'Not found'})
+    self._SendJson(200, self.server.manager.Cancel(job.job_id).Snapshot())
+
+  def log_message(self, format, *args):
+    if self.server.verbose:
+      BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+  def _GetJob(self, parts):
+    if len(parts) < 2 or len(parts) > 3 or parts[0] != 'jobs':
+      return None
+    return self.server.manager.Get(parts[1])
+
+  def _Stream(self, job):
+    """Send a JSON line per job update, closing once the job finishes."""
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/x-ndjson')
+    self.send_header('Connection', 'close')
+    self.end_headers()
+    version = None
+    while True:
+      snapshot = self.server.manager.Wait(job, version,
+                                          self.server.stream_interval)
+      if snapshot['version'] != version:
+        version = snapshot['version']
+        self.wfile.write(json.dumps(snapshot) + '\n')
+        self.wfile.flush()
+      if snapshot['status'] in FINISHED_STATES:
+        break
+
+  def _SendJson(self, code, body):
+    data = json.dumps(body)
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+
+class JobServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """Threaded HTTP server owning a JobManager."""
+  daemon_threads = True
+
+  def __init__(self, port=8080, num_workers=None, stream_interval=1.0,
+               verbose=False):
+    """Constructor.
+
+    Args:
+      port: int, localhost port to listen on. 0 picks a free port.
+      num_workers: int, worker processes. None uses one per cpu.
+      stream_interval: float, seconds between checks of a streamed job.
+      verbose: bool, log every request.
+    """
+    BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port),
+                                       JobRequestHandler)
+    self.manager = JobManager(num_workers)
+    self.stream_interval = stream_interval
+    self.verbose = verbose
+
+  def server_close(self):
+    BaseHTTPServer.HTTPServer.server_close(self)
+    self.manager.Close()
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--port', type=int, default=8080,
+                      help='Localhost port to listen on.')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--verbose', action='store_true', default=False,
+                      help='Log every request.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  server = JobServer(args.port, args.workers, verbose=args.verbose)
+  print 'Serving on http://127.0.0.1:%d' % server.server_address[1]
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+if __name__ == '__main__':
+  main()
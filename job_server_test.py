@@ -0,0 +1,82 @@
+import counters
+import job_server
+import json
+import simulation
+import threading
+import unittest
+import urllib2
+
+WALLETS = [{'name': 'min', 'strategy': 'table_minimum',
+            'params': {'table_minimum': 1}},
+           {'name': 'ramp', 'strategy': 'ramp',
+            'params': {'ramp': [[0, 1], [2, 5]]}}]
+
+
+class JobServerTest(unittest.TestCase):
+  def setUp(self):
+    self.server = job_server.JobServer(port=0, num_workers=1,
+                                       stream_interval=0.05)
+    self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.start()
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.thread.join()
+
+  def Request(self, path, body=None, method=None):
+    data = None if body is None else json.dumps(body)
+    request = urllib2.Request(self.url + path, data)
+    if method is not None:
+      request.get_method = lambda: method
+    return urllib2.urlopen(request)
+
+  def test_stream_matches_direct_run_and_caches(self):
+    spec = {'num_rounds': 250, 'batch_rounds': 100, 'seed': 4,
+            'wallets': WALLETS}
+    job = json.load(self.Request('/jobs', spec))
+    lines = [json.loads(line) for line in
+             self.Request('/jobs/%s/stream' % job['id']).read().splitlines()]
+    self.assertEqual(lines[-1]['status'], job_server.JOB_DONE)
+    self.assertEqual(lines[-1]['rounds_done'], 250)
+
+    expected = counters.GameCounters()
+    for index, num_rounds in enumerate((84, 83, 83)):
+      expected.Merge(counters.CountersTask(
+          (simulation.DEFAULT_GAME_CONFIG, 4 + index, num_rounds, WALLETS)))
+    self.assertEqual(lines[-1]['counters'], json.loads(
+        json.dumps(expected.ToDict())))
+
+    cached = json.load(self.Request('/jobs', spec))
+    self.assertTrue(cached['cached'])
+    self.assertEqual(cached['counters'], lines[-1]['counters'])
+
+  def test_cancel(self):
+    job = json.load(self.Request('/jobs', {'num_rounds': 10 ** 7}))
+    cancelled = json.load(self.Request('/jobs/%s' % job['id'],
+                                       method='DELETE'))
+    self.assertEqual(cancelled['status'], job_server.JOB_CANCELLED)
+
+  def test_bad_spec(self):
+    for spec in ({'num_rounds': 10, 'rules': {'num_decks': 6}},
+                 {'num_rounds': 10, 'wallets': [{'strategy': 'martingale'}]},
+                 {'rounds': 10},
+                 {'num_rounds': 10, 'rules': 5},
+                 {'num_rounds': 10, 'rules': {'double_limited_to': 5}},
+                 {'num_rounds': 10, 'rules': {'num_decks': '6'}},
+                 {'num_rounds': 10, 'rules': {'hit_on_soft_17': 1}},
+                 {'num_rounds': 10, 'rules': {'surrender': 'sometimes'}},
+                 {'num_rounds': 10, 'rules': {'dealer_peek': 'never'}},
+                 {'num_rounds': 10, 'num_players': 9},
+                 {'num_rounds': 10, 'num_players': 3,
+                  'rules': {'max_num_seats': 2}}):
+      try:
+        self.Request('/jobs', spec)
+        self.fail('Accepted %s' % spec)
+      except urllib2.HTTPError as e:
+        self.assertEqual(e.code, 400)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,38 +1,81 @@
 import argparse
-import game
-import table_rules
+import sys
+
+import session
+import simulation
+
 
 def parse_args():
   parser = argparse.ArgumentParser()
-  parser.add_argument('--table-rules', type=str,
-                      default=table_rules.DEFAULT_TABLE_RULES,
-                      help='Table rules yaml.')
   parser.add_argument('--players', type=int, default=4,
                       help='Number of players at the table.')
   parser.add_argument('--num-rounds', type=int, default=100000,
                       help='Number of rounds to play before checking stats.')
-  parser.add_argument('--interactive', action='store_true', default=True,
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--batch-rounds', type=int, default=10000,
+                      help='Rounds per batch handed to a worker.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the first batch.')
+  parser.add_argument('--control-variates', action='store_true',
+                      default=False,
+                      help='Also report wallet EVs with control variates.')
+  parser.add_argument('--interactive', action='store_true', default=False,
                       help='Allow the play of more games rather than exit.')
   return parser.parse_args()
 
 
+def PrintProgress(rounds_done, rounds_requested):
+  sys.stdout.write('\rPlayed %d/%d rounds' % (rounds_done, rounds_requested))
+  sys.stdout.flush()
+
+
+def PlayAndReport(blackjack_session, num_rounds):
+  finished = blackjack_session.Play(num_rounds, progress=PrintProgress)
+  print ''
+  if not finished:
+    print 'Interrupted. Unplayed batches run with the next request.'
+  session.PrintTotals(blackjack_session.Totals(),
+                      blackjack_session.NewWallets())
+
+
+def AskYesNo(prompt):
+  while True:
+    user_response = raw_input(prompt).strip().lower()
+    if user_response in ('y', 'n'):
+      return user_response == 'y'
+    print 'Please answer y or n.'
+
+
+def AskRounds(prompt):
+  while True:
+    user_response = raw_input(prompt).strip()
+    if user_response.isdigit() and int(user_response) > 0:
+      return int(user_response)
+    print 'Please enter a positive number of rounds.'
+
+
 def main():
   args = parse_args()
 
-  blackjack_game = game.Game(num_players=args.players, rules=args.table_rules)
-  blackjack_game.PlayRounds(args.num_rounds)
-  blackjack_game.StatsForNerds()
-
-  if args.interactive:
-    while True:
-      user_response = raw_input('Play more rounds? (y/n): ')
-      # TODO(self): check for invalid response
-      if user_response.lower() != 'y':
+  config = simulation.DEFAULT_GAME_CONFIG._replace(num_players=args.players)
+  blackjack_session = session.Session(config, num_workers=args.workers,
+                                      batch_rounds=args.batch_rounds,
+                                      seed=args.seed,
+                                      control_variates=args.control_variates)
+  try:
+    PlayAndReport(blackjack_session, args.num_rounds)
+    while args.interactive:
+      try:
+        if not AskYesNo('Play more rounds? (y/n): '):
+          break
+        num_rounds = AskRounds('How many rounds?: ')
+      except (EOFError, KeyboardInterrupt):
+        print ''
         break
-
-      num_rounds = input('How many rounds?: ')
-      blackjack_game.PlayRounds(args.num_arounds)
-      blackjack_game.StatsForNerds()
+      PlayAndReport(blackjack_session, num_rounds)
+  finally:
+    blackjack_session.Close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,431 @@
+""" Sampling whole round results instead of dealing cards.
+
+For betting system studies with a fixed play strategy, a round only matters
+to the wallets through its outcome: a win, blackjack, loss or tie, at the
+bet multiplier doubling left it with. OutcomeDistribution computes the
+probability of every such outcome exactly, once per (rules, strategy,
+composition), and OutcomeSampler draws rounds from it through an alias
+table, paying wallets and calling their betting strategies as the game
+would.
+
+Cards are drawn with replacement from the composition's rank frequencies,
+the infinite deck approximation: card removal within a round and shoe
+depletion are ignored. The default composition is a full shoe of the
+rules, so rank frequencies are those of any number of decks.
+
+Only strategies betting from the round history can follow the sampled
+stream; strategies reading the shoe (counts, blackjack percent) cannot,
+there being no shoe.
+"""
+import argparse
+import collections
+import random
+import time
+
+import card
+import dealer_automaton
+import play_strategy
+import shoe
+import simulation
+import stats
+import strategy
+import table_rules
+import wallet
+
+# Outcome kinds, as the betting strategies are told of them.
+WIN = 'win'
+BLACKJACK = 'blackjack'
+LOSS = 'loss'
+TIE = 'tie'
+
+# Signals of strategies which can bet from sampled rounds, see
+# population.SIGNAL_NAMES.
+SAMPLEABLE_SIGNALS = ('constant', 'loss_streak')
+
+# Player final value of a busted hand.
+_PLAYER_BUST = 0
+
+
+class OutcomeSamplingException(Exception):
+  """Base exception."""
+
+
+class Outcome(collections.namedtuple('Outcome',
+                                     ['kind', 'multiplier', 'net'])):
+  """A round result: kind, bet multiplier from doubling and net money
+  units won per unit initially bet."""
+
+
+def FullShoeComposition(rules):
+  """Returns the composition of a full shoe of the rules."""
+  return tuple([per_deck * rules.num_decks
+                for per_deck in shoe.Shoe.RANK_COUNTS_PER_DECK])
+
+
+class OutcomeDistribution(object):
+  """Exact probabilities of the outcomes of a round."""
+
+  def __init__(self, rules, strategy_table, composition=None):
+    """Constructor.
+
+    Args:
+      rules: table_rules.TableRules, rules at the table.
+      strategy_table: play_strategy.PlayStrategy, how hands are played.
+      composition: (int), cards per rank in card.RANKS order whose
+          frequencies cards are drawn with. None uses a full shoe.
+
+    Raises:
+      OutcomeSamplingException: The strategy splits, the composition is
+          empty or the rules are not the classic peek and no surrender
+          round.
+    """
+    if not table_rules.HasClassicRound(rules):
+      raise OutcomeSamplingException('Only the classic round has outcomes, '
+                                     'got peek %s and surrender %s' % (
+                                         rules.dealer_peek, rules.surrender))
+    if composition is None:
+      composition = FullShoeComposition(rules)
+    num_cards = float(sum(composition))
+    if not num_cards:
+      raise OutcomeSamplingException('Empty composition')
+    self.table_rules = rules
+    self.play_strategy = strategy_table
+    self.composition = tuple(composition)
+    self.rank_probs = [count / num_cards for count in composition]
+    self.automaton = dealer_automaton.GetAutomaton(rules)
+    self._player_cache = {}
+    self._dealer_cache = {}
+    # {Outcome: probability}
+    self.probabilities = self._Compute()
+
+  def _PlayerFinals(self, hard_value, has_ace, up_value):
+    """Distribution of the final hand, as the player plays it.
+
+    Returns:
+      {(int, int): float}, probability per (final value or _PLAYER_BUST,
+          bet multiplier).
+    """
+    key = (hard_value, has_ace, up_value)
+    finals = self._player_cache.get(key)
+    if finals is not None:
+      return finals
+
+    value = hard_value
+    is_soft = has_ace and hard_value + 10 <= 21
+    if is_soft:
+      value += 10
+    if value > 21:
+      finals = {(_PLAYER_BUST, 1): 1.0}
+    else:
+      action = self.play_strategy.LookupAction(value, is_soft, up_value)
+      if action == play_strategy.Action.STAND:
+        finals = {(value, 1): 1.0}
+      elif action in (play_strategy.Action.HIT, play_strategy.Action.DOUBLE):
+        # As person.Player.Play, a doubled hand keeps following the strategy.
+        factor = 2 if action == play_strategy.Action.DOUBLE else 1
+        finals = collections.defaultdict(float)
+        for rank, prob in zip(card.RANKS, self.rank_probs):
+          if not prob:
+            continue
+          for (final, multiplier), final_prob in self._PlayerFinals(
+              hard_value + rank.alt_value, has_ace or rank == card.ACE,
+              up_value).iteritems():
+            finals[(final, multiplier * factor)] += prob * final_prob
+        finals = dict(finals)
+      else:
+        raise OutcomeSamplingException('Unsupported action: %s' % action)
+    self._player_cache[key] = finals
+    return finals
+
+  def _DealerFinals(self, code):
+    """Returns the probability of each dealer outcome from a table code."""
+    finals = self._dealer_cache.get(code)
+    if finals is not None:
+      return finals
+    finals = [0.0] * dealer_automaton.NUM_OUTCOMES
+    if code < 0:
+      finals[dealer_automaton.Outcome(code)] = 1.0
+    else:
+      steps = self.automaton.steps
+      for rank, prob in zip(card.RANKS, self.rank_probs):
+        if prob:
+          drawn = self._DealerFinals(steps[code + rank.value])
+          finals = [total + prob * final for total, final in
+                    zip(finals, drawn)]
+    self._dealer_cache[code] = finals
+    return finals
+
+  def _Compute(self):
+    """Returns {Outcome: probability} of a round."""
+    blackjack_multiplier = self.table_rules.blackjack_win_multiplier
+    probabilities = collections.defaultdict(float)
+    steps = self.automaton.steps
+    for up, up_prob in zip(card.RANKS, self.rank_probs):
+      if not up_prob:
+        continue
+      # The dealer peeks: split the hole card on completing a blackjack.
+      dealer = [0.0] * dealer_automaton.NUM_OUTCOMES
+      dealer_blackjack = 0.0
+      up_code = self.automaton.StateOf([up])
+      for hole, hole_prob in zip(card.RANKS, self.rank_probs):
+        if not hole_prob:
+          continue
+        if up.value + hole.value == 21:
+          dealer_blackjack += hole_prob
+          continue
+        drawn = self._DealerFinals(steps[up_code + hole.value])
+        dealer = [total + hole_prob * final for total, final in
+                  zip(dealer, drawn)]
+
+      for first, first_prob in zip(card.RANKS, self.rank_probs):
+        for second, second_prob in zip(card.RANKS, self.rank_probs):
+          prob = up_prob * first_prob * second_prob
+          if not prob:
+            continue
+          if first.value + second.value == 21:
+            probabilities[Outcome(TIE, 1, 0.0)] += prob * dealer_blackjack
+            probabilities[Outcome(BLACKJACK, 1, blackjack_multiplier)] += (
+                prob * (1 - dealer_blackjack))
+            continue
+          probabilities[Outcome(LOSS, 1, -1.0)] += prob * dealer_blackjack
+          player = self._PlayerFinals(
+              first.alt_value + second.alt_value,
+              card.ACE in (first, second), up.value)
+          for (final, multiplier), final_prob in player.iteritems():
+            for outcome, dealer_prob in enumerate(dealer):
+              if not dealer_prob:
+                continue
+              if final == _PLAYER_BUST:
+                kind = LOSS
+              elif outcome == dealer_automaton.BUST:
+                kind = WIN
+              else:
+                total = dealer_automaton.OUTCOME_TOTALS[outcome]
+                kind = WIN if final > total else (
+                    LOSS if final < total else TIE)
+              net = {WIN: 1.0, LOSS: -1.0, TIE: 0.0}[kind] * multiplier
+              probabilities[Outcome(kind, multiplier, net)] += (
+                  prob * final_prob * dealer_prob)
+    return dict(probabilities)
+
+  def Ev(self):
+    """Returns the expected money units won per unit bet."""
+    return sum(outcome.net * prob
+               for outcome, prob in self.probabilities.iteritems())
+
+
+class AliasTable(object):
+  """Walker's alias method: O(1) draws from a discrete distribution."""
+
+  def __init__(self, weights):
+    """Constructor.
+
+    Args:
+      weights: [float], non negative weights, not all zero.
+    """
+    size = len(weights)
+    total = float(sum(weights))
+    scaled = [weight * size / total for weight in weights]
+    self.size = size
+    self.accept = [1.0] * size
+    self.alias = range(size)
+    small = [index for index, value in enumerate(scaled) if value < 1.0]
+    large = [index for index, value in enumerate(scaled) if value >= 1.0]
+    while small and large:
+      low = small.pop()
+      high = large.pop()
+      self.accept[low] = scaled[low]
+      self.alias[low] = high
+      scaled[high] -= 1.0 - scaled[low]
+      if scaled[high] < 1.0:
+        small.append(high)
+      else:
+        large.append(high)
+    # Leftovers are 1 up to rounding.
+
+  def Sample(self, num_samples, rng=random):
+    """Returns num_samples indices drawn from the weights.
+
+    Args:
+      num_samples: int, number of draws.
+      rng: random.Random, source of randomness.
+    """
+    accept = self.accept
+    alias = self.alias
+    size = self.size
+    uniform = rng.random
+    samples = []
+    append = samples.append
+    for _ in xrange(num_samples):
+      position = uniform() * size
+      index = int(position)
+      append(index if position - index < accept[index] else alias[index])
+    return samples
+
+
+# Distributions by (rules, strategy file, composition).
+_DISTRIBUTIONS = {}
+
+
+def GetDistribution(config, composition=None):
+  """Returns the outcome distribution of a game config, computed at most once.
+
+  Args:
+    config: simulation.GameConfig, rules and strategy file.
+    composition: (int), see OutcomeDistribution.
+  """
+  key = (repr(config.rules), config.strategy_file, composition)
+  if key not in _DISTRIBUTIONS:
+    _DISTRIBUTIONS[key] = OutcomeDistribution(
+        config.rules, simulation.GetPlayStrategy(config), composition)
+  return _DISTRIBUTIONS[key]
+
+
+class OutcomeSampler(object):
+  """Plays wallets against rounds sampled from an OutcomeDistribution."""
+
+  def __init__(self, distribution, wallets, rng=None, batch_rounds=10000):
+    """Constructor.
+
+    Args:
+      distribution: OutcomeDistribution, outcomes to sample.
+      wallets: [Wallet], wallets betting on every round.
+      rng: random.Random, source of randomness.
+      batch_rounds: int, rounds drawn from the alias table at once.
+
+    Raises:
+      OutcomeSamplingException: A betting strategy reads the shoe.
+    """
+    for player_wallet in wallets:
+      if player_wallet.betting_strategy.signal not in SAMPLEABLE_SIGNALS:
+        raise OutcomeSamplingException(
+            '%s needs a shoe to bet' %
+            type(player_wallet.betting_strategy).__name__)
+    self.distribution = distribution
+    self.wallets = list(wallets)
+    self.rng = rng or random.Random()
+    self.batch_rounds = batch_rounds
+    self.outcomes = sorted(distribution.probabilities)
+    self.table = AliasTable([distribution.probabilities[outcome]
+                             for outcome in self.outcomes])
+    self.num_rounds = 0
+    # Rounds sampled per Outcome.
+    self.outcome_counts = dict.fromkeys(self.outcomes, 0)
+
+  def Play(self, num_rounds):
+    """Sample rounds and settle every wallet's bet on them.
+
+    Wallets betting from the constant signal are settled once per batch
+    from the outcome counts, as population.Population prices them; the
+    others bet and are told the outcome round by round.
+
+    Args:
+      num_rounds: int, number of rounds.
+    """
+    nets = [outcome.net for outcome in self.outcomes]
+    kinds = [outcome.kind for outcome in self.outcomes]
+    flat = []
+    stepped = []
+    for player_wallet in self.wallets:
+      betting_strategy = player_wallet.betting_strategy
+      if betting_strategy.signal == 'constant':
+        flat.append((player_wallet, betting_strategy))
+      else:
+        stepped.append((player_wallet, betting_strategy))
+
+    bet_kwargs = {'shoe': None, 'num_hands': self.num_rounds}
+    remaining = num_rounds
+    while remaining:
+      batch = min(remaining, self.batch_rounds)
+      remaining -= batch
+      samples = self.table.Sample(batch, self.rng)
+      counts = [0] * len(nets)
+      for index in samples:
+        counts[index] += 1
+      for outcome, count in zip(self.outcomes, counts):
+        self.outcome_counts[outcome] += count
+
+      if flat:
+        batch_net = sum(count * net for count, net in zip(counts, nets))
+        wins = sum(count for count, kind in zip(counts, kinds)
+                   if kind in (WIN, BLACKJACK))
+        blackjacks = sum(count for count, kind in zip(counts, kinds)
+                         if kind == BLACKJACK)
+        losses = sum(count for count, kind in zip(counts, kinds)
+                     if kind == LOSS)
+        ties = sum(count for count, kind in zip(counts, kinds)
+                   if kind == TIE)
+        for player_wallet, betting_strategy in flat:
+          bet, multiplier = betting_strategy.BetForSignal(None)
+          player_wallet.money_units += bet * batch_net
+          record = betting_strategy.multiplier_record.get(multiplier)
+          if record is None:
+            record = betting_strategy.multiplier_record[multiplier] = (
+                stats.WinLossTie())
+          record.win += wins
+          record.win_blackjack += blackjacks
+          record.loss += losses
+          record.tie += ties
+
+      if stepped:
+        for index in samples:
+          net = nets[index]
+          kind = kinds[index]
+          for player_wallet, betting_strategy in stepped:
+            player_wallet.money_units += (
+                betting_strategy.GetBetAmount(**bet_kwargs) * net)
+            if kind == WIN:
+              betting_strategy.ProcessWin()
+            elif kind == LOSS:
+              betting_strategy.ProcessLoss()
+            elif kind == TIE:
+              betting_strategy.ProcessTie()
+            else:
+              betting_strategy.ProcessWin(blackjack=True)
+          bet_kwargs['num_hands'] += 1
+      self.num_rounds += batch
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--num-rounds', type=int, default=1000000,
+                      help='Number of rounds to sample.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the sampler.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  config = simulation.DEFAULT_GAME_CONFIG
+  rules = config.rules
+  distribution = GetDistribution(config)
+  print '== Outcome Distribution =='
+  for outcome in sorted(distribution.probabilities):
+    print '%-10s x%-3d %8.1f %10.3e' % (outcome.kind, outcome.multiplier,
+                                        outcome.net,
+                                        distribution.probabilities[outcome])
+  print 'EV: %.5f [units/hand]' % distribution.Ev()
+  print '=========================='
+
+  wallets = [
+      wallet.Wallet('Table Minimum',
+                    strategy.StrategyTableMinimum(rules.min_money_units)),
+      wallet.Wallet('Progressive',
+                    strategy.StrategyProgressive(rules.min_money_units,
+                                                 rules.max_money_units))]
+  sampler = OutcomeSampler(distribution, wallets,
+                           rng=random.Random(args.seed))
+  start = time.time()
+  sampler.Play(args.num_rounds)
+  elapsed = time.time() - start
+  print 'Sampled %d rounds in %.2f s (%.0f rounds/s)' % (
+      args.num_rounds, elapsed, args.num_rounds / max(elapsed, 1e-9))
+  for player_wallet in wallets:
+    print '%-25s Units: %10.1f  Rate: %0.4f [units/hand]' % (
+        player_wallet.name, player_wallet.money_units,
+        player_wallet.money_units / float(args.num_rounds))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,86 @@
+import outcome_sampling
+import random
+import round_ev
+import simulation
+import strategy
+import unittest
+import wallet
+
+
+CONFIG = simulation.DEFAULT_GAME_CONFIG
+
+
+class OutcomeDistributionTest(unittest.TestCase):
+  def setUp(self):
+    self.distribution = outcome_sampling.GetDistribution(CONFIG)
+
+  def test_probabilities_sum_to_one(self):
+    self.assertAlmostEqual(1.0, sum(self.distribution.probabilities.values()))
+
+  def test_blackjack_probability(self):
+    # Infinite deck: 2 * P(ace) * P(ten) * (1 - P(dealer blackjack)).
+    ace, ten = 1 / 13.0, 4 / 13.0
+    dealer_blackjack = ace * ten * 2
+    outcome = outcome_sampling.Outcome(outcome_sampling.BLACKJACK, 1,
+                                       CONFIG.rules.blackjack_win_multiplier)
+    self.assertAlmostEqual(2 * ace * ten * (1 - dealer_blackjack),
+                           self.distribution.probabilities[outcome])
+
+  def test_ev_near_finite_shoe(self):
+    calculator = round_ev.RoundEvCalculator(
+        CONFIG.rules, simulation.GetPlayStrategy(CONFIG))
+    finite = calculator.RoundEv(
+        outcome_sampling.FullShoeComposition(CONFIG.rules))
+    # Only card removal separates the two.
+    self.assertAlmostEqual(finite, self.distribution.Ev(), delta=0.005)
+
+  def test_cached(self):
+    self.assertIs(self.distribution, outcome_sampling.GetDistribution(CONFIG))
+
+
+class AliasTableTest(unittest.TestCase):
+  def test_frequencies(self):
+    weights = [0.5, 0.0, 0.3, 0.2]
+    table = outcome_sampling.AliasTable(weights)
+    samples = table.Sample(40000, random.Random(1))
+    for index, weight in enumerate(weights):
+      self.assertAlmostEqual(weight, samples.count(index) / 40000.0,
+                             delta=0.01)
+
+
+class OutcomeSamplerTest(unittest.TestCase):
+  def test_wallets_follow_outcomes(self):
+    flat = wallet.Wallet('Flat', strategy.StrategyTableMinimum(2))
+    progressive = wallet.Wallet('Progressive',
+                                strategy.StrategyProgressive(1, 20))
+    sampler = outcome_sampling.OutcomeSampler(
+        outcome_sampling.GetDistribution(CONFIG), [flat, progressive],
+        rng=random.Random(2), batch_rounds=700)
+    sampler.Play(5000)
+    sampler.Play(1000)
+
+    self.assertEqual(6000, sampler.num_rounds)
+    self.assertEqual(6000, sum(sampler.outcome_counts.values()))
+    self.assertAlmostEqual(
+        2 * sum(outcome.net * count for outcome, count in
+                sampler.outcome_counts.iteritems()), flat.money_units)
+    for player_wallet in (flat, progressive):
+      records = player_wallet.betting_strategy.multiplier_record.values()
+      self.assertEqual(6000, sum(record.win + record.loss + record.tie
+                                 for record in records))
+    blackjacks = sum(count for outcome, count in
+                     sampler.outcome_counts.iteritems()
+                     if outcome.kind == outcome_sampling.BLACKJACK)
+    self.assertEqual(blackjacks, sum(
+        record.win_blackjack for record in
+        progressive.betting_strategy.multiplier_record.values()))
+
+  def test_rejects_shoe_strategies(self):
+    counting = wallet.Wallet('Count', strategy.StrategyCount(1, 20))
+    self.assertRaises(outcome_sampling.OutcomeSamplingException,
+                      outcome_sampling.OutcomeSampler,
+                      outcome_sampling.GetDistribution(CONFIG), [counting])
+
+
+if __name__ == '__main__':
+  unittest.main()
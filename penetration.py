@@ -0,0 +1,244 @@
+""" Penetration studies from one pass over the shoes.
+
+How deep the cut card sits changes what a counter earns. The cards dealt
+up to a depth do not depend on where the cut card is deeper in the shoe,
+so a shoe dealt to the deepest cut card of interest holds the rounds of
+every shallower one: a round is dealt under a cut card exactly when the
+cards played before it are no more than the cut card location, as
+Shoe.IsFinished decides.
+
+Every shoe is dealt to the deepest penetration and the result of every
+round is added to sums by the depth the round started at. Running sums over
+the depths then give the results of every cut card at once. Shoes are
+shuffled from the same random numbers whichever the cut card (the random
+stop is still drawn, then moved), so the numbers for one cut card are those
+of a game with that cut card.
+
+Betting strategies should bet on the shoe only, such as count ramps: a
+strategy betting on previous results sees the rounds past the shallower
+cut cards too.
+
+Run directly for a table of results per penetration:
+
+  python penetration.py --shoes 2000 --penetrations 60 65 70 75 80 85
+"""
+import argparse
+import array
+import collections
+
+import count_atlas
+import shoe
+import simulation
+
+# Flat and true count ramp wallets, see simulation.NewWallets.
+DEFAULT_WALLET_SPECS = [
+    {'name': 'flat', 'strategy': 'table_minimum',
+     'params': {'table_minimum': 1}},
+    {'name': 'ramp', 'strategy': 'ramp',
+     'params': {'ramp': [[1, 1], [2, 2], [3, 4], [4, 6], [5, 8]]}},
+]
+
+# Deepest penetration studied, in percent. Deeper shoes may run out of
+# cards during a round.
+MAX_PENETRATION = 90
+
+
+class PenetrationException(Exception):
+  """Base exception."""
+
+
+class DepthSums(object):
+  """Rounds and money units won, summed by the depth rounds started at.
+
+  Attributes:
+    wallet_names: [str], wallets in sums order.
+    num_rounds: array.array, rounds per depth.
+    totals: [array.array], per wallet money units won per depth.
+    totals_squared: [array.array], per wallet sum of squared money units
+        won per round, per depth.
+    num_shoes: int, shoes dealt.
+  """
+
+  def __init__(self, wallet_names, shoe_size):
+    self.wallet_names = list(wallet_names)
+    self.num_rounds = array.array('l', [0]) * (shoe_size + 1)
+    self.totals = [array.array('d', [0.0]) * (shoe_size + 1)
+                   for _ in wallet_names]
+    self.totals_squared = [array.array('d', [0.0]) * (shoe_size + 1)
+                           for _ in wallet_names]
+    self.num_shoes = 0
+
+  def Merge(self, other):
+    """Add the sums of other, over the same wallets and shoe size."""
+    for depth, num in enumerate(other.num_rounds):
+      self.num_rounds[depth] += num
+    for mine, theirs in zip(self.totals + self.totals_squared,
+                            other.totals + other.totals_squared):
+      for depth, total in enumerate(theirs):
+        mine[depth] += total
+    self.num_shoes += other.num_shoes
+
+
+def PenetrationTask(task):
+  """Worker entry point. Deal shoes to the deepest cut card.
+
+  Args:
+    task: (GameConfig, int, int, int, [dict]), game config, seed, number of
+        shoes, deepest cut card location and wallet specs, see
+        simulation.NewWallets.
+
+  Returns:
+    DepthSums, results by depth.
+  """
+  config, seed, num_shoes, stop_location, wallet_specs = task
+  wallets = simulation.NewWallets(wallet_specs)
+  blackjack_game = simulation.NewGame(config, seed, wallets=wallets)
+  current_shoe = blackjack_game.shoe
+  sums = DepthSums([new_wallet.name for new_wallet in wallets],
+                   shoe.Shoe.NUM_CARDS_PER_DECK * config.rules.num_decks)
+  wallet_sums = zip(wallets, sums.totals, sums.totals_squared)
+
+  for index in xrange(num_shoes):
+    if index:
+      current_shoe.Reset()
+    current_shoe.stop_location = stop_location
+    while not current_shoe.IsFinished():
+      depth = current_shoe.GetNumCardsPlayed()
+      before = [new_wallet.money_units for new_wallet in wallets]
+      blackjack_game.PlayRound()
+      sums.num_rounds[depth] += 1
+      for (new_wallet, totals, totals_squared), start in zip(wallet_sums,
+                                                             before):
+        won = new_wallet.money_units - start
+        totals[depth] += won
+        totals_squared[depth] += won * won
+  sums.num_shoes = num_shoes
+  return sums
+
+
+PenetrationResult = collections.namedtuple(
+    'PenetrationResult', ['penetration', 'cut_card', 'num_shoes',
+                          'num_rounds', 'money_units', 'rates', 'stdevs'])
+
+
+def Results(sums, num_decks, penetrations):
+  """Returns the results of every cut card from the sums by depth.
+
+  Args:
+    sums: DepthSums, results by depth.
+    num_decks: int, number of decks in the shoe.
+    penetrations: [float], percent of the shoe dealt before the shuffle.
+
+  Returns:
+    [PenetrationResult], per penetration, in order. money_units, rates and
+        stdevs are dicts by wallet name of the units won, the mean and the
+        standard deviation of the units won per round.
+  """
+  cumulative_rounds = [0]
+  for num in sums.num_rounds:
+    cumulative_rounds.append(cumulative_rounds[-1] + num)
+  cumulative = []
+  for depth_sums in sums.totals + sums.totals_squared:
+    running = [0.0]
+    for total in depth_sums:
+      running.append(running[-1] + total)
+    cumulative.append(running)
+
+  num_wallets = len(sums.wallet_names)
+  results = []
+  for penetration in penetrations:
+    cut_card = count_atlas.CutCard(num_decks, penetration)
+    num_rounds = cumulative_rounds[cut_card + 1]
+    money_units, rates, stdevs = {}, {}, {}
+    for index, name in enumerate(sums.wallet_names):
+      total = cumulative[index][cut_card + 1]
+      total_squared = cumulative[num_wallets + index][cut_card + 1]
+      rate = total / max(num_rounds, 1)
+      money_units[name] = total
+      rates[name] = rate
+      stdevs[name] = max(total_squared / max(num_rounds, 1) - rate * rate,
+                         0.0) ** 0.5
+    results.append(PenetrationResult(
+        penetration=penetration, cut_card=cut_card, num_shoes=sums.num_shoes,
+        num_rounds=num_rounds, money_units=money_units, rates=rates,
+        stdevs=stdevs))
+  return results
+
+
+def Study(penetrations, num_shoes, config=simulation.DEFAULT_GAME_CONFIG,
+          wallet_specs=None, seed=0, num_workers=None, num_batches=None):
+  """Results of several cut cards, from one pass over the shoes.
+
+  Args:
+    penetrations: [float], percent of the shoe dealt before the shuffle.
+    num_shoes: int, shoes dealt.
+    config: simulation.GameConfig, game to simulate.
+    wallet_specs: [dict], wallets compared, see simulation.NewWallets. None
+        uses DEFAULT_WALLET_SPECS.
+    seed: int, seed of the first batch; batch i uses seed + i.
+    num_workers: int, worker processes. None uses one per cpu.
+    num_batches: int, batches the shoes are split over. None uses one per
+        worker.
+
+  Returns:
+    [PenetrationResult], per penetration, see Results.
+
+  Raises:
+    PenetrationException: Penetration out of range.
+  """
+  for penetration in penetrations:
+    if not 0 < penetration <= MAX_PENETRATION:
+      raise PenetrationException('Penetration %s outside (0, %d]' % (
+          penetration, MAX_PENETRATION))
+  if wallet_specs is None:
+    wallet_specs = DEFAULT_WALLET_SPECS
+  if num_batches is None:
+    num_batches = num_workers or simulation.multiprocessing.cpu_count()
+
+  num_decks = config.rules.num_decks
+  stop_location = count_atlas.CutCard(num_decks, max(penetrations))
+  tasks = [(config, seed + index, batch_shoes, stop_location, wallet_specs)
+           for index, batch_shoes in enumerate(
+               simulation.SplitRounds(num_shoes, num_batches))]
+  merged = None
+  for sums in simulation.RunTasks(PenetrationTask, tasks, num_workers):
+    if merged is None:
+      merged = sums
+    else:
+      merged.Merge(sums)
+  return Results(merged, num_decks, penetrations)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--shoes', type=int, default=2000,
+                      help='Shoes dealt.')
+  parser.add_argument('--penetrations', type=float, nargs='+',
+                      default=[60, 65, 70, 75, 80, 85],
+                      help='Percent of the shoe dealt before the shuffle.')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the shoes.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  results = Study(args.penetrations, args.shoes, seed=args.seed,
+                  num_workers=args.workers)
+  names = sorted(results[0].rates)
+  print '%6s %8s %12s' % ('Pen.', 'Cut card', 'Rounds/shoe'),
+  print ' '.join(['%18s' % name for name in names])
+  for result in results:
+    print '%5.1f%% %8d %12.2f' % (
+        result.penetration, result.cut_card,
+        float(result.num_rounds) / max(result.num_shoes, 1)),
+    print ' '.join(['%9.4f+-%.4f' % (
+        result.rates[name],
+        result.stdevs[name] / max(result.num_rounds, 1) ** 0.5)
+                    for name in names])
+
+
+if __name__ == '__main__':
+  main()
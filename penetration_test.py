@@ -0,0 +1,56 @@
+import count_atlas
+import penetration
+import simulation
+import unittest
+
+
+class PenetrationTest(unittest.TestCase):
+  def setUp(self):
+    self.config = simulation.DEFAULT_GAME_CONFIG
+
+  def Reference(self, cut_card, num_shoes, seed):
+    """Returns (rounds, {wallet: units}) of a game with a fixed cut card."""
+    wallets = simulation.NewWallets(penetration.DEFAULT_WALLET_SPECS)
+    blackjack_game = simulation.NewGame(self.config, seed, wallets=wallets)
+    num_rounds = 0
+    for index in xrange(num_shoes):
+      if index:
+        blackjack_game.shoe.Reset()
+      blackjack_game.shoe.stop_location = cut_card
+      while not blackjack_game.shoe.IsFinished():
+        blackjack_game.PlayRound()
+        num_rounds += 1
+    return num_rounds, dict((new_wallet.name, new_wallet.money_units)
+                            for new_wallet in wallets)
+
+  def test_matches_games_with_each_cut_card(self):
+    penetrations = [60, 72.5, 85]
+    results = penetration.Study(penetrations, 30, config=self.config,
+                                seed=4, num_workers=1, num_batches=1)
+    self.assertEqual([result.penetration for result in results],
+                     penetrations)
+    for result in results:
+      cut_card = count_atlas.CutCard(self.config.rules.num_decks,
+                                     result.penetration)
+      self.assertEqual(result.cut_card, cut_card)
+      num_rounds, money_units = self.Reference(cut_card, 30, seed=4)
+      self.assertEqual(result.num_rounds, num_rounds)
+      for name, units in money_units.iteritems():
+        self.assertAlmostEqual(result.money_units[name], units)
+
+  def test_batches_merge(self):
+    single = penetration.Study([70, 80], 20, seed=1, num_workers=1,
+                               num_batches=1)
+    split = penetration.Study([70, 80], 20, seed=1, num_workers=1,
+                              num_batches=2)
+    self.assertEqual([result.num_shoes for result in split], [20, 20])
+    self.assertLess(split[0].num_rounds, split[1].num_rounds)
+    self.assertLess(single[0].num_rounds, single[1].num_rounds)
+
+  def test_rejects_deep_cut(self):
+    self.assertRaises(penetration.PenetrationException, penetration.Study,
+                      [70, 95], 10)
+
+
+if __name__ == '__main__':
+  unittest.main()
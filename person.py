@@ -4,6 +4,8 @@ Dealer: Must adhere to casino rules, has no money and places no bets.
 Player: Will adhere to a play strategy and betting strategy.
         Has money and places bets.
 """
+import dealer_automaton
+import events
 import hand
 import play_strategy
 import stats
@@ -12,8 +14,11 @@ import wallet
 
 
 class Person(object):
-  def __init__(self, name=''):
+  def __init__(self, name='', event_bus=None):
     self.name = name
+    if event_bus is None:
+      event_bus = events.EventBus()
+    self.events = event_bus
     self.stats = stats.WinLossTie()
     self.action_stats = stats.ActionStats()
     self.blackjack_tie = 0
@@ -43,39 +48,44 @@ class Person(object):
 
 class Dealer(Person):
   """The dealer at the table."""
-  def __init__(self, rules, name=''):
+  def __init__(self, rules, name='', event_bus=None):
     """Constructor.
 
     Args:
       rules: table_rules.TableRules, rules at the table.
+      event_bus: events.EventBus, receives dealer_draw events.
     """
-    super(Dealer, self).__init__(name)
+    super(Dealer, self).__init__(name, event_bus)
     self.table_rules = rules
+    self.automaton = dealer_automaton.GetAutomaton(rules)
+    self.bust_code = dealer_automaton.FinalCode(dealer_automaton.BUST)
 
   def Play(self, shoe, current_hand):
     """Play the dealer current hand.
 
     Dealer hits on everything lower than 16, depending on the table rules will
-    hit or stand on soft 17, and will stand on everything 18-21.
+    hit or stand on soft 17, and will stand on everything 18-21. The rule is
+    read from the dealer_automaton transition table of the table rules.
 
     Args:
       shoe: Shoe, the table shoe. Used to get cards.
       current_hand: Hand, dealers current hand.
     """
-    while True:
-      if not current_hand.IsActive():
-        self.action_stats.bust += 1
-        break
-
-      if current_hand.GetValue() < 17:
-        current_hand.AddCard(shoe.GetCard())
-        self.action_stats.hit += 1
-      elif self.table_rules.hit_on_soft_17 and current_hand.IsSoft(17):
-        current_hand.AddCard(shoe.GetCard())
-        self.action_stats.hit += 1
-      else:
-        self.action_stats.stand += 1
-        break
+    steps = self.automaton.steps
+    state = self.automaton.StateOf(current_hand.cards)
+    handler = self.events.dealer_draw
+    while state >= 0:
+      new_card = shoe.GetCard()
+      current_hand.AddCard(new_card)
+      self.action_stats.hit += 1
+      if handler is not None:
+        handler(new_card)
+      state = steps[state + new_card.value]
+
+    if state == self.bust_code:
+      self.action_stats.bust += 1
+    else:
+      self.action_stats.stand += 1
 
 
 class PlayerException(Exception):
@@ -89,13 +99,14 @@ class Player(Person):
   WALLET_COUNT_BASIC = 'Count Basic'
   WALLET_BJ_OPTIMIZED = 'Blackjack Optimized'
 
-  def __init__(self, rules, play_strategy, name=''):
+  def __init__(self, rules, play_strategy, name='', event_bus=None):
     """Constructor.
 
     Args:
       rules: table_rules.TableRules, rules of the table.
+      event_bus: events.EventBus, receives bet_placed and action_taken events.
     """
-    super(Player, self).__init__(name)
+    super(Player, self).__init__(name, event_bus)
 
     # Player needs to know about the rules in order to play and bet.
     self.table_rules = rules
@@ -137,16 +148,56 @@ class Player(Person):
       raise PlayerException('Wallet %s already created' % new_wallet)
 
     self.wallets[new_wallet.name] = new_wallet
+    new_wallet.betting_strategy.Listen(self.events)
+
+  def ClearWallets(self):
+    """Remove every wallet."""
+    for old_wallet in self.wallets.itervalues():
+      old_wallet.betting_strategy.Unlisten(self.events)
+    self.wallets = {}
 
-  def PlaceBets(self, current_hand, **kwargs):
+  def PlaceBets(self, current_hand, bet_kwargs):
     """Bet some money units on the current hand.
     
     Args:
       current_hand: Hand, the current hand to place a bet on.
-      kwargs: dict, Useful variables when placing a bet.
+      bet_kwargs: dict, Useful variables when placing a bet, passed on as is
+          to every wallet.
+    """
+    handler = self.events.bet_placed
+    for active_wallet in self.wallets.itervalues():
+      active_wallet.PlaceBet(current_hand, bet_kwargs)
+      if handler is not None:
+        handler(active_wallet.name, current_hand.bets[-1])
+
+  def OfferInsurance(self, current_hand, shoe):
+    """The dealer shows an Ace. Place side bets offered after the up card.
+
+    Args:
+      current_hand: Hand, the current hand.
+      shoe: Shoe, the table shoe, holding every card not yet seen.
     """
     for active_wallet in self.wallets.itervalues():
-      active_wallet.PlaceBet(current_hand, **kwargs)
+      if active_wallet.side_bets:
+        active_wallet.PlaceSideBets(current_hand, shoe, after_up_card=True)
+
+  def SettleSideBets(self, current_hand, dealer_hand, identities):
+    """Pay out the side bets of a freshly dealt hand.
+
+    Args:
+      current_hand: Hand, the players first two cards.
+      dealer_hand: Hand, the dealers up and hole cards.
+      identities: (int), suited identities of the four cards, None if the
+          shoe does not track suits.
+
+    Raises:
+      PlayerException: Unknown/missing wallet.
+    """
+    for side_bet, bet in current_hand.side_bets:
+      if bet.wallet_name not in self.wallets:
+        raise PlayerException('Side bet missing wallet named: %s' % bet.wallet_name)
+      self.wallets[bet.wallet_name].SettleSideBet(
+          side_bet, bet, side_bet.Payout(current_hand, dealer_hand, identities))
 
   def _UpdateBetsSplitAction(self, current_hand, split_hand):
     """Add same bet to split hand.
@@ -161,7 +212,8 @@ class Player(Person):
         raise PlayerException('Double bet missing wallet named: %s' % bet.wallet_name)
 
       self.wallets[bet.wallet_name].money_units -= bet.money_units
-      split_hand.AddBet(bet)
+      # A bet of its own, so doubling one hand leaves the other alone.
+      split_hand.AddBet(wallet.Bet(bet.wallet_name, bet.money_units))
 
   def _UpdateBetsDoubleAction(self, current_hand):
     """Double current hand bet.
@@ -255,6 +307,28 @@ class Player(Person):
     for active_wallet in self.wallets.itervalues():
       active_wallet.betting_strategy.ProcessLoss()
 
+  def Surrender(self, current_hand):
+    """Hand surrendered. Half of every bet comes back.
+
+    Args:
+      current_hand: Hand, the surrendered hand.
+
+    Raises:
+      PlayerException: Unknown/missing wallet.
+    """
+    super(Player, self).Loss()
+
+    for bet in current_hand.bets:
+      # Sanity check for wallet to pay.
+      if bet.wallet_name not in self.wallets:
+        raise PlayerException('Surrendered bet. Missing wallet named: %s' % bet.wallet_name)
+
+      self.wallets[bet.wallet_name].money_units += bet.money_units * 0.5
+
+    # Inform betting strategy of loss.
+    for active_wallet in self.wallets.itervalues():
+      active_wallet.betting_strategy.ProcessLoss()
+
   def Play(self, current_shoe, current_hand, dealer_top_card):
     """Play the current hand.
 
@@ -270,35 +344,39 @@ class Player(Person):
     for my_hand in hands:
       while True:
         # Hand busted.
-        if not current_hand.IsActive():
+        if not my_hand.IsActive():
           self.action_stats.bust += 1
           break
 
         # Get appropriate action from play strategy.
-        action = self.play_strategy.GetAction(current_hand, dealer_top_card, len(hands))
+        action = self.play_strategy.GetAction(my_hand, dealer_top_card,
+                                              len(hands), current_shoe)
+        handler = self.events.action_taken
+        if handler is not None:
+          handler(my_hand, action)
 
         # Act upon action.
         if action == play_strategy.Action.STAND:
           self.action_stats.stand += 1
           break
         elif action == play_strategy.Action.HIT:
-          current_hand.AddCard(current_shoe.GetCard())
+          my_hand.AddCard(current_shoe.GetCard())
           self.action_stats.hit += 1
         elif action == play_strategy.Action.DOUBLE:
-          self._UpdateBetsDoubleAction(current_hand)
-          current_hand.AddCard(current_shoe.GetCard())
+          self._UpdateBetsDoubleAction(my_hand)
+          my_hand.AddCard(current_shoe.GetCard())
           self.action_stats.double += 1
         elif action == play_strategy.Action.SPLIT:
-          split_hand = hand.Hand([current_hand.Split()])
-          current_hand.AddCard(current_shoe.GetCard())
+          split_hand = hand.Hand([my_hand.Split()])
+          my_hand.AddCard(current_shoe.GetCard())
 
-          self._UpdateBetsSplitAction(current_hand, split_hand)
+          self._UpdateBetsSplitAction(my_hand, split_hand)
           split_hand.AddCard(current_shoe.GetCard())
           hands.append(split_hand)
 
           self.action_stats.split += 1
         else:
-          raise PersonException('Unknown action: %s for hand: %s' % (
-            action, current_hand))
+          raise PlayerException('Unknown action: %s for hand: %s' % (
+            action, my_hand))
 
     return hands
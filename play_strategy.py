@@ -1,12 +1,17 @@
 """ Playing strategy.
 
-Rules to STAND, HIT, DOUBLE, or SPLIT based on your hand.
+Rules to STAND, HIT, DOUBLE, or SPLIT based on your hand, and when to
+SURRENDER where the table allows it.
+
+Strategies are YAML files, loaded through their compiled form in the
+strategy catalog (see strategy_catalog).
 
 """
 import os
 import card
 import hand
-import yaml
+import strategy_catalog
+import table_rules
 from enum import Enum
 
 
@@ -15,32 +20,69 @@ class Action(Enum):
   HIT = 1
   DOUBLE = 2
   SPLIT = 3
+  SURRENDER = 4
 
 
 class PlayStrategyException(Exception):
   """Base exception."""
 
 
+# Actions by value, as compiled strategies store them.
+ACTIONS = dict((action.value, action) for action in Action)
+
+# Two card hard hands surrendered by basic strategy, as (value, dealer up
+# card value). Strategy files do not cover surrender.
+LATE_SURRENDER_HANDS = frozenset([(15, 10), (16, 9), (16, 10), (16, 11)])
+LATE_SURRENDER_HIT_SOFT_17_HANDS = LATE_SURRENDER_HANDS | frozenset(
+    [(15, 11), (17, 11)])
+EARLY_SURRENDER_HANDS = frozenset(
+    [(value, 11) for value in (5, 6, 7, 12, 13, 14, 15, 16, 17)] +
+    [(14, 10), (15, 10), (16, 10), (16, 9)])
+
+
+def SurrenderHands(rules):
+  """Returns the hands basic strategy surrenders at a table.
+
+  Args:
+    rules: table_rules.TableRules, rules at the table.
+
+  Returns:
+    frozenset, (hard hand value, dealer up card value) of the two card hands
+        to surrender. Empty without surrender.
+  """
+  if rules.surrender == table_rules.EARLY_SURRENDER:
+    return EARLY_SURRENDER_HANDS
+  if rules.surrender == table_rules.LATE_SURRENDER:
+    if rules.hit_on_soft_17:
+      return LATE_SURRENDER_HIT_SOFT_17_HANDS
+    return LATE_SURRENDER_HANDS
+  return frozenset()
+
+
 # TODO(self): Make unit testable by passing stream instead of filename.
 class PlayStrategy(object):
   # Available strategies.
   YAML_FOUR_DECK_HIT_SOFT_17 = os.path.join(
-      '/', 'home', 'matthewbstokes','Blackjack',
+      strategy_catalog.DEFAULT_DIRECTORY,
       'play_strat_four_deck_hit_soft_17.yaml')
 
-  def __init__(self, table_rules, yaml_file=YAML_FOUR_DECK_HIT_SOFT_17):
+  def __init__(self, table_rules, yaml_file=None):
     """Constructor.
 
     Args:
-      yaml_file: str, YAML filepath.
       table_rules: CasinoRules, Rules in the Casino.
+      yaml_file: str, YAML filepath. None finds the strategy matching the
+          rules in the strategy catalog.
 
     Raises:
       IOError: YAML file does not exist.
       PlayStrategyException: Strategy does not match casino rules.
     """
     self.table_rules = table_rules
-    self.LoadStrategy(yaml_file)
+    if yaml_file is None:
+      self.FindAndLoadStrategy(table_rules)
+    else:
+      self.LoadStrategy(yaml_file)
 
   def LoadStrategy(self, yaml_file):
     """Load strategy from YAML file.
@@ -52,7 +94,16 @@ class PlayStrategy(object):
       IOError: YAML file does not exist
       PlayStrategyException: Strategy does not match casino rules.
     """
-    strategy = yaml.load(open(yaml_file))
+    try:
+      compiled = strategy_catalog.LoadCompiled(yaml_file)
+    except strategy_catalog.StrategyCatalogException as e:
+      raise PlayStrategyException(str(e))
+
+    # Same layout as the YAML, with tables indexed by
+    # [hand value][dealer up card value] and None for uncovered cells.
+    strategy = dict(compiled.rules)
+    for name, table in compiled.tables.iteritems():
+      strategy[name] = [[ACTIONS.get(value) for value in row] for row in table]
 
     if self.table_rules is not None:
       if (strategy['hit_on_soft_17'] != self.table_rules.hit_on_soft_17 or
@@ -70,17 +121,25 @@ class PlayStrategy(object):
 
     Args:
       table_rules: TableRules, Rules which define the table.
+
+    Raises:
+      PlayStrategyException: No strategy in the catalog matches the rules.
     """
-    # TODO(self): Add logic to find then load strategy.
-    pass
+    try:
+      yaml_file = strategy_catalog.GetCatalog().Find(table_rules)
+    except strategy_catalog.StrategyCatalogException as e:
+      raise PlayStrategyException(str(e))
+    self.LoadStrategy(yaml_file)
 
-  def GetAction(self, current_hand, dealer_top_card, num_split_hands=1):
+  def GetAction(self, current_hand, dealer_top_card, num_split_hands=1,
+                current_shoe=None):
     """Get player action based on strategy.
 
     Args:
       current_hand: Hand, Players hand.
       dealer_top_card: Card, Dealers face up card.
       num_split_hands: int, Number of currently active split hands.
+      current_shoe: Shoe, shoe being played. Unused by a fixed strategy.
 
     Returns:
       Action, action to take.
@@ -90,11 +149,23 @@ class PlayStrategy(object):
 
     if (current_hand.IsSplitable() and
         num_split_hands <= self.table_rules.max_num_split_hands):
-      strategy = self.strategy['split']
-    elif current_hand.IsSoft():
-      strategy = self.strategy['soft']
-    else:
-      strategy = self.strategy['hard']
+      return self.strategy['split'][current_hand.GetValue()][
+          dealer_top_card.value]
+
+    return self.LookupAction(current_hand.GetValue(), current_hand.IsSoft(),
+                             dealer_top_card.value)
+
+  def LookupAction(self, value, is_soft, dealer_value):
+    """Get player action for a hand that is not being split.
 
-    value = current_hand.GetValue()
-    return strategy[value][dealer_top_card.value]
+    Args:
+      value: int, value of the players hand.
+      is_soft: bool, True if the hand is soft.
+      dealer_value: int, value of the dealers face up card.
+
+    Returns:
+      Action, action to take.
+    """
+    if is_soft:
+      return self.strategy['soft'][value][dealer_value]
+    return self.strategy['hard'][value][dealer_value]
@@ -0,0 +1,301 @@
+""" Evaluating thousands of betting strategy variants in one pass.
+
+Every wallet at the table sees the same rounds, and a bet does not change
+how the hand is played, so a round pays each wallet its bet times the same
+result per unit. For a strategy whose bet only depends on one signal (the
+loss streak, a shoe bucket, ...) its whole run is therefore determined by,
+per value of the signal, the number of rounds, the sum and sum of squares
+of the results and the win/loss/tie counts.
+
+The population plays the game once with a single probe wallet and keeps
+those statistics per signal. The cost per round grows with the number of
+distinct signals, not the number of variants; each variant is priced once
+at the end from its BetForSignal table. Path dependent quantities, such as
+the lowest balance reached, cannot be recovered from these statistics.
+"""
+import collections
+
+import bet_ramp
+import simulation
+import stats
+import strategy
+import wallet
+
+
+class PopulationException(Exception):
+  """Base exception."""
+
+
+class LossStreakSignal(object):
+  """Number of losses since the last win, ties leave it unchanged."""
+
+  def __init__(self):
+    self.streak = 0
+
+  def Key(self, current_shoe):
+    return self.streak
+
+  def Update(self, result):
+    if result > 0:
+      self.streak = 0
+    elif result < 0:
+      self.streak += 1
+
+
+class ShoeSignal(object):
+  """Bucket of the shoe when the bet is placed."""
+
+  def __init__(self, bucket_function):
+    self.bucket_function = bucket_function
+
+  def Key(self, current_shoe):
+    return self.bucket_function(current_shoe)
+
+  def Update(self, result):
+    pass
+
+
+class ConstantSignal(object):
+  """The same key every round, for strategies which always bet the same."""
+
+  def Key(self, current_shoe):
+    return None
+
+  def Update(self, result):
+    pass
+
+
+def NewSignal(signal_name):
+  """Returns a fresh signal.
+
+  Args:
+    signal_name: str, one of SIGNAL_NAMES.
+
+  Raises:
+    PopulationException: Unknown signal.
+  """
+  if signal_name == 'constant':
+    return ConstantSignal()
+  elif signal_name == 'loss_streak':
+    return LossStreakSignal()
+  elif signal_name in strategy.BUCKET_FUNCTIONS:
+    return ShoeSignal(strategy.BUCKET_FUNCTIONS[signal_name])
+  raise PopulationException('Unknown signal: %s' % signal_name)
+
+SIGNAL_NAMES = ['constant', 'loss_streak'] + sorted(strategy.BUCKET_FUNCTIONS)
+
+
+class SignalStats(object):
+  """Round results and outcomes per value of a signal."""
+
+  def __init__(self):
+    self.histogram = bet_ramp.RoundHistogram()
+    self.outcomes = {}
+
+  def Add(self, key, result, blackjack=False):
+    """Record a round.
+
+    Args:
+      key: object, value of the signal when the bet was placed.
+      result: float, money units won per unit bet.
+      blackjack: bool, the round was won with a blackjack.
+    """
+    self.histogram.Add(key, result)
+    outcome = self.outcomes.get(key)
+    if outcome is None:
+      outcome = self.outcomes[key] = stats.WinLossTie()
+    if result > 0:
+      outcome.win += 1
+      if blackjack:
+        outcome.win_blackjack += 1
+    elif result < 0:
+      outcome.loss += 1
+    else:
+      outcome.tie += 1
+
+  def Merge(self, other):
+    """Add the rounds of another SignalStats to this one."""
+    self.histogram.Merge(other.histogram)
+    for key, other_outcome in other.outcomes.iteritems():
+      outcome = self.outcomes.get(key)
+      if outcome is None:
+        outcome = self.outcomes[key] = stats.WinLossTie()
+      outcome.win += other_outcome.win
+      outcome.win_blackjack += other_outcome.win_blackjack
+      outcome.loss += other_outcome.loss
+      outcome.tie += other_outcome.tie
+
+
+class _ProbeStrategy(strategy.BettingStrategy):
+  """Bets one unit and reads every signal at bet time."""
+
+  def __init__(self, signal_names):
+    super(_ProbeStrategy, self).__init__()
+    self.signals = [(name, NewSignal(name)) for name in signal_names]
+    self.keys = None
+    self.blackjack = False
+
+  def GetBetAmount(self, **kwargs):
+    current_shoe = kwargs['shoe']
+    self.keys = [signal.Key(current_shoe) for _, signal in self.signals]
+    self.blackjack = False
+    return 1
+
+  def ProcessWin(self, blackjack=False):
+    self.blackjack = blackjack
+
+  def ProcessLoss(self):
+    pass
+
+  def ProcessTie(self):
+    pass
+
+
+def PopulationTask(task):
+  """Worker entry point. Simulate rounds into per signal stats.
+
+  Args:
+    task: (GameConfig, int, int, [str]), game config, seed, number of rounds
+        and signal names.
+
+  Returns:
+    {str: SignalStats}, stats per signal name.
+  """
+  config, seed, num_rounds, signal_names = task
+  signal_stats = [SignalStats() for _ in signal_names]
+  for keys, result, blackjack in _PlayRounds(config, seed, num_rounds,
+                                             signal_names):
+    for key, signal_stat in zip(keys, signal_stats):
+      signal_stat.Add(key, result, blackjack)
+  return dict(zip(signal_names, signal_stats))
+
+
+def RecordRounds(config, seed, num_rounds, signal_names):
+  """Simulate rounds and keep the signal values and result of each.
+
+  Unlike PopulationTask the order of the rounds is kept, for path dependent
+  measures such as the risk of ruin.
+
+  Args:
+    config: simulation.GameConfig, game to simulate.
+    seed: int, seed of the shoe.
+    num_rounds: int, number of rounds.
+    signal_names: [str], signals to record.
+
+  Returns:
+    ({str: [object]}, [float]), value of each signal per round and money
+        units won per unit bet per round.
+  """
+  keys = [[] for _ in signal_names]
+  results = []
+  for round_keys, result, _ in _PlayRounds(config, seed, num_rounds,
+                                           signal_names):
+    for key, signal_keys in zip(round_keys, keys):
+      signal_keys.append(key)
+    results.append(result)
+  return dict(zip(signal_names, keys)), results
+
+
+def _PlayRounds(config, seed, num_rounds, signal_names):
+  """Yield (signal values, result per unit, won with blackjack) per round."""
+  probe = _ProbeStrategy(signal_names)
+  probe_wallet = wallet.Wallet('Probe', probe)
+  blackjack_game = simulation.NewGame(config, seed, wallets=[probe_wallet])
+  for _ in xrange(num_rounds):
+    start = probe_wallet.money_units
+    simulation.PlayRound(blackjack_game)
+    result = probe_wallet.money_units - start
+    yield probe.keys, result, probe.blackjack
+    for _, signal in probe.signals:
+      signal.Update(result)
+
+
+class VariantResult(collections.namedtuple(
+    'VariantResult', ['money_units', 'num_rounds', 'rate', 'stdev',
+                      'total_bet', 'multiplier_record'])):
+  """Result of one variant: final money units, rounds played, mean and
+  standard deviation of money units won per round, total money units bet and
+  stats.WinLossTie per multiplier."""
+
+
+class Population(object):
+  """A population of betting strategies evaluated on the same rounds."""
+
+  def __init__(self, strategies):
+    """Constructor.
+
+    Args:
+      strategies: [BettingStrategy], variants. Each must bet from a signal.
+
+    Raises:
+      PopulationException: A strategy does not bet from a signal.
+    """
+    self.strategies = list(strategies)
+    for variant in self.strategies:
+      if variant.signal not in SIGNAL_NAMES:
+        raise PopulationException('%s does not bet from a known signal' %
+                                  type(variant).__name__)
+    self.signal_names = sorted(set([variant.signal
+                                    for variant in self.strategies]))
+    self.signal_stats = dict((name, SignalStats())
+                             for name in self.signal_names)
+
+  def Play(self, num_rounds, config=simulation.DEFAULT_GAME_CONFIG,
+           num_workers=None, num_batches=None, seed=0):
+    """Simulate rounds and add them to the population.
+
+    Args:
+      num_rounds: int, total number of rounds.
+      config: simulation.GameConfig, game to simulate.
+      num_workers: int, worker processes. None uses one per cpu.
+      num_batches: int, independent games the rounds are split over. None
+          uses one per worker.
+      seed: int, seed of the first batch; batch i uses seed + i.
+    """
+    if num_batches is None:
+      num_batches = num_workers or simulation.multiprocessing.cpu_count()
+    tasks = [(config, seed + index, batch_rounds, self.signal_names)
+             for index, batch_rounds in enumerate(
+                 simulation.SplitRounds(num_rounds, num_batches))]
+    for batch_stats in simulation.RunTasks(PopulationTask, tasks,
+                                           num_workers):
+      for name, signal_stat in batch_stats.iteritems():
+        self.signal_stats[name].Merge(signal_stat)
+
+  def Results(self):
+    """Price every variant.
+
+    Returns:
+      [VariantResult], result per strategy, in population order.
+    """
+    results = []
+    for variant in self.strategies:
+      signal_stat = self.signal_stats[variant.signal]
+      histogram = signal_stat.histogram
+      money_units = 0.0
+      total_squared = 0.0
+      total_bet = 0.0
+      num_rounds = 0
+      multiplier_record = {}
+      for key, key_rounds in histogram.num_rounds.iteritems():
+        bet, multiplier = variant.BetForSignal(key)
+        money_units += bet * histogram.total[key]
+        total_squared += bet * bet * histogram.total_squared[key]
+        total_bet += bet * key_rounds
+        num_rounds += key_rounds
+
+        outcome = signal_stat.outcomes[key]
+        record = multiplier_record.get(multiplier)
+        if record is None:
+          record = multiplier_record[multiplier] = stats.WinLossTie()
+        record.win += outcome.win
+        record.win_blackjack += outcome.win_blackjack
+        record.loss += outcome.loss
+        record.tie += outcome.tie
+
+      rate = money_units / max(num_rounds, 1)
+      variance = max(total_squared / max(num_rounds, 1) - rate * rate, 0.0)
+      results.append(VariantResult(money_units, num_rounds, rate,
+                                   variance ** 0.5, total_bet,
+                                   multiplier_record))
+    return results
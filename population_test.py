@@ -0,0 +1,45 @@
+import population
+import simulation
+import strategy
+import unittest
+import wallet
+
+
+class PopulationTest(unittest.TestCase):
+  def NewStrategies(self):
+    return [strategy.StrategyTableMinimum(1),
+            strategy.StrategyProgressive(1, 20),
+            strategy.StrategyProgressive(1, 20, reset_after_max=True),
+            strategy.StrategyProgressive(2, 6, reset_after_max=True),
+            strategy.StrategyCount(1, 20),
+            strategy.StrategyRamp({-1: 1, 0: 2, 3: 10}),
+            strategy.StrategyRamp({4.5: 1, 5.5: 4}, 'blackjack_percent')]
+
+  def test_matches_wallets(self):
+    num_rounds = 3000
+    wallets = [wallet.Wallet(str(index), betting_strategy)
+               for index, betting_strategy in enumerate(self.NewStrategies())]
+    blackjack_game = simulation.NewGame(simulation.DEFAULT_GAME_CONFIG, 5,
+                                        wallets=wallets)
+    for _ in xrange(num_rounds):
+      simulation.PlayRound(blackjack_game)
+
+    variants = population.Population(self.NewStrategies())
+    variants.Play(num_rounds, num_workers=1, num_batches=1, seed=5)
+
+    for variant_wallet, result in zip(wallets, variants.Results()):
+      self.assertEqual(result.num_rounds, num_rounds)
+      self.assertAlmostEqual(result.money_units, variant_wallet.money_units)
+      self.assertEqual(
+          dict((multiplier, repr(record)) for multiplier, record in
+               result.multiplier_record.iteritems()),
+          dict((multiplier, repr(record)) for multiplier, record in
+               variant_wallet.betting_strategy.multiplier_record.iteritems()))
+
+  def test_rejects_path_dependent_strategy(self):
+    self.assertRaises(population.PopulationException, population.Population,
+                      [strategy.StrategyBlackjackOptimized()])
+
+
+if __name__ == '__main__':
+  unittest.main()
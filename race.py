@@ -0,0 +1,308 @@
+""" Racing sweeps: drop clearly worse candidates early.
+
+Comparing many strategies on a fixed number of rounds each spends most of
+the rounds on candidates that are obviously behind after a fraction of
+them. A race plays the candidates in stages of growing size instead. Every
+stage adds batches of batch_rounds rounds, and every candidate still in the
+race plays every batch on the same shoes (common random numbers), so the
+difference between two candidates on a batch has little shuffle luck in it.
+
+After each stage a candidate is dropped when the leader, the candidate
+with the highest mean money units won per round, beats it by more than z
+standard errors of the mean of the per batch differences. The race ends
+when one candidate is left or the round budget is spent.
+
+The race looks at the results after every stage and compares the leader
+to every other candidate, so z is not that of a single comparison. The
+error allowed, one minus the confidence, is split evenly (Bonferroni) over
+the other candidates and the stages the budget allows. The best candidate
+then survives the whole race with at least the confidence asked for, up to
+the normal approximation of the batch means.
+
+Candidates are priced by a task function taking
+(config, seed, num_rounds, contestants) and returning the money units won
+by each contestant. BettingTask prices evolve.Candidate betting strategies
+on shared recorded rounds; PlayTask plays a game per play strategy file.
+
+Run directly to race the betting families against each other:
+
+  python race.py --candidates 20 --num-rounds 400000
+"""
+import argparse
+import collections
+import math
+import random
+
+import evolve
+import simulation
+import strategy
+import wallet
+
+
+class RaceException(Exception):
+  """Base exception."""
+
+
+def NormalQuantile(probability):
+  """Returns z with P(Z < z) = probability for a standard normal Z."""
+  if not 0 < probability < 1:
+    raise RaceException('Probability %s outside (0, 1)' % probability)
+  low, high = -10.0, 10.0
+  for _ in xrange(100):
+    middle = (low + high) / 2
+    if 0.5 * math.erfc(-middle / math.sqrt(2)) < probability:
+      low = middle
+    else:
+      high = middle
+  return (low + high) / 2
+
+
+def BettingTask(task):
+  """Worker entry point. Price betting candidates on one batch of rounds.
+
+  Args:
+    task: (GameConfig, int, int, [evolve.Candidate]), game config, seed,
+        number of rounds and candidates.
+
+  Returns:
+    [float], money units won per candidate.
+  """
+  config, seed, num_rounds, candidates = task
+  all_stats = evolve.FitnessTask((config, seed, num_rounds, num_rounds,
+                                  float('inf'), candidates))
+  return [candidate_stats.total for candidate_stats in all_stats]
+
+
+def PlayTask(task):
+  """Worker entry point. Play one batch of rounds per play strategy.
+
+  Every strategy plays a flat table minimum bet on its own game, all
+  shuffled from the same seed.
+
+  Args:
+    task: (GameConfig, int, int, [str]), game config, seed, number of rounds
+        and play strategy files.
+
+  Returns:
+    [float], money units won per strategy file.
+  """
+  config, seed, num_rounds, strategy_files = task
+  totals = []
+  for strategy_file in strategy_files:
+    flat = wallet.Wallet('Race', strategy.StrategyTableMinimum(
+        config.rules.min_money_units))
+    blackjack_game = simulation.NewGame(
+        config._replace(strategy_file=strategy_file), seed, wallets=[flat])
+    for _ in xrange(num_rounds):
+      simulation.PlayRound(blackjack_game)
+    totals.append(flat.money_units)
+  return totals
+
+
+Elimination = collections.namedtuple(
+    'Elimination', ['stage', 'num_rounds', 'contestant', 'rate', 'leader',
+                    'leader_rate', 'gap', 'stderr'])
+
+
+class Race(object):
+  """Candidates played in growing stages, dominated ones dropped."""
+
+  def __init__(self, task_function, contestants,
+               config=simulation.DEFAULT_GAME_CONFIG, num_rounds=200000,
+               batch_rounds=2000, first_batches=8, growth=2,
+               confidence=0.95, num_workers=None, seed=0):
+    """Constructor.
+
+    Args:
+      task_function: callable, module level function pricing contestants,
+          such as BettingTask or PlayTask.
+      contestants: [object], picklable candidates task_function takes.
+      config: simulation.GameConfig, game to simulate.
+      num_rounds: int, most rounds any contestant plays, at least 2 batches.
+      batch_rounds: int, rounds per batch.
+      first_batches: int, batches in the first stage, at least 2.
+      growth: float, factor by which every stage has more batches.
+      confidence: float, probability of the best contestant surviving the
+          race.
+      num_workers: int, worker processes. None uses one per cpu.
+      seed: int, seed of the first batch; batch i uses seed + i.
+
+    Raises:
+      RaceException: Fewer than two contestants or bad parameters.
+    """
+    if len(contestants) < 2:
+      raise RaceException('A race needs 2 contestants, got %d' %
+                          len(contestants))
+    if first_batches < 2 or growth < 1:
+      raise RaceException('Need at least 2 first batches and growth >= 1')
+    if num_rounds < 2 * batch_rounds:
+      raise RaceException('Need rounds for 2 batches of %d, got %d' %
+                          (batch_rounds, num_rounds))
+    self.task_function = task_function
+    self.contestants = list(contestants)
+    self.config = config
+    self.num_rounds = num_rounds
+    self.batch_rounds = batch_rounds
+    self.first_batches = first_batches
+    self.growth = growth
+    self.num_stages = self._NumStages()
+    # Bonferroni over every comparison with the best contestant, at every
+    # stage.
+    self.z = NormalQuantile(1 - (1 - confidence) / (
+        (len(self.contestants) - 1) * self.num_stages))
+    self.num_workers = num_workers
+    self.seed = seed
+
+    self.stage = 0
+    # Indices of the contestants still racing.
+    self.alive = range(len(self.contestants))
+    # Money units won per round, per contestant per batch played.
+    self.rates = [[] for _ in self.contestants]
+    self.history = []
+    self.rounds_played = 0
+
+  def _NumStages(self):
+    """Returns the number of stages the round budget allows, at least 1."""
+    max_batches = self.num_rounds // self.batch_rounds
+    played = 0
+    num_stages = 0
+    while played < max_batches:
+      played += min(int(round(self.first_batches * self.growth ** num_stages)),
+                    max_batches - played)
+      num_stages += 1
+    return max(num_stages, 1)
+
+  def Finished(self):
+    """Returns True once one contestant is left or the budget is spent."""
+    num_batches = len(self.rates[self.alive[0]])
+    return (len(self.alive) == 1 or
+            (num_batches + 1) * self.batch_rounds > self.num_rounds)
+
+  def Step(self):
+    """Play a stage and drop the dominated contestants.
+
+    Returns:
+      [Elimination], contestants dropped by the stage.
+    """
+    played = len(self.rates[self.alive[0]])
+    num_batches = int(round(self.first_batches * self.growth ** self.stage))
+    num_batches = min(num_batches,
+                      self.num_rounds // self.batch_rounds - played)
+    contestants = [self.contestants[index] for index in self.alive]
+    tasks = [(self.config, self.seed + played + batch, self.batch_rounds,
+              contestants) for batch in xrange(num_batches)]
+    for totals in simulation.RunTasks(self.task_function, tasks,
+                                      self.num_workers):
+      for index, total in zip(self.alive, totals):
+        self.rates[index].append(float(total) / self.batch_rounds)
+    self.rounds_played += len(self.alive) * num_batches * self.batch_rounds
+
+    eliminated = self._Eliminate()
+    self.stage += 1
+    return eliminated
+
+  def _Eliminate(self):
+    num_batches = len(self.rates[self.alive[0]])
+    leader = max(self.alive, key=self.Rate)
+    leader_rates = self.rates[leader]
+    eliminated = []
+    dropped = set()
+    for index in self.alive:
+      if index == leader:
+        continue
+      gaps = [mine - theirs
+              for mine, theirs in zip(leader_rates, self.rates[index])]
+      gap = sum(gaps) / num_batches
+      variance = sum((one - gap) ** 2 for one in gaps) / (num_batches - 1)
+      stderr = math.sqrt(variance / num_batches)
+      if gap - self.z * stderr > 0:
+        dropped.add(index)
+        eliminated.append(Elimination(
+            stage=self.stage, num_rounds=num_batches * self.batch_rounds,
+            contestant=self.contestants[index], rate=self.Rate(index),
+            leader=self.contestants[leader], leader_rate=self.Rate(leader),
+            gap=gap, stderr=stderr))
+    self.alive = [index for index in self.alive if index not in dropped]
+    self.history.extend(eliminated)
+    return eliminated
+
+  def Rate(self, index):
+    """Returns the mean money units won per round of a contestant."""
+    rates = self.rates[index]
+    return sum(rates) / max(len(rates), 1)
+
+  def Run(self):
+    """Race until finished.
+
+    Returns:
+      [object], contestants left, best first.
+    """
+    while not self.Finished():
+      self.Step()
+    return self.Survivors()
+
+  def Survivors(self):
+    """Returns the contestants still racing, best first."""
+    return [self.contestants[index]
+            for index in sorted(self.alive, key=self.Rate, reverse=True)]
+
+  def RoundsSaved(self):
+    """Returns the rounds not played compared to a full sweep.
+
+    A full sweep plays every contestant as many rounds as the survivors.
+    """
+    full = (len(self.contestants) * len(self.rates[self.alive[0]]) *
+            self.batch_rounds)
+    return full - self.rounds_played
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--candidates', type=int, default=20,
+                      help='Random betting candidates to race.')
+  parser.add_argument('--num-rounds', type=int, default=400000,
+                      help='Most rounds a candidate plays.')
+  parser.add_argument('--batch-rounds', type=int, default=2000,
+                      help='Rounds per batch.')
+  parser.add_argument('--confidence', type=float, default=0.95,
+                      help='Probability of the best candidate surviving.')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='Worker processes. Defaults to one per cpu.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the candidates and shoes.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  config = simulation.DEFAULT_GAME_CONFIG
+  families = evolve.NewFamilies(config.rules)
+  rng = random.Random(args.seed)
+  candidates = []
+  for _ in xrange(args.candidates):
+    family = rng.choice(sorted(families))
+    candidates.append(evolve.Candidate(family, families[family].Random(rng)))
+
+  race = Race(BettingTask, candidates, config=config,
+              num_rounds=args.num_rounds, batch_rounds=args.batch_rounds,
+              confidence=args.confidence, num_workers=args.workers,
+              seed=args.seed)
+  while not race.Finished():
+    for elimination in race.Step():
+      print 'Stage %d, %d rounds: dropped %s %s rate %.4f, %.4f behind +-%.4f' % (
+          elimination.stage, elimination.num_rounds,
+          elimination.contestant.family, elimination.contestant.params,
+          elimination.rate, elimination.gap, elimination.stderr)
+
+  print ''
+  for candidate in race.Survivors():
+    print 'Survivor: %s %s rate %.4f' % (
+        candidate.family, candidate.params,
+        race.Rate(race.contestants.index(candidate)))
+  full = race.rounds_played + race.RoundsSaved()
+  print 'Rounds played %d of %d, %.1f%% saved' % (
+      race.rounds_played, full, 100.0 * race.RoundsSaved() / max(full, 1))
+
+
+if __name__ == '__main__':
+  main()
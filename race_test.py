@@ -0,0 +1,86 @@
+import race
+import random
+import simulation
+import unittest
+
+
+def FakeTask(task):
+  """Contestants are (mean, noise) per round; shoe luck is shared by seed."""
+  _, seed, num_rounds, contestants = task
+  luck = random.Random(seed).gauss(0, 1)
+  return [num_rounds * (mean + noise * luck)
+          for mean, noise in contestants]
+
+
+def NoisyTask(task):
+  """Contestants are (name, mean, noise) with luck of their own per batch."""
+  _, seed, num_rounds, contestants = task
+  return [num_rounds * (mean + noise * random.Random(
+      '%d %s' % (seed, name)).gauss(0, 1))
+          for name, mean, noise in contestants]
+
+
+class RaceTest(unittest.TestCase):
+  def test_normal_quantile(self):
+    self.assertAlmostEqual(race.NormalQuantile(0.975), 1.96, places=2)
+    self.assertAlmostEqual(race.NormalQuantile(0.5), 0.0)
+    self.assertRaises(race.RaceException, race.NormalQuantile, 1)
+
+  def test_drops_dominated(self):
+    contestants = [(0.0, 0.01), (-0.5, 0.02), (0.0, 0.01)]
+    sweep = race.Race(FakeTask, contestants, num_rounds=100000,
+                      batch_rounds=1000, num_workers=1)
+    self.assertEqual(sweep.Run(), [(0.0, 0.01), (0.0, 0.01)])
+    self.assertEqual([elimination.contestant
+                      for elimination in sweep.history], [(-0.5, 0.02)])
+    self.assertEqual(sweep.history[0].stage, 0)
+    self.assertEqual(sweep.history[0].leader, (0.0, 0.01))
+    # The dropped contestant only played the first stage.
+    self.assertEqual(sweep.RoundsSaved(), 100000 - 8000)
+    self.assertEqual(sweep.rounds_played, 2 * 100000 + 8000)
+
+  def test_num_stages(self):
+    sweep = race.Race(FakeTask, [(0.0, 0.01)] * 2, num_rounds=100000,
+                      batch_rounds=1000, num_workers=1)
+    # 8, 16, 32 then the 44 batches left.
+    self.assertEqual(sweep.num_stages, 4)
+    self.assertGreater(sweep.z, race.NormalQuantile(0.95))
+
+  def test_budget_for_two_batches(self):
+    self.assertRaises(race.RaceException, race.Race, FakeTask,
+                      [(0.0, 0.01)] * 3, num_rounds=3000, batch_rounds=2000,
+                      num_workers=1)
+    sweep = race.Race(FakeTask, [(0.0, 0.01)] * 3, num_rounds=4000,
+                      batch_rounds=2000, num_workers=1)
+    self.assertEqual(len(sweep.Run()), 3)
+    self.assertEqual(sweep.rounds_played, 3 * 4000)
+
+  def test_best_survives_at_confidence(self):
+    # The best contestant is ahead by a hair; without the correction it is
+    # dropped in about half the races.
+    contestants = [('best', 0.001, 1.0)] + [(name, 0.0, 1.0)
+                                           for name in 'abcd']
+    num_races = 200
+    lost = 0
+    for seed in xrange(num_races):
+      sweep = race.Race(NoisyTask, contestants, num_rounds=240,
+                        batch_rounds=1, first_batches=30, confidence=0.9,
+                        num_workers=1, seed=seed * 1000)
+      sweep.Run()
+      lost += contestants[0] not in sweep.Survivors()
+    # At most 10% of the races, give or take three standard errors.
+    self.assertLess(float(lost) / num_races,
+                    0.1 + 3 * (0.1 * 0.9 / num_races) ** 0.5)
+
+  def test_play_strategies_share_shoes(self):
+    strategy_file = simulation.DEFAULT_GAME_CONFIG.strategy_file
+    sweep = race.Race(race.PlayTask, [strategy_file, strategy_file],
+                      num_rounds=400, batch_rounds=100, first_batches=2,
+                      num_workers=1)
+    self.assertEqual(len(sweep.Run()), 2)
+    self.assertEqual(sweep.rates[0], sweep.rates[1])
+    self.assertEqual(sweep.history, [])
+
+
+if __name__ == '__main__':
+  unittest.main()
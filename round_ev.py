@@ -0,0 +1,502 @@
+""" Exact expected value of a round for a given shoe composition.
+
+An alternative to Monte Carlo through Game.PlayRound. The calculator follows
+the same rules the game engine does: the dealer peeks for blackjack, a player
+blackjack pays TableRules.blackjack_win_multiplier, the player follows the
+PlayStrategy (continuing to act after a double, as person.Player.Play does)
+and the dealer draws per TableRules.hit_on_soft_17.
+
+Compositions are tuples of remaining card counts in card.RANKS order, as
+returned by Shoe.GetComposition. Burned cards are unseen, so they do not
+change the expectation and are ignored.
+
+Player cards are drawn before the dealer's hole card. By exchangeability this
+is the same as drawing the hole card first; the dealer peek is handled by
+only counting hole cards which do not complete a dealer blackjack.
+
+Every ordering of the same removed cards is equally likely, with probability
+prod(ff(count, removed)) / ff(num_cards, num_removed) over the ranks, where
+ff is the falling factorial. RoundEv is thus a sum over sets of removed cards
+of the payoff summed over their orderings times that probability. The summed
+payoffs only depend on the rules and the strategy, so they are expanded once
+and each composition only evaluates the sum.
+"""
+import collections
+
+import card
+import dealer_automaton
+import play_strategy
+
+# Hard value of each rank, aces counted as 1.
+RANK_VALUES = tuple([rank.alt_value for rank in card.RANKS])
+
+# Rank indices.
+ACE_INDEX = card.RANKS.index(card.ACE)
+FACE_INDEX = card.RANKS.index(card.FACE)
+
+# Dealer outcome indices: final totals 17-21 then bust.
+DEALER_BUST = dealer_automaton.BUST
+_DEALER_TOTALS = dealer_automaton.OUTCOME_TOTALS
+
+# Hole card which completes a dealer blackjack, by up card.
+_BLACKJACK_HOLE = {ACE_INDEX: FACE_INDEX, FACE_INDEX: ACE_INDEX}
+
+# Removed cards are keyed by their count per rank in _REMOVED_BITS bits. No
+# round draws 64 cards of a rank.
+_REMOVED_BITS = 6
+_MAX_REMOVED = (1 << _REMOVED_BITS) - 1
+_REMOVED_PLACES = tuple([1 << (_REMOVED_BITS * index)
+                         for index in xrange(len(card.RANKS))])
+# Slot of the total number of removed cards in a RoundEv table, after the
+# slots of the count removed per rank.
+_NUM_REMOVED_SLOT = len(card.RANKS) << _REMOVED_BITS
+
+
+class RoundEvException(Exception):
+  """Base exception."""
+
+
+def RemoveCard(composition, index):
+  """Returns the composition with one card of the rank removed.
+
+  Args:
+    composition: (int), count per rank in card.RANKS order.
+    index: int, index of the rank to remove.
+
+  Returns:
+    (int), new composition.
+  """
+  return composition[:index] + (composition[index] - 1,) + composition[index + 1:]
+
+
+def HandValue(hard_value, has_ace):
+  """Returns the value and softness of a hand.
+
+  Args:
+    hard_value: int, value of the hand counting aces as 1.
+    has_ace: bool, True if the hand contains an ace.
+
+  Returns:
+    (int, bool), value of the hand and True if it is soft.
+  """
+  if has_ace and hard_value <= 11:
+    return hard_value + 10, True
+  return hard_value, False
+
+
+def _HandState(hard_value, has_ace):
+  """Integer id of a player or dealer hand state."""
+  return hard_value * 2 + int(has_ace)
+
+
+def _UpState(up):
+  """Integer id of the dealer up card with the hole card still to draw.
+
+  Negative so it differs from every _HandState.
+  """
+  return -1 - up
+
+
+def _Slots(key):
+  """Returns (int), RoundEv table slots of the removed cards in a key.
+
+  The slot of each removed rank is its index and count in _REMOVED_BITS
+  bits, followed by the slot of the total number of removed cards.
+  """
+  slots = []
+  num_removed = 0
+  index = 0
+  while key:
+    count = key & _MAX_REMOVED
+    if count:
+      slots.append((index << _REMOVED_BITS) + count)
+      num_removed += count
+    key >>= _REMOVED_BITS
+    index += 1
+  slots.append(_NUM_REMOVED_SLOT + num_removed)
+  return tuple(slots)
+
+
+def _FallingFactorials(count, max_removed):
+  """Returns [float], count * (count - 1) * ... over 0 to max_removed terms.
+
+  Args:
+    count: int, number of cards.
+    max_removed: int, largest number of terms.
+
+  Returns:
+    [float], the falling factorial of count per number of terms; 0 once
+        more cards are removed than there are.
+  """
+  factorials = [1.0]
+  for removed in xrange(max_removed):
+    factorials.append(factorials[-1] * max(count - removed, 0))
+  return factorials
+
+
+class RoundEvCalculator(object):
+  """Exact round EV per composition.
+
+  RoundEv sums the payoff of each set of removed cards, expanded once per
+  calculator. ActionEvs is a memoized recursion over player and dealer hand
+  states, with memo tables keyed by composition and shared across calls.
+  """
+
+  def __init__(self, rules, strategy):
+    """Constructor.
+
+    Args:
+      rules: table_rules.TableRules, rules at the table.
+      strategy: play_strategy.PlayStrategy, how the player plays hands.
+    """
+    self.table_rules = rules
+    self.play_strategy = strategy
+    self._dealer_cache = {}
+    self._player_cache = {}
+    self._dealer_steps = self._BuildDealerSteps()
+    # [(float, (int))], built on the first RoundEv.
+    self._round_terms = None
+
+  def _BuildDealerSteps(self):
+    """Transitions of the dealer drawing rule, from the dealer_automaton
+    table person.Dealer.Play draws with.
+
+    Returns:
+      {int: [(int, int)]}, per dealer state, the next state and final outcome
+          index (-1 if the dealer keeps drawing) for each rank index.
+    """
+    automaton = dealer_automaton.GetAutomaton(self.table_rules)
+    steps = {}
+    for hard_value in xrange(1, 27):
+      for has_ace in (False, True):
+        row = automaton.State(hard_value, has_ace)
+        transitions = []
+        for index, rank in enumerate(card.RANKS):
+          code = automaton.steps[row + rank.value]
+          next_state = _HandState(hard_value + RANK_VALUES[index],
+                                  has_ace or index == ACE_INDEX)
+          if code >= 0:
+            transitions.append((next_state, -1))
+          else:
+            transitions.append((next_state, dealer_automaton.Outcome(code)))
+        steps[_HandState(hard_value, has_ace)] = transitions
+    return steps
+
+  def ClearCache(self):
+    """Drop all memoized states.
+
+    The RoundEv terms do not depend on the composition and are kept.
+    """
+    self._dealer_cache.clear()
+    self._player_cache.clear()
+
+  def RoundEv(self, composition):
+    """Returns the expected value of a round for a one unit bet.
+
+    Args:
+      composition: (int), count per rank in card.RANKS order.
+
+    Returns:
+      float, expected money units won per unit bet.
+
+    Raises:
+      RoundEvException: Not enough cards to deal a round.
+    """
+    num_cards = sum(composition)
+    if num_cards < 4:
+      raise RoundEvException('Need at least 4 cards, got %d' % num_cards)
+    if self._round_terms is None:
+      self._round_terms = self._BuildRoundTerms()
+
+    # Probability factors of the removed cards, see _Slots.
+    table = []
+    for count in composition:
+      table.extend(_FallingFactorials(count, _MAX_REMOVED))
+    table.extend([1.0 / dealt if dealt else 0.0
+                  for dealt in _FallingFactorials(num_cards, _MAX_REMOVED)])
+
+    ev = 0.0
+    for prob, slots in self._round_terms:
+      for slot in slots:
+        prob *= table[slot]
+      ev += prob
+    return ev
+
+  def ShoeEv(self, current_shoe):
+    """Returns the expected value of the next round in the shoe.
+
+    Args:
+      current_shoe: Shoe, shoe to price.
+
+    Returns:
+      float, expected money units won per unit bet.
+    """
+    return self.RoundEv(current_shoe.GetComposition())
+
+  def ActionEvs(self, first, second, up, composition,
+                actions=(play_strategy.Action.STAND, play_strategy.Action.HIT,
+                         play_strategy.Action.DOUBLE)):
+    """Returns the EV of each first action for a dealt hand.
+
+    After the first action the hand follows the play strategy. Values are
+    conditioned on the dealer not having blackjack, as the dealer has
+    already peeked when the player acts.
+
+    Args:
+      first: int, rank index of the players first card.
+      second: int, rank index of the players second card.
+      up: int, rank index of the dealers face up card.
+      composition: (int), remaining composition, dealt cards removed.
+      actions: (Action), first actions to evaluate.
+
+    Returns:
+      {Action: float}, expected money units won per unit bet.
+    """
+    no_blackjack = 1.0 - self._DealerBlackjackProb(up, composition)
+    hard_value = RANK_VALUES[first] + RANK_VALUES[second]
+    has_ace = ACE_INDEX in (first, second)
+    return dict((action, self._ActionEv(action, hard_value, has_ace, up,
+                                        composition) / no_blackjack)
+                for action in actions)
+
+  def ShoeProfile(self, blackjack_game):
+    """Play out the current shoe, recording the EV before each round.
+
+    Args:
+      blackjack_game: game.Game, game whose shoe is played out. The shoe is
+          left finished; the caller decides when to reset it.
+
+    Returns:
+      [float], expected value before each round.
+    """
+    profile = []
+    while not blackjack_game.shoe.IsFinished():
+      profile.append(self.ShoeEv(blackjack_game.shoe))
+      blackjack_game.PlayRound()
+    return profile
+
+  def _BuildRoundTerms(self):
+    """Expand a round into the summed payoff per set of removed cards.
+
+    Hands are played forward, one card per level, summing the number of
+    orderings (times the bet multiplier) which reach each player state and
+    removed cards. Standing hands start the dealer, whose states carry the
+    summed payoff per dealer outcome until the dealer's outcome is final.
+
+    Returns:
+      [(float, (int))], per set of removed cards, the payoff summed over its
+          orderings and the table slots of the cards, see _Slots.
+
+    Raises:
+      RoundEvException: The strategy takes an unsupported action.
+    """
+    num_ranks = len(card.RANKS)
+    places = _REMOVED_PLACES
+    # Payoff of a standing hand against each dealer outcome, per value.
+    stand_payoffs = dict(
+        (value, [1.0 if outcome == DEALER_BUST else
+                 float(cmp(value, _DEALER_TOTALS[outcome]))
+                 for outcome in xrange(dealer_automaton.NUM_OUTCOMES)])
+        for value in xrange(22))
+    blackjack_multiplier = self.table_rules.blackjack_win_multiplier
+    payoffs = collections.defaultdict(float)
+
+    # {(int, int, int): float}, per player state, up card and removed cards.
+    players = collections.defaultdict(float)
+    for first in xrange(num_ranks):
+      for second in xrange(num_ranks):
+        for up in xrange(num_ranks):
+          key = places[first] + places[second] + places[up]
+          hole = _BLACKJACK_HOLE.get(up)
+          if sorted((first, second)) == [ACE_INDEX, FACE_INDEX]:
+            payoffs[key] += blackjack_multiplier
+            if hole is not None:
+              payoffs[key + places[hole]] -= blackjack_multiplier
+            continue
+          if hole is not None:
+            payoffs[key + places[hole]] -= 1.0
+          state = _HandState(RANK_VALUES[first] + RANK_VALUES[second],
+                             ACE_INDEX in (first, second))
+          players[(state, up, key)] += 1.0
+
+    # {(int, int): [float]}, per dealer state and removed cards, the summed
+    # payoff per dealer outcome.
+    dealers = {}
+    while players or dealers:
+      next_players = collections.defaultdict(float)
+      for (state, up, key), weight in players.iteritems():
+        hard_value, has_ace = divmod(state, 2)
+        value, is_soft = HandValue(hard_value, has_ace)
+        if value > 21:
+          payoffs[key] -= weight
+          hole = _BLACKJACK_HOLE.get(up)
+          if hole is not None:
+            payoffs[key + places[hole]] += weight
+          continue
+
+        action = self.play_strategy.LookupAction(value, is_soft,
+                                                 card.RANKS[up].value)
+        if action == play_strategy.Action.STAND:
+          sums = dealers.setdefault((_UpState(up), key),
+                                    [0.0] * dealer_automaton.NUM_OUTCOMES)
+          for outcome, payoff in enumerate(stand_payoffs[value]):
+            sums[outcome] += weight * payoff
+          continue
+        if action not in (play_strategy.Action.HIT,
+                          play_strategy.Action.DOUBLE):
+          raise RoundEvException('Unsupported action: %s' % action)
+        if action == play_strategy.Action.DOUBLE:
+          weight *= 2
+        for index in xrange(num_ranks):
+          next_players[(_HandState(hard_value + RANK_VALUES[index],
+                                   has_ace or index == ACE_INDEX),
+                        up, key + places[index])] += weight
+
+      next_dealers = {}
+      for (state, key), sums in dealers.iteritems():
+        skip = None
+        if state < 0:
+          up = _UpState(state)
+          skip = _BLACKJACK_HOLE.get(up)
+          state = _HandState(RANK_VALUES[up], up == ACE_INDEX)
+        for index, (next_state, final) in enumerate(self._dealer_steps[state]):
+          if index == skip:
+            continue
+          next_key = key + places[index]
+          if final >= 0:
+            payoffs[next_key] += sums[final]
+            continue
+          next_sums = next_dealers.get((next_state, next_key))
+          if next_sums is None:
+            next_dealers[(next_state, next_key)] = list(sums)
+          else:
+            for outcome, payoff in enumerate(sums):
+              next_sums[outcome] += payoff
+
+      players, dealers = next_players, next_dealers
+
+    return [(payoff, _Slots(key))
+            for key, payoff in payoffs.iteritems() if payoff]
+
+  def _DealerBlackjackProb(self, up, composition):
+    """Probability the hole card completes a dealer blackjack."""
+    if up == ACE_INDEX:
+      return float(composition[FACE_INDEX]) / sum(composition)
+    elif up == FACE_INDEX:
+      return float(composition[ACE_INDEX]) / sum(composition)
+    return 0.0
+
+  def _PlayerEv(self, hard_value, has_ace, up, composition):
+    """Expected payoff of a hand, restricted to no dealer blackjack.
+
+    Args:
+      hard_value: int, players hand value counting aces as 1.
+      has_ace: bool, True if the players hand contains an ace.
+      up: int, rank index of the dealers face up card.
+      composition: (int), remaining composition.
+
+    Returns:
+      float, E[payoff * 1(no dealer blackjack)] per unit at stake.
+    """
+    key = (hard_value, has_ace, up, composition)
+    if key in self._player_cache:
+      return self._player_cache[key]
+
+    value, is_soft = HandValue(hard_value, has_ace)
+    if value > 21:
+      ev = self._DealerBlackjackProb(up, composition) - 1.0
+    else:
+      ev = self._ActionEv(
+          self.play_strategy.LookupAction(value, is_soft, card.RANKS[up].value),
+          hard_value, has_ace, up, composition)
+
+    self._player_cache[key] = ev
+    return ev
+
+  def _ActionEv(self, action, hard_value, has_ace, up, composition):
+    """Expected payoff of taking an action then following the strategy.
+
+    Returns:
+      float, E[payoff * 1(no dealer blackjack)] per unit at stake.
+
+    Raises:
+      RoundEvException: Action is not supported.
+    """
+    if action == play_strategy.Action.STAND:
+      value = HandValue(hard_value, has_ace)[0]
+      dealer = self._DealerOutcomes(up, composition)
+      ev = dealer[DEALER_BUST]
+      for total, prob in zip(_DEALER_TOTALS, dealer):
+        if value > total:
+          ev += prob
+        elif value < total:
+          ev -= prob
+      return ev
+
+    if action not in (play_strategy.Action.HIT, play_strategy.Action.DOUBLE):
+      raise RoundEvException('Unsupported action: %s' % action)
+
+    num_cards = float(sum(composition))
+    ev = 0.0
+    for index, count in enumerate(composition):
+      if count:
+        ev += count / num_cards * self._PlayerEv(
+            hard_value + RANK_VALUES[index], has_ace or index == ACE_INDEX,
+            up, RemoveCard(composition, index))
+    if action == play_strategy.Action.DOUBLE:
+      ev *= 2
+    return ev
+
+  def _DealerOutcomes(self, up, composition):
+    """Dealer final totals, restricted to no dealer blackjack.
+
+    Args:
+      up: int, rank index of the dealers face up card.
+      composition: (int), remaining composition, hole card included.
+
+    Returns:
+      (float), joint probability of no blackjack and each outcome, 17-21
+          then bust.
+    """
+    key = (_UpState(up), composition)
+    outcomes = self._dealer_cache.get(key)
+    if outcomes is None:
+      blackjack_hole = _BLACKJACK_HOLE.get(up)
+      outcomes = self._DealerDraw(
+          self._dealer_steps[_HandState(RANK_VALUES[up], up == ACE_INDEX)],
+          composition, blackjack_hole)
+      self._dealer_cache[key] = outcomes
+    return outcomes
+
+  def _DealerDraw(self, steps, composition, skip=None):
+    """Dealer final totals after drawing the next card.
+
+    Args:
+      steps: [(int, int)], next dealer state and final outcome index (-1 if
+          the dealer keeps drawing) per rank index.
+      composition: (int), remaining composition.
+      skip: int, rank index which is not counted as a possible next card.
+
+    Returns:
+      (float), probability of each outcome, 17-21 then bust.
+    """
+    outcomes = [0.0] * 6
+    num_cards = float(sum(composition))
+    for index, count in enumerate(composition):
+      if not count or index == skip:
+        continue
+      prob = count / num_cards
+      next_state, final = steps[index]
+      if final >= 0:
+        outcomes[final] += prob
+        continue
+
+      remaining = composition[:index] + (count - 1,) + composition[index + 1:]
+      key = (next_state, remaining)
+      drawn = self._dealer_cache.get(key)
+      if drawn is None:
+        drawn = self._DealerDraw(self._dealer_steps[next_state], remaining)
+        self._dealer_cache[key] = drawn
+      outcomes = [total + prob * final_prob
+                  for total, final_prob in zip(outcomes, drawn)]
+    return tuple(outcomes)
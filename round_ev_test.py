@@ -0,0 +1,104 @@
+import card
+import game
+import itertools
+import os
+import person
+import play_strategy
+import round_ev
+import table_rules
+import unittest
+
+STRATEGY_YAML = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'play_strat_four_deck_hit_soft_17.yaml')
+
+
+def DistinctOrders(cards):
+  """Yield every distinct ordering of a multiset of cards."""
+  if not cards:
+    yield []
+    return
+  for index, first in enumerate(cards):
+    if first in cards[:index]:
+      continue
+    for rest in DistinctOrders(cards[:index] + cards[index + 1:]):
+      yield [first] + rest
+
+
+class RoundEvTest(unittest.TestCase):
+  def setUp(self):
+    self.rules = table_rules.DEFAULT_TABLE_RULES
+    self.play_strategy = play_strategy.PlayStrategy(self.rules, STRATEGY_YAML)
+    self.calculator = round_ev.RoundEvCalculator(self.rules, self.play_strategy)
+
+  def test_matches_engine_over_every_order(self):
+    # Enough high cards that no round can run out.
+    cards = ([card.FACE] * 4 +
+             [card.ACE, card.TWO, card.FIVE, card.SEVEN, card.NINE])
+    composition = tuple([cards.count(rank) for rank in card.RANKS])
+
+    blackjack_game = game.Game(num_players=1, rules=self.rules,
+                               player_strategy=self.play_strategy)
+    blackjack_game.shoe.stop_location = 1000
+    player_wallet = blackjack_game.player.wallets[person.Player.WALLET_TABLE_MIN]
+    blackjack_game.player.wallets = {player_wallet.name: player_wallet}
+
+    total = 0.0
+    num_orders = 0
+    for order in DistinctOrders(cards):
+      blackjack_game.shoe.cards = order[::-1]
+      start = player_wallet.money_units
+      blackjack_game.PlayRound()
+      total += player_wallet.money_units - start
+      num_orders += 1
+
+    self.assertAlmostEqual(self.calculator.RoundEv(composition),
+                           total / num_orders, places=12)
+
+  def test_matches_recursion_over_every_deal(self):
+    composition = (2, 2, 2, 2, 2, 2, 2, 2, 2, 8)
+    blackjack_multiplier = self.rules.blackjack_win_multiplier
+
+    total = 0.0
+    for first, second, up in itertools.product(xrange(len(card.RANKS)),
+                                               repeat=3):
+      remaining = composition
+      prob = 1.0
+      for index in (first, second, up):
+        prob *= float(remaining[index]) / sum(remaining)
+        if not prob:
+          break
+        remaining = round_ev.RemoveCard(remaining, index)
+      if not prob:
+        continue
+      hole = round_ev._BLACKJACK_HOLE.get(up)
+      dealer_blackjack = (float(remaining[hole]) / sum(remaining)
+                          if hole is not None else 0.0)
+      if sorted((first, second)) == [round_ev.ACE_INDEX, round_ev.FACE_INDEX]:
+        total += prob * (1 - dealer_blackjack) * blackjack_multiplier
+        continue
+      value, is_soft = round_ev.HandValue(
+          card.RANKS[first].alt_value + card.RANKS[second].alt_value,
+          round_ev.ACE_INDEX in (first, second))
+      action = self.play_strategy.LookupAction(value, is_soft,
+                                               card.RANKS[up].value)
+      action_ev = self.calculator.ActionEvs(first, second, up, remaining,
+                                            (action,))[action]
+      total += prob * (-dealer_blackjack +
+                       (1 - dealer_blackjack) * action_ev)
+
+    self.assertAlmostEqual(self.calculator.RoundEv(composition), total,
+                           places=12)
+
+  def test_terms_shared_across_calls(self):
+    composition = (2, 2, 2, 2, 2, 2, 2, 2, 2, 8)
+    ev = self.calculator.RoundEv(composition)
+    terms = self.calculator._round_terms
+
+    self.calculator.RoundEv((4, 4, 4, 4, 4, 4, 4, 4, 4, 16))
+    self.calculator.ClearCache()
+    self.assertEqual(self.calculator.RoundEv(composition), ev)
+    self.assertIs(self.calculator._round_terms, terms)
+
+
+if __name__ == '__main__':
+  unittest.main()
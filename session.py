@@ -0,0 +1,266 @@
+""" A long lived simulation session.
+
+The session keeps a process pool, and in each worker the loaded play
+strategy, alive between requests. Each request is split into batches of at
+most batch_rounds rounds; batch i always plays a fresh game seeded with
+seed + i, so asking for more rounds only plays the new batches and the
+totals are those of one long run split the same way.
+
+A run can be interrupted with Ctrl-C. Batches already running finish in the
+background and are kept; batches not yet started are played by the next
+request, before any new ones.
+"""
+import multiprocessing
+import signal
+import threading
+
+import control_variate
+import counters
+import game
+import hand
+import person
+import play_strategy
+import shoe
+import simulation
+import stats
+import strategy
+
+# Failures a batch reports to the session instead of raising in its worker:
+# bad game configs, wallet specs and play strategy files.
+_BATCH_ERRORS = (EnvironmentError, game.GameException, hand.HandException,
+                 person.PlayerException, play_strategy.PlayStrategyException,
+                 shoe.ShoeException, simulation.SimulationException,
+                 strategy.BettingStrategyException)
+
+
+class SessionException(Exception):
+  """Base exception."""
+
+
+def _IgnoreInterrupt():
+  """Pool initializer. Ctrl-C is for the session, not the workers."""
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _BatchTask(task):
+  """Worker entry point. Returns (GameCounters, None) or (None, error)."""
+  try:
+    return counters.CountersTask(task), None
+  except _BATCH_ERRORS as e:
+    return None, '%s: %s' % (type(e).__name__, e)
+
+
+class Session(object):
+  """Plays batches on a warm pool and keeps every batch result."""
+
+  def __init__(self, config=simulation.DEFAULT_GAME_CONFIG,
+               wallet_specs=None, num_workers=None, batch_rounds=10000,
+               seed=0, control_variates=False):
+    """Constructor.
+
+    Args:
+      config: simulation.GameConfig, game to play.
+      wallet_specs: [dict], see simulation.NewWallets. None keeps the
+          players default wallets.
+      num_workers: int, worker processes. None uses one per cpu.
+      batch_rounds: int, most rounds per batch.
+      seed: int, seed of batch 0.
+      control_variates: bool, collect control variates in every batch, see
+          control_variate.
+    """
+    if num_workers is None:
+      num_workers = multiprocessing.cpu_count()
+    self.config = config
+    self.wallet_specs = wallet_specs
+    self.num_workers = num_workers
+    self.batch_rounds = batch_rounds
+    self.seed = seed
+    self.control_variates = control_variates
+
+    self.pool = multiprocessing.Pool(num_workers, initializer=_IgnoreInterrupt)
+    self.condition = threading.Condition()
+    # {batch index: GameCounters} of every finished batch.
+    self.results = {}
+    # {batch index: rounds} of every requested batch.
+    self.batch_sizes = {}
+    # Batch indices requested but not started, oldest first.
+    self.queued = []
+    self.in_flight = 0
+    self.num_batches = 0
+    self.cancelled = False
+    self.error = None
+
+  def Close(self):
+    """Stop the workers."""
+    self.pool.terminate()
+    self.pool.join()
+
+  def NumRounds(self):
+    """Returns the number of rounds played so far."""
+    with self.condition:
+      return sum(self.batch_sizes[index] for index in self.results)
+
+  def Totals(self):
+    """Returns the counters of every finished batch, merged in batch order."""
+    with self.condition:
+      totals = counters.GameCounters()
+      for index in sorted(self.results):
+        totals.Merge(self.results[index])
+      return totals
+
+  def NewWallets(self):
+    """Returns fresh wallets, as every batch builds them."""
+    if self.wallet_specs is not None:
+      return simulation.NewWallets(self.wallet_specs)
+    return simulation.NewGame(self.config, self.seed).player.wallets.values()
+
+  def Play(self, num_rounds, progress=None, progress_interval=0.5):
+    """Play more rounds.
+
+    Args:
+      num_rounds: int, rounds to add, split as evenly as possible into
+          batches of at most batch_rounds.
+      progress: callable, called with (rounds done, rounds requested) while
+          the batches run.
+      progress_interval: float, seconds between progress calls.
+
+    Returns:
+      bool, True if every requested batch finished, False if interrupted.
+
+    Raises:
+      SessionException: A batch failed in a worker.
+    """
+    sizes = []
+    if num_rounds > 0:
+      sizes = simulation.SplitRounds(
+          num_rounds, -(-num_rounds // self.batch_rounds))
+    with self.condition:
+      # Batches skipped by an interrupted run come first.
+      batches = self.queued + range(self.num_batches,
+                                    self.num_batches + len(sizes))
+      for index, size in enumerate(sizes, self.num_batches):
+        self.batch_sizes[index] = size
+      self.num_batches += len(sizes)
+      self.queued = list(batches)
+      self.cancelled = False
+      self.error = None
+      self._Schedule()
+
+    requested = sum(self.batch_sizes[index] for index in batches)
+    try:
+      with self.condition:
+        while self.queued or self.in_flight:
+          self.condition.wait(progress_interval)
+          if self.error is not None:
+            raise SessionException('Batch failed: %s' % self.error)
+          if progress is not None:
+            done = sum(self.batch_sizes[index] for index in batches
+                       if index in self.results)
+            progress(done, requested)
+        if progress is not None:
+          progress(requested, requested)
+    except KeyboardInterrupt:
+      with self.condition:
+        self.cancelled = True
+      return False
+    return True
+
+  def _Schedule(self):
+    """Keep one batch per worker in the pool. Called holding the condition."""
+    while (not self.cancelled and self.queued and
+           self.in_flight < self.num_workers):
+      index = self.queued.pop(0)
+      self.in_flight += 1
+      task = (self.config, self.seed + index, self.batch_sizes[index],
+              self.wallet_specs, self.control_variates)
+      self.pool.apply_async(
+          _BatchTask, (task,),
+          callback=lambda result, index=index: self._BatchDone(index, result))
+
+  def _BatchDone(self, index, result):
+    """Pool callback of a finished batch."""
+    game_counters, error = result
+    with self.condition:
+      self.in_flight -= 1
+      if error is None:
+        self.results[index] = game_counters
+      else:
+        # Retried by the next request.
+        self.queued.insert(0, index)
+        self.error = error
+        self.cancelled = True
+      self._Schedule()
+      self.condition.notify_all()
+
+
+def PrintTotals(game_counters, wallets):
+  """Print the stats of the counters, as Game.StatsForNerds does.
+
+  Args:
+    game_counters: counters.GameCounters, counters to print.
+    wallets: [Wallet], fresh wallets of the session, see Session.NewWallets.
+        Each is loaded with its merged counters and printed by its betting
+        strategy.
+  """
+  num_hands = game_counters.num_hands
+  if not num_hands:
+    print 'No games played. No stats for you.'
+    return
+
+  def Percent(count):
+    return float(count) / num_hands * 100
+
+  print '== Session Stats ========='
+  print 'Hands:   %d' % num_hands
+  print 'Shoes:   %d' % game_counters.num_shoes
+  print 'Rate:    %0.1f [hands/shoe]' % (
+      float(num_hands) / max(game_counters.num_shoes, 1))
+  print '=========================='
+  print ''
+
+  dealer = game_counters.dealer
+  print '== Dealer Stats =========='
+  print 'Blackjack Win: %02.2f [%%]' % Percent(dealer['win_blackjack'])
+  print 'Blackjack Tie: %02.2f [%%]' % Percent(dealer['blackjack_tie'])
+  print 'Bust: %.2f [%%]' % Percent(dealer['bust'])
+  print ''
+  print 'Stand: %.2f [%%]' % Percent(dealer['stand'])
+  print 'Hit: %.2f [%%]' % Percent(dealer['hit'])
+  print '=========================='
+  print ''
+
+  player = game_counters.player
+  print '== Player Stats =========='
+  print 'Win:  %02.2f [%%]' % Percent(player['win'])
+  print 'Loss: %02.2f [%%]' % Percent(player['loss'])
+  print 'Tie:  %02.2f [%%]' % Percent(player['tie'])
+  print ''
+  print 'Blackjack Win: %02.2f [%%]' % Percent(player['win_blackjack'])
+  print 'Blackjack Tie: %02.2f [%%]' % Percent(player['blackjack_tie'])
+  print 'Bust: %.2f [%%]' % Percent(player['bust'])
+  print ''
+  print 'Stand: %.2f [%%]' % Percent(player['stand'])
+  print 'Hit: %.2f [%%]' % Percent(player['hit'])
+  print 'Double: %.2f [%%]' % Percent(player['double'])
+  print 'Split: %.2f [%%]' % Percent(player['split'])
+  print '=========================='
+  print ''
+
+  game_stats = stats.GameStats()
+  game_stats.num_hands = num_hands
+  game_stats.num_shoes = game_counters.num_shoes
+  print '== Performance Stats ====='
+  for player_wallet in sorted(wallets, key=lambda w: w.name):
+    name = player_wallet.name
+    if name not in game_counters.wallets:
+      continue
+    player_wallet.money_units = game_counters.wallets[name]
+    player_wallet.betting_strategy.multiplier_record = dict(
+        (multiplier, stats.WinLossTie(*counts)) for multiplier, counts in
+        game_counters.multiplier_records.get(name, {}).iteritems())
+    player_wallet.PrintStats(game_stats)
+  print '=========================='
+
+  if game_counters.control_sums is not None:
+    print ''
+    control_variate.PrintSums(game_counters.control_sums)
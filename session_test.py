@@ -0,0 +1,80 @@
+import StringIO
+import counters
+import session
+import simulation
+import sys
+import unittest
+
+
+class _Interrupt(object):
+  """Progress callback raising KeyboardInterrupt on its first call."""
+
+  def __init__(self):
+    self.calls = 0
+
+  def __call__(self, rounds_done, rounds_requested):
+    self.calls += 1
+    if self.calls == 1:
+      raise KeyboardInterrupt()
+
+
+class SessionTest(unittest.TestCase):
+  def setUp(self):
+    self.session = session.Session(num_workers=1, batch_rounds=50, seed=7)
+
+  def tearDown(self):
+    self.session.Close()
+
+  def test_extend_equals_one_run(self):
+    self.assertTrue(self.session.Play(100))
+    self.assertTrue(self.session.Play(60))
+    self.assertEqual(160, self.session.NumRounds())
+
+    expected = counters.GameCounters()
+    for index, num_rounds in enumerate([50, 50, 30, 30]):
+      expected.Merge(counters.CountersTask(
+          (simulation.DEFAULT_GAME_CONFIG, 7 + index, num_rounds, None)))
+    self.assertEqual(expected, self.session.Totals())
+
+  def test_plays_exactly_the_requested_rounds(self):
+    progress = []
+    self.assertTrue(self.session.Play(
+        5, progress=lambda *args: progress.append(args)))
+    self.assertEqual(5, self.session.NumRounds())
+    self.assertEqual((5, 5), progress[-1])
+    self.assertEqual(5, self.session.Totals().num_hands)
+
+  def test_interrupt_keeps_finished_batches(self):
+    self.assertFalse(self.session.Play(500, progress=_Interrupt(),
+                                       progress_interval=0))
+    self.assertTrue(self.session.queued)
+    self.assertTrue(self.session.Play(0))
+    self.assertEqual(500, self.session.NumRounds())
+    self.assertEqual(range(10), sorted(self.session.results))
+
+  def test_failed_batch_raises(self):
+    failing = session.Session(
+        num_workers=1, batch_rounds=50,
+        wallet_specs=[{'name': 'bad', 'strategy': 'unknown'}])
+    try:
+      self.assertRaises(session.SessionException, failing.Play, 50)
+    finally:
+      failing.Close()
+
+  def test_print_totals(self):
+    self.assertTrue(self.session.Play(100))
+    stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    try:
+      session.PrintTotals(self.session.Totals(), self.session.NewWallets())
+      printed = sys.stdout.getvalue()
+    finally:
+      sys.stdout = stdout
+    for line in ('== Dealer Stats', 'Double:', 'Wallet: ', '+/-: '):
+      self.assertIn(line, printed)
+    for player_wallet in self.session.NewWallets():
+      self.assertIn('Wallet: %s' % player_wallet.name, printed)
+
+
+if __name__ == '__main__':
+  unittest.main()
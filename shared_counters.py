@@ -0,0 +1,242 @@
+""" Aggregating worker counters through shared memory.
+
+Each worker owns a slot of a multiprocessing.RawArray and periodically
+writes its counters.GameCounters into it. The parent reads totals at any
+moment by summing the slots, with no messages between processes; workers
+return nothing.
+
+The slot layout is fixed when the array is created: the game, dealer and
+player counters, then per wallet its money units and a table of up to
+max_records multiplier records, each the multiplier itself followed by its
+counts. Multipliers are kept exact, fractional ones such as those of
+StrategyCount included, so totals equal those of a single process run. A
+slot holding more distinct multipliers for a wallet than the table has room
+for fails to pack rather than merge them.
+
+A slot has a single writer and is written without locking, so totals read
+while workers run may mix two updates of a slot; totals read after the
+workers finish are exact.
+"""
+import multiprocessing
+
+import counters
+import simulation
+
+# Multiplier records per wallet a slot has room for, unless told otherwise.
+DEFAULT_MAX_RECORDS = 64
+
+
+class SharedCountersException(Exception):
+  """Base exception."""
+
+
+class CounterLayout(object):
+  """Where each counter lives in a slot."""
+
+  def __init__(self, wallet_names, max_records=DEFAULT_MAX_RECORDS):
+    """Constructor.
+
+    Args:
+      wallet_names: [str], wallets every worker has.
+      max_records: int, distinct multipliers per wallet a slot holds.
+    """
+    self.wallet_names = sorted(wallet_names)
+    self.max_records = max_records
+    self.num_person_fields = len(counters.PERSON_FIELDS)
+    # The multiplier, then its counts.
+    self.entry_size = 1 + len(counters.RECORD_FIELDS)
+    self.wallet_size = 1 + max_records * self.entry_size
+    # num_hands, num_shoes, dealer then player fields.
+    self.wallet_offset = 2 + 2 * self.num_person_fields
+    self.slot_size = (self.wallet_offset +
+                      len(self.wallet_names) * self.wallet_size)
+
+  def Pack(self, game_counters):
+    """Returns the counters as a flat list of floats, one slot long.
+
+    Raises:
+      SharedCountersException: Counters have a wallet not in the layout, or
+          more multipliers for a wallet than max_records.
+    """
+    unknown = set(game_counters.wallets) - set(self.wallet_names)
+    if unknown:
+      raise SharedCountersException('Wallets not in layout: %s' %
+                                    sorted(unknown))
+    values = [game_counters.num_hands, game_counters.num_shoes]
+    values.extend([game_counters.dealer[field]
+                   for field in counters.PERSON_FIELDS])
+    values.extend([game_counters.player[field]
+                   for field in counters.PERSON_FIELDS])
+    for name in self.wallet_names:
+      records = game_counters.multiplier_records.get(name, {})
+      if len(records) > self.max_records:
+        raise SharedCountersException(
+            'Wallet %s has %d multipliers, a slot holds %d' % (
+                name, len(records), self.max_records))
+      values.append(game_counters.wallets.get(name, 0))
+      for multiplier in sorted(records):
+        values.append(multiplier)
+        values.extend(records[multiplier])
+      values.extend([0] * ((self.max_records - len(records)) *
+                           self.entry_size))
+    return values
+
+  def Unpack(self, values):
+    """Returns the counters held by a flat list of one or more slots.
+
+    Slots are summed, so a whole array unpacks to the totals.
+
+    Args:
+      values: [float], slot values.
+
+    Returns:
+      counters.GameCounters, totals.
+    """
+    game_counters = counters.GameCounters()
+    for start in xrange(0, len(values), self.slot_size):
+      game_counters.Merge(self._UnpackSlot(
+          values[start:start + self.slot_size]))
+    return game_counters
+
+  def _UnpackSlot(self, slot):
+    """Returns the counters of a single slot."""
+    game_counters = counters.GameCounters()
+    game_counters.num_hands = int(slot[0])
+    game_counters.num_shoes = int(slot[1])
+    for index, field in enumerate(counters.PERSON_FIELDS):
+      game_counters.dealer[field] = int(slot[2 + index])
+      game_counters.player[field] = int(slot[2 + self.num_person_fields +
+                                             index])
+    for wallet_index, name in enumerate(self.wallet_names):
+      start = self.wallet_offset + wallet_index * self.wallet_size
+      game_counters.wallets[name] = slot[start]
+      records = {}
+      for entry in xrange(start + 1, start + self.wallet_size,
+                          self.entry_size):
+        counts = slot[entry + 1:entry + self.entry_size]
+        if any(counts):
+          records[slot[entry]] = [int(num) for num in counts]
+      game_counters.multiplier_records[name] = records
+    return game_counters
+
+
+class SharedCounters(object):
+  """A shared array of counter slots."""
+
+  def __init__(self, layout, num_slots):
+    """Constructor.
+
+    Args:
+      layout: CounterLayout, layout of each slot.
+      num_slots: int, number of slots.
+    """
+    self.layout = layout
+    self.num_slots = num_slots
+    self.array = multiprocessing.RawArray('d', layout.slot_size * num_slots)
+
+  def Write(self, slot, game_counters):
+    """Overwrite a slot with counters."""
+    start = slot * self.layout.slot_size
+    self.array[start:start + self.layout.slot_size] = self.layout.Pack(
+        game_counters)
+
+  def Read(self, slot):
+    """Returns the counters of one slot."""
+    start = slot * self.layout.slot_size
+    return self.layout.Unpack(self.array[start:start + self.layout.slot_size])
+
+  def Totals(self):
+    """Returns the counters summed over every slot."""
+    return self.layout.Unpack(self.array[:])
+
+
+# Shared counters of a worker process, set by the pool initializer.
+_worker_counters = None
+
+
+def _InitWorker(shared_counters):
+  global _worker_counters
+  _worker_counters = shared_counters
+
+
+def SharedTask(task):
+  """Worker entry point. Play rounds, publishing counters into a slot.
+
+  Args:
+    task: (GameConfig, int, int, [dict], int, int), game config, seed,
+        number of rounds, wallet specs (see counters.CountersTask), slot and
+        rounds between publishes.
+  """
+  config, seed, num_rounds, wallet_specs, slot, publish_rounds = task
+  wallets = None
+  if wallet_specs is not None:
+    wallets = simulation.NewWallets(wallet_specs)
+  blackjack_game = simulation.NewGame(config, seed, wallets=wallets)
+  for played in xrange(1, num_rounds + 1):
+    simulation.PlayRound(blackjack_game)
+    if played % publish_rounds == 0 or played == num_rounds:
+      _worker_counters.Write(slot, counters.FromGame(blackjack_game))
+
+
+def RunShared(num_rounds, config=simulation.DEFAULT_GAME_CONFIG,
+              wallet_specs=None, num_workers=None, num_batches=None, seed=0,
+              max_records=DEFAULT_MAX_RECORDS, publish_rounds=1000,
+              progress=None,
+              progress_interval=1.0):
+  """Play seeded batches across workers, aggregating through shared memory.
+
+  Batch i plays a fresh game seeded with seed + i into slot i, exactly as
+  counters.CountersTask would.
+
+  Args:
+    num_rounds: int, total number of rounds.
+    config: simulation.GameConfig, game to simulate.
+    wallet_specs: [dict], see simulation.NewWallets. None keeps the players
+        default wallets.
+    num_workers: int, worker processes. None uses one per cpu.
+    num_batches: int, batches the rounds are split over. None uses one per
+        worker.
+    seed: int, seed of the first batch.
+    max_records: int, distinct multipliers per wallet a slot holds.
+    publish_rounds: int, rounds a worker plays between slot writes.
+    progress: callable, called with the live counters.GameCounters totals
+        every progress_interval seconds while workers run.
+    progress_interval: float, seconds between progress calls.
+
+  Returns:
+    counters.GameCounters, totals of every batch.
+  """
+  if num_workers is None:
+    num_workers = multiprocessing.cpu_count()
+  if num_batches is None:
+    num_batches = num_workers
+
+  # Wallet names come from a throwaway game.
+  wallets = None
+  if wallet_specs is not None:
+    wallets = simulation.NewWallets(wallet_specs)
+  layout = CounterLayout(
+      simulation.NewGame(config, seed, wallets=wallets).player.wallets,
+      max_records)
+
+  batches = simulation.SplitRounds(num_rounds, num_batches)
+  shared_counters = SharedCounters(layout, len(batches))
+  tasks = [(config, seed + index, batch_rounds, wallet_specs, index,
+            publish_rounds)
+           for index, batch_rounds in enumerate(batches)]
+
+  pool = multiprocessing.Pool(min(num_workers, len(tasks)),
+                              initializer=_InitWorker,
+                              initargs=(shared_counters,))
+  try:
+    pending = pool.map_async(SharedTask, tasks)
+    while not pending.ready():
+      pending.wait(progress_interval)
+      if progress is not None and not pending.ready():
+        progress(shared_counters.Totals())
+    # Re-raise worker errors.
+    pending.get()
+  finally:
+    pool.close()
+    pool.join()
+  return shared_counters.Totals()
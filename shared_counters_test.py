@@ -0,0 +1,48 @@
+import counters
+import shared_counters
+import simulation
+import unittest
+
+
+class SharedCountersTest(unittest.TestCase):
+  def test_matches_single_process(self):
+    live = []
+    totals = shared_counters.RunShared(
+        600, num_workers=2, num_batches=3, seed=8, publish_rounds=50,
+        progress=live.append, progress_interval=0.01)
+
+    expected = counters.GameCounters()
+    for index, num_rounds in enumerate((200, 200, 200)):
+      expected.Merge(counters.CountersTask(
+          (simulation.DEFAULT_GAME_CONFIG, 8 + index, num_rounds, None)))
+    self.assertEqual(totals, expected)
+    self.assertEqual(totals.num_hands, 600)
+    for live_totals in live:
+      self.assertLessEqual(live_totals.num_hands, 600)
+
+  def test_pack_round_trip(self):
+    game_counters = counters.CountersTask(
+        (simulation.DEFAULT_GAME_CONFIG, 1, 300, None))
+    layout = shared_counters.CounterLayout(game_counters.wallets)
+    self.assertEqual(layout.Unpack(layout.Pack(game_counters)), game_counters)
+
+  def test_fractional_multipliers_are_exact(self):
+    game_counters = counters.GameCounters()
+    game_counters.wallets['progressive'] = -3.5
+    game_counters.multiplier_records['progressive'] = {
+        1: [1, 0, 2, 0], 1.5: [0, 0, 1, 1], 2.25: [2, 1, 0, 0], 40: [0, 0, 1, 0]}
+    layout = shared_counters.CounterLayout(['progressive'], max_records=4)
+    packed = layout.Pack(game_counters)
+    self.assertEqual(layout.Unpack(packed), game_counters)
+    doubled = counters.GameCounters()
+    doubled.Merge(game_counters)
+    doubled.Merge(game_counters)
+    self.assertEqual(layout.Unpack(packed + packed), doubled)
+
+    small = shared_counters.CounterLayout(['progressive'], max_records=3)
+    self.assertRaises(shared_counters.SharedCountersException, small.Pack,
+                      game_counters)
+
+
+if __name__ == '__main__':
+  unittest.main()
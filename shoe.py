@@ -4,7 +4,9 @@ The shoe has a stop card which indicates the last hand before a re-shuffle.
 """
 import card
 import copy
+import events
 import random
+import shoe_odds
 
 class ShoeException(Exception):
   """Base shoe exception."""
@@ -23,16 +25,45 @@ class Shoe(object):
       [card.EIGHT] * 4 +
       [card.NINE] * 4 +
       [card.FACE] * 16)
+  RANK_COUNTS_PER_DECK = tuple([DECK_OF_CARDS.count(c) for c in card.RANKS])
 
-  def __init__(self, num_decks):
+  def __init__(self, num_decks, shuffle_model=None, rng=random,
+               event_bus=None):
+    """Constructor.
+
+    Args:
+      num_decks: int, number of decks in the shoe.
+      shuffle_model: shuffle.ShuffleModel, procedure used to shuffle new decks
+          and, on Reset, the previous shoe's pile. None shuffles perfectly at
+          random.
+      rng: random.Random, source of randomness for shuffling and the stop card.
+      event_bus: events.EventBus, receives card_dealt and shoe_reset events.
+    """
     self.num_decks = num_decks
+    self.shuffle_model = shuffle_model
+    self.rng = rng
+    if event_bus is None:
+      event_bus = events.EventBus()
+    self.events = event_bus
+
+    # Cards in the order they were played, last played on top.
+    self.discards = []
+
+    # New decks come out of the box in order.
     self.cards = copy.deepcopy(self.DECK_OF_CARDS)
     self.cards *= self.num_decks
-    random.shuffle(self.cards)  # Shuffle shoe at beginning then pop off cards.
+    self._Shuffle()  # Shuffle shoe at beginning then pop off cards.
 
     # Lookup table.
     self.cards_played = {}
 
+    # Cards remaining per rank in card.RANKS order, and a version bumped
+    # whenever they change, read by the probability queries in self.odds.
+    self.rank_counts = [per_deck * self.num_decks
+                        for per_deck in self.RANK_COUNTS_PER_DECK]
+    self.version = 0
+    self.odds = shoe_odds.ShoeOdds(self)
+
     # Location of the stopper.
     self.stop_location = (self.NUM_CARDS_PER_DECK * self.num_decks) - 1
 
@@ -48,15 +79,47 @@ class Shoe(object):
     """
     return (self.NUM_CARDS_PER_DECK * self.num_decks) - len(self.cards)
 
+  def GetComposition(self):
+    """Returns the number of cards of each rank remaining in the shoe.
+
+    Returns:
+      (int), count per rank in card.RANKS order.
+    """
+    return tuple(self.rank_counts)
+
   def Reset(self):
-    """Reset everything to state upon initilization."""
-    self.cards = copy.deepcopy(self.DECK_OF_CARDS)
-    self.cards *= self.num_decks
-    random.shuffle(self.cards)  # Shuffle shoe at beginning then pop off cards.
+    """Reset everything to state upon initilization.
+
+    Without a shuffle model the shoe is rebuilt from fresh decks and shuffled
+    at random. With one, the unplayed cards are placed under the discards and
+    the resulting pile is shuffled by the model, so the card order carries
+    over from the previous shoe.
+    """
+    if self.shuffle_model is None:
+      self.cards = copy.deepcopy(self.DECK_OF_CARDS)
+      self.cards *= self.num_decks
+    else:
+      self.cards = self.cards + self.discards
+    del self.discards[:]
+    self._Shuffle()  # Shuffle shoe at beginning then pop off cards.
 
     self.cards_played.clear()
+    self.rank_counts = [per_deck * self.num_decks
+                        for per_deck in self.RANK_COUNTS_PER_DECK]
+    self.version += 1
+    self.odds.Clear()
+    handler = self.events.shoe_reset
+    if handler is not None:
+      handler(self)
     self._Start()
 
+  def _Shuffle(self):
+    """Shuffle the cards in the shoe."""
+    if self.shuffle_model is None:
+      self.rng.shuffle(self.cards)
+    else:
+      self.cards = self.shuffle_model.Shuffle(self.cards, self.rng)
+
   def RemoveCard(self, remove_card):
     """Remove a specific card from the shoe.
     
@@ -69,12 +132,19 @@ class Shoe(object):
     if remove_card not in self.cards:
       raise ShoeException('Could not remove %s from the shoe.' % remove_card)
     self.cards.remove(remove_card)
+    self.discards.append(remove_card)
 
     # Update cards available, and record card played.
     if remove_card in self.cards_played:
       self.cards_played[remove_card] += 1
     else:
       self.cards_played[remove_card] = 1
+    self.rank_counts[shoe_odds.RANK_INDEX[remove_card]] -= 1
+    self.version += 1
+
+    handler = self.events.card_dealt
+    if handler is not None:
+      handler(remove_card)
 
   def AddCard(self, old_card):
     """Re-add previously played card to the shoe.
@@ -92,8 +162,15 @@ class Shoe(object):
       self.cards_played.pop(old_card)
     else:
       self.cards_played[old_card] -= 1
+    self.rank_counts[shoe_odds.RANK_INDEX[old_card]] += 1
+    self.version += 1
 
-    self.cards.insert(random.randint(0, len(self.cards)), old_card)
+    # Take the most recently played copy back out of the discards.
+    self.discards.reverse()
+    self.discards.remove(old_card)
+    self.discards.reverse()
+
+    self.cards.insert(self.rng.randint(0, len(self.cards)), old_card)
 
   def GetCard(self):
     """Grab the next card in the shoe, record, and remove from shoe.
@@ -110,10 +187,17 @@ class Shoe(object):
 
     # Update cards available, and record card played.
     new_card = self.cards.pop()
+    self.discards.append(new_card)
     if new_card in self.cards_played:
       self.cards_played[new_card] += 1
     else:
       self.cards_played[new_card] = 1
+    self.rank_counts[shoe_odds.RANK_INDEX[new_card]] -= 1
+    self.version += 1
+
+    handler = self.events.card_dealt
+    if handler is not None:
+      handler(new_card)
 
     return new_card
 
@@ -155,7 +239,7 @@ class Shoe(object):
     """
     # Set default.
     if shoe_percent is None:
-      shoe_percent = random.randint(60, 85)
+      shoe_percent = self.rng.randint(60, 85)
 
     # Check in range.
     if 60 < shoe_percent > 85:
@@ -212,15 +296,9 @@ class Shoe(object):
   def GetBlackjackPercent(self):
     """Return the percent chance of getting a blackjack.
     
-    Based on the cards remaining.
+    Based on the cards remaining, see shoe_odds.ShoeOdds.
 
     Returns:
       float, percent chance of getting a blackjack.
     """
-    face_remaining = (16 * self.num_decks) - self.cards_played.get(card.FACE, 0)
-    ace_remaining =  (4 * self.num_decks) - self.cards_played.get(card.ACE, 0)
-    percent_face_ace = ((float(face_remaining) / len(self.cards)) * 
-        (float(ace_remaining) / (len(self.cards) - 1)))
-    percent_ace_face = ((float(ace_remaining) / len(self.cards)) * 
-        (float(face_remaining) / (len(self.cards) - 1)))
-    return (percent_face_ace + percent_ace_face) * 100
+    return self.odds.BlackjackProbability() * 100
@@ -0,0 +1,255 @@
+""" Probability queries on the cards remaining in a shoe.
+
+Every shoe owns a ShoeOdds, as shoe.odds. It reads the shoe's rank_counts
+vector, which the shoe updates as each card is dealt, so a query never walks
+the cards played:
+
+  bust = current_shoe.odds.DealerBust(card.SIX, rules)
+
+Answers are memoized per composition. The shoe bumps its version with every
+card it deals or takes back; the first query after a change looks up the
+answers of the new composition, the following ones are dict reads. Dealer
+outcomes are memoized per dealer state and composition, so queries for
+nearby compositions reuse the draws below them. Memos are dropped when the
+shoe is reshuffled.
+
+Cards dealt but not seen, such as burned cards or a dealer hole card, are
+not in the shoe; by exchangeability they do not change the odds of the
+cards still to come.
+"""
+import card
+import dealer_automaton
+
+# Rank indices.
+ACE_INDEX = card.RANKS.index(card.ACE)
+FACE_INDEX = card.RANKS.index(card.FACE)
+
+# Index of each rank in composition vectors.
+RANK_INDEX = dict((rank, index) for index, rank in enumerate(card.RANKS))
+
+# Hole card which completes a dealer blackjack, by up card rank index.
+_BLACKJACK_HOLE = {ACE_INDEX: FACE_INDEX, FACE_INDEX: ACE_INDEX}
+
+
+class ShoeOddsException(Exception):
+  """Base exception."""
+
+
+def HandValue(first, second):
+  """Returns the value and softness of a two card hand.
+
+  Args:
+    first: int, rank index of the first card.
+    second: int, rank index of the second card.
+
+  Returns:
+    (int, bool), value of the hand and True if it is soft.
+  """
+  hard_value = card.RANKS[first].alt_value + card.RANKS[second].alt_value
+  if ACE_INDEX in (first, second) and hard_value <= 11:
+    return hard_value + 10, True
+  return hard_value, False
+
+
+class ShoeOdds(object):
+  """Memoized probability queries on a shoe."""
+
+  def __init__(self, current_shoe):
+    """Constructor.
+
+    Args:
+      current_shoe: Shoe, shoe whose remaining cards are queried.
+    """
+    self.shoe = current_shoe
+    self._version = None
+    self._composition = None
+    self._answers = None
+    # {composition: {query: answer}}
+    self._answers_by_composition = {}
+    # {(hit_on_soft_17, state, composition): (float)}
+    self._dealer_memo = {}
+
+  def Clear(self):
+    """Drop every memoized answer."""
+    self._version = None
+    self._answers_by_composition.clear()
+    self._dealer_memo.clear()
+
+  def _Answers(self):
+    """Returns the memo of the current composition."""
+    if self._version != self.shoe.version:
+      self._version = self.shoe.version
+      self._composition = tuple(self.shoe.rank_counts)
+      self._answers = self._answers_by_composition.setdefault(
+          self._composition, {})
+    return self._answers
+
+  def Composition(self):
+    """Returns the remaining count per rank in card.RANKS order."""
+    self._Answers()
+    return self._composition
+
+  def NextCard(self):
+    """Returns the probability of each rank being the next card.
+
+    Returns:
+      (float), probability per rank in card.RANKS order.
+
+    Raises:
+      ShoeOddsException: The shoe is empty.
+    """
+    answers = self._Answers()
+    probs = answers.get('next_card')
+    if probs is None:
+      num_cards = float(sum(self._composition))
+      if not num_cards:
+        raise ShoeOddsException('No cards remaining')
+      probs = tuple([count / num_cards for count in self._composition])
+      answers['next_card'] = probs
+    return probs
+
+  def CardProbability(self, rank):
+    """Returns the probability of the next card being a rank.
+
+    Args:
+      rank: Card, rank such as card.FACE.
+    """
+    return self.NextCard()[RANK_INDEX[rank]]
+
+  def TenProbability(self):
+    """Returns the probability of a ten valued card, such as a hole card."""
+    return self.NextCard()[FACE_INDEX]
+
+  def TwoCardTotals(self):
+    """Returns the distribution of the next two cards as a hand.
+
+    Returns:
+      {(int, bool): float}, probability of each hand value and softness. An
+          ace and a ten valued card is (21, True).
+
+    Raises:
+      ShoeOddsException: Fewer than two cards remaining.
+    """
+    answers = self._Answers()
+    totals = answers.get('two_card_totals')
+    if totals is not None:
+      return totals
+
+    composition = self._composition
+    num_cards = float(sum(composition))
+    if num_cards < 2:
+      raise ShoeOddsException('Need 2 cards, got %d' % num_cards)
+    num_pairs = num_cards * (num_cards - 1)
+    totals = {}
+    for first, first_count in enumerate(composition):
+      if not first_count:
+        continue
+      for second in xrange(first, len(composition)):
+        if first == second:
+          pairs = first_count * (first_count - 1)
+        else:
+          pairs = 2 * first_count * composition[second]
+        if pairs:
+          key = HandValue(first, second)
+          totals[key] = totals.get(key, 0.0) + pairs / num_pairs
+    answers['two_card_totals'] = totals
+    return totals
+
+  def TwoCardTotal(self, total, soft=None):
+    """Returns the probability of the next two cards making a total.
+
+    Args:
+      total: int, hand value, aces counted as 11 where they fit.
+      soft: bool, True for soft hands only, False for hard hands only, None
+          for either.
+    """
+    totals = self.TwoCardTotals()
+    if soft is None:
+      return totals.get((total, False), 0.0) + totals.get((total, True), 0.0)
+    return totals.get((total, soft), 0.0)
+
+  def BlackjackProbability(self):
+    """Returns the probability of the next two cards being a blackjack."""
+    composition = self.Composition()
+    num_cards = sum(composition)
+    if num_cards < 2:
+      return 0.0
+    return (2.0 * composition[ACE_INDEX] * composition[FACE_INDEX] /
+            (num_cards * (num_cards - 1)))
+
+  def DealerOutcomes(self, up_card, rules, peeked=False):
+    """Returns the distribution of the dealers final hand.
+
+    The hole card and every hit are drawn from the cards remaining.
+
+    Args:
+      up_card: Card, dealers face up card, already out of the shoe.
+      rules: table_rules.TableRules, rules the dealer draws by.
+      peeked: bool, condition on the dealer not having blackjack, as is
+          known once the dealer has peeked. Otherwise a dealer blackjack
+          counts as a 21.
+
+    Returns:
+      (float), probability of each outcome: the totals in
+          dealer_automaton.OUTCOME_TOTALS then a bust.
+
+    Raises:
+      ShoeOddsException: The shoe is empty.
+    """
+    automaton = dealer_automaton.GetAutomaton(rules)
+    key = ('dealer', up_card, automaton.hit_on_soft_17, peeked)
+    answers = self._Answers()
+    outcomes = answers.get(key)
+    if outcomes is None:
+      skip = None
+      if peeked:
+        skip = _BLACKJACK_HOLE.get(RANK_INDEX[up_card])
+      outcomes = self._Draw(automaton,
+                            automaton.StateOf([up_card]),
+                            self._composition, skip)
+      answers[key] = outcomes
+    return outcomes
+
+  def DealerBust(self, up_card, rules, peeked=False):
+    """Returns the probability of the dealer busting. See DealerOutcomes."""
+    return self.DealerOutcomes(up_card, rules, peeked)[dealer_automaton.BUST]
+
+  def _Draw(self, automaton, state, composition, skip=None):
+    """Dealer outcomes after drawing from a state until final.
+
+    Args:
+      automaton: dealer_automaton.DealerAutomaton, the drawing rule.
+      state: int, drawing state of the dealer hand.
+      composition: (int), remaining count per rank.
+      skip: int, rank index the next card is known not to be.
+
+    Returns:
+      (float), probability of each outcome, see DealerOutcomes.
+    """
+    num_cards = sum(composition)
+    if skip is not None:
+      num_cards -= composition[skip]
+    if num_cards <= 0:
+      raise ShoeOddsException('No cards remaining for the dealer')
+    num_cards = float(num_cards)
+
+    steps = automaton.steps
+    outcomes = [0.0] * dealer_automaton.NUM_OUTCOMES
+    for index, count in enumerate(composition):
+      if not count or index == skip:
+        continue
+      prob = count / num_cards
+      code = steps[state + card.RANKS[index].value]
+      if code < 0:
+        outcomes[dealer_automaton.Outcome(code)] += prob
+        continue
+
+      remaining = composition[:index] + (count - 1,) + composition[index + 1:]
+      key = (automaton.hit_on_soft_17, code, remaining)
+      drawn = self._dealer_memo.get(key)
+      if drawn is None:
+        drawn = self._Draw(automaton, code, remaining)
+        self._dealer_memo[key] = drawn
+      for outcome, drawn_prob in enumerate(drawn):
+        outcomes[outcome] += prob * drawn_prob
+    return tuple(outcomes)
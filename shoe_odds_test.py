@@ -0,0 +1,81 @@
+import card
+import dealer_automaton
+import random
+import round_ev
+import shoe
+import table_rules
+import unittest
+
+
+class ShoeOddsTest(unittest.TestCase):
+  def setUp(self):
+    self.rules = table_rules.DEFAULT_TABLE_RULES
+    self.shoe = shoe.Shoe(self.rules.num_decks, rng=random.Random(5))
+
+  def test_rank_counts_follow_cards(self):
+    self.shoe.GetCards(30)
+    self.shoe.RemoveCard(self.shoe.cards[0])
+    self.shoe.AddCard(self.shoe.discards[3])
+    self.assertEqual(list(self.shoe.odds.Composition()),
+                     [self.shoe.cards.count(rank) for rank in card.RANKS])
+    self.shoe.Reset()
+    self.assertEqual(sum(self.shoe.GetComposition()), len(self.shoe.cards))
+
+  def test_next_card(self):
+    self.shoe.GetCards(20)
+    composition = self.shoe.GetComposition()
+    probs = self.shoe.odds.NextCard()
+    self.assertAlmostEqual(sum(probs), 1.0)
+    self.assertAlmostEqual(self.shoe.odds.TenProbability(),
+                           float(composition[-1]) / len(self.shoe.cards))
+    self.assertAlmostEqual(self.shoe.odds.CardProbability(card.ACE),
+                           float(composition[0]) / len(self.shoe.cards))
+
+  def test_answers_follow_the_shoe(self):
+    odds = self.shoe.odds
+    before = odds.NextCard()
+    self.assertIs(before, odds.NextCard())
+    self.shoe.GetCard()
+    self.assertNotEqual(before, odds.NextCard())
+
+  def test_two_card_totals(self):
+    odds = self.shoe.odds
+    self.assertAlmostEqual(sum(odds.TwoCardTotals().values()), 1.0)
+    self.assertAlmostEqual(odds.TwoCardTotal(21, soft=True),
+                           odds.BlackjackProbability())
+    self.assertAlmostEqual(self.shoe.GetBlackjackPercent(),
+                           odds.BlackjackProbability() * 100)
+    # Two aces are a soft 12, never a hard 2.
+    self.assertEqual(odds.TwoCardTotal(2), 0.0)
+    self.assertGreater(odds.TwoCardTotal(12, soft=True), 0.0)
+    self.assertAlmostEqual(odds.TwoCardTotal(20),
+                           odds.TwoCardTotal(20, soft=True) +
+                           odds.TwoCardTotal(20, soft=False))
+
+  def test_dealer_outcomes_match_round_ev(self):
+    calculator = round_ev.RoundEvCalculator(self.rules, None)
+    self.shoe.GetCards(40)
+    composition = self.shoe.GetComposition()
+    for up in card.RANKS:
+      outcomes = self.shoe.odds.DealerOutcomes(up, self.rules, peeked=True)
+      self.assertAlmostEqual(sum(outcomes), 1.0)
+      expected = calculator._DealerOutcomes(card.RANKS.index(up), composition)
+      no_blackjack = sum(expected)
+      for prob, expected_prob in zip(outcomes, expected):
+        self.assertAlmostEqual(prob, expected_prob / no_blackjack)
+
+  def test_dealer_blackjack_counts_as_21(self):
+    odds = self.shoe.odds
+    peeked = odds.DealerOutcomes(card.ACE, self.rules, peeked=True)
+    unpeeked = odds.DealerOutcomes(card.ACE, self.rules)
+    self.assertAlmostEqual(sum(unpeeked), 1.0)
+    self.assertGreater(unpeeked[-2], peeked[-2])
+    self.assertEqual(odds.DealerBust(card.SIX, self.rules),
+                     odds.DealerOutcomes(card.SIX, self.rules)[
+                         dealer_automaton.BUST])
+    self.assertGreater(odds.DealerBust(card.SIX, self.rules),
+                       odds.DealerBust(card.FACE, self.rules))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,4 +1,6 @@
 import card
+import events
+import random
 import shoe
 import unittest
 
@@ -26,6 +28,26 @@ class ShoeTest(unittest.TestCase):
     self.shoe.Reset()
     self.assertEqual(self.shoe.GetNumCardsPlayed(), decks)
 
+  def test_same_seed_same_cards(self):
+    # Differential checks rely on a seed fixing every card dealt.
+    first = shoe.Shoe(4, rng=random.Random(3))
+    second = shoe.Shoe(4, rng=random.Random(3))
+    self.assertEqual(first.GetCards(100), second.GetCards(100))
+    first.Reset()
+    second.Reset()
+    self.assertEqual(first.cards, second.cards)
+
+  def test_card_dealt_events(self):
+    bus = events.EventBus()
+    dealt = []
+    bus.Register(events.CARD_DEALT, dealt.append)
+    self.shoe = shoe.Shoe(4, rng=random.Random(4), event_bus=bus)
+    del dealt[:]
+    cards = self.shoe.GetCards(5)
+    self.shoe.BurnCards(2)
+    self.assertEqual(cards, dealt[:5])
+    self.assertEqual(7, len(dealt))
+
   def test_add_card_new_deck(self):
     #self.assertRaises(self.shoe.AddCard(card.ACE), shoe.ShoeException)
     pass
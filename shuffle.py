@@ -0,0 +1,215 @@
+""" Non-random shuffle models.
+
+A shuffle model turns the previous shoe's pile of cards into the next shoe's
+card order by simulating the procedures a dealer actually performs: riffles,
+strips, plugs, and cuts. Unlike random.shuffle, the resulting order depends
+on the order of the pile, which is what shuffle-tracking exploits.
+
+Piles are lists ordered the same way as Shoe.cards: the last element is the
+top of the pile (the next card to come out of the shoe).
+
+Every procedure is expressed as bulk list operations (slicing, concatenation,
+and a single merge per riffle) instead of moving one card at a time, so a
+multi-pass eight deck shuffle costs about the same as random.shuffle.
+"""
+import random
+
+
+class ShuffleException(Exception):
+  """Base exception."""
+
+
+class ShuffleModel(object):
+  """Base class for shuffle models. Does nothing."""
+
+  def Shuffle(self, pile, rng=random):
+    """Return a new card order from the pile.
+
+    Args:
+      pile: [Card], cards to shuffle, top of the pile last.
+      rng: random.Random, source of randomness.
+
+    Returns:
+      [Card], shuffled cards, top of the shoe last.
+    """
+    raise ShuffleException('No shuffle model set')
+
+
+class PerfectShuffle(ShuffleModel):
+  """Uniformly random order regardless of the pile. Matches Shoe default."""
+
+  def Shuffle(self, pile, rng=random):
+    cards = list(pile)
+    rng.shuffle(cards)
+    return cards
+
+
+class RiffleShuffle(ShuffleModel):
+  """Gilbert-Shannon-Reeds riffle.
+
+  The pile is cut near the middle and the two packets are dropped together.
+  Each output position independently takes the next card from the left or the
+  right packet with equal probability, which is exactly the GSR model and
+  produces its characteristic clumping of cards from the same packet.
+  """
+
+  def __init__(self, passes=1):
+    """Constructor.
+
+    Args:
+      passes: int, number of riffles performed.
+    """
+    if passes < 1:
+      raise ShuffleException('Riffle needs at least 1 pass, got %d' % passes)
+    self.passes = passes
+
+  def Shuffle(self, pile, rng=random):
+    cards = list(pile)
+    num_cards = len(cards)
+    for _ in xrange(self.passes):
+      # One fair bit per output position. The number of zeros is binomial,
+      # which is the GSR cut, and their placement is a uniform interleave.
+      bits = bin(rng.getrandbits(num_cards) | (1 << num_cards))[3:]
+      cut = bits.count('0')
+      drop = {'0': iter(cards[:cut]).next, '1': iter(cards[cut:]).next}
+      cards = [drop[bit]() for bit in bits]
+    return cards
+
+
+class StripShuffle(ShuffleModel):
+  """Strip small packets off the top onto a new pile, reversing packet order."""
+
+  def __init__(self, min_packet=3, max_packet=10):
+    """Constructor.
+
+    Args:
+      min_packet: int, smallest packet stripped off at once.
+      max_packet: int, largest packet stripped off at once.
+    """
+    if not 0 < min_packet <= max_packet:
+      raise ShuffleException('Invalid packet range [%d, %d]' % (
+          min_packet, max_packet))
+    self.min_packet = min_packet
+    self.max_packet = max_packet
+
+  def Shuffle(self, pile, rng=random):
+    span = self.max_packet - self.min_packet + 1
+    cards = []
+    top = len(pile)
+    # First packet stripped lands on the bottom of the new pile.
+    while top > 0:
+      bottom = top - self.min_packet - int(rng.random() * span)
+      cards += pile[max(bottom, 0):top]
+      top = bottom
+    return cards
+
+
+class PlugShuffle(ShuffleModel):
+  """Take a chunk from the bottom and plug it into the pile at random."""
+
+  def __init__(self, min_fraction=0.1, max_fraction=0.25):
+    """Constructor.
+
+    Args:
+      min_fraction: float, smallest fraction of the pile plugged.
+      max_fraction: float, largest fraction of the pile plugged.
+    """
+    if not 0.0 <= min_fraction <= max_fraction < 1.0:
+      raise ShuffleException('Invalid plug range [%.2f, %.2f]' % (
+          min_fraction, max_fraction))
+    self.min_fraction = min_fraction
+    self.max_fraction = max_fraction
+
+  def Shuffle(self, pile, rng=random):
+    plug_size = int(len(pile) * rng.uniform(self.min_fraction,
+                                            self.max_fraction))
+    plug, rest = pile[:plug_size], pile[plug_size:]
+    position = rng.randint(0, len(rest))
+    return rest[:position] + plug + rest[position:]
+
+
+class CutShuffle(ShuffleModel):
+  """Cut the pile, moving the top portion to the bottom."""
+
+  def __init__(self, min_fraction=0.25, max_fraction=0.75):
+    """Constructor.
+
+    Args:
+      min_fraction: float, smallest fraction of the pile cut off the top.
+      max_fraction: float, largest fraction of the pile cut off the top.
+    """
+    if not 0.0 <= min_fraction <= max_fraction <= 1.0:
+      raise ShuffleException('Invalid cut range [%.2f, %.2f]' % (
+          min_fraction, max_fraction))
+    self.min_fraction = min_fraction
+    self.max_fraction = max_fraction
+
+  def Shuffle(self, pile, rng=random):
+    cut = len(pile) - int(len(pile) * rng.uniform(self.min_fraction,
+                                                  self.max_fraction))
+    return pile[cut:] + pile[:cut]
+
+
+class ShuffleProcedure(ShuffleModel):
+  """A sequence of shuffle models applied one after another."""
+
+  def __init__(self, steps):
+    """Constructor.
+
+    Args:
+      steps: [ShuffleModel], models to apply in order.
+    """
+    self.steps = list(steps)
+
+  def Shuffle(self, pile, rng=random):
+    cards = list(pile)
+    for step in self.steps:
+      cards = step.Shuffle(cards, rng)
+    return cards
+
+
+class ZoneShuffle(ShuffleModel):
+  """Split the pile into zones and shuffle each zone independently.
+
+  Large shoes are too big to riffle in one go, so dealers break the pile into
+  zones, shuffle each with the same procedure, then restack the zones. Cards
+  never leave their zone, which is what makes the shuffle trackable.
+  """
+
+  def __init__(self, procedure, num_zones=4):
+    """Constructor.
+
+    Args:
+      procedure: ShuffleModel, procedure applied within each zone.
+      num_zones: int, number of zones the pile is split into.
+    """
+    if num_zones < 1:
+      raise ShuffleException('Need at least 1 zone, got %d' % num_zones)
+    self.procedure = procedure
+    self.num_zones = num_zones
+
+  def Shuffle(self, pile, rng=random):
+    cards = []
+    zone_size = float(len(pile)) / self.num_zones
+    for zone in xrange(self.num_zones):
+      cards.extend(self.procedure.Shuffle(
+          pile[int(zone * zone_size):int((zone + 1) * zone_size)], rng))
+    return cards
+
+
+def CasinoShuffle(num_decks):
+  """A typical hand shuffle for the given shoe size.
+
+  Plug, then riffle-strip-riffle each two deck zone, then cut.
+
+  Args:
+    num_decks: int, number of decks in the shoe.
+
+  Returns:
+    ShuffleModel, the casino shuffle.
+  """
+  zone = ShuffleProcedure([RiffleShuffle(), StripShuffle(), RiffleShuffle()])
+  return ShuffleProcedure([
+      PlugShuffle(),
+      ZoneShuffle(zone, num_zones=max(num_decks // 2, 1)),
+      CutShuffle()])
@@ -0,0 +1,52 @@
+import collections
+import random
+import shoe
+import shuffle
+import unittest
+
+class ShuffleTest(unittest.TestCase):
+  def setUp(self):
+    self.pile = shoe.Shoe.DECK_OF_CARDS * 8
+    self.rng = random.Random(7)
+
+  def test_models_keep_cards(self):
+    models = [shuffle.PerfectShuffle(), shuffle.RiffleShuffle(passes=3),
+              shuffle.StripShuffle(), shuffle.PlugShuffle(),
+              shuffle.CutShuffle(), shuffle.CasinoShuffle(8)]
+    for model in models:
+      cards = model.Shuffle(self.pile, self.rng)
+      self.assertEqual(collections.Counter(cards),
+                       collections.Counter(self.pile))
+
+  def test_riffle_has_two_rising_sequences(self):
+    cards = shuffle.RiffleShuffle().Shuffle(range(100), self.rng)
+
+    # Each packet keeps its relative order, so at most one descent.
+    position = dict((value, index) for index, value in enumerate(cards))
+    descents = sum(1 for value in xrange(99)
+                   if position[value + 1] < position[value])
+    self.assertLessEqual(descents, 1)
+
+  def test_strip_reverses_packets(self):
+    cards = shuffle.StripShuffle(min_packet=2, max_packet=2).Shuffle(
+        range(6), self.rng)
+    self.assertEqual(cards, [4, 5, 2, 3, 0, 1])
+
+  def test_cut(self):
+    cards = shuffle.CutShuffle(0.5, 0.5).Shuffle(range(6), self.rng)
+    self.assertEqual(cards, [3, 4, 5, 0, 1, 2])
+
+  def test_shoe_reset_carries_order(self):
+    # A procedure with no steps must reproduce the previous pile exactly.
+    identity = shuffle.ShuffleProcedure([])
+    test_shoe = shoe.Shoe(4, shuffle_model=identity, rng=self.rng)
+    test_shoe.BurnCards(20)
+    pile = test_shoe.cards + test_shoe.discards
+
+    test_shoe.Reset()
+    self.assertEqual(test_shoe.cards + test_shoe.discards[::-1], pile)
+    self.assertEqual(test_shoe.GetNumCardsPlayed(), 4)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,434 @@
+""" Side bets priced exactly from the cards left in the shoe.
+
+A side bet is settled on the first cards of a round: the players two cards,
+the dealers up card and, for some bets, the dealers hole card. Those cards
+are the next ones out of the shoe, so the exact odds of every outcome follow
+from what is left in it.
+
+Perfect Pairs, 21+3 and Lucky Ladies depend on suits and on faces being told
+apart, which the default shoe does not track. A SuitedShoe deals the same
+card.Card values but also knows the identity (see card.Identity) of every
+card, and keeps a SuitedComposition up to date as cards leave. The
+composition holds the counts per identity, rank and suit plus running sums
+such as the number of ordered same rank pairs, so each card updates it in
+constant time and each bet is priced in time bounded by the number of ranks.
+
+Insurance only needs ranks and is priced from the shoe's odds (see
+shoe_odds), so it works with the default shoe.
+
+Ev returns the expected net units won per unit staked; Payout returns the
+net units won per unit staked by a dealt round. Wallets only place a side
+bet when its Ev is positive, staking what Stake returns: a fixed number of
+units, or half the main bet for Insurance.
+"""
+import random
+
+import card
+import shoe
+import shoe_odds
+
+# Suited ranks forming a straight in 21+3, the Ace plays high or low.
+STRAIGHTS = tuple((rank, rank + 1, rank + 2) for rank in xrange(11)) + (
+    (card.QUEEN, card.KING, 0),)
+
+# Suited ranks worth 10.
+TEN_RANKS = (card.TEN, card.JACK, card.QUEEN, card.KING)
+
+
+class SideBetException(Exception):
+  """Base exception."""
+
+
+class SuitedComposition(object):
+  """Cards left in a suited shoe, with the sums the side bets price from.
+
+  Pair and triple sums count ordered draws: rank_pairs is sum R * (R - 1)
+  over ranks, the number of ways to draw two cards of the same rank in
+  order.
+  """
+
+  def __init__(self, num_decks):
+    """Constructor.
+
+    Args:
+      num_decks: int, number of decks in the shoe.
+    """
+    self.num_decks = num_decks
+    self.Reset()
+
+  def Reset(self):
+    """Every card is back in the shoe."""
+    num_decks = self.num_decks
+    self.total = card.NUM_IDENTITIES * num_decks
+    self.counts = [num_decks] * card.NUM_IDENTITIES
+    self.rank_counts = [4 * num_decks] * len(card.SUITED_RANKS)
+    self.suit_counts = [len(card.SUITED_RANKS) * num_decks] * len(card.SUITS)
+
+    ranks = 4 * num_decks
+    # Same identity.
+    self.same_card_pairs = card.NUM_IDENTITIES * num_decks * (num_decks - 1)
+    self.same_card_triples = self.same_card_pairs * (num_decks - 2)
+    # Same rank, same colour, other suit.
+    self.same_colour_pairs = card.NUM_IDENTITIES * num_decks * num_decks
+    # Same rank.
+    self.rank_pairs = len(card.SUITED_RANKS) * ranks * (ranks - 1)
+    self.rank_triples = len(card.SUITED_RANKS) * ranks * (ranks - 1) * (
+        ranks - 2)
+
+  def Remove(self, identity):
+    """A card left the shoe.
+
+    Args:
+      identity: int, card identity.
+    """
+    count = self.counts[identity]
+    self.same_card_pairs -= 2 * (count - 1)
+    self.same_card_triples -= 3 * (count - 1) * (count - 2)
+    self.same_colour_pairs -= 2 * self.counts[identity ^ 1]
+    self.counts[identity] = count - 1
+
+    rank = identity // 4
+    count = self.rank_counts[rank]
+    self.rank_pairs -= 2 * (count - 1)
+    self.rank_triples -= 3 * (count - 1) * (count - 2)
+    self.rank_counts[rank] = count - 1
+
+    self.suit_counts[identity % 4] -= 1
+    self.total -= 1
+
+  def Add(self, identity):
+    """A card went back into the shoe.
+
+    Args:
+      identity: int, card identity.
+    """
+    count = self.counts[identity]
+    self.same_card_pairs += 2 * count
+    self.same_card_triples += 3 * count * (count - 1)
+    self.same_colour_pairs += 2 * self.counts[identity ^ 1]
+    self.counts[identity] = count + 1
+
+    rank = identity // 4
+    count = self.rank_counts[rank]
+    self.rank_pairs += 2 * count
+    self.rank_triples += 3 * count * (count - 1)
+    self.rank_counts[rank] = count + 1
+
+    self.suit_counts[identity % 4] += 1
+    self.total += 1
+
+
+class SuitedShoe(shoe.Shoe):
+  """A shoe that also tracks the suit and face rank of every card.
+
+  self.identities runs parallel to self.cards and self.identity_discards to
+  self.discards.
+  """
+
+  def __init__(self, num_decks, shuffle_model=None, rng=random,
+               event_bus=None):
+    """Constructor. See shoe.Shoe."""
+    self.identities = range(card.NUM_IDENTITIES) * num_decks
+    self.identity_discards = []
+    self.composition = SuitedComposition(num_decks)
+    super(SuitedShoe, self).__init__(num_decks, shuffle_model=shuffle_model,
+                                     rng=rng, event_bus=event_bus)
+
+  def Reset(self):
+    if self.shuffle_model is None:
+      self.identities = range(card.NUM_IDENTITIES) * self.num_decks
+    else:
+      self.identities = self.identities + self.identity_discards
+    del self.identity_discards[:]
+    self.composition.Reset()
+    super(SuitedShoe, self).Reset()
+
+  def _Shuffle(self):
+    """Shuffle the identities and deal the matching cards."""
+    if self.shuffle_model is None:
+      self.rng.shuffle(self.identities)
+    else:
+      self.identities = self.shuffle_model.Shuffle(self.identities, self.rng)
+    self.cards = [card.SUITED_CARDS[identity] for identity in self.identities]
+
+  def GetCard(self):
+    new_card = super(SuitedShoe, self).GetCard()
+    identity = self.identities.pop()
+    self.identity_discards.append(identity)
+    self.composition.Remove(identity)
+    return new_card
+
+  def RemoveCard(self, remove_card):
+    if remove_card in self.cards:
+      identity = self.identities.pop(self.cards.index(remove_card))
+      self.identity_discards.append(identity)
+      self.composition.Remove(identity)
+    super(SuitedShoe, self).RemoveCard(remove_card)
+
+  def AddCard(self, old_card):
+    if old_card not in self.cards_played:
+      raise shoe.ShoeException('Cannot re-add. None played.')
+
+    if self.cards_played[old_card] == 1:
+      self.cards_played.pop(old_card)
+    else:
+      self.cards_played[old_card] -= 1
+    self.rank_counts[shoe_odds.RANK_INDEX[old_card]] += 1
+    self.version += 1
+
+    # Take the most recently played copy back out of the discards.
+    index = len(self.discards) - 1 - self.discards[::-1].index(old_card)
+    del self.discards[index]
+    identity = self.identity_discards.pop(index)
+    self.composition.Add(identity)
+
+    location = self.rng.randint(0, len(self.cards))
+    self.cards.insert(location, old_card)
+    self.identities.insert(location, identity)
+
+  def GetLastIdentities(self, num_cards):
+    """Returns the identities of the last cards dealt, oldest first.
+
+    Args:
+      num_cards: int, number of cards.
+    """
+    return tuple(self.identity_discards[-num_cards:])
+
+
+def _Composition(current_shoe):
+  """Returns the SuitedComposition of a shoe.
+
+  Raises:
+    SideBetException: The shoe does not track suits.
+  """
+  if not isinstance(current_shoe, SuitedShoe):
+    raise SideBetException('Suited side bets need a SuitedShoe.')
+  return current_shoe.composition
+
+
+class SideBet(object):
+  """A bet on the first cards of a round, staking Stake units."""
+  name = ''
+  # Needs a SuitedShoe.
+  suited = True
+  # Offered once the dealers up card is seen instead of with the main bet.
+  after_up_card = False
+  # Reads the dealers second card. Tables without a hole card settle such
+  # bets once the dealer has drawn, the others with the first three cards.
+  hole_card = True
+
+  def __init__(self, money_units=1):
+    """Constructor.
+
+    Args:
+      money_units: int, units staked whenever the bet is placed.
+    """
+    self.money_units = money_units
+
+  def Stake(self, main_money_units):
+    """Returns the units staked on a hand.
+
+    Args:
+      main_money_units: float, units of the main bet on the hand.
+    """
+    return self.money_units
+
+  def Ev(self, current_shoe):
+    """Returns the expected net units won per unit staked.
+
+    Args:
+      current_shoe: Shoe, shoe the round will be dealt from.
+    """
+    raise SideBetException('No side bet set')
+
+  def Payout(self, player_hand, dealer_hand, identities):
+    """Returns the net units won per unit staked.
+
+    Args:
+      player_hand: Hand, the players first two cards.
+      dealer_hand: Hand, the dealers up and hole cards.
+      identities: (int), identities of the players two cards, the dealers up
+          card and hole card. None if the shoe does not track suits.
+    """
+    raise SideBetException('No side bet set')
+
+
+class PerfectPairs(SideBet):
+  """The players two cards are a pair.
+
+  Pays 25 to 1 for the same suit, 12 to 1 for the same colour and 6 to 1
+  otherwise.
+  """
+  name = 'Perfect Pairs'
+  hole_card = False
+  PERFECT = 25
+  COLOURED = 12
+  MIXED = 6
+
+  def Ev(self, current_shoe):
+    composition = _Composition(current_shoe)
+    total = composition.total
+    ways = float(total * (total - 1))
+    perfect = composition.same_card_pairs
+    coloured = composition.same_colour_pairs
+    mixed = composition.rank_pairs - perfect - coloured
+    return ((self.PERFECT + 1) * perfect + (self.COLOURED + 1) * coloured +
+            (self.MIXED + 1) * mixed) / ways - 1
+
+  def Payout(self, player_hand, dealer_hand, identities):
+    first, second = identities[:2]
+    if first // 4 != second // 4:
+      return -1
+    if first == second:
+      return self.PERFECT
+    if first ^ 1 == second:
+      return self.COLOURED
+    return self.MIXED
+
+
+class TwentyOnePlusThree(SideBet):
+  """The players two cards and the dealers up card make a poker hand.
+
+  Pays 100 to 1 for suited trips, 40 to 1 for a straight flush, 30 to 1 for
+  three of a kind, 10 to 1 for a straight and 5 to 1 for a flush.
+  """
+  name = '21+3'
+  hole_card = False
+  SUITED_TRIPS = 100
+  STRAIGHT_FLUSH = 40
+  THREE_OF_A_KIND = 30
+  STRAIGHT = 10
+  FLUSH = 5
+
+  def Ev(self, current_shoe):
+    composition = _Composition(current_shoe)
+    total = composition.total
+    ways = float(total * (total - 1) * (total - 2))
+    counts = composition.counts
+    rank_counts = composition.rank_counts
+
+    straights = 0
+    straight_flushes = 0
+    for low, middle, high in STRAIGHTS:
+      straights += rank_counts[low] * rank_counts[middle] * rank_counts[high]
+      low, middle, high = low * 4, middle * 4, high * 4
+      for suit in xrange(4):
+        straight_flushes += (counts[low + suit] * counts[middle + suit] *
+                             counts[high + suit])
+    # Three different cards come out in 3! orders.
+    straights *= 6
+    straight_flushes *= 6
+    flushes = sum(count * (count - 1) * (count - 2)
+                  for count in composition.suit_counts)
+
+    suited_trips = composition.same_card_triples
+    return ((self.SUITED_TRIPS + 1) * suited_trips +
+            (self.STRAIGHT_FLUSH + 1) * straight_flushes +
+            (self.THREE_OF_A_KIND + 1) * (composition.rank_triples -
+                                          suited_trips) +
+            (self.STRAIGHT + 1) * (straights - straight_flushes) +
+            (self.FLUSH + 1) * (flushes - straight_flushes - suited_trips)
+           ) / ways - 1
+
+  def Payout(self, player_hand, dealer_hand, identities):
+    cards = identities[:3]
+    ranks = sorted(identity // 4 for identity in cards)
+    flush = len(set(identity % 4 for identity in cards)) == 1
+    if ranks[0] == ranks[2]:
+      return self.SUITED_TRIPS if flush else self.THREE_OF_A_KIND
+    straight = (ranks[0] + 1 == ranks[1] and ranks[1] + 1 == ranks[2] or
+                ranks == [0, card.QUEEN, card.KING])
+    if straight:
+      return self.STRAIGHT_FLUSH if flush else self.STRAIGHT
+    if flush:
+      return self.FLUSH
+    return -1
+
+
+class LuckyLadies(SideBet):
+  """The players two cards total 20.
+
+  Pays 1000 to 1 for a pair of Queens of Hearts with a dealer blackjack,
+  125 to 1 for a pair of Queens of Hearts, 19 to 1 for a matched 20 (same
+  rank and suit), 9 to 1 for a suited 20 and 4 to 1 for any other 20.
+  """
+  name = 'Lucky Ladies'
+  QUEENS_DEALER_BLACKJACK = 1000
+  QUEENS = 125
+  MATCHED = 19
+  SUITED = 9
+  ANY = 4
+  QUEEN_OF_HEARTS = card.Identity(card.QUEEN, card.HEARTS)
+
+  def Ev(self, current_shoe):
+    composition = _Composition(current_shoe)
+    total = composition.total
+    ways = float(total * (total - 1))
+    counts = composition.counts
+    rank_counts = composition.rank_counts
+
+    tens = sum(rank_counts[rank] for rank in TEN_RANKS)
+    aces = rank_counts[0]
+    twenties = tens * (tens - 1) + 2 * aces * rank_counts[8]
+
+    suited = 0
+    matched = 0
+    for suit in xrange(4):
+      suit_tens = 0
+      for rank in TEN_RANKS:
+        count = counts[rank * 4 + suit]
+        suit_tens += count
+        matched += count * (count - 1)
+      suited += suit_tens * (suit_tens - 1) + 2 * counts[suit] * counts[
+          32 + suit]
+
+    queens = counts[self.QUEEN_OF_HEARTS]
+    queens = queens * (queens - 1)
+    # The dealers up and hole cards follow the players two Queens.
+    rest = total - 2
+    dealer_blackjack = 0.0
+    if rest > 1:
+      dealer_blackjack = 2.0 * aces * (tens - 2) / (rest * (rest - 1))
+    queens_blackjack = queens * dealer_blackjack
+
+    return ((self.QUEENS_DEALER_BLACKJACK + 1) * queens_blackjack +
+            (self.QUEENS + 1) * (queens - queens_blackjack) +
+            (self.MATCHED + 1) * (matched - queens) +
+            (self.SUITED + 1) * (suited - matched) +
+            (self.ANY + 1) * (twenties - suited)) / ways - 1
+
+  def Payout(self, player_hand, dealer_hand, identities):
+    first, second = identities[:2]
+    if player_hand.GetValue() != 20:
+      return -1
+    if first == second:
+      if first == self.QUEEN_OF_HEARTS:
+        if dealer_hand.IsBlackjack():
+          return self.QUEENS_DEALER_BLACKJACK
+        return self.QUEENS
+      return self.MATCHED
+    if first % 4 == second % 4:
+      return self.SUITED
+    return self.ANY
+
+
+class Insurance(SideBet):
+  """The dealer shows an Ace and has blackjack. Pays 2 to 1.
+
+  Stakes half the main bet, whatever money_units says.
+  """
+  name = 'Insurance'
+  suited = False
+  after_up_card = True
+  PAYS = 2
+
+  def Stake(self, main_money_units):
+    return main_money_units / 2.0
+
+  def Ev(self, current_shoe):
+    return (self.PAYS + 1) * current_shoe.odds.TenProbability() - 1
+
+  def Payout(self, player_hand, dealer_hand, identities):
+    if dealer_hand.IsBlackjack():
+      return self.PAYS
+    return -1
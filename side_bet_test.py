@@ -0,0 +1,199 @@
+import card
+import game
+import hand
+import random
+import shuffle
+import side_bet
+import simulation
+import strategy
+import unittest
+import wallet
+
+
+def _Draws(counts, num_cards):
+  """Yields (weight, identities) of every ordered draw from the counts."""
+  if not num_cards:
+    yield 1, ()
+    return
+  for identity, count in enumerate(counts):
+    if not count:
+      continue
+    counts[identity] -= 1
+    for weight, rest in _Draws(counts, num_cards - 1):
+      yield count * weight, (identity,) + rest
+    counts[identity] += 1
+
+
+def _Hands(identities):
+  """Returns the player and dealer hands of a deal, dealer cards optional."""
+  player_hand = hand.Hand([card.SUITED_CARDS[i] for i in identities[:2]])
+  dealer_hand = hand.Hand([card.SUITED_CARDS[i] for i in identities[2:4]])
+  return player_hand, dealer_hand
+
+
+def _BruteForceEv(bet, counts, num_cards):
+  """Returns the EV of a bet by enumerating the deals of num_cards cards."""
+  total = 0.0
+  ways = 0
+  for weight, identities in _Draws(list(counts), num_cards):
+    player_hand, dealer_hand = _Hands(identities)
+    total += weight * bet.Payout(player_hand, dealer_hand, identities)
+    ways += weight
+  return total / ways
+
+
+class _Recording(object):
+  """Mixin recording every EV a side bet was priced at."""
+
+  def __init__(self):
+    super(_Recording, self).__init__()
+    self.evs = []
+
+  def Ev(self, current_shoe):
+    ev = super(_Recording, self).Ev(current_shoe)
+    self.evs.append(ev)
+    return ev
+
+
+class _PerfectPairs(_Recording, side_bet.PerfectPairs):
+  pass
+
+
+class _TwentyOnePlusThree(_Recording, side_bet.TwentyOnePlusThree):
+  pass
+
+
+class _LuckyLadies(_Recording, side_bet.LuckyLadies):
+  pass
+
+
+class _Insurance(_Recording, side_bet.Insurance):
+  pass
+
+
+class SideBetTest(unittest.TestCase):
+  def setUp(self):
+    self.shoe = side_bet.SuitedShoe(1, rng=random.Random(3))
+    self.shoe.BurnCards(20)
+
+  def assertMatchesCounts(self, composition):
+    fresh = side_bet.SuitedComposition(composition.num_decks)
+    for identity, count in enumerate(composition.counts):
+      for _ in xrange(composition.num_decks - count):
+        fresh.Remove(identity)
+    self.assertEqual(vars(fresh), vars(composition))
+
+  def test_composition_follows_shoe(self):
+    self.assertMatchesCounts(self.shoe.composition)
+    self.assertEqual(sorted(self.shoe.identities),
+                     sorted(i for i, count in
+                            enumerate(self.shoe.composition.counts)
+                            for _ in xrange(count)))
+    self.shoe.RemoveCard(card.FACE)
+    self.shoe.AddCard(card.ACE if card.ACE in self.shoe.cards_played
+                      else card.FACE)
+    self.assertMatchesCounts(self.shoe.composition)
+    self.assertEqual([card.SUITED_CARDS[i] for i in self.shoe.identities],
+                     self.shoe.cards)
+
+  def test_shuffle_model_keeps_identities(self):
+    suited_shoe = side_bet.SuitedShoe(2, shuffle_model=shuffle.RiffleShuffle(),
+                                      rng=random.Random(1))
+    suited_shoe.BurnCards(30)
+    suited_shoe.Reset()
+    self.assertEqual(sorted(suited_shoe.identities + suited_shoe.identity_discards),
+                     sorted(range(card.NUM_IDENTITIES) * 2))
+    self.assertMatchesCounts(suited_shoe.composition)
+
+  def test_exact_ev(self):
+    counts = self.shoe.composition.counts
+    for bet, num_cards in ((side_bet.PerfectPairs(), 2),
+                           (side_bet.TwentyOnePlusThree(), 3)):
+      self.assertAlmostEqual(_BruteForceEv(bet, counts, num_cards),
+                             bet.Ev(self.shoe))
+
+  def test_lucky_ladies_ev(self):
+    # Leave plenty of Queens of Hearts so every payout is reachable.
+    suited_shoe = side_bet.SuitedShoe(6, rng=random.Random(5))
+    suited_shoe.BurnCards(250)
+    counts = suited_shoe.composition.counts
+    bet = side_bet.LuckyLadies()
+
+    total = 0.0
+    ways = 0
+    for weight, identities in _Draws(list(counts), 2):
+      ways += weight
+      if identities != (bet.QUEEN_OF_HEARTS,) * 2:
+        player_hand, dealer_hand = _Hands(identities)
+        total += weight * bet.Payout(player_hand, dealer_hand, identities)
+        continue
+      # Only a pair of Queens of Hearts pays depending on the dealers cards.
+      remaining = list(counts)
+      remaining[bet.QUEEN_OF_HEARTS] -= 2
+      dealer_total = 0.0
+      dealer_ways = 0
+      for dealer_weight, dealer in _Draws(remaining, 2):
+        player_hand, dealer_hand = _Hands(identities + dealer)
+        dealer_total += dealer_weight * bet.Payout(player_hand, dealer_hand,
+                                                   identities + dealer)
+        dealer_ways += dealer_weight
+      total += weight * dealer_total / dealer_ways
+    self.assertAlmostEqual(total / ways, bet.Ev(suited_shoe))
+
+  def test_insurance_uses_ranks_only(self):
+    plain_shoe = simulation.NewGame(simulation.DEFAULT_GAME_CONFIG, 0).shoe
+    composition = plain_shoe.GetComposition()
+    self.assertAlmostEqual(3.0 * composition[-1] / sum(composition) - 1,
+                           side_bet.Insurance().Ev(plain_shoe))
+
+  def test_suited_bet_needs_suited_shoe(self):
+    plain_shoe = simulation.NewGame(simulation.DEFAULT_GAME_CONFIG, 0).shoe
+    self.assertRaises(side_bet.SideBetException,
+                      side_bet.PerfectPairs().Ev, plain_shoe)
+
+  def test_insurance_stakes_half_the_bet(self):
+    insurance = side_bet.Insurance()
+    insurance.Ev = lambda current_shoe: 1.0
+    insured = wallet.Wallet('Insured', strategy.StrategyTableMinimum(4),
+                            side_bets=[insurance, side_bet.PerfectPairs()])
+    next_hand = hand.Hand([])
+    next_hand.bets.append(wallet.Bet('Other', 10))
+    next_hand.bets.append(wallet.Bet('Insured', 4))
+    insured.PlaceSideBets(next_hand, self.shoe, after_up_card=True)
+    self.assertEqual([(insurance, 2.0)],
+                     [(bet, stake.money_units)
+                      for bet, stake in next_hand.side_bets])
+    self.assertEqual(-2.0, insured.money_units)
+
+  def test_base_side_bet_raises(self):
+    self.assertRaises(side_bet.SideBetException,
+                      side_bet.SideBet().Ev, self.shoe)
+
+  def test_settled_in_game(self):
+    bets = [_PerfectPairs(), _TwentyOnePlusThree(), _LuckyLadies(),
+            _Insurance()]
+    suited_game = game.Game(
+        num_players=1, rng=random.Random(11), suited=True,
+        player_strategy=simulation.GetPlayStrategy(
+            simulation.DEFAULT_GAME_CONFIG))
+    suited_game.player.ClearWallets()
+    suited_game.AddPlayerWallet(wallet.Wallet('Plain',
+                                              strategy.StrategyTableMinimum(1)))
+    suited_game.AddPlayerWallet(wallet.Wallet(
+        'Side', strategy.StrategyTableMinimum(1), side_bets=bets))
+    for _ in xrange(3000):
+      simulation.PlayRound(suited_game)
+
+    wallets = suited_game.player.wallets
+    record = wallets['Side'].side_bet_record
+    for bet in bets:
+      placed = len([ev for ev in bet.evs if ev > 0])
+      self.assertEqual(placed, record.get(bet.name, [0])[0])
+    self.assertTrue(record)
+    self.assertEqual(wallets['Plain'].money_units +
+                     sum(units for _, units in record.values()),
+                     wallets['Side'].money_units)
+
+
+if __name__ == '__main__':
+  unittest.main()
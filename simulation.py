@@ -0,0 +1,171 @@
+""" Running many games, optionally across worker processes.
+
+Workers rebuild their game from a GameConfig and a seed, so every task is
+reproducible and only small, picklable values cross process boundaries.
+"""
+import collections
+import multiprocessing
+import os
+import random
+
+import game
+import play_strategy
+import strategy
+import table_rules
+import wallet
+
+DEFAULT_STRATEGY_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'play_strat_four_deck_hit_soft_17.yaml')
+
+
+class SimulationException(Exception):
+  """Base exception."""
+
+
+class GameConfig(collections.namedtuple(
+    'GameConfig', ['num_players', 'rules', 'strategy_file'])):
+  """Everything needed to build a game in a worker."""
+
+DEFAULT_GAME_CONFIG = GameConfig(
+    num_players=5,
+    rules=table_rules.DEFAULT_TABLE_RULES,
+    strategy_file=DEFAULT_STRATEGY_FILE)
+
+
+# Betting strategies a wallet spec may name, see NewWallets.
+STRATEGIES = {
+    'table_minimum': strategy.StrategyTableMinimum,
+    'progressive': strategy.StrategyProgressive,
+    'count': strategy.StrategyCount,
+    'blackjack_optimized': strategy.StrategyBlackjackOptimized,
+    'ramp': strategy.StrategyRamp,
+}
+
+
+def NewWallets(wallet_specs):
+  """Build wallets from plain, picklable specs.
+
+  Args:
+    wallet_specs: [dict], per wallet its 'name', the 'strategy' name from
+        STRATEGIES and optional 'params' keyword arguments of the strategy.
+        A ramp is given as a list of [bucket, bet] pairs.
+
+  Returns:
+    [Wallet], new wallets.
+
+  Raises:
+    SimulationException: Unknown strategy or bad parameters.
+  """
+  wallets = []
+  for spec in wallet_specs:
+    strategy_class = STRATEGIES.get(spec.get('strategy'))
+    if strategy_class is None:
+      raise SimulationException('Unknown strategy: %s' % spec.get('strategy'))
+    params = dict(spec.get('params', {}))
+    if 'ramp' in params:
+      params['ramp'] = dict([tuple(pair) for pair in params['ramp']])
+    try:
+      betting_strategy = strategy_class(**params)
+    except (TypeError, ValueError, strategy.BettingStrategyException) as e:
+      raise SimulationException('Bad %s parameters: %s' % (spec['strategy'], e))
+    wallets.append(wallet.Wallet(spec.get('name', spec['strategy']),
+                                 betting_strategy))
+  return wallets
+
+
+# Play strategies by (rules, strategy file). They are read only once loaded,
+# so games in a process share them instead of parsing the YAML again.
+_PLAY_STRATEGIES = {}
+
+
+def GetPlayStrategy(config):
+  """Returns the play strategy of a config, loading it at most once.
+
+  Args:
+    config: GameConfig, config naming the rules and strategy file.
+
+  Returns:
+    play_strategy.PlayStrategy, shared strategy.
+  """
+  key = (repr(config.rules), config.strategy_file)
+  if key not in _PLAY_STRATEGIES:
+    _PLAY_STRATEGIES[key] = play_strategy.PlayStrategy(config.rules,
+                                                       config.strategy_file)
+  return _PLAY_STRATEGIES[key]
+
+
+def NewGame(config, seed, wallets=None):
+  """Build a game from a config.
+
+  Args:
+    config: GameConfig, game to build.
+    seed: int, seed of the shoe random number generator.
+    wallets: [Wallet], wallets replacing the players default wallets. None
+        keeps the default wallets.
+
+  Returns:
+    game.Game, new game.
+  """
+  new_game = game.Game(
+      num_players=config.num_players, rules=config.rules,
+      player_strategy=GetPlayStrategy(config),
+      rng=random.Random(seed))
+  if wallets is not None:
+    new_game.player.ClearWallets()
+    for new_wallet in wallets:
+      new_game.AddPlayerWallet(new_wallet)
+  return new_game
+
+
+def PlayRound(blackjack_game):
+  """Play a round, starting a new shoe first if the current one is finished.
+
+  Args:
+    blackjack_game: game.Game, game to play.
+  """
+  if blackjack_game.shoe.IsFinished():
+    blackjack_game.game_stats.num_shoes += 1
+    blackjack_game.shoe.Reset()
+  blackjack_game.PlayRound()
+
+
+def SplitRounds(num_rounds, num_batches):
+  """Split rounds into batch sizes as even as possible.
+
+  Args:
+    num_rounds: int, total number of rounds.
+    num_batches: int, number of batches.
+
+  Returns:
+    [int], rounds per batch, empty batches dropped.
+  """
+  if num_batches < 1:
+    raise SimulationException('Need at least one batch, got %d' % num_batches)
+  size, extra = divmod(num_rounds, num_batches)
+  batches = [size + 1] * extra + [size] * (num_batches - extra)
+  return [batch for batch in batches if batch]
+
+
+def RunTasks(function, tasks, num_workers=None):
+  """Run function over tasks, in worker processes if more than one.
+
+  Args:
+    function: callable, module level function taking one task.
+    tasks: [object], picklable tasks.
+    num_workers: int, worker processes. None uses one per cpu.
+
+  Returns:
+    [object], results in task order.
+  """
+  if num_workers is None:
+    num_workers = multiprocessing.cpu_count()
+  if num_workers <= 1 or len(tasks) <= 1:
+    return map(function, tasks)
+
+  pool = multiprocessing.Pool(min(num_workers, len(tasks)))
+  try:
+    return pool.map(function, tasks)
+  finally:
+    pool.close()
+    pool.join()
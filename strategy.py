@@ -1,20 +1,50 @@
 """ Betting strategy."""
 import stats
 import card
+import count
+import events
 
 class BettingStrategyException(Exception):
   """Base exception."""
 
 
 class BettingStrategy(object):
-  """Base class for betting strategies. Does nothing."""
+  """Base class for betting strategies. Does nothing.
+
+  Strategies whose bet only depends on one signal (see
+  population.SIGNAL_NAMES) set signal and implement BetForSignal, which
+  lets a population.Population evaluate them without a wallet.
+  """
+  signal = None
 
   def __init__(self):
     self.multiplier = 1
     self.multiplier_record = {}
 
   def GetBetAmount(self, **kwargs):
-    raise BettingStratException('No betting strategy set')
+    raise BettingStrategyException('No betting strategy set')
+
+  def Listen(self, event_bus):
+    """Register with the events of the game the strategy bets in.
+
+    Args:
+      event_bus: events.EventBus, events of the game.
+    """
+
+  def Unlisten(self, event_bus):
+    """Undo Listen."""
+
+  def BetForSignal(self, key):
+    """Returns the bet for a value of the signal.
+
+    Args:
+      key: object, value of the signal when the bet is placed.
+
+    Returns:
+      (float, float), bet amount and the multiplier recorded for the bet.
+    """
+    raise BettingStrategyException(
+        '%s does not bet from a signal' % type(self).__name__)
 
   def ProcessWin(self, blackjack=False):
     if self.multiplier not in self.multiplier_record:
@@ -45,6 +75,39 @@ class BettingStrategy(object):
     self.multiplier_record.clear()
 
 
+def TrueCountBucket(current_shoe):
+  """Returns the Hi-Lo true count of the shoe, rounded to an integer."""
+  return int(round(count.TrueCount(current_shoe)))
+
+
+def BlackjackPercentBucket(current_shoe):
+  """Returns the blackjack percent of the shoe, rounded to half a percent."""
+  return round(current_shoe.GetBlackjackPercent() * 2) / 2
+
+
+def CountBasicBucket(current_shoe, running_count=None):
+  """Returns the StrategyCount count per shoe remaining, positive is good.
+
+  Args:
+    current_shoe: Shoe, shoe being played.
+    running_count: int, StrategyCount running count if already known. None
+        counts the cards played.
+  """
+  if running_count is None:
+    running_count = 0
+    for shoe_card, num_cards in current_shoe.cards_played.iteritems():
+      running_count += (StrategyCount.CARD_COUNT[shoe_card] * num_cards)
+  return -1 * (running_count / current_shoe.GetDecksRemaining())
+
+
+# Shoe signals a bet ramp can be keyed by.
+BUCKET_FUNCTIONS = {
+    'true_count': TrueCountBucket,
+    'blackjack_percent': BlackjackPercentBucket,
+    'count_basic': CountBasicBucket,
+}
+
+
 class StrategyMock(object):
   """Mock instantiation for testing."""
 
@@ -95,8 +158,10 @@ class StrategyBlackjackOptimized(BettingStrategy):
     if rate:
       print 'Rate:  ~%d    [hands/unit]' % (max(max((1/rate), -1 * (1/rate)), 1))
     print 'Rate:  %0.3f [units/hand]' % rate
-    print 'Avg: %0.3f [%%]' % self.bj_percent_avg
-    print 'Highest: %0.3f [%%]' % self.highest
+    # Only known to the strategy that saw the hands, not to merged counters.
+    if self.num_hands:
+      print 'Avg: %0.3f [%%]' % self.bj_percent_avg
+      print 'Highest: %0.3f [%%]' % self.highest
     print '+/-: ',
     print sorted(self.multiplier_record.iteritems())
 
@@ -124,16 +189,47 @@ class StrategyCount(BettingStrategy):
     card.TWO: -1
   }
 
+  signal = 'count_basic'
+
   def __init__(self, table_minimum, table_maximum):
     super(StrategyCount, self).__init__()
     self.table_minimum = table_minimum
     self.table_maximum = table_maximum
 
+    # Running count kept from card_dealt events while listening. None
+    # recounts the cards played at the next bet.
+    self.listening = False
+    self.count = None
+
+  def Listen(self, event_bus):
+    # The shoe may already be under way.
+    self.listening = True
+    self.count = None
+    event_bus.Register(events.CARD_DEALT, self._CardDealt)
+    event_bus.Register(events.SHOE_RESET, self._ShoeReset)
+
+  def Unlisten(self, event_bus):
+    event_bus.Unregister(events.CARD_DEALT, self._CardDealt)
+    event_bus.Unregister(events.SHOE_RESET, self._ShoeReset)
+    self.listening = False
+    self.count = None
+
+  def _CardDealt(self, new_card):
+    if self.count is not None:
+      self.count += self.CARD_COUNT[new_card]
+
+  def _ShoeReset(self, current_shoe):
+    self.count = 0
+
   def GetBetAmount(self, **kwargs):
-    count = self._GetCount(kwargs['shoe'])
-    decks_remaining = kwargs['shoe'].GetDecksRemaining()
-    multiplier = max(1, -1 * (count / decks_remaining))
-    self.multiplier = min(self.table_minimum * multiplier, self.table_maximum)
+    current_shoe = kwargs['shoe']
+    running_count = self.count
+    if running_count is None:
+      running_count = self._GetCount(current_shoe)
+      if self.listening:
+        self.count = running_count
+    self.multiplier = self.BetForSignal(
+        CountBasicBucket(current_shoe, running_count))[0]
     return self.multiplier
 
   def _GetCount(self, current_shoe):
@@ -142,6 +238,11 @@ class StrategyCount(BettingStrategy):
       count += (self.CARD_COUNT[shoe_card] * num_cards)
     return count
 
+  def BetForSignal(self, key):
+    multiplier = max(1, key)
+    bet = min(self.table_minimum * multiplier, self.table_maximum)
+    return bet, bet
+
   def PrintStats(self, name, game_stats, money_units):
     print '====',
     print 'Wallet: %s' % name
@@ -155,6 +256,8 @@ class StrategyCount(BettingStrategy):
 
 
 class StrategyTableMinimum(BettingStrategy):
+  signal = 'constant'
+
   def __init__(self, table_minimum):
     super(StrategyTableMinimum, self).__init__()
     self.table_minimum = table_minimum
@@ -162,6 +265,9 @@ class StrategyTableMinimum(BettingStrategy):
   def GetBetAmount(self, **kwargs):
     return self.table_minimum
 
+  def BetForSignal(self, key):
+    return self.table_minimum, 1
+
   def PrintStats(self, name, game_stats, money_units):
     print '====',
     print 'Wallet: %s' % name
@@ -173,15 +279,40 @@ class StrategyTableMinimum(BettingStrategy):
 
 
 class StrategyProgressive(BettingStrategy):
-  def __init__(self, table_minimum, table_max, reset_after_max=False):
+  signal = 'loss_streak'
+
+  def __init__(self, table_minimum, table_max, reset_after_max=False,
+               factor=2):
+    """Constructor.
+
+    Args:
+      table_minimum: int, bet after a win.
+      table_max: int, cap of the multiplier.
+      reset_after_max: bool, go back to the table minimum instead of staying
+          at the cap once the multiplier passes it.
+      factor: float, multiplier growth after each loss.
+    """
     super(StrategyProgressive, self).__init__()
     self.table_minimum = table_minimum
     self.table_max = table_max
     self.reset_after_max = reset_after_max
+    self.factor = factor
 
   def GetBetAmount(self, **kwargs):
     return self.table_minimum * self.multiplier
 
+  def BetForSignal(self, key):
+    # Replay ProcessLoss once per loss since the last win.
+    multiplier = 1
+    for _ in xrange(key):
+      multiplier *= self.factor
+      if multiplier > self.table_max:
+        if self.reset_after_max:
+          multiplier = self.table_minimum
+        else:
+          multiplier = self.table_max
+    return self.table_minimum * multiplier, multiplier
+
   def ProcessWin(self, blackjack=False):
     super(StrategyProgressive, self).ProcessWin(blackjack)
     self.multiplier = 1
@@ -189,7 +320,7 @@ class StrategyProgressive(BettingStrategy):
   def ProcessLoss(self):
     super(StrategyProgressive, self).ProcessLoss()
 
-    self.multiplier *= 2
+    self.multiplier *= self.factor
     # Max bet is capped by table.
     if self.multiplier > self.table_max:
       if self.reset_after_max:
@@ -208,3 +339,55 @@ class StrategyProgressive(BettingStrategy):
     print '+/-: ',
     print sorted(self.multiplier_record.iteritems())
 
+
+class StrategyRamp(BettingStrategy):
+  """Bet from a lookup table keyed by a shoe signal.
+
+  Buckets outside the table use the bet of the nearest bucket in the table.
+  """
+
+  def __init__(self, ramp, bucket_name='true_count'):
+    """Constructor.
+
+    Args:
+      ramp: {int or float: int}, bet amount per bucket.
+      bucket_name: str, key of BUCKET_FUNCTIONS the ramp is keyed by.
+
+    Raises:
+      BettingStrategyException: Empty ramp or unknown bucket.
+    """
+    super(StrategyRamp, self).__init__()
+    if not ramp:
+      raise BettingStrategyException('Ramp has no buckets')
+    if bucket_name not in BUCKET_FUNCTIONS:
+      raise BettingStrategyException('Unknown bucket: %s' % bucket_name)
+    self.ramp = dict(ramp)
+    self.signal = bucket_name
+    self.bucket_function = BUCKET_FUNCTIONS[bucket_name]
+    self.lowest = min(self.ramp)
+    self.highest = max(self.ramp)
+
+  def GetBetAmount(self, **kwargs):
+    self.multiplier = self.BetForSignal(self.bucket_function(kwargs['shoe']))[0]
+    return self.multiplier
+
+  def BetForSignal(self, key):
+    bucket = min(max(key, self.lowest), self.highest)
+    bet = self.ramp.get(bucket)
+    if bet is None:
+      # Gap in the table, use the closest bucket.
+      bet = self.ramp[min(self.ramp, key=lambda other: abs(other - bucket))]
+    return bet, bet
+
+  def PrintStats(self, name, game_stats, money_units):
+    print '====',
+    print 'Wallet: %s' % name
+    print 'Units: %0.1f' % money_units
+    rate = float(money_units) / game_stats.num_hands
+    if rate:
+      print 'Rate:  ~%d    [hands/unit]' % (max(max((1/rate), -1 * (1/rate)), 1))
+    print 'Rate:  %0.3f [units/hand]' % rate
+    print 'Ramp: ',
+    print sorted(self.ramp.iteritems())
+    print '+/-: ',
+    print sorted(self.multiplier_record.iteritems())
@@ -0,0 +1,299 @@
+""" A catalog of play strategies indexed by their table rules.
+
+Every *.yaml play strategy in a catalog directory is indexed by the rule
+attributes at its top (hit_on_soft_17, decks, ...). The index is kept in
+INDEX_FILE next to the sources, with each source's SHA-1, so unchanged
+sources are not parsed again.
+
+A source is compiled once into a small binary file next to it, named as the
+source with COMPILED_SUFFIX. The compiled file starts with the SHA-1 of the
+source it was built from; a source whose content changed is compiled again.
+Loading a compiled strategy memory-maps the file and reads three tables of
+action values, so parallel workers do not parse YAML on spawn.
+
+Sources are parsed with a safe loader which only knows the
+play_strategy.Action tags the strategy files use.
+"""
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import yaml
+
+# Directory holding the strategies shipped with the simulator.
+DEFAULT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+INDEX_FILE = 'strategy_index.json'
+COMPILED_SUFFIX = '.strat'
+
+# Tables of a strategy, in compiled order, each indexed by
+# [hand value][dealer up card value].
+TABLES = ('split', 'soft', 'hard')
+NUM_HAND_VALUES = 22
+NUM_DEALER_VALUES = 12
+TABLE_SIZE = NUM_HAND_VALUES * NUM_DEALER_VALUES
+# Action value of cells the strategy does not cover.
+NO_ACTION = 0xff
+
+# Rule attributes a strategy is indexed by, in compiled header order.
+RULE_ATTRIBUTES = ('hit_on_soft_17', 'decks', 'double_on_any_number')
+
+_MAGIC = 'BJSTRAT1'
+_HEADER = struct.Struct('<8s20sBBB')
+
+
+class StrategyCatalogException(Exception):
+  """Base exception."""
+
+
+class _StrategyLoader(yaml.SafeLoader):
+  """Safe loader reading play_strategy.Action tags as their int value."""
+
+
+def _ConstructAction(loader, node):
+  return loader.construct_sequence(node)[0]
+
+_StrategyLoader.add_constructor(
+    u'tag:yaml.org,2002:python/object/apply:play_strategy.Action',
+    _ConstructAction)
+
+
+def ParseSource(source):
+  """Parse a YAML strategy safely.
+
+  Args:
+    source: str, YAML text.
+
+  Returns:
+    dict, the strategy with actions as int values.
+
+  Raises:
+    StrategyCatalogException: Not a strategy.
+  """
+  try:
+    strategy = yaml.load(source, Loader=_StrategyLoader)
+  except yaml.YAMLError as e:
+    raise StrategyCatalogException('Bad strategy YAML: %s' % e)
+  if not isinstance(strategy, dict):
+    raise StrategyCatalogException('Strategy is not a mapping')
+  for attribute in RULE_ATTRIBUTES[:2] + TABLES:
+    if attribute not in strategy:
+      raise StrategyCatalogException('Strategy has no %s' % attribute)
+  return strategy
+
+
+class CompiledStrategy(object):
+  """Action values of a strategy, as read from a compiled file.
+
+  Attributes:
+    rules: {str: int}, value of each RULE_ATTRIBUTES entry.
+    tables: {str: [[int]]}, per TABLES name the action value by
+        [hand value][dealer up card value], NO_ACTION where uncovered.
+  """
+
+  def __init__(self, rules, tables):
+    self.rules = rules
+    self.tables = tables
+
+
+def Compile(source):
+  """Returns the compiled bytes of a YAML strategy.
+
+  Args:
+    source: str, YAML text.
+
+  Raises:
+    StrategyCatalogException: Not a strategy, or a cell out of range.
+  """
+  strategy = ParseSource(source)
+  cells = bytearray([NO_ACTION]) * (len(TABLES) * TABLE_SIZE)
+  for table_index, name in enumerate(TABLES):
+    for value, row in strategy[name].iteritems():
+      for dealer_value, action in row.iteritems():
+        if (not 0 <= value < NUM_HAND_VALUES or
+            not 0 <= dealer_value < NUM_DEALER_VALUES):
+          raise StrategyCatalogException('%s cell out of range: %s, %s' %
+                                         (name, value, dealer_value))
+        cells[table_index * TABLE_SIZE + value * NUM_DEALER_VALUES +
+              dealer_value] = action
+  header = _HEADER.pack(_MAGIC, hashlib.sha1(source).digest(),
+                        *[int(strategy.get(attribute, 0))
+                          for attribute in RULE_ATTRIBUTES])
+  return header + str(cells)
+
+
+def _WriteAtomically(path, data):
+  """Write a file through a rename, so concurrent readers never see half.
+
+  Returns:
+    bool, False if the directory is not writable.
+  """
+  directory = os.path.dirname(path) or '.'
+  try:
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+  except (IOError, OSError):
+    return False
+  try:
+    with os.fdopen(handle, 'wb') as output:
+      output.write(data)
+    os.rename(temporary, path)
+  except (IOError, OSError):
+    if os.path.exists(temporary):
+      os.remove(temporary)
+    return False
+  return True
+
+
+def _Decode(data):
+  """Returns the CompiledStrategy of compiled bytes, None if malformed."""
+  if len(data) != _HEADER.size + len(TABLES) * TABLE_SIZE:
+    return None
+  header = _HEADER.unpack(data[:_HEADER.size])
+  if header[0] != _MAGIC:
+    return None
+  cells = bytearray(data[_HEADER.size:])
+  tables = {}
+  for table_index, name in enumerate(TABLES):
+    start = table_index * TABLE_SIZE
+    tables[name] = [list(cells[row:row + NUM_DEALER_VALUES]) for row in
+                    xrange(start, start + TABLE_SIZE, NUM_DEALER_VALUES)]
+  return CompiledStrategy(dict(zip(RULE_ATTRIBUTES, header[2:])), tables)
+
+
+def CompiledPath(source_path):
+  """Returns the path of the compiled file of a source."""
+  return os.path.splitext(source_path)[0] + COMPILED_SUFFIX
+
+
+def LoadCompiled(source_path):
+  """Load a strategy from its compiled file, compiling it if stale.
+
+  Args:
+    source_path: str, YAML strategy file.
+
+  Returns:
+    CompiledStrategy, the strategy.
+
+  Raises:
+    IOError: The source does not exist.
+    StrategyCatalogException: Not a strategy.
+  """
+  with open(source_path, 'rb') as source_file:
+    source = source_file.read()
+  digest = hashlib.sha1(source).digest()
+
+  compiled_path = CompiledPath(source_path)
+  try:
+    with open(compiled_path, 'rb') as compiled_file:
+      mapped = mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ)
+      try:
+        if mapped[8:28] == digest:
+          compiled = _Decode(mapped[:])
+          if compiled is not None:
+            return compiled
+      finally:
+        mapped.close()
+  except (IOError, OSError, ValueError):
+    # Missing or empty compiled file.
+    pass
+
+  data = Compile(source)
+  # A read only directory still loads, it just compiles every time.
+  _WriteAtomically(compiled_path, data)
+  return _Decode(data)
+
+
+class Catalog(object):
+  """The strategies of a directory, indexed by their rule attributes."""
+
+  def __init__(self, directory=DEFAULT_DIRECTORY):
+    """Constructor. Indexes the directory, parsing new or changed sources.
+
+    Args:
+      directory: str, directory holding *.yaml strategies.
+    """
+    self.directory = directory
+    # {file name: {'sha1': str, rule attribute: value}}
+    self.index = {}
+    self.Refresh()
+
+  def Refresh(self):
+    """Bring the index up to date with the directory."""
+    index_path = os.path.join(self.directory, INDEX_FILE)
+    stored = {}
+    if os.path.exists(index_path):
+      try:
+        with open(index_path) as index_file:
+          stored = json.load(index_file)
+      except (IOError, ValueError):
+        stored = {}
+
+    index = {}
+    for source_path in sorted(glob.glob(os.path.join(self.directory,
+                                                     '*.yaml'))):
+      name = os.path.basename(source_path)
+      with open(source_path, 'rb') as source_file:
+        source = source_file.read()
+      digest = hashlib.sha1(source).hexdigest()
+      entry = stored.get(name)
+      if entry is None or entry['sha1'] != digest:
+        try:
+          strategy = ParseSource(source)
+        except StrategyCatalogException:
+          # Other YAML files may share the directory.
+          continue
+        entry = dict((attribute, strategy.get(attribute))
+                     for attribute in RULE_ATTRIBUTES)
+        entry['sha1'] = digest
+      index[name] = entry
+
+    if index != stored:
+      _WriteAtomically(index_path, json.dumps(index, indent=2,
+                                              sort_keys=True))
+    self.index = index
+
+  def Find(self, table_rules):
+    """Returns the path of the strategy matching the table rules.
+
+    Args:
+      table_rules: TableRules, rules which define the table.
+
+    Raises:
+      StrategyCatalogException: No strategy matches. The message suggests
+          the strategies matching the most attributes.
+    """
+    wanted = {'hit_on_soft_17': table_rules.hit_on_soft_17,
+              'decks': table_rules.num_decks}
+    scores = {}
+    for name, entry in self.index.iteritems():
+      scores[name] = sum(1 for attribute, value in wanted.iteritems()
+                         if entry.get(attribute) == value)
+    matches = sorted(name for name, score in scores.iteritems()
+                     if score == len(wanted))
+    if matches:
+      return os.path.join(self.directory, matches[0])
+
+    best = max(scores.values() or [0])
+    suggestions = sorted(name for name, score in scores.iteritems()
+                         if best and score == best)
+    raise StrategyCatalogException(
+        'No strategy for %s in %s.%s' % (
+            ', '.join('%s=%s' % item for item in sorted(wanted.items())),
+            self.directory,
+            ' Closest: %s.' % ', '.join(suggestions) if suggestions else ''))
+
+
+# Catalogs by directory. Indexing hashes every source, so a process does it
+# once per directory.
+_CATALOGS = {}
+
+
+def GetCatalog(directory=DEFAULT_DIRECTORY):
+  """Returns the catalog of a directory, indexing it at most once."""
+  if directory not in _CATALOGS:
+    _CATALOGS[directory] = Catalog(directory)
+  return _CATALOGS[directory]
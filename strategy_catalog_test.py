@@ -0,0 +1,102 @@
+import os
+import play_strategy
+import shutil
+import strategy_catalog
+import table_rules
+import tempfile
+import time
+import unittest
+
+
+SOURCE = play_strategy.PlayStrategy.YAML_FOUR_DECK_HIT_SOFT_17
+
+
+class StrategyCatalogTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.source_path = os.path.join(self.directory, os.path.basename(SOURCE))
+    shutil.copy(SOURCE, self.source_path)
+    with open(self.source_path) as source_file:
+      self.source = source_file.read()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_compiled_matches_source(self):
+    strategy = strategy_catalog.ParseSource(self.source)
+    compiled = strategy_catalog.LoadCompiled(self.source_path)
+    self.assertTrue(os.path.exists(
+        strategy_catalog.CompiledPath(self.source_path)))
+    self.assertEqual(1, compiled.rules['hit_on_soft_17'])
+    self.assertEqual(4, compiled.rules['decks'])
+    for name in strategy_catalog.TABLES:
+      for value, row in strategy[name].iteritems():
+        for dealer_value, action in row.iteritems():
+          self.assertEqual(action,
+                           compiled.tables[name][value][dealer_value])
+    self.assertEqual(strategy_catalog.NO_ACTION,
+                     compiled.tables['hard'][0][0])
+
+  def test_changed_source_is_recompiled(self):
+    strategy_catalog.LoadCompiled(self.source_path)
+    # Stand on hard 16 against a 10 instead of hitting.
+    lines = self.source.splitlines(True)
+    hard = lines.index('hard:\n')
+    sixteen = lines.index('  16:\n', hard)
+    ten = lines.index('    10: *id001\n', sixteen)
+    lines[ten] = '    10: *id000\n'
+    with open(self.source_path, 'w') as source_file:
+      source_file.write(''.join(lines))
+    compiled = strategy_catalog.LoadCompiled(self.source_path)
+    self.assertEqual(play_strategy.Action.STAND.value,
+                     compiled.tables['hard'][16][10])
+
+  def test_find_by_rules(self):
+    catalog = strategy_catalog.Catalog(self.directory)
+    self.assertEqual(self.source_path,
+                     catalog.Find(table_rules.DEFAULT_TABLE_RULES))
+    self.assertTrue(os.path.exists(os.path.join(
+        self.directory, strategy_catalog.INDEX_FILE)))
+
+  def test_index_reused_until_source_changes(self):
+    strategy_catalog.Catalog(self.directory)
+    index_path = os.path.join(self.directory, strategy_catalog.INDEX_FILE)
+    written = os.stat(index_path).st_mtime
+    time.sleep(0.01)
+    strategy_catalog.Catalog(self.directory)
+    self.assertEqual(written, os.stat(index_path).st_mtime)
+
+    with open(self.source_path, 'w') as source_file:
+      source_file.write(self.source.replace('decks: 4', 'decks: 6'))
+    catalog = strategy_catalog.Catalog(self.directory)
+    rules = table_rules.DEFAULT_TABLE_RULES._replace(num_decks=6)
+    self.assertEqual(self.source_path, catalog.Find(rules))
+
+  def test_no_match_suggests_closest(self):
+    catalog = strategy_catalog.Catalog(self.directory)
+    rules = table_rules.DEFAULT_TABLE_RULES._replace(num_decks=8)
+    with self.assertRaises(strategy_catalog.StrategyCatalogException) as e:
+      catalog.Find(rules)
+    self.assertIn(os.path.basename(SOURCE), str(e.exception))
+
+  def test_rejects_non_strategy(self):
+    self.assertRaises(strategy_catalog.StrategyCatalogException,
+                      strategy_catalog.ParseSource, 'decks: 4\n')
+
+
+class FindAndLoadStrategyTest(unittest.TestCase):
+  def test_default_rules(self):
+    strategy = play_strategy.PlayStrategy(table_rules.DEFAULT_TABLE_RULES)
+    self.assertEqual(play_strategy.Action.DOUBLE,
+                     strategy.LookupAction(11, False, 6))
+    self.assertEqual(play_strategy.Action.HIT,
+                     strategy.LookupAction(16, False, 10))
+
+  def test_unknown_rules(self):
+    rules = table_rules.DEFAULT_TABLE_RULES._replace(num_decks=3)
+    self.assertRaises(play_strategy.PlayStrategyException,
+                      play_strategy.PlayStrategy, rules)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,659 @@
+""" Many blackjack tables in flat arrays.
+
+A game.Game is an object graph: Card namedtuples in a list shoe, a Hand, Bet,
+Wallet, WinLossTie and ActionStats object per person and wallet, and a
+multiplier_record dict per betting strategy. A TableArray keeps the state of
+many tables in a few array.array columns instead, indexed by table:
+
+  cards: the shoes, one int card code (card.Card.value, an ace is 11) per
+      card, shoe_size codes per table in dealing order.
+  positions, stops: cards dealt from each shoe and its stop card location.
+  counters: per table COUNTER_FIELDS, the numbers counters.GameCounters
+      holds, as ints.
+  balances: money units per table and wallet.
+
+Betting strategies become bettors, which keep their per table state
+(a loss streak, a moving average, ...) in arrays of their own and one
+multiplier record shared by every table. Hands and bets only live for a
+round, so a round is played in local variables and one scratch list of bets.
+
+Every table follows Game.PlayRound, burned cards and repeated doubles
+included, and deals shoes from one shared random.Random: a TableArray of one
+table seeded s plays the same rounds as simulation.NewGame(config, s). The
+tables of a larger array draw their shoes from the shared stream in turn.
+
+Run directly for the memory per table, against a game.Game:
+
+  python table_array.py --tables 10000 --num-rounds 10
+"""
+import argparse
+import array
+import gc
+import random
+import sys
+import time
+import types
+
+import card
+import counters
+import dealer_automaton
+import person
+import play_strategy
+import shoe
+import simulation
+import strategy
+import strategy_catalog
+import table_rules
+
+# Per table counters: the game, then the player and dealer PERSON_FIELDS.
+COUNTER_FIELDS = (('num_hands', 'num_shoes') +
+                  tuple('player.' + field for field in counters.PERSON_FIELDS) +
+                  tuple('dealer.' + field for field in counters.PERSON_FIELDS))
+NUM_COUNTERS = len(COUNTER_FIELDS)
+
+_NUM_HANDS = COUNTER_FIELDS.index('num_hands')
+_NUM_SHOES = COUNTER_FIELDS.index('num_shoes')
+_PLAYER = COUNTER_FIELDS.index('player.win')
+_DEALER = COUNTER_FIELDS.index('dealer.win')
+_WIN, _WIN_BLACKJACK, _LOSS, _TIE, _BLACKJACK_TIE, _STAND, _HIT, _DOUBLE, \
+    _SPLIT, _BUST = [counters.PERSON_FIELDS.index(field) for field in
+                     ('win', 'win_blackjack', 'loss', 'tie', 'blackjack_tie',
+                      'stand', 'hit', 'double', 'split', 'bust')]
+
+# Card codes.
+ACE = card.ACE.value
+FACE = card.FACE.value
+# Hard value of each card code, aces counted as 1.
+HARD_VALUES = tuple(code if code != ACE else card.ACE.alt_value
+                    for code in xrange(ACE + 1))
+
+# Play strategy actions, as compiled strategies store them.
+_STAND_ACTION = play_strategy.Action.STAND.value
+_HIT_ACTION = play_strategy.Action.HIT.value
+_DOUBLE_ACTION = play_strategy.Action.DOUBLE.value
+
+# Settlements, as bettors are told of them.
+WIN = 1
+LOSS = -1
+TIE = 0
+
+
+class TableArrayException(Exception):
+  """Base exception."""
+
+
+def _Record(records, multiplier, outcome, blackjack):
+  """Count a settlement in a {multiplier: [int]} multiplier record."""
+  counts = records.get(multiplier)
+  if counts is None:
+    counts = records[multiplier] = [0] * len(counters.RECORD_FIELDS)
+  if outcome == WIN:
+    counts[0] += 1
+    if blackjack:
+      counts[1] += 1
+  elif outcome == LOSS:
+    counts[2] += 1
+  else:
+    counts[3] += 1
+
+
+class _Bettor(object):
+  """Compact form of a betting strategy.
+
+  Attributes:
+    records: {multiplier: [int]}, multiplier record of every table, counts
+        in counters.RECORD_FIELDS order.
+    reads_shoe: bool, Bet reads the shoe counts of the TableArray.
+  """
+  reads_shoe = False
+
+  def __init__(self, prototype, num_tables):
+    self.records = {}
+    self.multiplier = 1
+
+  def Bet(self, tables, table):
+    """Returns the bet of a table and sets the multiplier recorded for it."""
+    raise TableArrayException('No bettor set')
+
+  def Settle(self, table, outcome, blackjack):
+    """The bet of a table settled as WIN, LOSS or TIE."""
+    _Record(self.records, self.multiplier, outcome, blackjack)
+
+
+class _FlatBettor(_Bettor):
+  """strategy.StrategyTableMinimum."""
+
+  def __init__(self, prototype, num_tables):
+    super(_FlatBettor, self).__init__(prototype, num_tables)
+    self.bet = prototype.table_minimum
+
+  def Bet(self, tables, table):
+    return self.bet
+
+
+class _StreakBettor(_Bettor):
+  """strategy.StrategyProgressive, betting from the loss streak."""
+
+  def __init__(self, prototype, num_tables):
+    super(_StreakBettor, self).__init__(prototype, num_tables)
+    self.prototype = prototype
+    self.streaks = array.array('l', [0]) * num_tables
+    # (bet, multiplier) per loss streak, extended as streaks grow.
+    self.bets = []
+
+  def Bet(self, tables, table):
+    streak = self.streaks[table]
+    while streak >= len(self.bets):
+      self.bets.append(self.prototype.BetForSignal(len(self.bets)))
+    bet, self.multiplier = self.bets[streak]
+    return bet
+
+  def Settle(self, table, outcome, blackjack):
+    _Record(self.records, self.multiplier, outcome, blackjack)
+    if outcome == WIN:
+      self.streaks[table] = 0
+    elif outcome == LOSS:
+      self.streaks[table] += 1
+
+
+class _CountBettor(_Bettor):
+  """strategy.StrategyCount, betting from its running count."""
+  reads_shoe = True
+
+  def __init__(self, prototype, num_tables):
+    super(_CountBettor, self).__init__(prototype, num_tables)
+    self.prototype = prototype
+
+  def Bet(self, tables, table):
+    # As Shoe.GetDecksRemaining, which returns the fraction of the shoe left.
+    remaining = float(tables.shoe_size - tables.positions[table]) / (
+        tables.shoe_size)
+    decks_remaining = max(round(remaining * 2) / 2, 0.5)
+    bet, self.multiplier = self.prototype.BetForSignal(
+        -1 * (tables.basic_counts[table] / decks_remaining))
+    return bet
+
+
+class _BlackjackBettor(_Bettor):
+  """strategy.StrategyBlackjackOptimized, betting from its moving average
+  of the blackjack percent."""
+  reads_shoe = True
+
+  def __init__(self, prototype, num_tables):
+    super(_BlackjackBettor, self).__init__(prototype, num_tables)
+    self.averages = array.array('d', [0.0]) * num_tables
+
+  def Bet(self, tables, table):
+    num_cards = tables.shoe_size - tables.positions[table]
+    # As shoe_odds.ShoeOdds.BlackjackProbability.
+    bj_percent = 0.0
+    if num_cards >= 2:
+      bj_percent = (2.0 * tables.aces_left[table] * tables.faces_left[table] /
+                    (num_cards * (num_cards - 1))) * 100
+    average = self.averages[table]
+    self.multiplier = min(max(int((bj_percent - average) * (5)), 1), 20)
+
+    num_hands = tables.counters[table * NUM_COUNTERS + _NUM_HANDS]
+    self.averages[table] = (
+        average * (float(num_hands) / (num_hands + 1)) +
+        (bj_percent * (1.0 / (num_hands + 1))))
+    return self.multiplier
+
+
+# Bettor of each betting strategy class.
+BETTORS = {
+    strategy.StrategyTableMinimum: _FlatBettor,
+    strategy.StrategyProgressive: _StreakBettor,
+    strategy.StrategyCount: _CountBettor,
+    strategy.StrategyBlackjackOptimized: _BlackjackBettor,
+}
+
+
+def _ActionTable(player_strategy):
+  """Returns the actions of a play strategy as a flat bytearray.
+
+  Indexed by (is_soft * NUM_HAND_VALUES + hand value) * NUM_DEALER_VALUES
+  + dealer up card value, strategy_catalog.NO_ACTION where uncovered.
+  """
+  actions = bytearray()
+  for name in ('hard', 'soft'):
+    for row in player_strategy.strategy[name]:
+      actions.extend(strategy_catalog.NO_ACTION if action is None
+                     else action.value for action in row)
+  return actions
+
+
+class TableArray(object):
+  """Blackjack tables in flat arrays, played a round at a time."""
+
+  def __init__(self, config=simulation.DEFAULT_GAME_CONFIG, num_tables=1,
+               seed=0, wallet_specs=None, count_tags=None):
+    """Constructor. Shuffles a shoe for every table.
+
+    Args:
+      config: simulation.GameConfig, game played at every table.
+      num_tables: int, number of tables.
+      seed: int, seed of the random number generator the shoes share.
+      wallet_specs: [dict], wallets at every table, see
+          simulation.NewWallets. None uses the players default wallets.
+      count_tags: {Card: int}, counting system of RunningCount, such as
+          count.HI_LO. None keeps no running count.
+
+    Raises:
+      TableArrayException: A betting strategy has no compact form, or the
+          rules are not the classic peek and no surrender round.
+    """
+    if not table_rules.HasClassicRound(config.rules):
+      raise TableArrayException('Only the classic round is compact, got '
+                                'peek %s and surrender %s' % (
+                                    config.rules.dealer_peek,
+                                    config.rules.surrender))
+    self.config = config
+    self.num_tables = num_tables
+    self.rng = random.Random(seed)
+    rules = config.rules
+
+    self.shoe_size = shoe.Shoe.NUM_CARDS_PER_DECK * rules.num_decks
+    self.deck = [dealt.value for dealt in shoe.Shoe.DECK_OF_CARDS]
+    self.deck *= rules.num_decks
+    self.cards = array.array('b', [0]) * (num_tables * self.shoe_size)
+    self.positions = array.array('l', [0]) * num_tables
+    self.stops = array.array('l', [0]) * num_tables
+    self.counters = array.array('l', [0]) * (num_tables * NUM_COUNTERS)
+
+    if wallet_specs is None:
+      wallets = person.Player(rules, None).wallets.values()
+    else:
+      wallets = simulation.NewWallets(wallet_specs)
+    wallets.sort(key=lambda new_wallet: new_wallet.name)
+    self.wallet_names = [new_wallet.name for new_wallet in wallets]
+    self.bettors = []
+    for new_wallet in wallets:
+      bettor_class = BETTORS.get(type(new_wallet.betting_strategy))
+      if bettor_class is None:
+        raise TableArrayException('No compact form of %s for wallet %s' % (
+            type(new_wallet.betting_strategy).__name__, new_wallet.name))
+      self.bettors.append(bettor_class(new_wallet.betting_strategy,
+                                       num_tables))
+    self.balances = array.array('d', [0.0]) * (num_tables * len(wallets))
+    self._bets = [0] * len(wallets)
+
+    # Shoe counts, kept up to date only for bettors reading the shoe.
+    self.reads_shoe = any(bettor.reads_shoe for bettor in self.bettors)
+    self.count_tags = None
+    if count_tags is not None:
+      self.count_tags = [0] * (ACE + 1)
+      for rank, tag in count_tags.iteritems():
+        self.count_tags[rank.value] = tag
+    self.running_counts = array.array('l', [0]) * num_tables
+    self.counted = array.array('l', [0]) * num_tables
+    self.basic_counts = array.array('l', [0]) * num_tables
+    self.aces_left = array.array('l', [0]) * num_tables
+    self.faces_left = array.array('l', [0]) * num_tables
+    self.basic_tags = [0] * (ACE + 1)
+    for rank, tag in strategy.StrategyCount.CARD_COUNT.iteritems():
+      self.basic_tags[rank.value] = tag
+
+    self.actions = _ActionTable(simulation.GetPlayStrategy(config))
+    self.automaton = dealer_automaton.GetAutomaton(rules)
+    self.blackjack_payout = 1 + rules.blackjack_win_multiplier
+
+    for table in xrange(num_tables):
+      self._Shuffle(table)
+
+  def _Shuffle(self, table):
+    """Deal a table a fresh shoe, as Shoe.Reset does."""
+    codes = list(self.deck)
+    self.rng.shuffle(codes)
+    # Shoe deals from the end of its list.
+    codes.reverse()
+    start = table * self.shoe_size
+    self.cards[start:start + self.shoe_size] = array.array('b', codes)
+    self.stops[table] = int((float(self.rng.randint(60, 85)) / 100.0) *
+                            self.shoe_size)
+    # Burn a card per deck.
+    self.positions[table] = self.config.rules.num_decks
+    self.counted[table] = 0
+    self.basic_counts[table] = 0
+    self.running_counts[table] = 0
+    self.aces_left[table] = self.deck.count(ACE)
+    self.faces_left[table] = self.deck.count(FACE)
+
+  def _CountShoe(self, table):
+    """Bring the shoe counts of a table up to the cards dealt."""
+    start = table * self.shoe_size
+    dealt = self.cards[start + self.counted[table]:
+                       start + self.positions[table]]
+    tags = self.basic_tags
+    self.basic_counts[table] += sum([tags[code] for code in dealt])
+    self.aces_left[table] -= dealt.count(ACE)
+    self.faces_left[table] -= dealt.count(FACE)
+    if self.count_tags is not None:
+      tags = self.count_tags
+      self.running_counts[table] += sum([tags[code] for code in dealt])
+    self.counted[table] = self.positions[table]
+
+  def RunningCount(self, table):
+    """Returns the running count of the cards dealt from a tables shoe,
+    burned cards included, in the count_tags counting system."""
+    if self.count_tags is None:
+      raise TableArrayException('No counting system, see count_tags')
+    self._CountShoe(table)
+    return self.running_counts[table]
+
+  def BurnCount(self, table):
+    """Returns the running count of the cards burned face down when a tables
+    shoe started, in the count_tags counting system."""
+    if self.count_tags is None:
+      raise TableArrayException('No counting system, see count_tags')
+    start = table * self.shoe_size
+    tags = self.count_tags
+    return sum([tags[code] for code in
+                self.cards[start:start + self.config.rules.num_decks]])
+
+  def DecksRemaining(self, table):
+    """Returns the decks left in a tables shoe, as count.DecksRemaining."""
+    num_decks = float(self.shoe_size - self.positions[table]) / (
+        shoe.Shoe.NUM_CARDS_PER_DECK)
+    return max(round(num_decks * 2) / 2, 0.5)
+
+  def Shuffle(self, table):
+    """Start a new shoe at a table, as if its stop card had come out."""
+    self.counters[table * NUM_COUNTERS + _NUM_SHOES] += 1
+    self._Shuffle(table)
+
+  def ShoeNumber(self, table):
+    """Returns the number of shoes finished at a table."""
+    return self.counters[table * NUM_COUNTERS + _NUM_SHOES]
+
+  def ShoeFinished(self, table):
+    """Returns True if the next round at a table starts a new shoe."""
+    return self.positions[table] > self.stops[table]
+
+  def Play(self, num_rounds):
+    """Play rounds at every table, one round at each table in turn.
+
+    Args:
+      num_rounds: int, rounds per table.
+    """
+    for _ in xrange(num_rounds):
+      for table in xrange(self.num_tables):
+        self.PlayRound(table)
+
+  def PlayRound(self, table):
+    """Play a round at a table, starting a new shoe first if needed.
+
+    Args:
+      table: int, index of the table.
+
+    Raises:
+      TableArrayException: The play strategy has no action for a hand.
+    """
+    cards = self.cards
+    start = table * self.shoe_size
+    position = self.positions[table]
+    if position > self.stops[table]:
+      self.Shuffle(table)
+      position = self.positions[table]
+
+    table_counters = self.counters
+    player = table * NUM_COUNTERS + _PLAYER
+    dealer = table * NUM_COUNTERS + _DEALER
+    hard_values = HARD_VALUES
+    num_others = self.config.num_players - 1
+
+    # Cards of the other players.
+    position += 2 * num_others
+    self.positions[table] = position
+
+    bets = self._bets
+    bettors = self.bettors
+    balances = self.balances
+    balance = table * len(bettors)
+    if self.reads_shoe:
+      self._CountShoe(table)
+    for index, bettor in enumerate(bettors):
+      bet = bettor.Bet(self, table)
+      bets[index] = bet
+      balances[balance + index] -= bet
+
+    first, second, up, hole = cards[start + position:start + position + 4]
+    position += 4
+    table_counters[table * NUM_COUNTERS + _NUM_HANDS] += 1
+
+    player_blackjack = first + second == ACE + FACE
+    if up + hole == ACE + FACE:
+      self.positions[table] = position
+      if player_blackjack:
+        table_counters[player + _TIE] += 1
+        table_counters[player + _BLACKJACK_TIE] += 1
+        table_counters[dealer + _TIE] += 1
+        table_counters[dealer + _BLACKJACK_TIE] += 1
+        self._Settle(table, TIE, False)
+      else:
+        table_counters[player + _LOSS] += 1
+        table_counters[dealer + _WIN] += 1
+        table_counters[dealer + _WIN_BLACKJACK] += 1
+        self._Settle(table, LOSS, False)
+      return
+
+    # Cards of the other players hitting.
+    position += num_others
+
+    if player_blackjack:
+      self.positions[table] = position
+      table_counters[player + _WIN] += 1
+      table_counters[player + _WIN_BLACKJACK] += 1
+      self._Settle(table, WIN, True)
+      return
+
+    # Player. Doubling does not end the hand, as in person.Player.Play.
+    actions = self.actions
+    hard = hard_values[first] + hard_values[second]
+    has_ace = first == ACE or second == ACE
+    while True:
+      soft = has_ace and hard <= 11
+      value = hard + 10 if soft else hard
+      if value > 21:
+        table_counters[player + _BUST] += 1
+        break
+      action = actions[((soft * strategy_catalog.NUM_HAND_VALUES + value) *
+                        strategy_catalog.NUM_DEALER_VALUES) + up]
+      if action == _STAND_ACTION:
+        table_counters[player + _STAND] += 1
+        break
+      elif action == _HIT_ACTION:
+        table_counters[player + _HIT] += 1
+      elif action == _DOUBLE_ACTION:
+        for index, bet in enumerate(bets):
+          balances[balance + index] -= bet
+          bets[index] = bet * 2
+        table_counters[player + _DOUBLE] += 1
+      else:
+        raise TableArrayException('No action for %s %d against %d' % (
+            'soft' if soft else 'hard', value, up))
+      drawn = cards[start + position]
+      position += 1
+      hard += hard_values[drawn]
+      has_ace = has_ace or drawn == ACE
+
+    # Dealer.
+    steps = self.automaton.steps
+    state = self.automaton.Classify(hard_values[up] + hard_values[hole],
+                                    up == ACE or hole == ACE)
+    while state >= 0:
+      drawn = cards[start + position]
+      position += 1
+      table_counters[dealer + _HIT] += 1
+      state = steps[state + drawn]
+    self.positions[table] = position
+    outcome = dealer_automaton.Outcome(state)
+    if outcome == dealer_automaton.BUST:
+      table_counters[dealer + _BUST] += 1
+    else:
+      table_counters[dealer + _STAND] += 1
+
+    if value > 21:
+      result = LOSS
+    elif outcome == dealer_automaton.BUST:
+      result = WIN
+    else:
+      dealer_value = dealer_automaton.OUTCOME_TOTALS[outcome]
+      if value == dealer_value:
+        result = TIE
+      elif value > dealer_value:
+        result = WIN
+      else:
+        result = LOSS
+    if result == WIN:
+      table_counters[player + _WIN] += 1
+      table_counters[dealer + _LOSS] += 1
+    elif result == LOSS:
+      table_counters[player + _LOSS] += 1
+      table_counters[dealer + _WIN] += 1
+    else:
+      table_counters[player + _TIE] += 1
+      table_counters[dealer + _TIE] += 1
+    self._Settle(table, result, False)
+
+  def _Settle(self, table, outcome, blackjack):
+    """Pay the bets of a table and tell its bettors, as person.Player does.
+
+    Args:
+      table: int, index of the table.
+      outcome: int, WIN, LOSS or TIE.
+      blackjack: bool, the player won with a blackjack.
+    """
+    balances = self.balances
+    balance = table * len(self.bettors)
+    for index, bet in enumerate(self._bets):
+      if outcome == WIN:
+        if blackjack:
+          balances[balance + index] += bet * self.blackjack_payout
+        else:
+          balances[balance + index] += bet * 2
+      elif outcome == TIE:
+        balances[balance + index] += bet
+    for bettor in self.bettors:
+      bettor.Settle(table, outcome, blackjack)
+
+  def Balance(self, table, wallet_name):
+    """Returns the money units of a wallet at a table."""
+    return self.balances[table * len(self.bettors) +
+                         self.wallet_names.index(wallet_name)]
+
+  def Totals(self):
+    """Returns the counters of every table, merged.
+
+    Returns:
+      counters.GameCounters, as if every table were a merged game.Game.
+    """
+    totals = counters.GameCounters()
+    sums = [0] * NUM_COUNTERS
+    for table in xrange(self.num_tables):
+      offset = table * NUM_COUNTERS
+      for index in xrange(NUM_COUNTERS):
+        sums[index] += self.counters[offset + index]
+    totals.num_hands = sums[_NUM_HANDS]
+    totals.num_shoes = sums[_NUM_SHOES]
+    for index, field in enumerate(counters.PERSON_FIELDS):
+      totals.player[field] = sums[_PLAYER + index]
+      totals.dealer[field] = sums[_DEALER + index]
+
+    num_wallets = len(self.bettors)
+    for index, (name, bettor) in enumerate(zip(self.wallet_names,
+                                               self.bettors)):
+      totals.wallets[name] = sum(self.balances[index::num_wallets])
+      totals.multiplier_records[name] = dict(
+          (multiplier, list(counts))
+          for multiplier, counts in bettor.records.iteritems())
+    return totals
+
+  def BytesPerTable(self):
+    """Returns the bytes of per table state, over the number of tables."""
+    columns = [self.cards, self.positions, self.stops, self.counters,
+               self.balances, self.counted, self.basic_counts,
+               self.running_counts,
+               self.aces_left, self.faces_left]
+    for bettor in self.bettors:
+      columns.extend(value for value in vars(bettor).itervalues()
+                     if isinstance(value, array.array))
+    return float(sum(column.buffer_info()[1] * column.itemsize
+                     for column in columns)) / self.num_tables
+
+
+def ObjectBytes(root, shared=()):
+  """Returns the bytes of the objects reachable from root.
+
+  Types, modules and functions are not counted, nor anything only
+  reachable through the shared objects.
+
+  Args:
+    root: object, object to measure.
+    shared: [object], objects shared between instances, such as the rules.
+  """
+  seen = set(id(obj) for obj in shared)
+  skipped = (type, types.ClassType, types.ModuleType, types.FunctionType,
+             types.BuiltinFunctionType)
+  pending = [root]
+  total = 0
+  while pending:
+    obj = pending.pop()
+    if id(obj) in seen or isinstance(obj, skipped):
+      continue
+    seen.add(id(obj))
+    total += sys.getsizeof(obj)
+    pending.extend(gc.get_referents(obj))
+  return total
+
+
+def GameBytes(config=simulation.DEFAULT_GAME_CONFIG, seed=0,
+              wallet_specs=None, num_rounds=10):
+  """Returns the bytes of one game.Game past its first rounds.
+
+  The rules, play strategy, dealer automaton and card ranks are shared by
+  every game of a process and not counted.
+  """
+  wallets = None
+  if wallet_specs is not None:
+    wallets = simulation.NewWallets(wallet_specs)
+  blackjack_game = simulation.NewGame(config, seed, wallets=wallets)
+  for _ in xrange(num_rounds):
+    simulation.PlayRound(blackjack_game)
+  shared = [config.rules, blackjack_game.play_strategy,
+            blackjack_game.dealer.automaton] + list(card.RANKS)
+  return ObjectBytes(blackjack_game, shared)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--tables', type=int, default=10000,
+                      help='Tables in the array.')
+  parser.add_argument('--num-rounds', type=int, default=10,
+                      help='Rounds played at every table.')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='Seed of the shoes.')
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  start = time.time()
+  tables = TableArray(num_tables=args.tables, seed=args.seed)
+  built = time.time()
+  tables.Play(args.num_rounds)
+  played = time.time()
+
+  game_bytes = GameBytes(num_rounds=args.num_rounds)
+  print 'Tables:        %d' % args.tables
+  print 'Array:         %.0f [bytes/table]' % tables.BytesPerTable()
+  print 'Array objects: %.0f [bytes/table]' % (
+      float(ObjectBytes(tables, [args] + list(card.RANKS))) / args.tables)
+  print 'game.Game:     %d [bytes/table]' % game_bytes
+  print 'Build:         %.2f [s]' % (built - start)
+  print 'Rounds:        %.0f [rounds/s]' % (
+      args.tables * args.num_rounds / max(played - built, 1e-9))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,55 @@
+import counters
+import differential
+import simulation
+import table_array
+import unittest
+
+
+PROGRESSIVE_SPECS = [
+    {'name': 'flat', 'strategy': 'table_minimum',
+     'params': {'table_minimum': 1}},
+    {'name': 'progressive', 'strategy': 'progressive',
+     'params': {'table_minimum': 1, 'table_max': 20}},
+]
+
+
+class TableArrayTest(unittest.TestCase):
+  def test_one_table_matches_game(self):
+    for specs in (None, PROGRESSIVE_SPECS):
+      expected = counters.CountersTask(
+          (simulation.DEFAULT_GAME_CONFIG, 5, 2000, specs))
+      tables = table_array.TableArray(num_tables=1, seed=5,
+                                      wallet_specs=specs)
+      tables.Play(2000)
+      self.assertEqual([], differential.CounterDifferences(expected,
+                                                           tables.Totals()))
+
+  def test_tables_play_independently(self):
+    tables = table_array.TableArray(num_tables=50, seed=1,
+                                    wallet_specs=PROGRESSIVE_SPECS)
+    tables.Play(40)
+    totals = tables.Totals()
+    self.assertEqual(50 * 40, totals.num_hands)
+    self.assertEqual(totals.player['win'] + totals.player['loss'] +
+                     totals.player['tie'], totals.num_hands)
+    self.assertAlmostEqual(
+        totals.wallets['flat'],
+        sum(tables.Balance(table, 'flat') for table in xrange(50)))
+    self.assertEqual(totals.num_hands, sum(
+        sum(counts[:1] + counts[2:]) for counts in
+        totals.multiplier_records['progressive'].itervalues()))
+
+  def test_rejects_strategies_reading_other_signals(self):
+    specs = [{'name': 'ramp', 'strategy': 'ramp',
+              'params': {'ramp': [[0, 1], [2, 4]]}}]
+    self.assertRaises(table_array.TableArrayException,
+                      table_array.TableArray, wallet_specs=specs)
+
+  def test_smaller_than_game(self):
+    tables = table_array.TableArray(num_tables=100, seed=2)
+    tables.Play(5)
+    self.assertLess(tables.BytesPerTable() * 20, table_array.GameBytes())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -5,21 +5,64 @@ Collection of attributes which influence strategy that vary table to table.
 """
 import collections
 
+# Blackjack payouts, as blackjack_win_multiplier.
+BLACKJACK_PAYS_3_TO_2 = 1.5
+BLACKJACK_PAYS_6_TO_5 = 1.2
+
+# When the dealer looks for a blackjack, as dealer_peek. The dealer peeks
+# under the up cards listed; a blackjack under another up card is found once
+# the players have acted and takes every bet, doubles included. Without a
+# hole card (European) the dealers second card is dealt after the players
+# act, and side bets reading it are settled then.
+PEEK_ACE_AND_TEN = 'ace_and_ten'
+PEEK_ACE = 'ace'
+NO_PEEK = 'no_peek'
+NO_HOLE_CARD = 'no_hole_card'
+PEEK_UP_CARD_VALUES = {
+    PEEK_ACE_AND_TEN: (10, 11),
+    PEEK_ACE: (11,),
+    NO_PEEK: (),
+    NO_HOLE_CARD: (),
+}
+
+# When a player may give up half their bet, as surrender. Early surrender is
+# before the dealer peeks, late surrender after.
+NO_SURRENDER = 'none'
+LATE_SURRENDER = 'late'
+EARLY_SURRENDER = 'early'
+SURRENDERS = (NO_SURRENDER, LATE_SURRENDER, EARLY_SURRENDER)
+
 
 class TableRules(collections.namedtuple(
     'TableRules', ['min_money_units', 'max_money_units',
                    'blackjack_win_multiplier', 'hit_on_soft_17',
-                   'num_decks', 'double_limited_to', 
+                   'num_decks', 'double_limited_to',
                    'max_num_split_hands',
-                   'max_num_seats'])):
+                   'max_num_seats',
+                   'dealer_peek', 'surrender'])):
   """Table rules."""
 
 DEFAULT_TABLE_RULES = TableRules(
     min_money_units=1,
     max_money_units=20,
-    blackjack_win_multiplier=1.5,
+    blackjack_win_multiplier=BLACKJACK_PAYS_3_TO_2,
     hit_on_soft_17=True,
     num_decks=4,
     double_limited_to=[10, 11],
     max_num_split_hands=4,
-    max_num_seats=8)
+    max_num_seats=8,
+    dealer_peek=PEEK_ACE_AND_TEN,
+    surrender=NO_SURRENDER)
+
+
+def HasClassicRound(rules):
+  """Returns True if rounds are played as DEFAULT_TABLE_RULES play them.
+
+  That is the dealer peeking under aces and tens and no surrender, which
+  engines reproducing game.Game rounds without a Game assume.
+
+  Args:
+    rules: TableRules, rules at the table.
+  """
+  return (rules.dealer_peek == PEEK_ACE_AND_TEN and
+          rules.surrender == NO_SURRENDER)
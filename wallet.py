@@ -28,18 +28,24 @@ class Bet(object):
 
 class Wallet(object):
   """A collection of money associated with a betting strategy."""
-  def __init__(self, name, betting_strategy, starting_money_units=0):
+  def __init__(self, name, betting_strategy, starting_money_units=0,
+               side_bets=None):
     """Constructor.
 
     Args:
       name: str, Wallet name.
       betting_strategy: BettingStrategy, strategy.
       starting_money_units: int, starting money units.
+      side_bets: [side_bet.SideBet], side bets placed whenever their exact EV
+          is positive.
     """
     self.name = name
     self.betting_strategy = betting_strategy
     self.starting_money_units = starting_money_units
     self.money_units = self.starting_money_units
+    self.side_bets = list(side_bets or [])
+    # {side bet name: [bets placed, net money units]}
+    self.side_bet_record = {}
 
   def Reset(self, zero_reset=False):
     """Reset money units.
@@ -52,21 +58,22 @@ class Wallet(object):
     else:
       self.money_units = self.starting_money_units
 
+    self.side_bet_record = {}
     self.betting_strategy.Reset()
 
-  def PlaceBet(self, next_hand, **kwargs):
+  def PlaceBet(self, next_hand, bet_kwargs):
     """Determine how much to bet on the next hand.
 
     Bet amount will depend on the betting strategy and various other factors
-    which are passed as kwargs.
+    which are passed as the keyword arguments of GetBetAmount.
 
     Money units are transfered from the wallet to the hand.
 
     Args:
       next_hand: Hand, hand to place bet onto.
-      kwargs: dict, relevent parameters which influence betting strategy.
+      bet_kwargs: dict, relevent parameters which influence betting strategy.
     """
-    amount = self.betting_strategy.GetBetAmount(**kwargs)
+    amount = self.betting_strategy.GetBetAmount(**bet_kwargs)
 
     # Sanity check the bet.
     if not amount or amount < 0:
@@ -77,6 +84,46 @@ class Wallet(object):
     self.money_units -= amount
     next_hand.bets.append(Bet(self.name, amount))
 
+    if self.side_bets:
+      self.PlaceSideBets(next_hand, bet_kwargs['shoe'],
+                         after_up_card=False)
+
+  def PlaceSideBets(self, next_hand, shoe, after_up_card):
+    """Place every side bet of the wallet whose exact EV is positive.
+
+    Args:
+      next_hand: Hand, hand to place the side bets onto.
+      shoe: Shoe, shoe the round is dealt from.
+      after_up_card: bool, place the bets offered once the dealers up card is
+          seen, rather than those placed with the main bet.
+    """
+    for side_bet in self.side_bets:
+      if side_bet.after_up_card != after_up_card:
+        continue
+      if side_bet.Ev(shoe) <= 0:
+        continue
+      money_units = side_bet.Stake(self._MainBet(next_hand))
+      self.money_units -= money_units
+      next_hand.side_bets.append((side_bet, Bet(self.name, money_units)))
+
+  def _MainBet(self, next_hand):
+    """Returns the units the wallet bet on the hand."""
+    return sum(bet.money_units for bet in next_hand.bets
+               if bet.wallet_name == self.name)
+
+  def SettleSideBet(self, side_bet, bet, payout):
+    """Pay out a side bet.
+
+    Args:
+      side_bet: side_bet.SideBet, the side bet.
+      bet: Bet, money staked on it.
+      payout: float, net money units won per unit staked.
+    """
+    self.money_units += bet.money_units * (1 + payout)
+    record = self.side_bet_record.setdefault(side_bet.name, [0, 0])
+    record[0] += 1
+    record[1] += bet.money_units * payout
+
   # TODO(self): Revist who calculates stats.
   def PrintStats(self, game_stats):
     self.betting_strategy.PrintStats(self.name, game_stats, self.money_units)